@@ -0,0 +1,138 @@
+import os
+import time
+import logging
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.io.wavfile import write as wav_write
+
+import constants
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class Transcript(str):
+    """Transcript text with word timings, when the model gives them.
+
+    ``words`` holds (word, start, end) with times in seconds from the start
+    of the transcribed audio. Being a ``str``, it passes through the
+    scheduler and callbacks like any other result.
+    """
+    words: Optional[List[Tuple[str, float, float]]] = None
+
+    def __new__(cls, text: str, words: Optional[List[Tuple[str, float, float]]] = None):
+        obj = super().__new__(cls, text)
+        obj.words = words
+        return obj
+
+    def __reduce__(self):
+        return Transcript, (str(self), self.words)
+
+
+def hyp_text(hyp) -> str:
+    """Return the text of a NeMo hypothesis or a plain string result.
+
+    A hypothesis with word timestamps becomes a ``Transcript``.
+    """
+    if isinstance(hyp, Transcript):
+        return hyp
+    if isinstance(hyp, str):
+        return hyp.strip()
+    text = hyp.text.strip()
+    stamps = getattr(hyp, 'timestamp', None)
+    words = stamps.get('word') if isinstance(stamps, dict) else None
+    # NeMo 2 gives seconds; older releases only encoder frame offsets
+    if words is not None and all('start' in w and 'end' in w for w in words):
+        return Transcript(text, [(w['word'], float(w['start']), float(w['end'])) for w in words])
+    return text
+
+
+def to_float32(data: np.ndarray) -> np.ndarray:
+    """Convert an int16 (or float) PCM buffer to float32 in [-1, 1]."""
+    if data.dtype == np.int16:
+        return data.astype(np.float32) * (1.0 / 32768.0)
+    return data.astype(np.float32, copy=False)
+
+
+class ModelRunner:
+    """Hands audio buffers to an ASR model.
+
+    Buffers are passed to ``model.transcribe`` as float32 arrays so the
+    model's preprocessor consumes them directly. Models that only accept
+    file paths are served through temporary WAV files instead: until an
+    array batch has gone through, a batch the model fails on is tried
+    again as files, and if that works the runner keeps to files. Any other
+    error is raised.
+
+    Word timestamps are asked for, so chunks of a long segment can be
+    joined on timing; models that do not take the option are called
+    without it.
+    """
+
+    def __init__(self, model, in_memory: bool = True, timestamps: bool = True) -> None:
+        self.model = model
+        self.in_memory = in_memory
+        self.timestamps = timestamps
+        # the model has taken arrays, so later errors are not about the input type
+        self.arrays_accepted = False
+
+    def _call(self, items) -> list:
+        if self.timestamps:
+            try:
+                return self.model.transcribe(items, batch_size=len(items), verbose=False,
+                                             timestamps=True)
+            except TypeError as e:
+                if 'timestamps' not in str(e):
+                    raise
+                logger.info("Model does not take word timestamps: %s", e)
+                self.timestamps = False
+        return self.model.transcribe(items, batch_size=len(items), verbose=False)
+
+    def transcribe(self, batch: List[np.ndarray]) -> List[str]:
+        if not self.in_memory:
+            return self.transcribe_files(batch)
+        try:
+            texts = self.transcribe_arrays(batch)
+        except (TypeError, ValueError, AttributeError) as e:
+            if self.arrays_accepted:
+                raise
+            try:
+                texts = self.transcribe_files(batch)
+            except Exception:
+                # not the input type: the batch itself is bad
+                raise e
+            logger.warning("In-memory ASR input rejected, using WAV files from now on: %s", e)
+            self.in_memory = False
+            return texts
+        self.arrays_accepted = True
+        return texts
+
+    def transcribe_arrays(self, batch: List[np.ndarray]) -> List[str]:
+        audio = [to_float32(data) for data in batch]
+        start = time.perf_counter()
+        hyps = self._call(audio)
+        METRICS.since('transcribe', start)
+        return [hyp_text(h) for h in hyps]
+
+    def transcribe_files(self, batch: List[np.ndarray]) -> List[str]:
+        paths = []
+        try:
+            start = time.perf_counter()
+            for data in batch:
+                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+                    paths.append(f.name)
+                    wav_write(f, constants.TARGET_RATE, data)
+            METRICS.since('wav_write', start)
+            start = time.perf_counter()
+            hyps = self._call(paths)
+            METRICS.since('transcribe', start)
+            return [hyp_text(h) for h in hyps]
+        finally:
+            # one file that cannot be removed must not leave the others behind
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Could not remove %s: %s", path, e)
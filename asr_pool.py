@@ -0,0 +1,548 @@
+"""ASR in worker processes.
+
+Inference and NeMo's Python-side pre- and post-processing hold the GIL
+for long stretches, which delays the VAD loop and the UI sharing the
+interpreter with them. ``ASRProcessPool`` runs one model replica per
+worker process instead and is called like a model, so ``ModelRunner``
+and the scheduler use it unchanged: each scheduler worker thread hands
+its batch to an idle process and waits, without the GIL, for the texts.
+
+Audio goes through a ``multiprocessing.shared_memory`` buffer per
+process, which grows as needed; only buffer offsets and the resulting
+texts travel over the process's pipe.
+
+Each replica is pinned to its own share of the cores (``core_sets``)
+and, with ``threads`` 0, runs one intra-op thread per core of its share,
+so replicas do not fight over cores. A batch goes to the idle replica
+expected to finish it first, by the speed it measured on earlier
+batches. A monitor thread pings idle replicas every ``HEALTH_S``; one
+that died, does not answer or takes longer than ``CALL_TIMEOUT_S`` for
+a batch is killed and started again, loading its model anew, and the
+batch it was running fails as an ASR error would. ``resize`` changes the
+number of replicas while the pool serves: new replicas join once warm,
+and one whose cores change keeps serving until its replacement is ready.
+Processes are started outside the pool's lock and swapped in afterwards,
+so callers and the monitor are not held up while one starts.
+"""
+import os
+import time
+import logging
+import threading
+import multiprocessing as mp
+from functools import partial
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+import constants
+from asr import ModelRunner, to_float32
+from model_loader import LoadTimes, load_model, warm_up
+
+logger = logging.getLogger(__name__)
+
+# float32 samples each process's buffer holds at first: a full batch of 10 s segments
+INITIAL_SAMPLES = constants.ASR_MAX_BATCH * 10 * constants.TARGET_RATE
+# how often a waiting caller checks that its process is still alive
+POLL_S = 0.2
+# idle replicas are pinged this often, and must answer within PING_TIMEOUT_S
+HEALTH_S = 5.0
+PING_TIMEOUT_S = 2.0
+# a batch taking longer than this means the replica hangs
+CALL_TIMEOUT_S = 120.0
+# weight of the latest batch in a replica's measured speed
+SPEED_ALPHA = 0.3
+
+STARTING, IDLE, BUSY, FAILED = 'starting', 'idle', 'busy', 'failed'
+
+# in a worker process: the cores it is pinned to
+_CORES: Optional[List[int]] = None
+
+
+def available_cores() -> List[int]:
+    """Cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_sets(replicas: int, cores: Optional[Sequence[int]] = None) -> List[List[int]]:
+    """Split ``cores`` into ``replicas`` disjoint runs of neighbouring cores.
+
+    The first sets get one core more when they do not divide evenly. With
+    fewer cores than replicas, replicas share cores one each, in turn.
+    """
+    cores = list(available_cores() if cores is None else cores)
+    n = max(1, replicas)
+    if len(cores) < n:
+        return [[cores[i % len(cores)]] for i in range(n)]
+    size, extra = divmod(len(cores), n)
+    sets, pos = [], 0
+    for i in range(n):
+        k = size + (i < extra)
+        sets.append(cores[pos:pos + k])
+        pos += k
+    return sets
+
+
+def replica_cores() -> Optional[List[int]]:
+    """Cores the calling worker process is pinned to; None if it is not."""
+    return _CORES
+
+
+def _load(name: str, cache_dir: Optional[str], backend: str, threads: int):
+    if not threads and _CORES:
+        # one intra-op thread per core of the replica's own
+        threads = len(_CORES)
+    return load_model(name, cache_dir, backend, threads)[0]
+
+
+def model_factory(name: str = constants.MODEL_NAME,
+                  cache_dir: Optional[str] = constants.MODEL_CACHE_DIR,
+                  backend: str = constants.ASR_BACKEND, threads: int = 0) -> Callable[[], object]:
+    """Picklable loader of ``name`` for the worker processes."""
+    return partial(_load, name, cache_dir, backend, threads)
+
+
+def _serve(conn, factory: Callable[[], object], warmup_s: float,
+           cores: Optional[List[int]] = None) -> None:
+    """Worker process: load the model, then transcribe until told to stop."""
+    global _CORES
+    if cores is not None and hasattr(os, 'sched_setaffinity'):
+        # before the model's libraries start their thread pools
+        try:
+            os.sched_setaffinity(0, cores)
+            _CORES = list(cores)
+        except OSError:
+            pass
+    try:
+        start = time.perf_counter()
+        model = factory()
+        load_s = time.perf_counter() - start
+        warmup = warm_up(model, warmup_s) if warmup_s > 0 else 0.0
+    except Exception as e:
+        conn.send(('error', f"could not load the model: {type(e).__name__}: {e}"))
+        return
+    runner = ModelRunner(model)
+    conn.send(('ready', load_s, warmup))
+    shm = None
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                return
+            if msg is None:
+                return
+            if msg == 'ping':
+                conn.send(('pong',))
+                continue
+            name, spans = msg
+            if shm is None or shm.name != name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=name)
+            data = np.ndarray((shm.size // 4,), dtype=np.float32, buffer=shm.buf)
+            try:
+                conn.send(('ok', runner.transcribe([data[a:b] for a, b in spans])))
+            except Exception as e:
+                conn.send(('error', f"{type(e).__name__}: {e}"))
+            # views into the buffer must go before it can be closed
+            del data
+    finally:
+        if shm is not None:
+            shm.close()
+
+
+class _Replica:
+    """One worker process, its cores and the shared buffer its audio goes through.
+
+    ``state`` changes under the pool's lock; only the thread that moved a
+    replica to ``BUSY``, or the monitor while it is ``STARTING``, talks to
+    its process.
+    """
+
+    def __init__(self, ctx, index: int, factory: Callable[[], object], warmup_s: float,
+                 cores: Optional[List[int]]) -> None:
+        self.index = index
+        self.cores = cores
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_serve, args=(child, factory, warmup_s, cores),
+                                daemon=True, name=f"asr-proc-{index}")
+        self.proc.start()
+        child.close()
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.state = STARTING
+        self.error: Optional[str] = None
+        self.load_s = self.warmup_s = 0.0
+        self.jobs = self.errors = 0
+        # audio samples transcribed per second, measured
+        self.speed = 0.0
+        self.checked = time.monotonic()
+        # drained and stopped once idle
+        self.retiring = False
+        # the replica that takes over this one's slot once it is ready
+        self.successor: Optional['_Replica'] = None
+
+    def _died(self) -> RuntimeError:
+        return RuntimeError(f"ASR process {self.index} died (exit code {self.proc.exitcode})")
+
+    def _receive(self, timeout: Optional[float] = None):
+        """Next message from the process; raises if it died or hangs first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.conn.poll(POLL_S):
+            if not self.proc.is_alive():
+                raise self._died()
+            if deadline is not None and time.monotonic() > deadline:
+                self.proc.kill()
+                self.proc.join(1.0)
+                raise RuntimeError(f"ASR process {self.index} gave no answer in {timeout:.0f} s")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            raise self._died() from None
+
+    def started(self) -> bool:
+        """Whether the model is loaded, without waiting; raises if loading failed."""
+        if not self.conn.poll(0):
+            if not self.proc.is_alive():
+                raise self._died()
+            return False
+        msg = self._receive()
+        if msg[0] == 'error':
+            raise RuntimeError(msg[1])
+        self.load_s, self.warmup_s = msg[1], msg[2]
+        return True
+
+    def ping(self) -> bool:
+        try:
+            self.conn.send('ping')
+            return self._receive(PING_TIMEOUT_S)[0] == 'pong'
+        except (RuntimeError, OSError):
+            return False
+
+    def _buffer(self, samples: int) -> np.ndarray:
+        if self.shm is None or self.shm.size < 4 * samples:
+            size = max(samples, INITIAL_SAMPLES, 2 * self.shm.size // 4 if self.shm else 0)
+            self._release()
+            self.shm = shared_memory.SharedMemory(create=True, size=4 * size)
+        return np.ndarray((self.shm.size // 4,), dtype=np.float32, buffer=self.shm.buf)
+
+    def transcribe(self, audio: List[np.ndarray], timeout: float) -> List[str]:
+        buf = self._buffer(sum(len(a) for a in audio))
+        spans, pos = [], 0
+        for a in audio:
+            buf[pos:pos + len(a)] = to_float32(a)
+            spans.append((pos, pos + len(a)))
+            pos += len(a)
+        del buf
+        start = time.perf_counter()
+        try:
+            self.conn.send((self.shm.name, spans))
+        except OSError:
+            self.proc.join(1.0)
+            raise self._died() from None
+        msg = self._receive(timeout)
+        if msg[0] == 'error':
+            self.errors += 1
+            raise RuntimeError(msg[1])
+        speed = pos / max(time.perf_counter() - start, 1e-6)
+        self.speed = speed if not self.jobs else (1 - SPEED_ALPHA) * self.speed + SPEED_ALPHA * speed
+        self.jobs += 1
+        return msg[1]
+
+    def _release(self) -> None:
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def stop(self, timeout: float) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+            self.proc.join(timeout)
+        self.conn.close()
+        self._release()
+
+
+class ASRProcessPool:
+    """Model replicas in ``workers`` processes, called like a NeMo model.
+
+    ``factory`` is called in each process to load its model and must be
+    picklable, e.g. ``model_factory(...)``. The constructor returns once
+    every process has loaded and warmed up its model, and raises if one
+    could not. ``pin_cores`` pins each process to its ``core_sets`` share.
+    """
+
+    def __init__(self, factory: Callable[[], object], workers: int = constants.ASR_WORKERS,
+                 warmup_s: float = constants.WARMUP_SECONDS, start_method: str = 'spawn',
+                 pin_cores: bool = constants.ASR_PIN_CORES,
+                 call_timeout_s: float = CALL_TIMEOUT_S, health_s: float = HEALTH_S) -> None:
+        # spawn rather than fork: the parent runs Qt, audio and CUDA threads
+        self._ctx = mp.get_context(start_method)
+        self.factory = factory
+        self.warmup_s = warmup_s
+        self.pin_cores = pin_cores
+        self.call_timeout_s = call_timeout_s
+        self.health_s = health_s
+        self.restarts = 0
+        self._cond = threading.Condition()
+        # one resize at a time, so each swaps in what it planned
+        self._resizing = threading.Lock()
+        self._closed = False
+        # replicas being started again outside the lock
+        self._restarting = 0
+        # every process of the pool, and the one meant to serve each slot
+        self._replicas: List[_Replica] = []
+        self._slots: List[_Replica] = []
+        start = time.perf_counter()
+        self._resize(max(1, workers))
+        with self._cond:
+            first = list(self._replicas)
+        self._monitor = threading.Thread(target=self._watch, daemon=True, name='asr-pool-health')
+        self._monitor.start()
+        with self._cond:
+            while any(r.state == STARTING for r in first):
+                self._cond.wait()
+            failed = [r for r in first if r.state == FAILED]
+        if failed:
+            self.close()
+            raise RuntimeError(failed[0].error)
+        self.times = LoadTimes('processes', load_s=max(r.load_s for r in first),
+                               warmup_s=max(r.warmup_s for r in first),
+                               ready_s=time.perf_counter() - start)
+
+    @property
+    def workers(self) -> int:
+        return len(self._slots)
+
+    def pids(self) -> List[int]:
+        with self._cond:
+            return [r.proc.pid for r in self._slots if r.state in (IDLE, BUSY)]
+
+    def health(self) -> List[Dict]:
+        """State, cores and counters of every process, by slot."""
+        with self._cond:
+            return [{'index': r.index, 'pid': r.proc.pid, 'state': r.state, 'cores': r.cores,
+                     'retiring': r.retiring, 'jobs': r.jobs, 'errors': r.errors,
+                     'speed': r.speed / constants.TARGET_RATE, 'error': r.error}
+                    for r in sorted(self._replicas, key=lambda r: r.index)]
+
+    def resize(self, workers: int) -> None:
+        """Serve with ``workers`` replicas from now on; returns without waiting."""
+        self._resize(max(1, workers))
+        logger.info("ASR process pool resized to %d replicas", workers)
+
+    def _resize(self, n: int) -> None:
+        """Start, replace and retire replicas so ``n`` slots are served."""
+        with self._resizing:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("the ASR process pool is closed")
+                sets = core_sets(n) if self.pin_cores else [None] * n
+                wanted = [(i, cores) for i, cores in enumerate(sets)
+                          if i >= len(self._slots) or self._slots[i].cores != cores
+                          or self._slots[i].state == FAILED]
+            # starting a process takes a while; callers and the monitor go on meanwhile
+            new = {}
+            try:
+                for i, cores in wanted:
+                    new[i] = _Replica(self._ctx, i, self.factory, self.warmup_s, cores)
+            except BaseException:
+                for replica in new.values():
+                    replica.stop(timeout=1.0)
+                raise
+            with self._cond:
+                closed = self._closed
+                if not closed:
+                    self._swap_in(n, new)
+                    self._cond.notify_all()
+            if closed:
+                for replica in new.values():
+                    replica.stop(timeout=1.0)
+                raise RuntimeError("the ASR process pool is closed")
+
+    def _swap_in(self, n: int, new: Dict[int, _Replica]) -> None:
+        """Put started replicas in their slots and retire those past ``n``; under the lock."""
+        for i in sorted(new):
+            self._replicas.append(new[i])
+            current = self._slots[i] if i < len(self._slots) else None
+            if current is None:
+                self._slots.append(new[i])
+                continue
+            if current.state == FAILED:
+                self._replicas.remove(current)
+            else:
+                # keeps serving until the new one is ready
+                current.successor = new[i]
+            self._slots[i] = new[i]
+        for replica in self._slots[n:]:
+            replica.retiring = True
+            if replica.state == FAILED:
+                self._replicas.remove(replica)
+        del self._slots[n:]
+        for replica in self._replicas:
+            if replica.successor is not None and replica.successor.retiring:
+                replica.retiring = True
+
+    def _claim(self, replica: _Replica) -> bool:
+        with self._cond:
+            if self._closed or replica.state != IDLE:
+                return False
+            replica.state = BUSY
+            return True
+
+    def _acquire(self, samples: int) -> _Replica:
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("the ASR process pool is closed")
+                idle = [r for r in self._replicas if r.state == IDLE and not r.retiring]
+                if idle:
+                    # the one expected to finish first; unmeasured ones get measured
+                    best = min(idle, key=lambda r: (samples / r.speed if r.speed else 0.0, r.jobs))
+                    best.state = BUSY
+                    return best
+                if not self._restarting and not any(r.state in (STARTING, BUSY)
+                                                    for r in self._replicas):
+                    raise RuntimeError("no ASR process is running")
+                self._cond.wait()
+
+    def _put_back(self, replica: _Replica) -> None:
+        with self._cond:
+            if replica.state == BUSY:
+                replica.state = IDLE
+            self._cond.notify_all()
+
+    def transcribe(self, audio, batch_size: int = 0, verbose: bool = False, **kwargs) -> List[str]:
+        if not audio:
+            return []
+        audio = list(audio)
+        samples = sum(len(a) for a in audio)
+        while True:
+            replica = self._acquire(samples)
+            if replica.proc.is_alive():
+                break
+            # died while idle; nothing of this batch was lost yet
+            self._replace(replica, f"exited with code {replica.proc.exitcode}")
+        try:
+            texts = replica.transcribe(audio, self.call_timeout_s)
+        except RuntimeError:
+            if not replica.proc.is_alive():
+                self._replace(replica, f"exited with code {replica.proc.exitcode}")
+            else:
+                self._put_back(replica)
+            raise
+        self._put_back(replica)
+        return texts
+
+    def _replace(self, replica: _Replica, reason: str) -> None:
+        """Stop a claimed replica and start another in its slot."""
+        logger.error("ASR process %d %s, starting it again", replica.index, reason)
+        replica.stop(timeout=1.0)
+        with self._cond:
+            self._replicas.remove(replica)
+            restart = not self._closed and replica in self._slots and replica.successor is None
+            if restart:
+                self._restarting += 1
+            self._cond.notify_all()
+        if not restart:
+            return
+        new = None
+        try:
+            new = _Replica(self._ctx, replica.index, self.factory, self.warmup_s, replica.cores)
+        finally:
+            with self._cond:
+                self._restarting -= 1
+                # a resize or close may have taken the slot meanwhile
+                installed = (new is not None and not self._closed and replica in self._slots
+                             and replica.successor is None)
+                if installed:
+                    self._replicas.append(new)
+                    self._slots[self._slots.index(replica)] = new
+                    self.restarts += 1
+                self._cond.notify_all()
+            if new is not None and not installed:
+                new.stop(timeout=1.0)
+
+    def _retire(self, replica: _Replica) -> None:
+        if self._claim(replica):
+            replica.stop(timeout=1.0)
+            with self._cond:
+                self._replicas.remove(replica)
+                self._cond.notify_all()
+
+    def _started(self, replica: _Replica) -> None:
+        """Check on a loading replica; from the monitor thread only."""
+        try:
+            ready = replica.started()
+        except RuntimeError as e:
+            logger.error("ASR process %d could not start: %s", replica.index, e)
+            replica.stop(timeout=1.0)
+            with self._cond:
+                replica.state, replica.error = FAILED, str(e)
+                old = next((r for r in self._replicas if r.successor is replica), None)
+                if old is not None:
+                    # the slot stays with the one it was to replace
+                    old.successor = None
+                    if replica in self._slots:
+                        self._slots[self._slots.index(replica)] = old
+                    self._replicas.remove(replica)
+                self._cond.notify_all()
+            return
+        if ready:
+            with self._cond:
+                replica.state, replica.checked = IDLE, time.monotonic()
+                for old in self._replicas:
+                    if old.successor is replica:
+                        old.retiring = True
+                self._cond.notify_all()
+
+    def _check(self, replica: _Replica) -> None:
+        if not self._claim(replica):
+            return
+        if not replica.proc.is_alive():
+            self._replace(replica, f"exited with code {replica.proc.exitcode}")
+        elif not replica.ping():
+            self._replace(replica, "did not answer a health check")
+        else:
+            replica.checked = time.monotonic()
+            self._put_back(replica)
+
+    def _watch(self) -> None:
+        """Monitor thread: bring up, check and retire replicas."""
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                replicas = list(self._replicas)
+            now = time.monotonic()
+            for replica in replicas:
+                if replica.state == STARTING:
+                    self._started(replica)
+                elif replica.state == IDLE and replica.retiring:
+                    self._retire(replica)
+                elif replica.state == IDLE and (not replica.proc.is_alive()
+                                                or now - replica.checked >= self.health_s):
+                    self._check(replica)
+            with self._cond:
+                if not self._closed:
+                    self._cond.wait(POLL_S)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the worker processes and free their buffers."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            replicas = list(self._replicas)
+            self._cond.notify_all()
+        if self._monitor.is_alive() and self._monitor is not threading.current_thread():
+            self._monitor.join()
+        for replica in replicas:
+            replica.stop(timeout)
@@ -0,0 +1,479 @@
+"""Search the pipeline settings for a latency and CPU budget on recorded audio.
+
+    python autotune.py recordings/ --latency-ms 1000 --cpu 0.5 --trials 40
+
+Every candidate profile runs each recording through a ``DevicePipeline``
+frame by frame, as fast as the model allows: each ASR job is transcribed
+as soon as it is submitted, and timed. What the profile would cost and
+how late its text would be in real time is then worked out by replaying
+the jobs, at the audio position they were submitted and with the time
+they took, on ``asr_workers`` simulated scheduler workers: finals and
+chunks go before partials, one worker stays free of partials, and a
+partial still waiting when a newer one or its final comes is dropped.
+Results are cached by audio, so profiles that cut the same segments
+share their decoding, and the search soon runs many times faster than
+real time.
+
+Per profile it reports:
+
+* latency: p90 from the end of a segment's speech to its final;
+* lag: p90, sampled during speech, of how far the text on screen trails
+  the speech;
+* CPU: VAD and ASR time per second of audio, in cores;
+* WER against ``<name>.txt`` next to each recording, where there is one.
+
+The search starts from the current settings, samples the space at
+random, then refines around the best profile so far. The best profile
+within both budgets, by WER, then lag, then CPU, is written back with
+``settings.save_settings`` unless ``--dry-run``. The Pareto front of
+latency, lag, CPU and WER is printed either way; the pick is always on
+it.
+"""
+import os
+import re
+import sys
+import json
+import time
+import queue
+import random
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict, deque
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import constants
+import settings
+from asr import ModelRunner
+from backends import BACKENDS, resolve_threads
+from batch import find_inputs
+from model_loader import load_model
+from scheduler import CHUNK, FINAL, PARTIAL
+from transcriber import DevicePipeline, PipelineConfig
+from utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+LATENCY_MS = 1000
+CPU_CORES = 0.5
+TRIALS = 40
+# values tried per setting; segment lengths are searched in ms and stored in frames
+SPACE = {
+    'frame_ms': (10, 20, 30),
+    'vad_mode': (0, 1, 2, 3),
+    'max_silence_ms': (90, 150, 240, 300, 450, 600, 900),
+    'partial_interval_ms': (0, 300, 500, 800, 1200, 2000, 3000),
+    'min_ms': (150, 300, 450, 600),
+    'max_ms': (3000, 4500, 6000, 9000),
+    'asr_workers': (1, 2, 3, 4),
+}
+# how often the on-screen lag is sampled during speech
+LAG_STEP_S = 0.1
+
+
+@dataclass
+class Clip:
+    name: str
+    pcm: np.ndarray
+    rate: int
+    # reference words, if the recording has a transcript
+    words: Optional[List[str]] = None
+
+    @property
+    def seconds(self) -> float:
+        return len(self.pcm) / self.rate
+
+
+def normalize_text(text: str) -> List[str]:
+    return re.sub(r"[^\w' ]+", ' ', text.lower()).split()
+
+
+def word_errors(ref: Sequence[str], hyp: Sequence[str]) -> int:
+    """Word-level edit distance."""
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i]
+        for j, h in enumerate(hyp, 1):
+            cur.append(min(prev[j - 1] + (r != h), prev[j] + 1, cur[j - 1] + 1))
+        prev = cur
+    return prev[-1]
+
+
+def load_clips(paths: List[str]) -> List[Clip]:
+    """Recordings under ``paths``, each with the words of its ``.txt`` if present."""
+    clips = []
+    for path in find_inputs(paths):
+        pcm, rate = load_audio(path)
+        words = None
+        ref = os.path.splitext(path)[0] + '.txt'
+        if os.path.exists(ref):
+            with open(ref, encoding='utf-8') as f:
+                words = normalize_text(f.read())
+        clips.append(Clip(path, pcm, rate, words))
+    return clips
+
+
+@dataclass
+class _Job:
+    key: tuple
+    kind: str
+    # audio seconds: when it was submitted, and where the segment started
+    arrival: float
+    seg_start: float
+    # audio seconds of the segment the result shows; for finals, where its speech ended
+    covers: float
+    speech_end: float
+    # seconds the model took
+    cost: float
+
+
+class _Decoder:
+    """Model results and timings by audio, shared by every profile."""
+
+    def __init__(self, runner: ModelRunner) -> None:
+        self.runner = runner
+        self.results: Dict[bytes, Tuple[str, float]] = {}
+        self.calls = 0
+
+    def __call__(self, audio: np.ndarray) -> Tuple[str, float]:
+        key = hashlib.blake2b(audio.tobytes(), digest_size=16).digest()
+        hit = self.results.get(key)
+        if hit is None:
+            start = time.perf_counter()
+            text = self.runner.transcribe([audio])[0]
+            hit = self.results[key] = (text, time.perf_counter() - start)
+            self.calls += 1
+        return hit
+
+
+def quiet_tail(audio: np.ndarray, frame_len: int) -> int:
+    """Samples at the end of ``audio`` after its last loud frame.
+
+    The VAD's hangover runs past the end of a word, so a segment's
+    speech is taken to end at its last frame within 20 dB of its
+    loudest frames.
+    """
+    n = len(audio) // frame_len
+    if not n:
+        return 0
+    x = audio[len(audio) - n * frame_len:].astype(np.float32).reshape(n, frame_len)
+    rms = np.sqrt(np.mean(x * x, axis=1))
+    loud = np.flatnonzero(rms >= 0.1 * np.percentile(rms, 90))
+    return (n - 1 - loud[-1]) * frame_len if len(loud) else 0
+
+
+class _InlineScheduler:
+    """Transcribes each job as it is submitted and notes when, for ``replay``."""
+
+    def __init__(self, decode: _Decoder) -> None:
+        self.decode = decode
+        self.pipeline: Optional[DevicePipeline] = None
+        self.jobs: List[_Job] = []
+        self.seconds = 0.0
+
+    def submit(self, key, audio, kind, callback) -> None:
+        p, rate = self.pipeline, constants.TARGET_RATE
+        speech_end = p.seg_end
+        if kind == FINAL:
+            speech_end -= quiet_tail(audio, p.frame_len)
+        start = time.perf_counter()
+        text, cost = self.decode(audio)
+        self.seconds += time.perf_counter() - start
+        self.jobs.append(_Job(key, kind, p.vad_pos / rate, p.seg_start / rate, p.seg_end / rate,
+                              speech_end / rate, cost))
+        callback(text)
+
+
+def replay(jobs: List[_Job], workers: int) -> Tuple[List[Optional[float]], float]:
+    """When each job would finish on ``workers`` scheduler workers, None if dropped.
+
+    Also returns the seconds the workers were busy.
+    """
+    n = len(jobs)
+    done: List[Optional[float]] = [None] * n
+    ends = [0.0] * workers
+    on_partial = [False] * workers
+    urgent: deque = deque()
+    partials: 'OrderedDict[tuple, int]' = OrderedDict()
+    i, t, busy = 0, 0.0, 0.0
+    while True:
+        w = min(range(workers), key=ends.__getitem__)
+        t = max(t, ends[w])
+        while i < n and jobs[i].arrival <= t:
+            job = jobs[i]
+            if job.kind == PARTIAL:
+                # replacing in place keeps the key's position in the queue
+                partials[job.key] = i
+            else:
+                if job.kind == FINAL:
+                    partials.pop(job.key, None)
+                urgent.append(i)
+            i += 1
+        others = sum(1 for v in range(workers) if v != w and on_partial[v] and ends[v] > t)
+        if urgent:
+            j = urgent.popleft()
+        elif partials and (workers < 2 or others < workers - 1):
+            j = partials.popitem(last=False)[1]
+        else:
+            # wait for the next job or for a worker to finish
+            events = [ends[v] for v in range(workers) if ends[v] > t]
+            if i < n:
+                events.append(jobs[i].arrival)
+            if not events:
+                break
+            t = min(events)
+            continue
+        done[j] = ends[w] = t + jobs[j].cost
+        on_partial[w] = jobs[j].kind == PARTIAL
+        busy += jobs[j].cost
+    return done, busy
+
+
+def _p90(values: List[float]) -> float:
+    return float(np.percentile(values, 90)) if values else float('nan')
+
+
+def _timings(jobs: List[_Job], done: List[Optional[float]]) -> Tuple[List[float], List[float]]:
+    """Final latencies and on-screen lag samples, in seconds."""
+    segments: Dict[tuple, List[int]] = {}
+    for j, job in enumerate(jobs):
+        segments.setdefault(job.key, []).append(j)
+    latency, lag = [], []
+    for idx in segments.values():
+        finals = [j for j in idx if jobs[j].kind == FINAL]
+        if not finals:
+            continue
+        final = jobs[finals[-1]]
+        emitted = max(done[j] for j in idx if jobs[j].kind in (FINAL, CHUNK))
+        latency.append(emitted - final.speech_end)
+        shown = [(emitted, final.covers)]
+        for k, j in enumerate(idx):
+            if jobs[j].kind != PARTIAL or done[j] is None:
+                continue
+            # a partial superseded before it came back is never delivered
+            later = [jobs[m].arrival for m in idx[k + 1:] if jobs[m].kind in (PARTIAL, FINAL)]
+            if not later or done[j] <= later[0]:
+                shown.append((done[j], jobs[j].covers))
+        shown.sort()
+        t = final.seg_start + LAG_STEP_S
+        while t <= final.speech_end:
+            seen = [covers for when, covers in shown if when <= t]
+            lag.append(t - max(seen, default=final.seg_start))
+            t += LAG_STEP_S
+    return latency, lag
+
+
+def to_settings(base: settings.Settings, profile: Dict) -> settings.Settings:
+    """``base`` with the searched values of ``profile``."""
+    frame = profile['frame_ms']
+    return replace(base, frame_ms=frame, vad_mode=profile['vad_mode'],
+                   max_silence_ms=profile['max_silence_ms'],
+                   partial_interval_ms=profile['partial_interval_ms'],
+                   min_frames=max(1, round(profile['min_ms'] / frame)),
+                   max_frames=max(1, round(profile['max_ms'] / frame)),
+                   asr_workers=profile['asr_workers'])
+
+
+def from_settings(cfg: settings.Settings) -> Dict:
+    return {'frame_ms': cfg.frame_ms, 'vad_mode': cfg.vad_mode,
+            'max_silence_ms': cfg.max_silence_ms, 'partial_interval_ms': cfg.partial_interval_ms,
+            'min_ms': cfg.min_frames * cfg.frame_ms, 'max_ms': cfg.max_frames * cfg.frame_ms,
+            'asr_workers': cfg.asr_workers}
+
+
+def evaluate(profile: Dict, clips: List[Clip], base: settings.Settings, decode: _Decoder,
+             cores: int) -> Dict:
+    """Run ``clips`` under ``profile`` and measure it as described above."""
+    cfg = to_settings(base, profile)
+    config = PipelineConfig.from_ms(cfg.vad_mode, cfg.frame_ms, cfg.max_silence_ms,
+                                    cfg.partial_interval_ms, cfg.min_frames, cfg.max_frames,
+                                    cfg.stream_chunk_ms, cfg.stream_context_ms, cfg.preroll_ms,
+                                    vad_engine=cfg.vad_engine, vad_gate_level=cfg.vad_gate_level,
+                                    partial_adaptive=False)
+    # workers beyond the cores do not run at the speed measured one at a time
+    workers = max(1, min(cfg.asr_workers, cores))
+    latency, lag = [], []
+    cpu = audio = 0.0
+    errors = words = 0
+    dropped = 0
+    for clip in clips:
+        sched = _InlineScheduler(decode)
+        out: queue.SimpleQueue = queue.SimpleQueue()
+        pipeline = sched.pipeline = DevicePipeline(clip.name, clip.rate, config, sched, out)
+        step = clip.rate * cfg.frame_ms // 1000
+        start = time.perf_counter()
+        for pos in range(0, len(clip.pcm), step):
+            pipeline.feed(clip.pcm[pos:pos + step])
+        pipeline.flush()
+        cpu += time.perf_counter() - start - sched.seconds
+        done, busy = replay(sched.jobs, workers)
+        cpu += busy
+        audio += clip.seconds
+        dropped += sum(1 for d in done if d is None)
+        lat, lg = _timings(sched.jobs, done)
+        latency += lat
+        lag += lg
+        finals = []
+        while not out.empty():
+            item = out.get()
+            if item['final']:
+                finals.append(item)
+        if clip.words is not None:
+            hyp = normalize_text(' '.join(f['text'] for f in sorted(finals, key=lambda f: f['id'])))
+            errors += word_errors(clip.words, hyp)
+            words += len(clip.words)
+    return {'profile': profile, 'latency_ms': 1000 * _p90(latency), 'lag_ms': 1000 * _p90(lag),
+            'cpu': cpu / audio if audio else 0.0, 'wer': errors / words if words else None,
+            'finals': len(latency), 'dropped': dropped}
+
+
+def feasible(result: Dict, latency_ms: float, cpu: float) -> bool:
+    # nan latency, no finals at all, never fits
+    return result['latency_ms'] <= latency_ms and result['cpu'] <= cpu
+
+
+def rank(result: Dict) -> tuple:
+    lag = result['lag_ms']
+    return (result['wer'] or 0.0, lag if lag == lag else float('inf'), result['cpu'],
+            result['latency_ms'])
+
+
+def pareto(results: List[Dict]) -> List[Dict]:
+    """Results no other result beats on latency, lag, CPU and WER at once."""
+    def axes(r):
+        return (r['latency_ms'], r['lag_ms'], r['cpu'], r['wer'] or 0.0)
+
+    # nan where a profile had no finals
+    points = [r for r in results if not any(np.isnan(axes(r)))]
+    front = [r for r in points
+             if not any(all(a <= b for a, b in zip(axes(o), axes(r))) and axes(o) != axes(r)
+                        for o in points)]
+    return sorted(front, key=lambda r: r['latency_ms'])
+
+
+def _neighbour(profile: Dict, space: Dict, rng: random.Random) -> Dict:
+    """``profile`` with one or two settings moved to an adjacent value."""
+    new = dict(profile)
+    for name in rng.sample(sorted(space), rng.choice((1, 2))):
+        values = space[name]
+        # nearest value of the grid, as the current settings may be off it
+        i = min(range(len(values)), key=lambda k: abs(values[k] - new[name]))
+        new[name] = values[min(len(values) - 1, max(0, i + rng.choice((-1, 1))))]
+    return new
+
+
+def search(clips: List[Clip], model, base: settings.Settings, latency_ms: float = LATENCY_MS,
+           cpu: float = CPU_CORES, trials: int = TRIALS, seed: int = 0,
+           progress=None) -> List[Dict]:
+    """Evaluate up to ``trials`` profiles, the current settings first."""
+    rng = random.Random(seed)
+    space = dict(SPACE)
+    if base.stream_chunk_ms > 0:
+        # with a segment stream, long speech runs on to a pause whatever max_frames is
+        del space['max_ms']
+    decode = _Decoder(ModelRunner(model))
+    cores = os.cpu_count() or 1
+    current = from_settings(base)
+    results: List[Dict] = []
+    seen = set()
+    for n in range(trials):
+        ok = [r for r in results if feasible(r, latency_ms, cpu)]
+        for _ in range(50):
+            if n == 0:
+                profile = current
+            elif n < trials // 2 or not ok:
+                profile = dict(current, **{k: rng.choice(v) for k, v in space.items()})
+            else:
+                profile = _neighbour(min(ok, key=rank)['profile'], space, rng)
+            if tuple(sorted(profile.items())) not in seen:
+                break
+        else:
+            break
+        seen.add(tuple(sorted(profile.items())))
+        result = evaluate(profile, clips, base, decode, cores)
+        result['trial'] = n
+        results.append(result)
+        if progress is not None:
+            progress(result)
+    logger.info("%d profiles, %d model calls", len(results), decode.calls)
+    return results
+
+
+def best(results: List[Dict], latency_ms: float, cpu: float) -> Optional[Dict]:
+    ok = [r for r in results if feasible(r, latency_ms, cpu)]
+    return min(ok, key=rank) if ok else None
+
+
+HEADER = (f"{'#':>3s} {'frame':>5s} {'mode':>4s} {'silence':>7s} {'partial':>7s} {'min':>5s} "
+          f"{'max':>5s} {'wrk':>3s} {'latency':>8s} {'lag':>7s} {'cpu':>6s} {'WER':>6s}")
+
+
+def format_result(r: Dict) -> str:
+    p = r['profile']
+    wer = f"{100 * r['wer']:5.1f}%" if r['wer'] is not None else '     -'
+    return (f"{r['trial']:3d} {p['frame_ms']:5d} {p['vad_mode']:4d} {p['max_silence_ms']:7d} "
+            f"{p['partial_interval_ms']:7d} {p['min_ms']:5d} {p['max_ms']:5d} "
+            f"{p['asr_workers']:3d} {r['latency_ms']:6.0f}ms {r['lag_ms']:5.0f}ms "
+            f"{r['cpu']:6.3f} {wer}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='WAV/FLAC files or directories, with '
+                        'optional .txt transcripts next to them')
+    parser.add_argument('--latency-ms', type=float, default=LATENCY_MS,
+                        help='p90 budget from end of speech to final')
+    parser.add_argument('--cpu', type=float, default=CPU_CORES,
+                        help='budget of cores busy on average')
+    parser.add_argument('--trials', type=int, default=TRIALS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default=constants.MODEL_NAME)
+    parser.add_argument('--backend', choices=BACKENDS, help='inference backend (default: settings)')
+    parser.add_argument('--threads', type=int, help='intra-op threads per inference call, 0 = auto')
+    parser.add_argument('--report', help='write every profile and its measures to this JSON file')
+    parser.add_argument('--dry-run', action='store_true', help='do not save the best profile')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+    cfg = settings.load_settings()
+    clips = load_clips(args.inputs)
+    if not clips:
+        parser.error('no recordings found')
+    seconds = sum(c.seconds for c in clips)
+    refs = sum(c.words is not None for c in clips)
+    print(f"{len(clips)} recordings, {seconds:.1f} s of audio, {refs} with transcripts")
+    threads = resolve_threads(args.threads if args.threads is not None else cfg.asr_threads,
+                              cfg.asr_workers)
+    model, _ = load_model(args.model, cfg.model_cache_dir or None,
+                          args.backend or cfg.asr_backend, threads)
+    print(HEADER)
+    start = time.perf_counter()
+    results = search(clips, model, cfg, args.latency_ms, args.cpu, args.trials, args.seed,
+                     progress=lambda r: print(format_result(r)))
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} profiles in {elapsed:.1f} s, "
+          f"{len(results) * seconds / elapsed:.0f}x real time")
+    print("\nPareto front (latency, lag, CPU, WER):")
+    print(HEADER)
+    for r in pareto(results):
+        print(format_result(r))
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    chosen = best(results, args.latency_ms, args.cpu)
+    if chosen is None:
+        print(f"\nno profile within {args.latency_ms:.0f} ms and {args.cpu:g} cores")
+        sys.exit(1)
+    print(f"\nbest within {args.latency_ms:.0f} ms and {args.cpu:g} cores:")
+    print(format_result(chosen))
+    if args.dry_run:
+        return
+    settings.save_settings(to_settings(cfg, chosen['profile']))
+    print("saved to settings")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+"""Selectable ASR inference backends.
+
+``nemo`` runs the NeMo model through PyTorch, and ``nemo-int8`` the same
+model on the CPU with its Linear and LSTM weights dynamically quantized to
+int8, which works for any model, transducers such as the default TDT one
+included. ``onnx`` runs an ONNX export of the model's encoder and CTC head
+with ONNX Runtime on the CPU, and ``onnx-int8`` the same export with its
+weights dynamically quantized to int8. The export is made once and kept in
+the model cache directory next to a JSON file with the feature settings
+and vocabulary it needs, so later starts load it without importing NeMo
+or PyTorch. A model without a CTC head, such as a pure TDT or RNNT
+transducer, cannot be exported; the ONNX backends then fall back to
+``nemo`` or ``nemo-int8``.
+
+Every backend is called like a NeMo model, ``transcribe(audio, batch_size)``
+with float32 arrays or WAV paths, so ``ModelRunner`` and the scheduler
+work unchanged.
+"""
+import os
+import json
+import shutil
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import constants
+from asr import Transcript
+from utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+NEMO = 'nemo'
+NEMO_INT8 = 'nemo-int8'
+ONNX = 'onnx'
+ONNX_INT8 = 'onnx-int8'
+BACKENDS = (NEMO, NEMO_INT8, ONNX, ONNX_INT8)
+# what an ONNX backend runs instead for a model it cannot export
+NEMO_FALLBACK = {ONNX: NEMO, ONNX_INT8: NEMO_INT8}
+
+# SentencePiece marks the start of a word with this character
+WORD_START = '▁'
+
+
+def resolve_threads(threads: int, workers: int = constants.ASR_WORKERS) -> int:
+    """Intra-op threads per inference call; 0 shares the cores among the ASR workers."""
+    if threads > 0:
+        return threads
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def onnx_path(name: str, cache_dir: str, backend: str) -> str:
+    stem = name.replace('/', '__')
+    return os.path.join(cache_dir, stem + ('.int8.onnx' if backend == ONNX_INT8 else '.onnx'))
+
+
+def set_torch_threads(threads: int) -> None:
+    import torch
+    torch.set_num_threads(threads)
+
+
+def quantize_nemo(model):
+    """Dynamically quantize a NeMo model's Linear and LSTM weights to int8.
+
+    Covers the encoder, a transducer's prediction network and joint and a
+    CTC head. Quantized weights only run on the CPU, so the model is moved
+    there first.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+    model = model.cpu().eval()
+    for name in ('encoder', 'decoder', 'joint', 'ctc_decoder'):
+        module = getattr(model, name, None)
+        if isinstance(module, torch.nn.Module):
+            quantize_dynamic(module, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8,
+                             inplace=True)
+    return model
+
+
+def _hz_to_mel(f):
+    # Slaney scale: linear below 1 kHz, logarithmic above
+    f = np.asarray(f, dtype=np.float64)
+    log_step = np.log(6.4) / 27.0
+    return np.where(f < 1000.0, 3.0 * f / 200.0,
+                    15.0 + np.log(np.maximum(f, 1e-10) / 1000.0) / log_step)
+
+
+def _mel_to_hz(m):
+    m = np.asarray(m, dtype=np.float64)
+    log_step = np.log(6.4) / 27.0
+    return np.where(m < 15.0, 200.0 * m / 3.0, 1000.0 * np.exp(log_step * (m - 15.0)))
+
+
+def mel_filters(rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """Slaney-normalised triangular mel filterbank, shape (n_mels, n_fft // 2 + 1)."""
+    freqs = np.linspace(0.0, rate / 2.0, n_fft // 2 + 1)
+    points = _mel_to_hz(np.linspace(_hz_to_mel(0.0), _hz_to_mel(rate / 2.0), n_mels + 2))
+    widths = np.diff(points)
+    ramps = points[:, None] - freqs[None, :]
+    lower = -ramps[:-2] / widths[:-1, None]
+    upper = ramps[2:] / widths[1:, None]
+    weights = np.maximum(0.0, np.minimum(lower, upper))
+    weights *= (2.0 / (points[2:] - points[:-2]))[:, None]
+    return weights.astype(np.float32)
+
+
+class LogMel:
+    """Log-mel features computed like NeMo's ``AudioToMelSpectrogramPreprocessor``.
+
+    Pre-emphasis, a centred STFT with a Hann window, a power spectrum
+    through a Slaney mel filterbank, log with a small guard and, by
+    default, per-feature normalisation. Dither is left out.
+    """
+
+    def __init__(self, sample_rate: int = constants.TARGET_RATE, features: int = 80,
+                 n_fft: int = 512, window_size: float = 0.025, window_stride: float = 0.01,
+                 preemph: float = 0.97, normalize: str = 'per_feature',
+                 log_guard: float = 2 ** -24, pad_to: int = 0) -> None:
+        self.rate = sample_rate
+        self.hop = int(window_stride * sample_rate)
+        self.n_fft = n_fft
+        self.preemph = preemph
+        self.normalize = normalize
+        self.log_guard = log_guard
+        self.pad_to = pad_to
+        win = int(window_size * sample_rate)
+        window = np.hanning(win)
+        # centre the window in the FFT frame
+        self.window = np.zeros(n_fft, dtype=np.float32)
+        self.window[(n_fft - win) // 2:(n_fft - win) // 2 + win] = window
+        self.filters = mel_filters(sample_rate, n_fft, features)
+
+    def __call__(self, audio: np.ndarray) -> np.ndarray:
+        """Features of one float32 buffer, shape (features, frames)."""
+        x = np.asarray(audio, dtype=np.float32)
+        if self.preemph:
+            x = np.concatenate((x[:1], x[1:] - self.preemph * x[:-1]))
+        pad = self.n_fft // 2
+        x = np.pad(x, pad, mode='reflect' if len(x) > pad else 'constant')
+        frames = np.lib.stride_tricks.sliding_window_view(x, self.n_fft)[::self.hop]
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        feats = np.log(power.astype(np.float32) @ self.filters.T + self.log_guard).T
+        if self.normalize == 'per_feature' and feats.shape[1] > 1:
+            mean = feats.mean(axis=1, keepdims=True)
+            std = feats.std(axis=1, ddof=1, keepdims=True) + 1e-5
+            feats = (feats - mean) / std
+        return np.ascontiguousarray(feats, dtype=np.float32)
+
+    def batch(self, audio: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Zero-padded features (batch, features, frames) and frame counts."""
+        feats = [self(a) for a in audio]
+        lengths = np.array([f.shape[1] for f in feats], dtype=np.int64)
+        width = int(lengths.max())
+        if self.pad_to:
+            width = -(-width // self.pad_to) * self.pad_to
+        out = np.zeros((len(feats), feats[0].shape[0], width), dtype=np.float32)
+        for i, f in enumerate(feats):
+            out[i, :, :f.shape[1]] = f
+        return out, lengths
+
+
+def ctc_greedy(ids: np.ndarray, blank: int) -> List[int]:
+    """Collapse repeats and drop blanks."""
+    if not len(ids):
+        return []
+    keep = np.ones(len(ids), dtype=bool)
+    keep[1:] = ids[1:] != ids[:-1]
+    return [int(i) for i in ids[keep] if i != blank]
+
+
+def detokenize(tokens: Sequence[str]) -> str:
+    return ''.join(tokens).replace(WORD_START, ' ').strip()
+
+
+def ctc_words(frame_ids: np.ndarray, blank: int, vocabulary: Sequence[str],
+              frame_s: float) -> List[Tuple[str, float, float]]:
+    """Words of a greedy CTC path with the times of their first and last token."""
+    if not len(frame_ids):
+        return []
+    keep = np.ones(len(frame_ids), dtype=bool)
+    keep[1:] = frame_ids[1:] != frame_ids[:-1]
+    words: List[list] = []
+    for t in np.flatnonzero(keep).tolist():
+        i = int(frame_ids[t])
+        if i == blank or i >= len(vocabulary):
+            continue
+        piece = vocabulary[i]
+        if piece.startswith(WORD_START) or not words:
+            words.append([piece.lstrip(WORD_START), t * frame_s, (t + 1) * frame_s])
+        else:
+            words[-1][0] += piece
+            words[-1][2] = (t + 1) * frame_s
+    return [(w, s, e) for w, s, e in words if w]
+
+
+class OnnxBackend:
+    """CTC model exported to ONNX, run with ONNX Runtime on the CPU.
+
+    The graph takes features (batch, features, frames) and their lengths
+    and returns log-probabilities (batch, frames / subsampling, vocabulary
+    + blank); the sidecar JSON written by ``export_onnx`` describes the
+    features, vocabulary and subsampling. Asked for ``timestamps``, it
+    returns ``Transcript`` results with word timings from the CTC path.
+    """
+
+    def __init__(self, path: str, threads: int = 0) -> None:
+        import onnxruntime as ort
+        with open(path + '.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.path = path
+        self.vocabulary: List[str] = meta['vocabulary']
+        self.blank = int(meta.get('blank', len(self.vocabulary)))
+        self.subsampling = int(meta.get('subsampling', 1))
+        self.frontend = LogMel(**meta.get('preprocessor', {}))
+        self.threads = resolve_threads(threads)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = self.threads
+        # one graph runs per call; parallelism comes from the ASR workers
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, opts, providers=['CPUExecutionProvider'])
+        inputs = self.session.get_inputs()
+        self.signal_name = inputs[0].name
+        self.length_name = inputs[1].name if len(inputs) > 1 else None
+
+    def _load(self, item) -> np.ndarray:
+        if isinstance(item, str):
+            pcm, _ = load_audio(item)
+            item = pcm
+        if item.dtype == np.int16:
+            return item.astype(np.float32) * (1.0 / 32768.0)
+        return np.asarray(item, dtype=np.float32)
+
+    def transcribe(self, audio, batch_size: int = 0, verbose: bool = False, **kwargs) -> List[str]:
+        audio = [self._load(a) for a in audio]
+        if not audio:
+            return []
+        step = batch_size or len(audio)
+        texts: List[str] = []
+        for pos in range(0, len(audio), step):
+            texts.extend(self._run(audio[pos:pos + step], kwargs.get('timestamps', False)))
+        return texts
+
+    def _run(self, audio: List[np.ndarray], timestamps: bool = False) -> List[str]:
+        feats, lengths = self.frontend.batch(audio)
+        feed = {self.signal_name: feats}
+        if self.length_name is not None:
+            feed[self.length_name] = lengths
+        logprobs = self.session.run(None, feed)[0]
+        out_lengths = -(-lengths // self.subsampling)
+        frame_s = self.subsampling * self.frontend.hop / self.frontend.rate
+        texts = []
+        for row, n in zip(logprobs, out_lengths):
+            path = np.argmax(row[:n], axis=-1)
+            ids = ctc_greedy(path, self.blank)
+            text = detokenize([self.vocabulary[i] for i in ids if i < len(self.vocabulary)])
+            if timestamps:
+                text = Transcript(text, ctc_words(path, self.blank, self.vocabulary, frame_s))
+            texts.append(text)
+        return texts
+
+
+def _ctc_head(model):
+    """The CTC decoder of a CTC or hybrid model, or None for a pure transducer."""
+    if hasattr(model, 'ctc_decoder'):
+        return model.ctc_decoder
+    decoder = getattr(model, 'decoder', None)
+    if decoder is not None and hasattr(decoder, 'num_classes_with_blank'):
+        return decoder
+    return None
+
+
+def exportable(model) -> bool:
+    """Whether the ONNX backends can run ``model``."""
+    return _ctc_head(model) is not None
+
+
+def _preprocessor_meta(model) -> Dict:
+    cfg = model.cfg.preprocessor
+    meta = {'sample_rate': int(cfg.get('sample_rate', constants.TARGET_RATE)),
+            'features': int(cfg.get('features', 80)),
+            'n_fft': int(cfg.get('n_fft', 512)),
+            'window_size': float(cfg.get('window_size', 0.025)),
+            'window_stride': float(cfg.get('window_stride', 0.01)),
+            'normalize': cfg.get('normalize', 'per_feature'),
+            'pad_to': int(cfg.get('pad_to', 0) or 0)}
+    return meta
+
+
+def write_meta(path: str, meta: Dict) -> None:
+    tmp = path + '.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, path + '.json')
+
+
+def export_onnx(model, path: str) -> None:
+    """Export a NeMo CTC or hybrid RNNT/CTC model's encoder and CTC head."""
+    head = _ctc_head(model)
+    if head is None:
+        raise ValueError(f"{type(model).__name__} has no CTC head; the ONNX backends need a CTC "
+                         "or hybrid RNNT/CTC model")
+    if hasattr(model, 'ctc_decoder'):
+        model.set_export_config({'decoder_type': 'ctc'})
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp.onnx'
+    model.export(tmp)
+    vocabulary = list(head.vocabulary)
+    write_meta(path, {'vocabulary': vocabulary, 'blank': len(vocabulary),
+                      'subsampling': int(model.cfg.encoder.get('subsampling_factor', 1)),
+                      'preprocessor': _preprocessor_meta(model)})
+    os.replace(tmp, path)
+
+
+def quantize_onnx(src: str, dst: str) -> None:
+    """Dynamically quantize the weights of an ONNX export to int8."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    tmp = dst + '.tmp.onnx'
+    quantize_dynamic(src, tmp, weight_type=QuantType.QInt8)
+    shutil.copyfile(src + '.json', dst + '.json')
+    os.replace(tmp, dst)
+
+
+def ensure_onnx(name: str, cache_dir: str, backend: str, load_nemo) -> Tuple[str, bool]:
+    """Path of the cached export for ``backend``, making it first if needed.
+
+    ``load_nemo`` is only called when there is nothing to convert from.
+    Returns the path and whether anything had to be exported.
+    """
+    path = onnx_path(name, cache_dir, backend)
+    if os.path.exists(path) and os.path.exists(path + '.json'):
+        return path, False
+    fp32 = onnx_path(name, cache_dir, ONNX)
+    if not (os.path.exists(fp32) and os.path.exists(fp32 + '.json')):
+        logger.info("Exporting %s to %s, this happens once", name, fp32)
+        export_onnx(load_nemo(), fp32)
+    if backend == ONNX_INT8:
+        logger.info("Quantizing %s to %s", fp32, path)
+        quantize_onnx(fp32, path)
+    return path, True
@@ -0,0 +1,274 @@
+"""Headless batch transcription of audio files.
+
+    python batch.py recordings/ extra.flac --out transcripts --format srt --workers 4
+
+Files are segmented with the same webrtcvad pipeline as the live overlay,
+and the segments of all files are transcribed in batches by a shared
+worker pool. Each input gets a JSONL or SRT file with segment timestamps,
+next to it or, with ``--out``, at its path relative to the directory it
+was found in; inputs whose output already exists are skipped.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import constants
+import settings
+from asr import ModelRunner
+from backends import BACKENDS, resolve_threads
+from model_loader import load_model
+from asr_pool import ASRProcessPool, model_factory
+from scheduler import ASRScheduler, FINAL
+from transcriber import DevicePipeline, PipelineConfig
+from utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+
+
+def _walk_inputs(paths: List[str]) -> List[Tuple[str, str]]:
+    """Audio files, each with its path relative to the directory it was found in."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for f in files:
+                    if f.lower().endswith(AUDIO_EXTENSIONS):
+                        full = os.path.join(root, f)
+                        found.append((full, os.path.relpath(full, path)))
+        else:
+            found.append((path, os.path.basename(path)))
+    return sorted(found)
+
+
+def find_inputs(paths: List[str]) -> List[str]:
+    """Expand directories into the audio files they contain, sorted."""
+    return [path for path, _ in _walk_inputs(paths)]
+
+
+def _srt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def write_transcript(path: str, segments: List[Dict], fmt: str) -> None:
+    """Write segments atomically, so a partial file is never taken as done."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        if fmt == 'srt':
+            for i, seg in enumerate(segments, 1):
+                f.write(f"{i}\n{_srt_time(seg['start'])} --> {_srt_time(seg['end'])}\n{seg['text']}\n\n")
+        else:
+            for seg in segments:
+                f.write(json.dumps({'start': seg['start'], 'end': seg['end'], 'text': seg['text']}) + '\n')
+    os.replace(tmp, path)
+
+
+@dataclass
+class _FileJob:
+    """Collects one input's finals and writes them once all have arrived."""
+    path: str
+    out_path: str
+    fmt: str
+    duration: float
+    expected: int = 0
+    fed: bool = False
+    segments: List[Dict] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def put(self, item: Dict) -> None:
+        with self.lock:
+            self.segments.append(item)
+        self._maybe_finish()
+
+    def _maybe_finish(self) -> None:
+        with self.lock:
+            if not self.fed or len(self.segments) < self.expected or self.done.is_set():
+                return
+            self.done.set()
+        segments = sorted(self.segments, key=lambda s: s['start'])
+        try:
+            write_transcript(self.out_path, segments, self.fmt)
+        except OSError as e:
+            logger.error("Could not write %s: %s", self.out_path, e)
+
+
+class _CountingScheduler:
+    """Forwards jobs to the shared scheduler, counting one file's finals."""
+
+    def __init__(self, scheduler: ASRScheduler, job: _FileJob) -> None:
+        self.scheduler = scheduler
+        self.job = job
+
+    def submit(self, key, audio, kind, callback) -> None:
+        if kind == FINAL:
+            with self.job.lock:
+                self.job.expected += 1
+        self.scheduler.submit(key, audio, kind, callback)
+
+
+@dataclass
+class BatchStats:
+    files: int = 0
+    skipped: int = 0
+    failed: int = 0
+    segments: int = 0
+    audio_seconds: float = 0.0
+    wall_seconds: float = 0.0
+
+    @property
+    def rtf(self) -> float:
+        """Real-time factor: processing time per second of audio."""
+        return self.wall_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+
+def output_path(path: str, out_dir: Optional[str], fmt: str, rel: Optional[str] = None) -> str:
+    """Transcript next to the input, or at ``rel`` (default the file name) under ``out_dir``."""
+    if not out_dir:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(os.path.dirname(path), f"{stem}.{fmt}")
+    stem = os.path.splitext(rel or os.path.basename(path))[0]
+    return os.path.join(out_dir, f"{stem}.{fmt}")
+
+
+def plan_outputs(paths: List[str], out_dir: Optional[str], fmt: str) -> List[Tuple[str, str]]:
+    """Each input with its transcript path.
+
+    Raises ``ValueError`` if two inputs would write the same transcript,
+    e.g. two files of the same name passed directly, or ``x.wav`` and
+    ``x.flac`` side by side.
+    """
+    planned = []
+    inputs = set()
+    seen: Dict[str, str] = {}
+    for path, rel in _walk_inputs(paths):
+        if os.path.abspath(path) in inputs:
+            # the same file reached twice, e.g. as a file and through its directory
+            continue
+        inputs.add(os.path.abspath(path))
+        out = output_path(path, out_dir, fmt, rel)
+        key = os.path.normcase(os.path.abspath(out))
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {path} would both be transcribed to {out}")
+        seen[key] = path
+        planned.append((path, out))
+    return planned
+
+
+def transcribe_files(paths: List[str], model, out_dir: Optional[str] = None, fmt: str = 'jsonl',
+                     workers: int = constants.ASR_WORKERS, max_batch: int = constants.ASR_MAX_BATCH,
+                     vad_mode: int = constants.VAD_MODE, frame_ms: int = constants.FRAME_MS,
+                     max_silence_ms: int = constants.MAX_SILENCE_MS,
+                     min_frames: int = constants.MIN_FRAMES, max_frames: int = constants.MAX_FRAMES,
+                     skip_done: bool = True, vad_engine: str = constants.VAD_ENGINE,
+                     vad_gate_level: int = constants.VAD_GATE_LEVEL) -> BatchStats:
+    """Segment and transcribe audio files, writing one transcript per input.
+
+    Raises ``ValueError`` before any work if two inputs map to the same
+    transcript, see ``plan_outputs``.
+    """
+    stats = BatchStats()
+    start = time.perf_counter()
+    planned = plan_outputs(paths, out_dir, fmt)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    # partials and stream chunks are pointless offline
+    config = PipelineConfig.from_ms(vad_mode, frame_ms, max_silence_ms, 0, min_frames,
+                                    max_frames, 0, 0, vad_engine=vad_engine,
+                                    vad_gate_level=vad_gate_level)
+    scheduler = ASRScheduler(ModelRunner(model), workers, max_batch, constants.ASR_MAX_WAIT_MS)
+    jobs = []
+    try:
+        for path, out in planned:
+            if skip_done and os.path.exists(out):
+                stats.skipped += 1
+                continue
+            try:
+                pcm, rate = load_audio(path)
+            except (OSError, ValueError, RuntimeError) as e:
+                logger.error("Could not read %s: %s", path, e)
+                stats.failed += 1
+                continue
+            job = _FileJob(path, out, fmt, len(pcm) / rate)
+            pipeline = DevicePipeline(path, rate, config, _CountingScheduler(scheduler, job), job)
+            pipeline.feed(pcm)
+            pipeline.flush()
+            job.fed = True
+            job._maybe_finish()
+            jobs.append(job)
+            stats.files += 1
+            stats.audio_seconds += job.duration
+    finally:
+        scheduler.shutdown()
+    for job in jobs:
+        if not job.done.is_set():
+            logger.error("Transcription of %s did not complete", job.path)
+            stats.failed += 1
+        stats.segments += len(job.segments)
+    stats.wall_seconds = time.perf_counter() - start
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Transcribe WAV/FLAC files or directories.")
+    parser.add_argument('inputs', nargs='+', help='audio files or directories')
+    parser.add_argument('--out', help='output directory (default: next to each input)')
+    parser.add_argument('--format', choices=('jsonl', 'srt'), default='jsonl')
+    parser.add_argument('--workers', type=int, help='ASR worker threads')
+    parser.add_argument('--batch', type=int, help='max segments per model call')
+    parser.add_argument('--model', default=constants.MODEL_NAME)
+    parser.add_argument('--backend', choices=BACKENDS, help='inference backend (default: settings)')
+    parser.add_argument('--threads', type=int, help='intra-op threads per inference call, 0 = auto')
+    parser.add_argument('--processes', action='store_true', default=None,
+                        help='run the model in worker processes (default: settings)')
+    parser.add_argument('--force', action='store_true', help='redo inputs that already have output')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+    try:
+        # before the model is loaded
+        plan_outputs(args.inputs, args.out, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    cfg = settings.load_settings()
+    threads = resolve_threads(args.threads if args.threads is not None else cfg.asr_threads,
+                              args.workers or cfg.asr_workers)
+    backend = args.backend or cfg.asr_backend
+    workers = args.workers or cfg.asr_workers
+    if args.processes or cfg.asr_processes:
+        model = ASRProcessPool(model_factory(args.model, cfg.model_cache_dir or None, backend,
+                                             threads), workers, warmup_s=0)
+    else:
+        model, _ = load_model(args.model, cfg.model_cache_dir or None, backend, threads)
+    try:
+        stats = transcribe_files(args.inputs, model, args.out, args.format,
+                                 workers, args.batch or cfg.asr_max_batch,
+                                 cfg.vad_mode, cfg.frame_ms, cfg.max_silence_ms,
+                                 cfg.min_frames, cfg.max_frames, skip_done=not args.force,
+                                 vad_engine=cfg.vad_engine, vad_gate_level=cfg.vad_gate_level)
+    finally:
+        if isinstance(model, ASRProcessPool):
+            model.close()
+    speed = stats.audio_seconds / stats.wall_seconds if stats.wall_seconds else 0.0
+    print(f"{stats.files} files ({stats.skipped} skipped, {stats.failed} failed), "
+          f"{stats.segments} segments, {stats.audio_seconds:.1f} s of audio in "
+          f"{stats.wall_seconds:.1f} s")
+    print(f"real-time factor {stats.rtf:.4f} ({speed:.1f}x real time), "
+          f"{stats.segments / stats.wall_seconds if stats.wall_seconds else 0:.1f} segments/s")
+    sys.exit(1 if stats.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Allocation rate and GC pressure of the audio path, before and after.
+
+    python -m benchmarks.alloc [--seconds 30] [--rate 48000]
+
+Runs the same synthetic speech through the previous list-of-arrays path
+(callback copy, int16 cast, ``tobytes`` for the VAD, list append and a
+full ``np.concatenate`` per partial/final) and through ``DevicePipeline``
+with its preallocated rings. ASR submission is stubbed out in both so
+only the audio path is measured. Reports bytes allocated per frame as
+seen by tracemalloc and the number of gen-0 collections.
+"""
+import argparse
+import gc
+import queue
+import tracemalloc
+
+import numpy as np
+import webrtcvad
+
+import constants
+from benchmarks.fakes import synth_speech
+from transcriber import DevicePipeline, PipelineConfig
+from utils import StreamResampler
+
+
+class _NullScheduler:
+    def submit(self, key, audio, kind, callback) -> None:
+        pass
+
+
+class _Legacy:
+    """The pre-ring-buffer audio path, reduced to its allocations."""
+
+    def __init__(self, rate: int, cfg: PipelineConfig) -> None:
+        self.rate = rate
+        self.cfg = cfg
+        self.q = queue.Queue()
+        self.vad = webrtcvad.Vad(cfg.vad_mode)
+        self.resampler = StreamResampler(rate, constants.TARGET_RATE)
+        self.buffer, self.triggered, self.frames, self.silence = [], False, 0, 0
+
+    def step(self, block: np.ndarray) -> None:
+        self.q.put((block.copy().flatten(), self.rate))
+        pcm, _ = self.q.get()
+        pcm_rs = self.resampler.process(pcm.astype(np.int16))
+        is_speech = self.vad.is_speech(pcm_rs.tobytes(), sample_rate=constants.TARGET_RATE)
+        if not self.triggered and is_speech:
+            self.triggered, self.buffer, self.frames, self.silence = True, [pcm_rs], 0, 0
+        elif self.triggered:
+            self.buffer.append(pcm_rs)
+            self.frames += 1
+            self.silence = 0 if is_speech else self.silence + 1
+            if self.silence > self.cfg.max_silence:
+                np.concatenate(self.buffer)
+                self.triggered = False
+            elif self.frames >= self.cfg.partial_frames:
+                np.concatenate(self.buffer)
+                self.frames = 0
+
+
+class _Ring:
+    def __init__(self, rate: int, cfg: PipelineConfig) -> None:
+        self.q = queue.Queue()
+        self.pipeline = DevicePipeline(0, rate, cfg, _NullScheduler(), None)
+
+    def step(self, block: np.ndarray) -> None:
+        self.pipeline.inbox.push(block[:, 0])
+        self.q.put(0)
+        self.q.get()
+        self.pipeline.drain()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--rate', type=int, default=48000)
+    args = parser.parse_args()
+    cfg = PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS, constants.MAX_SILENCE_MS,
+                                 constants.PARTIAL_INTERVAL_MS, constants.MIN_FRAMES,
+                                 constants.MAX_FRAMES, 0, 0)
+    pattern = [(0.5, False)] + [(3.0, True), (0.8, False)] * int(args.seconds / 3.8 + 1)
+    signal = synth_speech(args.rate, pattern)[:int(args.seconds * args.rate)]
+    block = args.rate * constants.FRAME_MS // 1000
+    blocks = [signal[i:i + block, None] for i in range(0, len(signal) - block + 1, block)]
+
+    for name, cls in (('list+concatenate', _Legacy), ('ring buffers', _Ring)):
+        path = cls(args.rate, cfg)
+        gc.collect()
+        gen0 = gc.get_stats()[0]['collections']
+        tracemalloc.start()
+        # sum each block's transient allocations by resetting the peak every step
+        allocated = 0
+        for block in blocks:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            path.step(block)
+            allocated += tracemalloc.get_traced_memory()[1] - base
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        gen0 = gc.get_stats()[0]['collections'] - gen0
+        print(f"{name:17s} {allocated / len(blocks) / 1024:7.2f} KiB/frame  "
+              f"{allocated / args.seconds / 1024 / 1024:6.2f} MiB/s  gen0 collections {gen0}")
+        for stat in snapshot.statistics('lineno')[:3]:
+            print(f"    {stat}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Per-call latency of in-memory vs temp-WAV ASR handoff.
+
+    python -m benchmarks.asr_handoff [--model nvidia/parakeet-tdt-0.6b-v2]
+
+Without ``--model`` a fake model is used, which isolates the handoff cost
+(WAV write, file read, cleanup) from inference.
+"""
+import argparse
+import time
+
+import numpy as np
+
+import constants
+from asr import ModelRunner
+from benchmarks.fakes import FakeModel
+
+
+def _time_calls(fn, data, calls: int) -> np.ndarray:
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn([data])
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', help='NeMo model name; defaults to a fake model')
+    parser.add_argument('--seconds', type=float, default=4.5, help='buffer length')
+    parser.add_argument('--calls', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.model:
+        import nemo.collections.asr as nemo_asr
+        model = nemo_asr.models.ASRModel.from_pretrained(model_name=args.model)
+    else:
+        model = FakeModel()
+    runner = ModelRunner(model)
+    rng = np.random.default_rng(0)
+    data = (rng.standard_normal(int(args.seconds * constants.TARGET_RATE)) * 3000).astype(np.int16)
+
+    # warm up both paths once
+    runner.transcribe_arrays([data])
+    runner.transcribe_files([data])
+    for name, fn in (('in-memory', runner.transcribe_arrays), ('wav-file', runner.transcribe_files)):
+        t = _time_calls(fn, data, args.calls)
+        print(f"{name:10s} mean {t.mean():8.2f} ms  p50 {np.percentile(t, 50):8.2f} ms  "
+              f"p95 {np.percentile(t, 95):8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
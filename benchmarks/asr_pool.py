@@ -0,0 +1,135 @@
+"""VAD-loop and UI jitter with ASR in threads versus worker processes.
+
+    python -m benchmarks.asr_pool [--seconds 20] [--devices 2] [--workers 2]
+
+Plays synthetic speech in real time into ``VADTranscriber`` while a fake
+model that holds the GIL (``GILModel``) transcribes partials and finals,
+once with the model in the scheduler's threads and once behind an
+``ASRProcessPool``. A stand-in UI thread ticks every ``UI_FRAME_MS`` and
+does a little Python work per tick, like the overlay's render. Reports
+the delay between an audio callback and the VAD loop picking its block
+up, and the UI frame-time overrun. In the process run one worker is
+killed half-way through to check that it is restarted and that the
+remaining results still arrive.
+"""
+import os
+import time
+import queue
+import signal
+import argparse
+import threading
+from functools import partial
+from typing import List
+
+import numpy as np
+
+import constants
+from asr_pool import ASRProcessPool
+from benchmarks.fakes import GILModel
+from metrics import METRICS
+from sources import SyntheticSource
+from transcriber import VADTranscriber
+
+
+class UIThread(threading.Thread):
+    """Ticks every frame and records how late each tick ran."""
+
+    def __init__(self, frame_ms: float = constants.UI_FRAME_MS, work_ms: float = 1.0) -> None:
+        super().__init__(daemon=True, name='ui')
+        self.frame = frame_ms / 1000.0
+        self.work = work_ms / 1000.0
+        self.late: List[float] = []
+        self.running = True
+
+    def run(self) -> None:
+        due = time.perf_counter() + self.frame
+        while self.running:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            now = time.perf_counter()
+            self.late.append(now - due)
+            end = now + self.work
+            while time.perf_counter() < end:
+                pass
+            due += self.frame
+            if due < now:
+                # skip frames that were missed entirely
+                due = now + self.frame
+
+
+def pct(values, q: float) -> float:
+    return 1000.0 * float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def run(mode: str, args) -> dict:
+    METRICS.reset()
+    make = partial(GILModel, cost_ms=args.cost_ms, per_second_ms=args.per_second_ms)
+    pool = None
+    if mode == 'processes':
+        model = pool = ASRProcessPool(make, args.workers, warmup_s=0)
+    else:
+        model = make()
+    pattern = [(0.5, 'silence')] + [(2.5, 'tone'), (0.7, 'silence')] * int(args.seconds / 3.2)
+    sources = [SyntheticSource(f"in{i}", pattern, 48000, 300.0 + 100 * i, seed=i)
+               for i in range(args.devices)]
+    text_q = queue.Queue()
+    vt = VADTranscriber(text_q, [], model, partial_interval_ms=args.partial_ms,
+                        asr_workers=args.workers, sources=sources)
+    ui = UIThread()
+    ui.start()
+    vt.start()
+    killed = False
+    start = time.perf_counter()
+    while vt.is_alive():
+        vt.join(0.1)
+        if pool is not None and not killed and time.perf_counter() - start > args.seconds / 2:
+            os.kill(pool.pids()[0], signal.SIGKILL)
+            killed = True
+    vt.scheduler.shutdown()
+    ui.running = False
+    ui.join()
+    finals = partials = 0
+    while not text_q.empty():
+        item = text_q.get()
+        if item['final']:
+            finals += 1
+        else:
+            partials += 1
+    if pool is not None:
+        pool.close()
+    wait = METRICS.histograms['audio_q_wait'].snapshot()
+    return {'mode': mode, 'finals': finals, 'partials': partials,
+            'vad_p50': wait['p50_ms'], 'vad_p99': wait['p99_ms'], 'vad_max': wait['max_ms'],
+            'ui_p50': pct(ui.late, 50), 'ui_p99': pct(ui.late, 99),
+            'ui_max': 1000.0 * max(ui.late, default=0.0),
+            'restarts': pool.restarts if pool is not None else 0,
+            'expected': len(sources) * (len(pattern) // 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=20.0)
+    parser.add_argument('--devices', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--partial-ms', type=int, default=300)
+    parser.add_argument('--cost-ms', type=float, default=40.0, help='GIL held per model call')
+    parser.add_argument('--per-second-ms', type=float, default=15.0,
+                        help='GIL held per second of audio')
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.devices} inputs in real time, {args.workers} ASR workers")
+    print(f"{'':10s}{'finals':>7s}{'partials':>9s}   {'VAD pick-up delay ms':>22s}   "
+          f"{'UI tick overrun ms':>20s}")
+    print(f"{'':10s}{'':16s}   {'p50':>6s}{'p99':>8s}{'max':>8s}   {'p50':>6s}{'p99':>7s}{'max':>7s}")
+    for mode in ('threads', 'processes'):
+        r = run(mode, args)
+        print(f"{mode:10s}{r['finals']:7d}{r['partials']:9d}   {r['vad_p50']:6.2f}{r['vad_p99']:8.2f}"
+              f"{r['vad_max']:8.1f}   {r['ui_p50']:6.2f}{r['ui_p99']:7.2f}{r['ui_max']:7.1f}")
+        if mode == 'processes':
+            print(f"worker killed half-way, restarts: {r['restarts']}")
+    print(f"expected {r['expected']} finals per run")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Auto-tuning on synthetic recordings, and a real-time check of its estimates.
+
+    python -m benchmarks.autotune [--clips 3] [--seconds 30] [--trials 40]
+
+Writes recordings of ``WordModel`` words to a temporary directory as WAV
+files with their transcripts: phrases of one to eight words, with short
+gaps inside phrases and longer pauses between them. ``autotune.search``
+then looks for the best profile under a latency and a CPU budget with
+``WordModel`` as the model, and prints every profile, the Pareto front
+and the pick. Settings are not saved.
+
+Finally the current settings and the pick are each played through a
+``VADTranscriber`` in real time, and the latency of their finals, from
+the end of the last word to the final, is compared with the estimate.
+"""
+import os
+import time
+import queue
+import argparse
+import tempfile
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.io import wavfile
+
+import autotune
+import constants
+import settings
+from benchmarks.fakes import WORDS, WordModel, spoken_words
+from sources import FileSource
+from transcriber import VADTranscriber
+
+
+def recording(seconds: float, seed: int) -> Tuple[np.ndarray, List[str], List[float]]:
+    """Audio, its words and the time each phrase ends."""
+    rate = constants.TARGET_RATE
+    rng = np.random.default_rng(seed)
+    parts, words, ends = [np.zeros(int(0.5 * rate), dtype=np.int16)], [], []
+    total = 0.5
+    while total < seconds:
+        ids = []
+        for _ in range(int(rng.integers(1, 9))):
+            k = int(rng.integers(len(WORDS)))
+            while ids and k == ids[-1]:
+                k = int(rng.integers(len(WORDS)))
+            ids.append(k)
+        gaps = [float(rng.choice((0.0, 0.0, 0.05, 0.12))) for _ in ids]
+        gaps[-1] = 0.0
+        phrase = spoken_words(rate, ids, gaps)
+        pause = rng.uniform(0.3, 1.2)
+        parts += [phrase, np.zeros(int(pause * rate), dtype=np.int16)]
+        words += [WORDS[k] for k in ids]
+        total += len(phrase) / rate
+        ends.append(total)
+        total += pause
+    return np.concatenate(parts), words, ends
+
+
+def live_latency(cfg: settings.Settings, path: str, ends: List[float], make) -> List[float]:
+    """Final latencies of ``path`` played in real time, from the end of each final's speech."""
+    text_q: queue.Queue = queue.Queue()
+    vt = VADTranscriber(text_q, [], make(), cfg.vad_mode, cfg.frame_ms, cfg.max_silence_ms,
+                        cfg.partial_interval_ms, cfg.min_frames, cfg.max_frames,
+                        cfg.stream_chunk_ms, cfg.stream_context_ms, cfg.asr_workers,
+                        cfg.asr_max_batch, cfg.asr_max_wait_ms, cfg.preroll_ms,
+                        vad_engine=cfg.vad_engine, vad_gate_level=cfg.vad_gate_level,
+                        partial_adaptive=False, sources=[FileSource(path, cfg.frame_ms)])
+    start = time.perf_counter()
+    vt.start()
+    vt.join()
+    time.sleep(0.5)
+    vt.scheduler.shutdown()
+    latency = []
+    while not text_q.empty():
+        item = text_q.get()
+        if not item['final']:
+            continue
+        spoken = [e for e in ends if item['start'] <= e <= item['end']]
+        if spoken:
+            latency.append(item['emitted'] - start - max(spoken))
+    return latency
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clips', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=30.0, help='per recording')
+    parser.add_argument('--trials', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=600.0)
+    parser.add_argument('--cpu', type=float, default=0.25)
+    parser.add_argument('--cost-ms', type=float, default=15.0)
+    parser.add_argument('--per-second-ms', type=float, default=60.0)
+    args = parser.parse_args()
+
+    def make():
+        return WordModel(cost_ms=args.cost_ms, per_second_ms=args.per_second_ms)
+
+    base = settings.Settings()
+    with tempfile.TemporaryDirectory() as tmp:
+        phrase_ends: Dict[str, List[float]] = {}
+        for i in range(args.clips):
+            pcm, words, ends = recording(args.seconds, seed=i)
+            path = os.path.join(tmp, f"clip{i}.wav")
+            wavfile.write(path, constants.TARGET_RATE, pcm)
+            with open(os.path.join(tmp, f"clip{i}.txt"), 'w', encoding='utf-8') as f:
+                f.write(' '.join(words))
+            phrase_ends[path] = ends
+        clips = autotune.load_clips([tmp])
+        seconds = sum(c.seconds for c in clips)
+        print(f"{len(clips)} recordings, {seconds:.0f} s, budget {args.latency_ms:.0f} ms "
+              f"and {args.cpu:g} cores; model {args.cost_ms:g} ms + {args.per_second_ms:g} ms/s")
+        print(autotune.HEADER)
+        start = time.perf_counter()
+        results = autotune.search(clips, make(), base, args.latency_ms, args.cpu, args.trials,
+                                  progress=lambda r: print(autotune.format_result(r)))
+        elapsed = time.perf_counter() - start
+        print(f"{len(results)} profiles in {elapsed:.1f} s, "
+              f"{len(results) * seconds / elapsed:.0f}x real time")
+        print("\nPareto front (latency, lag, CPU, WER):")
+        print(autotune.HEADER)
+        for r in autotune.pareto(results):
+            print(autotune.format_result(r))
+        chosen = autotune.best(results, args.latency_ms, args.cpu)
+        if chosen is None:
+            print("no profile within budget")
+            return
+        print("\nbest:")
+        print(autotune.format_result(chosen))
+
+        print("\nestimate against a real-time run of the first recording:")
+        path = clips[0].name
+        for name, result in (('current', results[0]), ('best', chosen)):
+            cfg = autotune.to_settings(base, result['profile'])
+            estimate = autotune.search([clips[0]], make(), cfg, trials=1)[0]
+            live = live_latency(cfg, path, phrase_ends[path], make)
+            print(f"{name:8s} latency p90 estimated {estimate['latency_ms']:5.0f} ms, "
+                  f"measured {1000 * float(np.percentile(live, 90)):5.0f} ms "
+                  f"over {len(live)} finals")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""Accuracy and latency of the inference backends on the CPU.
+
+    python -m benchmarks.backends [--threads 1 2] [--utterances 40]
+    python -m benchmarks.backends --model nvidia/parakeet-ctc-0.6b --data clips/
+
+Without ``--model`` a small local test model is built: a CTC network over
+the same log-mel features as a real export, whose "words" are tones of
+different pitch. Its hidden layers are random and its output layer is
+fitted in closed form on synthetic utterances, so it takes seconds to
+make and needs neither NeMo nor PyTorch. It is saved in the export format
+of ``backends`` and quantized through the same cached path as a real
+model; the fp32 network evaluated in numpy stands in for the PyTorch path.
+The default comparison therefore leaves out ``nemo-int8``: PyTorch dynamic
+quantization (``backends.quantize_nemo``) is only measured with ``--model``.
+
+With ``--model`` the NeMo model is loaded, exported and quantized through
+``model_loader.load_model`` for each backend, and ``--data`` holds WAV
+files with reference transcripts in matching ``.txt`` files.
+
+Reports word error rate against the references, how often each backend's
+transcript matches the fp32 one, and latency and real-time factor for
+single utterances and batches per backend and thread count.
+"""
+import os
+import re
+import time
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import constants
+import backends
+from sources import synthesize
+from utils import load_audio
+
+WORDS = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten']
+TEST_MODEL = 'test-tones'
+FEATURES = 80
+
+
+def word_freq(k: int) -> float:
+    return 260.0 + 110.0 * k
+
+
+def tone_utterance(rng: np.random.Generator, words: int) -> Tuple[np.ndarray, str, List[int]]:
+    """Audio, reference text and word id per feature frame (-1 for silence)."""
+    rate = constants.TARGET_RATE
+    hop = rate // 100
+    parts, labels, text = [], [], []
+    pos = 0
+
+    def add(pcm, label):
+        nonlocal pos
+        parts.append(pcm)
+        labels.append((pos, pos + len(pcm), label))
+        pos += len(pcm)
+
+    add(synthesize(rate, [(rng.uniform(0.1, 0.3), 'silence')], seed=int(rng.integers(1 << 30))), -1)
+    for _ in range(words):
+        k = int(rng.integers(len(WORDS)))
+        level = rng.uniform(2000, 9000)
+        add(synthesize(rate, [(rng.uniform(0.2, 0.4), 'tone')], freq=word_freq(k), level=level), k)
+        add(synthesize(rate, [(rng.uniform(0.12, 0.3), 'silence')],
+                       seed=int(rng.integers(1 << 30))), -1)
+        text.append(WORDS[k])
+    audio = np.concatenate(parts).astype(np.float32) / 32768.0
+    audio += rng.standard_normal(len(audio)).astype(np.float32) * 0.002
+    frames = len(audio) // hop + 1
+    frame_labels = [-1] * frames
+    for start, end, label in labels:
+        for i in range(-(-start // hop), min(frames, end // hop + 1)):
+            frame_labels[i] = label
+    return audio, ' '.join(text), frame_labels
+
+
+class ReferenceModel:
+    """The test network evaluated in float32 numpy, for the PyTorch path."""
+
+    def __init__(self, weights: List[Tuple[np.ndarray, np.ndarray]]) -> None:
+        self.weights = weights
+        self.frontend = backends.LogMel(features=FEATURES)
+        self.vocabulary = [backends.WORD_START + w for w in WORDS]
+
+    def logprobs(self, feats: np.ndarray) -> np.ndarray:
+        x = feats.transpose(0, 2, 1)
+        for i, (w, b) in enumerate(self.weights):
+            x = x @ w + b
+            if i < len(self.weights) - 1:
+                x = np.maximum(x, 0.0)
+        x = x - x.max(axis=-1, keepdims=True)
+        return x - np.log(np.exp(x).sum(axis=-1, keepdims=True))
+
+    def transcribe(self, audio, batch_size: int = 0, verbose: bool = False, **kwargs) -> List[str]:
+        feats, lengths = self.frontend.batch([np.asarray(a, dtype=np.float32) for a in audio])
+        out = self.logprobs(feats)
+        return [backends.detokenize([self.vocabulary[i] for i in backends.ctc_greedy(
+                    np.argmax(row[:n], axis=-1), len(self.vocabulary))])
+                for row, n in zip(out, lengths)]
+
+
+def build_test_model(cache_dir: str, hidden: int, layers: int, seed: int = 0) -> ReferenceModel:
+    """Fit the tone-word CTC network and save it as ``TEST_MODEL`` in ``cache_dir``."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(seed)
+    frontend = backends.LogMel(features=FEATURES)
+    feats, targets = [], []
+    for _ in range(300):
+        audio, _, labels = tone_utterance(rng, int(rng.integers(3, 7)))
+        f = frontend(audio).T
+        labels = np.where(np.array(labels[:len(f)]) < 0, len(WORDS), labels[:len(f)])
+        # frames next to an onset or offset mix both classes; like a CTC
+        # model, call them blank
+        edge = np.flatnonzero(np.diff(labels)) + 1
+        for d in range(-2, 2):
+            labels[np.clip(edge + d, 0, len(f) - 1)] = len(WORDS)
+        feats.append(f)
+        targets.extend(labels)
+    x = np.concatenate(feats).astype(np.float32)
+    y = np.zeros((len(x), len(WORDS) + 1), dtype=np.float32)
+    y[np.arange(len(x)), targets] = 1.0
+
+    # random hidden layers, output layer by ridge regression on their activations
+    weights = []
+    width = FEATURES
+    h = x
+    for _ in range(layers):
+        w = (rng.standard_normal((width, hidden)) * np.sqrt(2.0 / width)).astype(np.float32)
+        b = (rng.standard_normal(hidden) * 0.1).astype(np.float32)
+        weights.append((w, b))
+        h = np.maximum(h @ w + b, 0.0)
+        width = hidden
+    h = h.astype(np.float64)
+    gram = h.T @ h + 1.0 * np.eye(hidden)
+    w_out = np.linalg.solve(gram, h.T @ y).astype(np.float32) * 10.0
+    weights.append((w_out, np.zeros(len(WORDS) + 1, dtype=np.float32)))
+
+    nodes = [helper.make_node('Transpose', ['audio_signal'], ['x0'], perm=[0, 2, 1])]
+    inits = []
+    prev = 'x0'
+    for i, (w, b) in enumerate(weights):
+        inits += [numpy_helper.from_array(w, f'w{i}'), numpy_helper.from_array(b, f'b{i}')]
+        nodes.append(helper.make_node('MatMul', [prev, f'w{i}'], [f'm{i}']))
+        nodes.append(helper.make_node('Add', [f'm{i}', f'b{i}'], [f'a{i}']))
+        prev = f'a{i}'
+        if i < len(weights) - 1:
+            nodes.append(helper.make_node('Relu', [prev], [f'r{i}']))
+            prev = f'r{i}'
+    nodes.append(helper.make_node('LogSoftmax', [prev], ['logprobs'], axis=-1))
+    graph = helper.make_graph(
+        nodes, TEST_MODEL,
+        [helper.make_tensor_value_info('audio_signal', TensorProto.FLOAT, ['B', FEATURES, 'T']),
+         helper.make_tensor_value_info('length', TensorProto.INT64, ['B'])],
+        [helper.make_tensor_value_info('logprobs', TensorProto.FLOAT, ['B', 'T', len(WORDS) + 1])],
+        inits)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 17)], ir_version=8)
+    path = backends.onnx_path(TEST_MODEL, cache_dir, backends.ONNX)
+    os.makedirs(cache_dir, exist_ok=True)
+    onnx.save(model, path)
+    reference = ReferenceModel(weights)
+    backends.write_meta(path, {'vocabulary': reference.vocabulary, 'blank': len(WORDS),
+                               'subsampling': 1, 'preprocessor': {'features': FEATURES}})
+    return reference
+
+
+def normalize_text(text: str) -> List[str]:
+    return re.sub(r"[^\w' ]+", ' ', text.lower()).split()
+
+
+def word_errors(ref: Sequence[str], hyp: Sequence[str]) -> int:
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def wer(refs: Sequence[str], hyps: Sequence[str]) -> float:
+    errors = sum(word_errors(normalize_text(r), normalize_text(h)) for r, h in zip(refs, hyps))
+    words = sum(len(normalize_text(r)) for r in refs)
+    return errors / words if words else 0.0
+
+
+def load_data(path: str) -> Tuple[List[np.ndarray], List[str]]:
+    audio, refs = [], []
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith('.wav'):
+            continue
+        txt = os.path.join(path, os.path.splitext(name)[0] + '.txt')
+        if not os.path.exists(txt):
+            continue
+        pcm, rate = load_audio(os.path.join(path, name))
+        if rate != constants.TARGET_RATE:
+            raise SystemExit(f"{name}: expected {constants.TARGET_RATE} Hz audio, got {rate}")
+        audio.append(pcm.astype(np.float32) / 32768.0)
+        with open(txt, 'r', encoding='utf-8') as f:
+            refs.append(f.read().strip())
+    return audio, refs
+
+
+def measure(model, audio: List[np.ndarray], batch: int) -> Dict:
+    """Transcripts, per-call latency and real-time factor."""
+    model.transcribe(audio[:1])  # warm-up
+    hyps, single = [], []
+    for a in audio:
+        start = time.perf_counter()
+        hyps.extend(model.transcribe([a]))
+        single.append(time.perf_counter() - start)
+    batched = []
+    for pos in range(0, len(audio) - batch + 1, batch):
+        start = time.perf_counter()
+        model.transcribe(audio[pos:pos + batch], batch_size=batch)
+        batched.append(time.perf_counter() - start)
+    seconds = sum(len(a) for a in audio) / constants.TARGET_RATE
+    batch_seconds = sum(len(a) for a in audio[:len(batched) * batch]) / constants.TARGET_RATE
+    return {'hyps': hyps,
+            'p50_ms': 1000 * statistics.median(single),
+            'p90_ms': 1000 * sorted(single)[int(0.9 * (len(single) - 1))],
+            'rtf': sum(single) / seconds,
+            'batch_ms': 1000 * statistics.median(batched) if batched else 0.0,
+            'batch_rtf': sum(batched) / batch_seconds if batched else 0.0}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', help='NeMo model, CTC or hybrid for the ONNX backends; '
+                        'default: local test model')
+    parser.add_argument('--data', help='WAV files with .txt references, for --model')
+    parser.add_argument('--cache-dir', help='where exports are kept (default: a temporary dir, '
+                        'or the model cache for --model)')
+    parser.add_argument('--threads', type=int, nargs='+', help='intra-op thread counts to try')
+    parser.add_argument('--utterances', type=int, default=40)
+    parser.add_argument('--batch', type=int, default=8)
+    parser.add_argument('--hidden', type=int, default=1024, help='test model width')
+    parser.add_argument('--layers', type=int, default=3, help='test model hidden layers')
+    args = parser.parse_args()
+    threads = args.threads or sorted({1, os.cpu_count() or 1})
+
+    tmp = None
+    if args.model:
+        if not args.data:
+            parser.error('--model needs --data')
+        name = args.model
+        cache_dir = args.cache_dir or constants.MODEL_CACHE_DIR
+        audio, refs = load_data(args.data)
+        from model_loader import load_model
+        candidates = [(b, lambda b=b, t=1: load_model(name, cache_dir, b, t)[0])
+                      for b in backends.BACKENDS]
+    else:
+        name = TEST_MODEL
+        tmp = tempfile.TemporaryDirectory()
+        cache_dir = args.cache_dir or tmp.name
+        start = time.perf_counter()
+        reference = build_test_model(cache_dir, args.hidden, args.layers)
+        print(f"test model: {args.layers} x {args.hidden} hidden, built in "
+              f"{time.perf_counter() - start:.1f} s")
+        rng = np.random.default_rng(1)
+        audio, refs = [], []
+        for _ in range(args.utterances):
+            a, text, _ = tone_utterance(rng, int(rng.integers(3, 8)))
+            audio.append(a)
+            refs.append(text)
+        print(f"{backends.NEMO} and {backends.NEMO_INT8} are not measured without --model")
+        candidates = [('reference', lambda t=1: reference)]
+        for backend in (backends.ONNX, backends.ONNX_INT8):
+            candidates.append((backend, lambda b=backend, t=1: backends.OnnxBackend(
+                backends.ensure_onnx(name, cache_dir, b, None)[0], t)))
+
+    seconds = sum(len(a) for a in audio) / constants.TARGET_RATE
+    print(f"{len(audio)} utterances, {seconds:.1f} s of audio, batch {args.batch}")
+    print(f"{'backend':10s} {'threads':>7s} {'WER':>6s} {'same':>6s} {'p50 ms':>8s} {'p90 ms':>8s} "
+          f"{'RTF':>7s} {'batch ms':>9s} {'b.RTF':>7s}")
+    baseline = None
+    for backend, make in candidates:
+        for t in ([1] if backend == 'reference' else threads):
+            if args.model and backend in (backends.NEMO, backends.NEMO_INT8):
+                backends.set_torch_threads(t)
+            model = make(t=t)
+            res = measure(model, audio, args.batch)
+            if baseline is None:
+                baseline = res['hyps']
+            same = sum(a == b for a, b in zip(res['hyps'], baseline)) / len(baseline)
+            print(f"{backend:10s} {t:7d} {100 * wer(refs, res['hyps']):5.1f}% {100 * same:5.0f}% "
+                  f"{res['p50_ms']:8.1f} {res['p90_ms']:8.1f} {res['rtf']:7.4f} "
+                  f"{res['batch_ms']:9.1f} {res['batch_rtf']:7.4f}")
+    for backend in (backends.ONNX, backends.ONNX_INT8):
+        path = backends.onnx_path(name, cache_dir, backend)
+        if os.path.exists(path):
+            print(f"{backend:9s} artifact {os.path.getsize(path) / 1e6:7.1f} MB  {path}")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
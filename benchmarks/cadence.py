@@ -0,0 +1,115 @@
+"""Fixed against adaptive partial cadence while the ASR latency changes.
+
+    python -m benchmarks.cadence [--phase-s 10] [--devices 3]
+
+Plays synthetic speech in real time from several inputs into a
+``VADTranscriber`` whose fake model is fast, then slow, then fast again,
+as when another program takes the CPU for a while. Per phase it reports
+how many partials were delivered and dropped, how far behind the audio
+partials were when shown, and the latency of finals, from the end of a
+segment's audio to its result, for a short fixed interval, the default
+fixed interval and the adaptive cadence. The adaptive run also prints
+its interval and the measured utilization over time. The controller's
+behaviour is asserted in ``tests/test_cadence.py``.
+"""
+import time
+import queue
+import argparse
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+import constants
+from benchmarks.fakes import FakeModel
+from sources import SyntheticSource
+from transcriber import VADTranscriber
+
+# (name, cost_ms per call, per_second_ms of audio)
+PHASES = [('fast', 5.0, 15.0), ('slow', 40.0, 250.0), ('fast again', 5.0, 15.0)]
+
+
+def speech_pattern(seconds: float, seed: int):
+    rng = np.random.default_rng(seed)
+    pattern, total = [(rng.uniform(0.1, 0.5), 'silence')], 0.0
+    while total < seconds:
+        talk, pause = rng.uniform(2.0, 6.0), rng.uniform(0.4, 0.8)
+        pattern += [(talk, 'tone'), (pause, 'silence')]
+        total += talk + pause
+    return pattern
+
+
+def run(adaptive: bool, interval_ms: int, devices: int, phase_s: float) -> Dict:
+    model = FakeModel(cost_ms=PHASES[0][1], per_second_ms=PHASES[0][2])
+    text_q: queue.Queue = queue.Queue()
+    seconds = phase_s * len(PHASES)
+    sources = [SyntheticSource(f"in{i}", speech_pattern(seconds, i), freq=200.0 + 50 * i, seed=i)
+               for i in range(devices)]
+    vt = VADTranscriber(text_q, [], model, partial_interval_ms=interval_ms,
+                        partial_adaptive=adaptive, sources=sources)
+    timeline: List[tuple] = []
+    start = time.perf_counter()
+    vt.start()
+
+    def steer() -> None:
+        for i, (_, cost_ms, per_second_ms) in enumerate(PHASES):
+            model.cost_ms, model.per_second_ms = cost_ms, per_second_ms
+            end = start + (i + 1) * phase_s
+            while time.perf_counter() < end and vt.is_alive():
+                time.sleep(0.5)
+                timeline.append((time.perf_counter() - start, vt.cadence_stats(),
+                                 vt.scheduler.pending()))
+
+    steering = threading.Thread(target=steer, daemon=True)
+    steering.start()
+    steering.join()
+    vt.stop()
+    items = []
+    while not text_q.empty():
+        items.append(text_q.get())
+    phases = []
+    for i, (name, _, _) in enumerate(PHASES):
+        lo, hi = i * phase_s, (i + 1) * phase_s
+        mine = [it for it in items if lo <= it['end'] < hi]
+        finals = [1000 * (it['emitted'] - start - it['end']) for it in mine if it['final']]
+        partials = [1000 * (it['emitted'] - start - it['end']) for it in mine if not it['final']]
+        phases.append({'name': name, 'partials': len(partials) / phase_s,
+                       'partial_lag': float(np.median(partials)) if partials else float('nan'),
+                       'final_p50': float(np.median(finals)) if finals else float('nan'),
+                       'final_max': max(finals) if finals else float('nan'),
+                       'finals': len(finals)})
+    return {'phases': phases, 'timeline': timeline, 'dropped': vt.scheduler.dropped}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--phase-s', type=float, default=10.0, help='seconds per model speed')
+    parser.add_argument('--devices', type=int, default=3)
+    parser.add_argument('--fast-ms', type=int, default=constants.PARTIAL_MIN_MS,
+                        help='the short fixed interval')
+    args = parser.parse_args()
+
+    runs = [(f"fixed {args.fast_ms} ms", False, args.fast_ms),
+            (f"fixed {constants.PARTIAL_INTERVAL_MS} ms", False, constants.PARTIAL_INTERVAL_MS),
+            ('adaptive', True, constants.PARTIAL_INTERVAL_MS)]
+    print(f"{'cadence':16s}{'phase':12s}{'partials/s':>11s}{'dropped':>9s}{'partial lag':>13s}"
+          f"{'finals':>8s}{'final p50':>11s}{'max':>9s}")
+    adaptive = None
+    for label, is_adaptive, interval in runs:
+        result = run(is_adaptive, interval, args.devices, args.phase_s)
+        for i, p in enumerate(result['phases']):
+            dropped = str(result['dropped']) if i == 0 else ''
+            print(f"{label if i == 0 else '':16s}{p['name']:12s}{p['partials']:11.1f}{dropped:>9s}"
+                  f"{p['partial_lag']:11.0f}ms{p['finals']:8d}{p['final_p50']:9.0f}ms"
+                  f"{p['final_max']:7.0f}ms")
+        if is_adaptive:
+            adaptive = result
+    print("\nadaptive cadence over time:")
+    print(f"{'t':>6s}{'interval':>10s}{'util':>7s}{'load':>7s}{'pending':>9s}")
+    for t, stats, pending in adaptive['timeline'][1::2]:
+        print(f"{t:5.1f}s{stats.get('interval_ms', 0):8d}ms{stats.get('utilization', 0):7.2f}"
+              f"{stats.get('load', 0):7.2f}{pending:9d}")
+
+
+if __name__ == '__main__':
+    main()
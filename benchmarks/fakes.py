@@ -0,0 +1,207 @@
+import time
+from typing import List
+
+import numpy as np
+from scipy.io import wavfile
+
+from sources import synthesize
+
+
+class FakeModel:
+    """Stand-in for a NeMo ASR model.
+
+    Accepts float32 arrays or WAV paths like ``ASRModel.transcribe`` and
+    burns ``cost_ms`` per call plus ``per_second_ms`` per second of audio.
+    """
+
+    def __init__(self, cost_ms: float = 0.0, per_second_ms: float = 0.0,
+                 rate: int = 16000, text: str = "hello world") -> None:
+        self.cost_ms = cost_ms
+        self.per_second_ms = per_second_ms
+        self.rate = rate
+        self.text = text
+        self.calls = 0
+        self.samples = 0
+        # seconds spent "inferring"
+        self.busy = 0.0
+        self.lengths: List[int] = []
+
+    def _load(self, item) -> np.ndarray:
+        if isinstance(item, str):
+            _, data = wavfile.read(item)
+            return data.astype(np.float32) / 32768.0
+        return np.asarray(item, dtype=np.float32)
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs) -> List[str]:
+        audio = [self._load(a) for a in audio]
+        n = sum(len(a) for a in audio)
+        self.calls += 1
+        self.samples += n
+        self.lengths.extend(len(a) for a in audio)
+        delay = self.cost_ms + self.per_second_ms * n / self.rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+            self.busy += delay / 1000.0
+        return [self.text for _ in audio]
+
+
+class PathOnlyModel(FakeModel):
+    """Fake model that, like older NeMo releases, only accepts file paths."""
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs) -> List[str]:
+        if not all(isinstance(a, str) for a in audio):
+            raise TypeError("audio must be a list of file paths")
+        return super().transcribe(audio, batch_size, verbose, **kwargs)
+
+
+class ToneModel(FakeModel):
+    """Fake model that "transcribes" audio as its dominant frequency in Hz.
+
+    Lets a benchmark check which source a segment's audio came from.
+    """
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs) -> List[str]:
+        super().transcribe(audio, batch_size, verbose, **kwargs)
+        texts = []
+        for a in audio:
+            a = self._load(a)
+            spectrum = np.abs(np.fft.rfft(a))
+            freq = np.argmax(spectrum[1:]) + 1
+            texts.append(f"{round(freq * self.rate / len(a), -1):.0f}")
+        return texts
+
+
+def synth_speech(rate: int, pattern, freq: float = 300.0, seed: int = 0) -> np.ndarray:
+    """Build int16 audio from (seconds, voiced) pairs.
+
+    Voiced spans are a harmonic tone that webrtcvad reliably flags as speech,
+    unvoiced spans are a quiet noise floor.
+    """
+    return synthesize(rate, [(seconds, 'tone' if voiced else 'silence') for seconds, voiced in pattern],
+                      freq, seed=seed)
+
+
+class GILModel(FakeModel):
+    """Fake model that busy-waits in Python, holding the GIL.
+
+    Stands in for NeMo's Python-side pre- and post-processing, which
+    ``FakeModel``'s sleep does not reproduce.
+    """
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs) -> List[str]:
+        audio = [self._load(a) for a in audio]
+        n = sum(len(a) for a in audio)
+        self.calls += 1
+        self.samples += n
+        delay = (self.cost_ms + self.per_second_ms * n / self.rate) / 1000.0
+        end = time.perf_counter() + delay
+        x = 0
+        while time.perf_counter() < end:
+            for i in range(200):
+                x += i * i
+        self.busy += delay
+        return [self.text for _ in audio]
+
+
+# WordModel's vocabulary; word k is a tone at word_freq(k) lasting word_seconds(k)
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'foxtrot', 'golf', 'hotel', 'india', 'juliett',
+         'kilo', 'lima', 'mike', 'november', 'oscar', 'papa', 'quebec', 'romeo', 'sierra',
+         'tango', 'uniform', 'victor', 'whiskey', 'xray', 'yankee', 'zulu']
+
+
+def word_freq(k: int) -> float:
+    return 250.0 + 80.0 * k
+
+
+def word_seconds(k: int) -> float:
+    return 0.25 + 0.05 * (k % 6)
+
+
+def spoken_words(rate: int, ids, gaps) -> np.ndarray:
+    """int16 audio of ``WordModel`` words, each followed by a quiet gap of ``gaps[i]`` seconds."""
+    parts = []
+    for i, (k, gap) in enumerate(zip(ids, gaps)):
+        parts.append(synthesize(rate, [(word_seconds(k), 'tone')], freq=word_freq(k)))
+        if gap > 0:
+            parts.append(synthesize(rate, [(gap, 'silence')], seed=i))
+    return np.concatenate(parts)
+
+
+class _Hypothesis:
+    """The parts of a NeMo ``Hypothesis`` that ``hyp_text`` reads."""
+
+    def __init__(self, text: str, timestamp: dict) -> None:
+        self.text = text
+        self.timestamp = timestamp
+
+
+class WordModel(FakeModel):
+    """Fake model that recognises ``spoken_words`` audio deterministically.
+
+    Each 10 ms frame is labelled with the word whose pitch is nearest its
+    dominant frequency, and runs of one label become that word. A word
+    cut off at either end of the audio comes out as the matching share
+    of its letters, its start or its end, as a real model mishears a
+    word cut mid-way. With ``timestamps`` it returns hypotheses with
+    NeMo-style word timings when asked; without, it rejects the option
+    like an older model.
+    """
+
+    def __init__(self, timestamps: bool = True, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.timestamps = timestamps
+        hop = self.rate // 100
+        self.hop = hop
+        self.window = np.hanning(2 * hop)
+        self.freqs = np.fft.rfftfreq(4096, 1.0 / self.rate)
+        self.pitches = np.array([word_freq(k) for k in range(len(WORDS))])
+
+    def _labels(self, x: np.ndarray) -> np.ndarray:
+        hop = self.hop
+        n = max(0, (len(x) - 2 * hop) // hop + 1)
+        if not n:
+            return np.full(0, -1)
+        frames = np.lib.stride_tricks.sliding_window_view(x, 2 * hop)[::hop][:n]
+        spectra = np.abs(np.fft.rfft(frames * self.window, 4096, axis=1))
+        peak = self.freqs[np.argmax(spectra[:, 1:], axis=1) + 1]
+        labels = np.argmin(np.abs(peak[:, None] - self.pitches[None, :]), axis=1)
+        loud = np.sqrt(np.mean(frames ** 2, axis=1)) > 0.05
+        off = np.abs(peak - self.pitches[labels]) > 20.0
+        return np.where(loud & ~off, labels, -1)
+
+    def _words(self, x: np.ndarray):
+        labels = self._labels(x)
+        frame_s = self.hop / self.rate
+        words = []
+        i = 0
+        while i < len(labels):
+            j = i
+            while j < len(labels) and labels[j] == labels[i]:
+                j += 1
+            k = int(labels[i])
+            if k >= 0 and j - i >= 3:
+                word = WORDS[k]
+                # a word running into either end of the audio may be cut short
+                heard = (j - i + 1) * frame_s / word_seconds(k)
+                if heard < 0.85 and (i == 0 or j == len(labels)):
+                    letters = max(1, round(len(word) * heard))
+                    word = word[-letters:] if i == 0 else word[:letters]
+                words.append((word, i * frame_s, (j + 1) * frame_s))
+            i = j
+        return words
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs) -> List[str]:
+        timestamps = kwargs.pop('timestamps', False)
+        if timestamps and not self.timestamps:
+            raise TypeError("transcribe() got an unexpected keyword argument 'timestamps'")
+        super().transcribe(audio, batch_size, verbose, **kwargs)
+        out = []
+        for a in audio:
+            words = self._words(self._load(a))
+            text = ' '.join(w for w, _, _ in words)
+            if timestamps:
+                out.append(_Hypothesis(text, {'word': [{'word': w, 'start': s, 'end': e}
+                                                       for w, s, e in words]}))
+            else:
+                out.append(text)
+        return out
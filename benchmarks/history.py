@@ -0,0 +1,114 @@
+"""History store against the old history.txt at multi-million-line scale.
+
+    python -m benchmarks.history [--lines 2000000]
+
+Fills a ``HistoryStore`` and a plain-text file with the same lines, then
+compares the cost on the UI thread of appending a line and of loading the
+last k lines, and times phrase, time-range and device searches. Finally
+checks that rotation keeps a small store under its size limit.
+"""
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+from history import HistoryStore
+
+
+def make_lines(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vocab = [f"w{i}" for i in range(5000)]
+    lengths = rng.integers(6, 16, n)
+    words = rng.integers(0, len(vocab), int(lengths.sum()))
+    lines, pos = [], 0
+    for length in lengths:
+        lines.append(' '.join(vocab[w] for w in words[pos:pos + length]))
+        pos += length
+    # a rare phrase to search for
+    for i in range(0, n, max(1, n // 20)):
+        lines[i] += ' quarterly budget review'
+    return lines
+
+
+def timed(fn, repeats: int = 20) -> float:
+    """Median wall time of ``fn`` in milliseconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(1000.0 * (time.perf_counter() - start))
+    return statistics.median(times)
+
+
+def legacy_tail(path: str, k: int):
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    return lines[-k:]
+
+
+def legacy_append(path: str, text: str) -> None:
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text + '\n')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lines = make_lines(args.lines)
+        txt = os.path.join(tmp, 'history.txt')
+        with open(txt, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        store = HistoryStore(os.path.join(tmp, 'history.db'), max_bytes=0)
+        t0 = 1.7e9
+        start = time.perf_counter()
+        for i, line in enumerate(lines):
+            # one line a second from four inputs
+            store.append(line, device=i % 4, ts=t0 + i)
+        queued = time.perf_counter() - start
+        store.flush()
+        total = time.perf_counter() - start
+        print(f"{args.lines} lines: queued in {queued:.1f} s ({1e6 * queued / args.lines:.2f} us/line "
+              f"on the caller), on disk after {total:.1f} s "
+              f"({args.lines / total:.0f} lines/s), db {store.size() / 1e6:.0f} MB, "
+              f"text {os.path.getsize(txt) / 1e6:.0f} MB")
+
+        probe = os.path.join(tmp, 'probe.txt')
+        legacy = timed(lambda: legacy_append(probe, lines[0]), 200)
+        store_append = timed(lambda: store.append(lines[0]), 200)
+        store.flush()
+        print(f"append one line: history.txt {1000 * legacy:.1f} us, store {1000 * store_append:.1f} us")
+
+        for k in (50, 500):
+            legacy = timed(lambda: legacy_tail(txt, k), 3)
+            tail = timed(lambda: store.tail(k))
+            assert [r.text for r in store.tail(k)][-1] == lines[0]
+            print(f"last {k:3d} lines: history.txt {legacy:8.1f} ms, store {tail:6.3f} ms")
+
+        hits = store.search('quarterly budget review', limit=1000)
+        print(f"phrase search: {len(hits)} hits in "
+              f"{timed(lambda: store.search('quarterly budget review', limit=1000)):.2f} ms")
+        since = t0 + args.lines // 2
+        print(f"time range, one hour: {len(store.search(since=since, until=since + 3600, limit=5000))} "
+              f"lines in {timed(lambda: store.search(since=since, until=since + 3600, limit=5000)):.2f} ms")
+        print(f"device 2 plus phrase: "
+              f"{timed(lambda: store.search('budget', device=2, limit=100)):.2f} ms")
+        store.close()
+
+        small = HistoryStore(os.path.join(tmp, 'small.db'), max_bytes=1 << 20)
+        for line in lines[:50000]:
+            small.append(line)
+        small.flush()
+        print(f"rotation: 50000 lines into a 1 MB store kept {small.count()} lines, "
+              f"{small.size() / 1e6:.2f} MB in use, file {os.path.getsize(small.path) / 1e6:.2f} MB")
+        small.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Long utterances: seam errors and final latency by way of segmentation.
+
+    python -m benchmarks.long_utterance [--seconds 15 60 120] [--speed 10]
+
+Feeds uninterrupted speech of ``WordModel`` words (mostly run together,
+sometimes with a short gap) through a ``DevicePipeline`` in paced
+frames, and compares the finals with the words spoken:
+
+* ``cut``: no segment stream, the default ``max_frames``; long speech is
+  force-finalized when the ring fills, wherever that falls.
+* ``whole``: no segment stream, ``max_frames`` raised past the utterance;
+  one final decoding all of it.
+* ``stitch``: overlapping chunks joined by matching words, the model
+  giving no timings.
+* ``timestamps``: overlapping chunks joined on word timings.
+
+Inserted and deleted words count duplicates and drops at seams. Final
+latency is from the end of the final's audio being fed to the final
+being emitted, in wall time; the audio is fed ``--speed`` times faster
+than real time and the model costs ``--cost-ms`` plus
+``--per-second-ms`` per second of audio. ``tests/test_long_utterance.py``
+asserts the seams and the latency bound.
+"""
+import time
+import queue
+import argparse
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+import constants
+from benchmarks.fakes import WORDS, WordModel, spoken_words, word_seconds
+from transcriber import VADTranscriber
+
+MODES = ('cut', 'whole', 'stitch', 'timestamps')
+
+
+def utterance(rate: int, seconds: float, seed: int) -> Tuple[np.ndarray, List[str]]:
+    """Speech lasting about ``seconds`` between short pauses, and its words."""
+    rng = np.random.default_rng(seed)
+    ids, gaps, total = [], [], 0.0
+    while total < seconds:
+        k = int(rng.integers(len(WORDS)))
+        if ids and k == ids[-1]:
+            # a repeated word would run into one
+            continue
+        ids.append(k)
+        gaps.append(0.05 if rng.random() < 0.2 else 0.0)
+        total += word_seconds(k) + gaps[-1]
+    pause = np.zeros(int(0.5 * rate), dtype=np.int16)
+    return np.concatenate([pause, spoken_words(rate, ids, gaps), pause]), [WORDS[k] for k in ids]
+
+
+def errors(ref: Sequence[str], hyp: Sequence[str]) -> Tuple[int, int, int]:
+    """Substituted, inserted and deleted words of the best alignment."""
+    # cost and (sub, ins, del) per cell
+    prev = [(j, (0, j, 0)) for j in range(len(hyp) + 1)]
+    for i, r in enumerate(ref, 1):
+        cur = [(i, (0, 0, i))]
+        for j, h in enumerate(hyp, 1):
+            sub = prev[j - 1][0] + (r != h), prev[j - 1][1], (r != h, 0, 0)
+            ins = cur[j - 1][0] + 1, cur[j - 1][1], (0, 1, 0)
+            dele = prev[j][0] + 1, prev[j][1], (0, 0, 1)
+            cost, base, step = min(sub, ins, dele, key=lambda c: c[0])
+            cur.append((cost, tuple(a + b for a, b in zip(base, step))))
+        prev = cur
+    return prev[-1][1]
+
+
+def run(mode: str, pcm: np.ndarray, speed: float, cost_ms: float,
+        per_second_ms: float) -> Dict:
+    rate = constants.TARGET_RATE
+    model = WordModel(timestamps=mode != 'stitch', cost_ms=cost_ms, per_second_ms=per_second_ms)
+    options = {}
+    if mode in ('cut', 'whole'):
+        options['stream_chunk_ms'] = 0
+    if mode == 'whole':
+        options['max_frames'] = len(pcm) * 1000 // (rate * constants.FRAME_MS) + 1
+    text_q: queue.Queue = queue.Queue()
+    vt = VADTranscriber(text_q, [], model, **options)
+    pipeline = vt.add_pipeline(0, rate)
+    flen = pipeline.frame_len
+    start = time.perf_counter()
+    for pos in range(0, len(pcm) - flen + 1, flen):
+        delay = start + pos / rate / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pipeline.feed(pcm[pos:pos + flen])
+    pipeline.flush()
+    deadline = time.perf_counter() + 30.0
+    while vt.scheduler.pending() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    vt.scheduler.shutdown()
+    finals = []
+    while not text_q.empty():
+        item = text_q.get()
+        if item['final']:
+            finals.append(item)
+    finals.sort(key=lambda item: item['id'])
+    # wall time when each final's last audio was fed
+    latency = [1000 * (f['emitted'] - start - f['end'] / speed) for f in finals]
+    return {'finals': finals, 'latency': latency,
+            'decoded': sum(model.lengths) / rate, 'calls': model.calls}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, nargs='+', default=[15.0, 60.0, 120.0])
+    parser.add_argument('--speed', type=float, default=10.0, help='feed rate, times real time')
+    parser.add_argument('--cost-ms', type=float, default=5.0)
+    parser.add_argument('--per-second-ms', type=float, default=20.0)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    print(f"{'mode':11s}{'speech':>8s}{'words':>7s}{'finals':>8s}{'WER':>7s}{'sub':>5s}"
+          f"{'ins':>5s}{'del':>5s}{'decoded':>10s}{'latency last':>14s}{'max':>8s}")
+    for i, seconds in enumerate(args.seconds):
+        pcm, ref = utterance(constants.TARGET_RATE, seconds, seed=i)
+        for mode in args.modes:
+            result = run(mode, pcm, args.speed, args.cost_ms, args.per_second_ms)
+            hyp = ' '.join(f['text'] for f in result['finals']).split()
+            sub, ins, dele = errors(ref, hyp)
+            latency = result['latency'] or [float('nan')]
+            print(f"{mode:11s}{seconds:7.0f}s{len(ref):7d}{len(result['finals']):8d}"
+                  f"{(sub + ins + dele) / len(ref):7.1%}{sub:5d}{ins:5d}{dele:5d}"
+                  f"{result['decoded']:9.0f}s{latency[-1]:12.0f}ms{max(latency):6.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
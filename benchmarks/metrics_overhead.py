@@ -0,0 +1,86 @@
+"""Cost of the stage instrumentation on the VAD loop.
+
+    python -m benchmarks.metrics_overhead [--seconds 60]
+
+Runs the same synthetic session through a ``DevicePipeline`` with metrics
+off and on, and reports the added time per 30 ms frame as a share of the
+frame budget. Then replays it through ``VADTranscriber`` with the HTTP
+endpoint up and prints the per-stage snapshot it serves.
+"""
+import json
+import time
+import queue
+import argparse
+import urllib.request
+
+import constants
+from asr import ModelRunner
+from benchmarks.fakes import FakeModel
+from metrics import METRICS, MetricsServer
+from scheduler import ASRScheduler
+from sources import SyntheticSource, synthesize
+from transcriber import DevicePipeline, PipelineConfig, VADTranscriber
+
+RATE = 48000
+
+
+def feed_time(pcm, config: PipelineConfig, repeats: int) -> float:
+    """Best wall time of feeding ``pcm`` through a fresh pipeline."""
+    block = RATE * config.frame_ms // 1000
+    best = float('inf')
+    for _ in range(repeats):
+        scheduler = ASRScheduler(ModelRunner(FakeModel()), 1, 8, 0)
+        pipeline = DevicePipeline(0, RATE, config, scheduler, queue.Queue())
+        start = time.perf_counter()
+        for pos in range(0, len(pcm), block):
+            pipeline.feed(pcm[pos:pos + block])
+        best = min(best, time.perf_counter() - start)
+        scheduler.shutdown()
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    pattern = [(0.5, 'silence')] + [(2.0, 'tone'), (1.0, 'silence')] * int(args.seconds / 3)
+    pcm = synthesize(RATE, pattern, 440)
+    config = PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS, constants.MAX_SILENCE_MS,
+                                    constants.PARTIAL_INTERVAL_MS, constants.MIN_FRAMES,
+                                    constants.MAX_FRAMES, constants.STREAM_CHUNK_MS,
+                                    constants.STREAM_CONTEXT_MS)
+    frames = len(pcm) // (RATE * config.frame_ms // 1000)
+
+    METRICS.enabled = False
+    off = feed_time(pcm, config, args.repeats)
+    METRICS.enabled = True
+    on = feed_time(pcm, config, args.repeats)
+    added = (on - off) / frames
+    print(f"{frames} frames: {1e6 * off / frames:.1f} us/frame off, {1e6 * on / frames:.1f} us/frame on")
+    print(f"instrumentation {1e6 * added:.2f} us/frame, "
+          f"{100 * added / (config.frame_ms / 1000):.3f}% of the {config.frame_ms} ms frame budget")
+
+    METRICS.reset()
+    server = MetricsServer(0)
+    source = SyntheticSource('mic', pattern[:9], RATE, 440, speed=None)
+    vt = VADTranscriber(queue.Queue(), [], FakeModel(cost_ms=5), sources=[source])
+    vt.start()
+    vt.join()
+    vt.scheduler.shutdown()
+    url = f"http://127.0.0.1:{server.port}"
+    with urllib.request.urlopen(url + '/metrics.json') as r:
+        snap = json.load(r)
+    with urllib.request.urlopen(url + '/metrics') as r:
+        prom = r.read().decode('utf-8')
+    server.stop()
+    for stage, h in snap['stages'].items():
+        print(f"{stage:18s} n={h['count']:6d}  p50 {h['p50_ms']:8.3f}  p99 {h['p99_ms']:8.3f}  "
+              f"max {h['max_ms']:8.3f} ms")
+    print(f"{len(snap['traces_ms'])} traces, e.g. {snap['traces_ms'][:1]}")
+    print(f"prometheus exposition: {len(prom.splitlines())} lines")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Aggregate ASR throughput of a process pool by number of replicas.
+
+    python -m benchmarks.model_pool [--replicas 1 2 4] [--seconds 10]
+
+Builds the small tone-word test model of ``benchmarks.backends`` and
+loads it through ``model_factory``'s ONNX path in ``ASRProcessPool``s of
+one to N replicas, each pinned to its share of the cores with one
+intra-op thread per core. Client threads, ``--clients`` per replica,
+send batches of utterances as fast as they are answered. Reports audio
+seconds transcribed per wall second, the speed-up over one replica, and
+how many batches each replica served. With more than one core, two
+replicas must reach 1.5 times the throughput of one.
+
+A last run starts with one replica, resizes the pool to the largest
+count under load, then kills a replica, and reports throughput per
+phase and the pool's health at the end.
+"""
+import os
+import time
+import signal
+import argparse
+import tempfile
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+import backends
+import constants
+from asr_pool import ASRProcessPool, available_cores, core_sets, model_factory
+from benchmarks.backends import TEST_MODEL, build_test_model, tone_utterance
+
+
+class Load:
+    """Client threads sending batches to ``model`` until stopped."""
+
+    def __init__(self, model, batches: List[List[np.ndarray]], clients: int) -> None:
+        self.model = model
+        self.batches = batches
+        self.samples = 0
+        self.errors = 0
+        self.running = True
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._client, args=(i,), daemon=True,
+                                         name=f"client-{i}") for i in range(clients)]
+        for t in self.threads:
+            t.start()
+
+    def _client(self, i: int) -> None:
+        n = i
+        while self.running:
+            batch = self.batches[n % len(self.batches)]
+            n += len(self.threads)
+            try:
+                self.model.transcribe(batch)
+            except RuntimeError:
+                with self._lock:
+                    self.errors += 1
+                continue
+            with self._lock:
+                self.samples += sum(len(a) for a in batch)
+
+    def measure(self, seconds: float) -> float:
+        """Audio seconds transcribed per wall second over the next ``seconds``."""
+        with self._lock:
+            before = self.samples
+        start = time.perf_counter()
+        time.sleep(seconds)
+        with self._lock:
+            done = self.samples - before
+        return done / constants.TARGET_RATE / (time.perf_counter() - start)
+
+    def stop(self) -> None:
+        self.running = False
+        for t in self.threads:
+            t.join()
+
+
+def jobs(pool: ASRProcessPool) -> str:
+    return ' '.join(str(h['jobs']) for h in pool.health())
+
+
+# least speed-up of two replicas over one, on two or more cores
+MIN_SPEEDUP = 1.5
+
+
+def scaling(factory, batches, counts: List[int], clients: int,
+            seconds: float) -> Dict[int, float]:
+    """Audio seconds transcribed per wall second, by number of replicas."""
+    print(f"{'replicas':>8s}  {'cores each':12s}{'audio s/s':>10s}{'speed-up':>10s}"
+          f"{'ready s':>9s}  batches per replica")
+    base = None
+    rates = {}
+    for n in counts:
+        pool = ASRProcessPool(factory, n, warmup_s=0.5)
+        load = Load(pool, batches, clients * n)
+        load.measure(min(1.0, seconds / 4))
+        rate = load.measure(seconds)
+        load.stop()
+        base = base or rate
+        rates[n] = rate
+        cores = ','.join(str(len(c)) for c in core_sets(n))
+        print(f"{n:8d}  {cores:12s}{rate:10.1f}{rate / base:9.2f}x{pool.times.ready_s:9.1f}  "
+              f"{jobs(pool)}")
+        pool.close()
+    return rates
+
+
+def wait_for(pool: ASRProcessPool, replicas: int, timeout: float = 60.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(pool.pids()) < replicas and time.perf_counter() < deadline:
+        time.sleep(0.05)
+
+
+def resize_and_kill(factory, batches, top: int, clients: int, seconds: float) -> Dict:
+    pool = ASRProcessPool(factory, 1, warmup_s=0.5, health_s=1.0)
+    load = Load(pool, batches, clients * top)
+    phases = [('1 replica', load.measure(seconds))]
+    pool.resize(top)
+    wait_for(pool, top)
+    phases.append((f"resized to {top}", load.measure(seconds)))
+    os.kill(pool.pids()[-1], signal.SIGKILL)
+    phases.append(('one killed', load.measure(seconds)))
+    wait_for(pool, top)
+    phases.append(('after restart', load.measure(seconds)))
+    load.stop()
+    result = {'phases': phases, 'errors': load.errors,
+              'restarts': pool.restarts, 'health': pool.health()}
+    pool.close()
+    return result
+
+
+def main() -> None:
+    cores = available_cores()
+    counts = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= max(2, len(cores))]
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--replicas', type=int, nargs='+', default=counts)
+    parser.add_argument('--seconds', type=float, default=5.0, help='measured per run')
+    parser.add_argument('--clients', type=int, default=2, help='client threads per replica')
+    parser.add_argument('--batch', type=int, default=4)
+    parser.add_argument('--hidden', type=int, default=512, help='test model width')
+    parser.add_argument('--layers', type=int, default=3, help='test model hidden layers')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    build_test_model(tmp.name, args.hidden, args.layers)
+    factory = model_factory(TEST_MODEL, tmp.name, backends.ONNX, 0)
+    rng = np.random.default_rng(0)
+    audio = [tone_utterance(rng, int(rng.integers(3, 8)))[0] for _ in range(8 * args.batch)]
+    batches = [audio[i:i + args.batch] for i in range(0, len(audio), args.batch)]
+    print(f"{len(cores)} cores, test model {args.layers} x {args.hidden}, batches of "
+          f"{args.batch} utterances, {args.clients} clients per replica")
+    rates = scaling(factory, batches, args.replicas, args.clients, args.seconds)
+    if len(cores) > 1 and 1 in rates and 2 in rates:
+        assert rates[2] >= MIN_SPEEDUP * rates[1], \
+            f"2 replicas ran {rates[2] / rates[1]:.2f}x as fast as one on {len(cores)} cores"
+    else:
+        print("throughput scaling not asserted: one core, or not run with 1 and 2 replicas")
+
+    top = max(args.replicas)
+    result = resize_and_kill(factory, batches, top, args.clients, args.seconds)
+    print("\nresized at run time, then one replica killed:")
+    for name, rate in result['phases']:
+        print(f"  {name:16s}{rate:8.1f} audio s/s")
+    print(f"  failed batches {result['errors']}, restarts {result['restarts']}")
+    for h in result['health']:
+        print(f"  replica {h['index']} pid {h['pid']} {h['state']:8s} cores {h['cores']} "
+              f"jobs {h['jobs']} speed {h['speed']:.0f}x real time")
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
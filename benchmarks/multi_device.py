@@ -0,0 +1,68 @@
+"""VAD loop cost of independent per-device pipelines with synthetic inputs.
+
+    python -m benchmarks.multi_device [--devices 8] [--speed 4]
+
+Drives ``VADTranscriber`` with N synthetic sources at mixed sample rates,
+each speaking bursts of its own tone, through the real sink and VAD
+loop, and reports the loop's time per frame and its share of a core at
+real time. That inputs stay apart is checked by
+tests/test_multi_device.py.
+"""
+import argparse
+import queue
+import time
+
+import constants
+from benchmarks.fakes import ToneModel
+from sources import SyntheticSource
+from transcriber import VADTranscriber
+
+RATES = (48000, 44100, 16000, 32000)
+
+
+class TimedTranscriber(VADTranscriber):
+    """VADTranscriber that accounts the time spent in the VAD loop."""
+
+    busy = 0.0
+    fed = 0
+
+    def _drain(self, name) -> None:
+        start = time.perf_counter()
+        self.fed += len(self.pipelines[name].inbox)
+        super()._drain(name)
+        self.busy += time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', type=int, default=8)
+    parser.add_argument('--bursts', type=int, default=5, help='utterances per device')
+    parser.add_argument('--speed', type=float, default=4.0, help='playback speed vs real time')
+    args = parser.parse_args()
+
+    sources = []
+    for dev in range(args.devices):
+        freq = 300 + 100 * dev
+        # stagger the bursts so inputs talk over each other
+        pattern = [(0.5 + 0.1 * dev, 'silence')] + [(1.5, 'tone'), (0.6 + 0.05 * dev, 'silence')] * args.bursts
+        sources.append(SyntheticSource(dev, pattern, RATES[dev % len(RATES)], freq, seed=dev,
+                                       speed=args.speed))
+
+    text_q = queue.Queue()
+    vt = TimedTranscriber(text_q, [], ToneModel(cost_ms=5), sources=sources)
+    start = time.perf_counter()
+    vt.start()
+    vt.join()
+    vt.scheduler.shutdown()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.devices} devices, {vt.fed} frames in {elapsed:.2f} s")
+    per_frame = vt.busy / vt.fed
+    print(f"VAD loop {1e6 * per_frame:.1f} us/frame, "
+          f"{100 * per_frame * args.devices / (constants.FRAME_MS / 1000):.1f}% of one core "
+          f"for {args.devices} real-time inputs")
+    print(f"scheduler {vt.scheduler.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Behaviour of each inbox overload policy when the VAD loop stalls.
+
+    python -m benchmarks.overload [--stall-ms 3000] [--queue-frames 50]
+
+Plays synthetic utterances as a live device while the VAD loop
+periodically stops for ``--stall-ms`` (on the audio clock), long enough
+to overflow an inbox of ``--queue-frames``. For each policy it reports
+overruns, frames dropped, how many of them were speech, the deepest the
+inbox got and how many utterances still produced a final.
+"""
+import time
+import queue
+import argparse
+
+import numpy as np
+
+import constants
+from benchmarks.fakes import FakeModel
+from ringbuffer import OVERLOAD_POLICIES
+from sources import SyntheticSource
+from transcriber import VADTranscriber
+
+RATE = 48000
+
+
+class StallingTranscriber(VADTranscriber):
+    """Stops the VAD loop for ``stall`` seconds every ``every`` seconds."""
+
+    stall = every = 0.0
+    started = 0.0
+    stalls = 0
+    max_depth = 0
+    speech_fed = 0
+
+    def add_pipeline(self, device, rate):
+        pipeline = super().add_pipeline(device, rate)
+        write = pipeline.write
+
+        def counting(pcm):
+            if np.sqrt(np.mean(pcm.astype(np.float64) ** 2)) >= constants.SILENCE_LEVEL:
+                self.speech_fed += 1
+            write(pcm)
+        pipeline.write = counting
+        return pipeline
+
+    def _drain(self, name) -> None:
+        if not self.started:
+            self.started = time.perf_counter()
+        if time.perf_counter() - self.started >= (self.stalls + 1) * self.every:
+            self.stalls += 1
+            time.sleep(self.stall)
+        self.max_depth = max(self.max_depth, len(self.pipelines[name].inbox))
+        super()._drain(name)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--utterances', type=int, default=10)
+    parser.add_argument('--speed', type=float, default=5.0, help='playback speed vs real time')
+    parser.add_argument('--stall-ms', type=float, default=3000.0)
+    parser.add_argument('--every-s', type=float, default=7.0, help='audio seconds between stalls')
+    parser.add_argument('--queue-frames', type=int, default=50)
+    args = parser.parse_args()
+
+    pattern = [(0.5, 'silence')] + [(1.5, 'tone'), (1.5, 'silence')] * args.utterances
+    speech_blocks = int(1.5 * 1000 / constants.FRAME_MS) * args.utterances
+    print(f"{args.utterances} utterances, inbox of {args.queue_frames} frames "
+          f"({args.queue_frames * constants.FRAME_MS} ms), stalls of {args.stall_ms:.0f} ms "
+          f"every {args.every_s:.0f} s")
+    print(f"{'policy':14s} {'overruns':>8s} {'dropped':>8s} {'speech':>7s} {'depth':>6s} "
+          f"{'finals':>7s}")
+    for policy in OVERLOAD_POLICIES:
+        source = SyntheticSource('mic', pattern, RATE, 440, speed=args.speed)
+        source.live = True
+        text_q = queue.Queue()
+        vt = StallingTranscriber(text_q, [], FakeModel(cost_ms=5 / args.speed),
+                                 audio_queue_frames=args.queue_frames, overload_policy=policy,
+                                 sources=[source])
+        vt.stall = args.stall_ms / 1000.0 / args.speed
+        vt.every = args.every_s / args.speed
+        vt.start()
+        vt.join()
+        vt.scheduler.shutdown()
+        finals = sum(1 for item in list(text_q.queue) if item['final'])
+        stats = vt.stats()['mic']
+        speech_lost = max(0, speech_blocks - vt.speech_fed)
+        print(f"{policy:14s} {stats['overruns']:8d} {stats['dropped']:8d} {speech_lost:7d} "
+              f"{vt.max_depth:6d} {finals:4d}/{args.utterances}")
+
+
+if __name__ == '__main__':
+    main()
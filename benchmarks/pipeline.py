@@ -0,0 +1,254 @@
+"""End-to-end latency and throughput of the live transcription pipeline.
+
+    python -m benchmarks.pipeline [--input capture.pcm] [--speed 4] [--out results.json]
+    python -m benchmarks.pipeline --frame-ms 20 30 --workers 1 2 4 --grid
+
+Drives ``VADTranscriber`` with synthetic utterances (or a recorded file)
+treated as a live device, against a fake model with a fixed cost per call
+and per second of audio. For every configuration it reports, as
+percentiles:
+
+- latency from the end of speech to the final's arrival in the text queue
+- interval between successive partials of a segment, the first counted
+  from the segment start
+- ASR scheduler queue depth and device inbox depth, sampled every 10 ms
+- device frames dropped on a full inbox and partials the scheduler dropped
+- real-time factor of the model and of the VAD loop
+
+Audio is played ``--speed`` times faster than real time and the fake
+model's costs are divided by the same factor, so timings are reported in
+real-time milliseconds. For recorded input the end of speech is estimated
+as the segment end minus the silence that closed it.
+
+By default each sweep axis is varied on its own around the first value of
+the other axes; ``--grid`` runs the full product. Results are written as
+JSON so runs from different commits can be compared.
+"""
+import sys
+import json
+import time
+import queue
+import argparse
+import itertools
+import platform
+import subprocess
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import constants
+from benchmarks.fakes import FakeModel
+from sources import FileSource, SyntheticSource
+from transcriber import VADTranscriber
+
+AXES = ('frame_ms', 'partial_interval_ms', 'max_silence_ms', 'workers')
+
+
+class _TimedQueue(queue.Queue):
+    """Text queue that stamps every result with its arrival time."""
+
+    def put(self, item, block=True, timeout=None) -> None:
+        super().put((time.perf_counter(), item), block, timeout)
+
+
+class _TimedTranscriber(VADTranscriber):
+    """Accounts the time spent in the VAD loop."""
+
+    busy = 0.0
+
+    def _drain(self, name) -> None:
+        start = time.perf_counter()
+        super()._drain(name)
+        self.busy += time.perf_counter() - start
+
+
+def percentiles(values) -> Dict[str, Optional[float]]:
+    if not len(values):
+        return {'n': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None, 'mean': None}
+    a = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(a, [50, 90, 99])
+    return {'n': int(len(a)), 'p50': round(float(p50), 2), 'p90': round(float(p90), 2),
+            'p99': round(float(p99), 2), 'max': round(float(a.max()), 2),
+            'mean': round(float(a.mean()), 2)}
+
+
+def synthetic_session(utterances: int, speech_s: float, gap_s: float, rate: int, seed: int):
+    """Utterances of tone separated by silence; returns (source, speech end times)."""
+    rng = np.random.default_rng(seed)
+    pattern = [(0.5, 'silence')]
+    ends = []
+    t = 0.5
+    for _ in range(utterances):
+        # vary lengths a little so segment boundaries do not line up with chunks
+        speech = speech_s * rng.uniform(0.6, 1.4)
+        pattern += [(speech, 'tone'), (gap_s, 'silence')]
+        t += speech
+        ends.append(t)
+        t += gap_s
+    return pattern, ends
+
+
+def run_once(params: Dict, args, pattern, speech_ends: List[float]) -> Dict:
+    speed = args.speed
+    if args.input:
+        source = FileSource(args.input, params['frame_ms'], speed, name='input')
+    else:
+        source = SyntheticSource('input', pattern, args.rate, seed=args.seed,
+                                 frame_ms=params['frame_ms'], speed=speed)
+    # behave like a device: never block the producer, drop on overrun
+    source.live = True
+    audio_s = len(source.pcm) / source.rate
+    model = FakeModel(args.cost_ms / speed, args.per_second_ms / speed)
+    text_q = _TimedQueue()
+    vt = _TimedTranscriber(text_q, [], model,
+                           frame_ms=params['frame_ms'],
+                           max_silence_ms=params['max_silence_ms'],
+                           partial_interval_ms=params['partial_interval_ms'],
+                           asr_workers=params['workers'],
+                           asr_max_batch=args.max_batch,
+                           asr_max_wait_ms=args.max_wait_ms / speed,
+                           sources=[source])
+
+    depth, inbox = [], []
+    sampling = threading.Event()
+
+    def sample() -> None:
+        while not sampling.wait(0.01 / speed):
+            depth.append(vt.scheduler.pending())
+            inbox.append(sum(len(p.inbox) for p in list(vt.pipelines.values())))
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    start = time.perf_counter()
+    vt.start()
+    sampler.start()
+    vt.join()
+    vt.scheduler.shutdown()
+    wall = time.perf_counter() - start
+    sampling.set()
+    sampler.join()
+
+    latencies, intervals = [], []
+    last_partial = {}
+    finals = 0
+    silence_s = (params['max_silence_ms'] + params['frame_ms']) / 1000.0
+    while not text_q.empty():
+        arrived, item = text_q.get()
+        # arrival on the audio clock, in seconds since playback started
+        t = (arrived - start) * speed
+        key = (item['device'], item['id'])
+        if item['final']:
+            finals += 1
+            if args.input:
+                speech_end = item['end'] - silence_s
+            else:
+                ended = [e for e in speech_ends if e <= item['end'] + 1e-3]
+                if not ended:
+                    continue
+                speech_end = ended[-1]
+            latencies.append(1000.0 * (t - speech_end))
+            last_partial.pop(key, None)
+        else:
+            # the first partial of a segment counts from the segment start
+            since = last_partial.get(key, item['start'])
+            intervals.append(1000.0 * (t - since))
+            last_partial[key] = t
+
+    stats = vt.scheduler.stats()
+    return {
+        'params': params,
+        'audio_s': round(audio_s, 2),
+        'wall_s': round(wall, 2),
+        'finals': finals,
+        'utterances': None if args.input else len(speech_ends),
+        'latency_ms': percentiles(latencies),
+        'partial_interval_ms': percentiles(intervals),
+        'asr_queue_depth': percentiles(depth),
+        'inbox_depth': percentiles(inbox),
+        'dropped_frames': int(sum(p.inbox.dropped for p in vt.pipelines.values())),
+        'dropped_partials': stats['dropped'],
+        'model_calls': model.calls,
+        'batches': stats['batches'],
+        'rtf_model': round(model.busy * speed / audio_s, 4),
+        'rtf_vad': round(vt.busy / audio_s, 4),
+    }
+
+
+def configurations(args) -> List[Dict]:
+    values = {axis: getattr(args, axis) for axis in AXES}
+    if args.grid:
+        return [dict(zip(AXES, combo)) for combo in itertools.product(*values.values())]
+    base = {axis: v[0] for axis, v in values.items()}
+    configs = [base]
+    for axis in AXES:
+        for v in values[axis][1:]:
+            configs.append(dict(base, **{axis: v}))
+    return configs
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input', help='WAV/FLAC file or raw capture to replay')
+    parser.add_argument('--utterances', type=int, default=8)
+    parser.add_argument('--speech-s', type=float, default=2.0, help='mean utterance length')
+    parser.add_argument('--gap-s', type=float, default=1.0, help='silence between utterances')
+    parser.add_argument('--rate', type=int, default=48000, help='synthetic device rate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--speed', type=float, default=4.0, help='playback speed vs real time')
+    parser.add_argument('--cost-ms', type=float, default=40.0, help='fake model cost per call')
+    parser.add_argument('--per-second-ms', type=float, default=15.0,
+                        help='fake model cost per second of audio')
+    parser.add_argument('--max-batch', type=int, default=constants.ASR_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=constants.ASR_MAX_WAIT_MS)
+    parser.add_argument('--frame-ms', dest='frame_ms', type=int, nargs='+',
+                        default=[constants.FRAME_MS, 10, 20])
+    parser.add_argument('--partial-interval-ms', dest='partial_interval_ms', type=int, nargs='+',
+                        default=[constants.PARTIAL_INTERVAL_MS, 500, 1000])
+    parser.add_argument('--max-silence-ms', dest='max_silence_ms', type=int, nargs='+',
+                        default=[constants.MAX_SILENCE_MS, 300, 600])
+    parser.add_argument('--workers', type=int, nargs='+', default=[constants.ASR_WORKERS, 1, 4])
+    parser.add_argument('--grid', action='store_true', help='run every combination')
+    parser.add_argument('--out', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    pattern, ends = synthetic_session(args.utterances, args.speech_s, args.gap_s,
+                                      args.rate, args.seed)
+    runs = []
+    for params in configurations(args):
+        result = run_once(params, args, pattern, ends)
+        lat = result['latency_ms']
+        print(f"{params}: latency p50 {lat['p50']} p99 {lat['p99']} ms, "
+              f"finals {result['finals']}, dropped frames {result['dropped_frames']}",
+              file=sys.stderr)
+        runs.append(result)
+
+    report = {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'speed': args.speed,
+        'model': {'cost_ms': args.cost_ms, 'per_second_ms': args.per_second_ms,
+                  'max_batch': args.max_batch, 'max_wait_ms': args.max_wait_ms},
+        'input': args.input or {'utterances': args.utterances, 'speech_s': args.speech_s,
+                                'gap_s': args.gap_s, 'rate': args.rate, 'seed': args.seed},
+        'runs': runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Repeated live reconfiguration of a running transcriber.
+
+    python -m benchmarks.reconfigure [--rounds 1000]
+
+Runs a ``VADTranscriber`` on two synthetic inputs and changes its settings
+``--rounds`` times: VAD engine, mode and gate, silence and partial
+thresholds, min/max frames, overload policy, ASR worker count and
+batching, with the inputs swapped for new ones every ``--swap-every``
+rounds. Reports the time per change and the thread count and traced
+memory after warming up and after the last round; the test in
+``tests/test_reconfigure.py`` asserts that they stay flat.
+"""
+import gc
+import time
+import argparse
+import threading
+import tracemalloc
+
+import constants
+from benchmarks.fakes import FakeModel
+from ringbuffer import OVERLOAD_POLICIES
+from sources import SyntheticSource
+from transcriber import PipelineConfig, VADTranscriber
+from vad import ENGINES
+
+PATTERN = [(0.8, 'tone'), (0.4, 'silence')] * 25
+
+
+class Discard:
+    """Text queue that only counts results."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def put(self, item) -> None:
+        self.count += 1
+
+
+def make_sources(generation: int):
+    return [SyntheticSource(f"in{i}", PATTERN, freq=200.0 + 100 * i, seed=generation)
+            for i in range(2)]
+
+
+def round_settings(i: int):
+    """Settings of round ``i``; round 0 is the baseline."""
+    config = PipelineConfig.from_ms(
+        vad_mode=i % 4, frame_ms=constants.FRAME_MS,
+        max_silence_ms=300 + 30 * (i % 7), partial_interval_ms=(i % 5) * 150,
+        min_frames=3 + i % 5, max_frames=150 + 25 * (i % 9),
+        stream_chunk_ms=constants.STREAM_CHUNK_MS if i % 2 else 0,
+        stream_context_ms=constants.STREAM_CONTEXT_MS,
+        overload_policy=OVERLOAD_POLICIES[i % len(OVERLOAD_POLICIES)],
+        vad_engine=list(ENGINES)[i // 2 % len(ENGINES)], vad_gate_level=100 * (i % 3))
+    return config, 1 + i % 3, 1 + i % 8, 5 + i % 20
+
+
+def applied(vt: VADTranscriber) -> None:
+    """Wait for the loop to apply the pending change, so each round is really exercised."""
+    while (vt._pending_config is not None or vt._pending_sources is not None) and vt.is_alive():
+        time.sleep(0.0005)
+
+
+def apply(vt: VADTranscriber, i: int) -> None:
+    config, workers, batch, wait = round_settings(i)
+    vt.reconfigure(config, workers, batch, wait)
+    applied(vt)
+
+
+def settle(vt: VADTranscriber, workers: int, timeout: float = 5.0) -> int:
+    """Thread count once retired ASR workers have exited.
+
+    Also waits for the finals flushed by replaced inputs to be delivered,
+    as they keep the old pipelines alive until then.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        asr = [t for t in threading.enumerate() if t.name.startswith('asr-')]
+        if len(asr) == workers and not vt.scheduler.pending():
+            break
+        time.sleep(0.01)
+    # a batch taken just before may still be running
+    time.sleep(0.1)
+    return threading.active_count()
+
+
+def traced() -> int:
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--swap-every', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=50)
+    args = parser.parse_args()
+
+    threads_before = threading.active_count()
+    tracemalloc.start()
+    texts = Discard()
+    config, workers, batch, wait = round_settings(0)
+    vt = VADTranscriber(texts, [], FakeModel(cost_ms=5.0), asr_workers=workers,
+                        asr_max_batch=batch, asr_max_wait_ms=wait, sources=make_sources(0))
+    vt.config = config
+    vt.start()
+    generation = 0
+    for i in range(1, args.warmup + 1):
+        apply(vt, i)
+    apply(vt, 0)
+    # fresh pipelines, whose rings have their nominal size, on both measurements
+    generation += 1
+    vt.set_sources(make_sources(generation))
+    applied(vt)
+    base_threads = settle(vt, workers)
+    base_mem = traced()
+
+    start = time.perf_counter()
+    swaps = 0
+    for i in range(1, args.rounds + 1):
+        apply(vt, i)
+        if i % args.swap_every == 0:
+            generation += 1
+            vt.set_sources(make_sources(generation))
+            applied(vt)
+            swaps += 1
+        if i % (args.rounds // 10 or 1) == 0:
+            print(f"round {i:5d}: {threading.active_count()} threads, "
+                  f"{vt.scheduler.workers} ASR workers, {traced() / 1024:.0f} KiB traced")
+    elapsed = time.perf_counter() - start
+    apply(vt, 0)
+    vt.set_sources(make_sources(generation + 1))
+    applied(vt)
+    threads = settle(vt, workers)
+    mem = traced()
+    vt.stop()
+    time.sleep(0.05)
+    threads_after_stop = threading.active_count()
+    tracemalloc.stop()
+
+    growth_kb = (mem - base_mem) / 1024
+    print(f"{args.rounds} reconfigurations and {swaps} input swaps in {elapsed:.1f} s "
+          f"({1000 * elapsed / args.rounds:.2f} ms each), {texts.count} results")
+    print(f"threads: {base_threads} after warm-up, {threads} after the last round, "
+          f"{threads_after_stop} after stop ({threads_before} before start)")
+    print(f"traced memory: {base_mem / 1024:.0f} KiB after warm-up, {mem / 1024:.0f} KiB after "
+          f"the last round ({growth_kb:+.0f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Capture a session to disk and replay it deterministically.
+
+    python -m benchmarks.replay [capture.pcm]
+
+Without an argument a synthetic session is recorded through
+``CaptureSource`` first. The capture is then replayed through
+``VADTranscriber`` as fast as possible, twice, and the two runs must
+produce identical finals with identical timestamps.
+"""
+import os
+import sys
+import time
+import queue
+import tempfile
+
+from benchmarks.fakes import ToneModel
+from sources import CaptureSource, FileSource, SyntheticSource
+from transcriber import VADTranscriber
+
+
+def run(sources):
+    text_q = queue.Queue()
+    vt = VADTranscriber(text_q, [], ToneModel(cost_ms=2), sources=sources)
+    start = time.perf_counter()
+    vt.start()
+    vt.join()
+    vt.scheduler.shutdown()
+    elapsed = time.perf_counter() - start
+    finals = []
+    while not text_q.empty():
+        item = text_q.get()
+        if item['final']:
+            finals.append((item['id'], item['start'], item['end'], item['text']))
+    return sorted(finals), elapsed
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = os.path.join(tmp, 'session.pcm')
+            pattern = [(0.5, 'silence')] + [(1.2, 'tone'), (0.4, 'noise'), (0.8, 'silence')] * 4
+            source = CaptureSource(SyntheticSource('mic', pattern, 48000, 440, speed=None), path)
+            live, elapsed = run([source])
+            print(f"captured {source.samples} samples at {source.rate} Hz "
+                  f"({os.path.getsize(path)} bytes) in {elapsed:.2f} s, {len(live)} finals")
+
+        replay = FileSource(path, speed=None, name='mic')
+        duration = len(replay.pcm) / replay.rate
+        first, elapsed = run([replay])
+        print(f"replayed {duration:.1f} s of audio in {elapsed:.2f} s "
+              f"({duration / elapsed:.0f}x real time), {len(first)} finals")
+        second, _ = run([FileSource(path, speed=None, name='mic')])
+        if len(sys.argv) == 1 and first != live:
+            print("replay differs from the captured session")
+            sys.exit(1)
+        if first != second:
+            print("replays differ")
+            sys.exit(1)
+        print("replays identical")
+
+
+if __name__ == '__main__':
+    main()
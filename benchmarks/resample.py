@@ -0,0 +1,64 @@
+"""Per-frame cost and boundary error of resample_pcm vs StreamResampler.
+
+    python -m benchmarks.resample [--seconds 10]
+
+Resamples a 30 ms-blocked test signal (tone plus noise) from common device
+rates to TARGET_RATE with both implementations. Error is measured against
+resampling the whole signal in one pass, so it shows the artifacts that
+per-frame processing introduces at block boundaries.
+"""
+import argparse
+import time
+
+import numpy as np
+import scipy.signal
+
+import constants
+from utils import resample_pcm, StreamResampler
+
+
+def _signal(rate: int, seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(rate * seconds)) / rate
+    x = 8000 * np.sin(2 * np.pi * 440 * t) + 2000 * np.sin(2 * np.pi * 2500 * t)
+    x += rng.standard_normal(len(t)) * 300
+    return x.astype(np.int16)
+
+
+def _best_error(out: np.ndarray, ref: np.ndarray, max_delay: int = 40) -> float:
+    """RMS error against the reference, allowing for a constant filter delay."""
+    n = min(len(out), len(ref)) - max_delay
+    out, ref = out.astype(np.float64), ref.astype(np.float64)
+    return min(np.sqrt(np.mean((out[d:d + n] - ref[:n]) ** 2)) for d in range(max_delay))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    args = parser.parse_args()
+    target = constants.TARGET_RATE
+    for rate in (48000, 44100):
+        x = _signal(rate, args.seconds)
+        ref = scipy.signal.resample_poly(x.astype(np.float64), target, rate)
+        block = int(rate * constants.FRAME_MS / 1000)
+        frames = [x[i:i + block] for i in range(0, len(x) - block + 1, block)]
+
+        start = time.perf_counter()
+        old = np.concatenate([resample_pcm(f, rate, target) for f in frames])
+        t_old = (time.perf_counter() - start) / len(frames)
+
+        resampler = StreamResampler(rate, target)
+        start = time.perf_counter()
+        new = np.concatenate([resampler.process(f) for f in frames])
+        t_new = (time.perf_counter() - start) / len(frames)
+
+        expected = len(frames) * block * target / rate
+        print(f"{rate} Hz -> {target} Hz, {len(frames)} frames")
+        print(f"  resample_pcm     {t_old * 1e6:7.1f} us/frame  samples {len(old)} "
+              f"(expected {expected:.0f})  rms error {_best_error(old, ref):7.1f}")
+        print(f"  StreamResampler  {t_new * 1e6:7.1f} us/frame  samples {len(new)} "
+              f"(expected {expected:.0f})  rms error {_best_error(new, ref):7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Batching and partial dropping of the ASR scheduler.
+
+    python -m benchmarks.scheduler [--segments 20] [--cost-ms 40]
+
+Submits bursts of partials followed by a final for many segments against
+a fake model whose per-call cost dominates, and reports model calls,
+dropped partials and queue wait. Ordering is checked by
+tests/test_scheduler.py.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from asr import ModelRunner
+from benchmarks.fakes import FakeModel
+from scheduler import ASRScheduler, PARTIAL, FINAL
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--segments', type=int, default=20)
+    parser.add_argument('--partials', type=int, default=5, help='partials per segment')
+    parser.add_argument('--cost-ms', type=float, default=40.0, help='fake model cost per call')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-batch', type=int, default=8)
+    args = parser.parse_args()
+
+    model = FakeModel(cost_ms=args.cost_ms)
+    sched = ASRScheduler(ModelRunner(model), args.workers, args.max_batch, 20)
+    audio = np.zeros(16000, dtype=np.int16)
+    start = time.perf_counter()
+    for seg in range(args.segments):
+        for i in range(args.partials):
+            sched.submit(seg, audio, PARTIAL, lambda text: None)
+        sched.submit(seg, audio, FINAL, lambda text: None)
+        time.sleep(args.cost_ms / 4000.0)
+    sched.shutdown()
+    elapsed = time.perf_counter() - start
+
+    submitted = args.segments * (args.partials + 1)
+    print(f"submitted {submitted} jobs in {elapsed:.2f} s, model calls {model.calls}")
+    print(f"stats {sched.stats()}")
+
+
+if __name__ == '__main__':
+    main()
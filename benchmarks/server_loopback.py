@@ -0,0 +1,80 @@
+"""Throughput and per-client CPU cost of the network transcription server.
+
+    python -m benchmarks.server_loopback [--clients 8]
+
+Starts ``TranscriptionServer`` on localhost with a fake model and
+connects several clients at different sample rates that stream
+synthetic speech as fast as the server accepts it. Reports the time
+taken and the feed-thread CPU (resampling, VAD and segmentation) each
+connection used per second of audio, i.e. the share of a core one
+real-time client costs. Correctness is checked by tests/test_server.py.
+"""
+import json
+import time
+import asyncio
+import argparse
+
+import constants
+from benchmarks.fakes import ToneModel, synth_speech
+from server import TranscriptionServer
+from transcriber import PipelineConfig
+
+RATES = (16000, 48000, 44100, 32000)
+
+
+async def _client(port: int, rate: int, freq: int, bursts: int):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(json.dumps({'rate': rate}).encode() + b'\n')
+    pattern = [(0.5, False)] + [(1.5, True), (0.6, False)] * bursts
+    audio = synth_speech(rate, pattern, freq).tobytes()
+    step = 2 * rate // 10
+    for pos in range(0, len(audio), step):
+        writer.write(audio[pos:pos + step])
+        await writer.drain()
+    writer.write_eof()
+    results = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        results.append(json.loads(line))
+    writer.close()
+    return results
+
+
+async def _run(args) -> None:
+    config = PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS,
+                                    constants.MAX_SILENCE_MS, 500, constants.MIN_FRAMES,
+                                    constants.MAX_FRAMES, constants.STREAM_CHUNK_MS,
+                                    constants.STREAM_CONTEXT_MS)
+    server = TranscriptionServer(ToneModel(cost_ms=args.cost_ms), config, workers=2)
+    srv = await server.start('127.0.0.1', 0)
+    port = srv.sockets[0].getsockname()[1]
+    freqs = [300 + 100 * i for i in range(args.clients)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(_client(port, RATES[i % len(RATES)], freqs[i], args.bursts)
+                                     for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    await server.close()
+
+    for i, res in enumerate(results):
+        finals = sum(r['final'] for r in res)
+        print(f"client {i} @ {RATES[i % len(RATES)]:5d} Hz: {finals} finals, "
+              f"{len(res) - finals} partials")
+    print(f"{server.audio_s:.0f} s of audio from {args.clients} clients in {elapsed:.2f} s")
+    cost = server.feed_s / server.audio_s
+    print(f"feed threads {1000 * cost:.1f} ms CPU per audio second: one real-time client "
+          f"costs {100 * cost:.2f}% of a core, {int(1 / cost)} clients fit in one core")
+    print(f"scheduler {server.scheduler.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--bursts', type=int, default=4)
+    parser.add_argument('--cost-ms', type=float, default=10.0)
+    asyncio.run(_run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
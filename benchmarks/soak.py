@@ -0,0 +1,255 @@
+"""Soak test of the overlay and the pipeline on hours of synthetic audio.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.soak [--hours 1] [--speed 20]
+        [--report soak.json]
+
+Runs the real ``Overlay`` headless with looping synthetic inputs played
+``--speed`` times faster than real time, a ``ToneModel`` that only takes
+WAV files and fails every ``--fail-every`` calls, and a history database
+in a temporary directory. The transcriber is restarted every
+``--restart-every`` seconds, as a change of input or model would.
+
+Every ``--interval`` seconds a snapshot records RSS, Python heap traced by
+``tracemalloc`` and its top allocators since the baseline, threads, open
+file descriptors, temporary WAV files left behind and queue depths. The
+baseline is the first snapshot after ``--warmup`` seconds; a snapshot
+that grew past one of the ``--max-*`` limits is a failure. Snapshots go to
+``--report`` as JSON, and the exit status is 1 if any limit was passed.
+Settings are not saved.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import functools
+import tracemalloc
+from typing import Dict, Iterator, List
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+
+import constants
+from benchmarks.fakes import PathOnlyModel, ToneModel
+from overlay import Overlay
+from sources import ReplaySource, synthesize
+
+# growth over the baseline that fails the run
+LIMITS = {'rss_mb': 64.0, 'traced_mb': 16.0, 'threads': 4, 'fds': 8, 'wavs': 0, 'audio_q': 8}
+# a WAV file this old was left behind by its call
+STALE_S = 5.0
+
+
+class SoakModel(ToneModel, PathOnlyModel):
+    """``ToneModel`` that only takes WAV files and raises every ``fail_every`` calls."""
+
+    def __init__(self, fail_every: int = 0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.fail_every = fail_every
+        self.failures = 0
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs):
+        if self.fail_every and (self.calls + 1) % self.fail_every == 0:
+            self.calls += 1
+            self.failures += 1
+            raise RuntimeError("injected failure")
+        return super().transcribe(audio, batch_size, verbose, **kwargs)
+
+
+class LoopSource(ReplaySource):
+    """Plays phrases of a tone with pauses between them, until stopped."""
+
+    def __init__(self, name, freq: float, speed: float, seed: int = 0,
+                 frame_ms: int = constants.FRAME_MS) -> None:
+        super().__init__(name, constants.TARGET_RATE, frame_ms, speed)
+        pattern = []
+        for i in range(8):
+            # phrases of 0.4 to 6 s, the longest split by the segment cap
+            pattern += [(0.4 + 0.8 * ((i * 5 + seed) % 8), 'tone'), (0.3 + 0.2 * (i % 4), 'silence')]
+        self.pcm = synthesize(self.rate, pattern, freq, seed=seed)
+        # samples delivered over all restarts
+        self.played = 0
+
+    def blocks(self) -> Iterator:
+        while True:
+            for pos in range(0, len(self.pcm), self.blocksize):
+                block = self.pcm[pos:pos + self.blocksize]
+                self.played += len(block)
+                yield block
+
+
+def rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    # the peak, where /proc is not available
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def count_dir(path: str) -> int:
+    try:
+        return len(os.listdir(path))
+    except OSError:
+        return -1
+
+
+def stale_files(path: str, age_s: float) -> int:
+    """Files in ``path`` older than ``age_s``, past any call still using them."""
+    cutoff = time.time() - age_s
+    with os.scandir(path) as entries:
+        return sum(1 for e in entries if e.stat().st_mtime < cutoff)
+
+
+class Soak:
+    """Drives the overlay and snapshots its resources from the UI thread."""
+
+    def __init__(self, app: QApplication, args, tmp: str) -> None:
+        self.app = app
+        self.args = args
+        self.wav_dir = os.path.join(tmp, 'wav')
+        os.makedirs(self.wav_dir)
+        # the WAV files of path-only models are written here
+        tempfile.tempdir = self.wav_dir
+        self.sources = [LoopSource(f"loop{i}", 300.0 + 200.0 * i, args.speed, seed=i)
+                        for i in range(args.sources)]
+        factory = functools.partial(SoakModel, fail_every=args.fail_every,
+                                    cost_ms=args.cost_ms, per_second_ms=args.per_second_ms)
+        self.overlay = Overlay(factory=factory, sources=self.sources,
+                               history_db=os.path.join(tmp, 'history.db'))
+        self.overlay.show()
+        self.started = time.perf_counter()
+        self.restarts = 0
+        self.baseline = None
+        self.heap = None
+        self.snapshots: List[Dict] = []
+        self.violations: List[Dict] = []
+        self.snap_timer = QTimer()
+        self.snap_timer.timeout.connect(self.snapshot)
+        self.snap_timer.start(int(args.interval * 1000))
+        self.restart_timer = QTimer()
+        self.restart_timer.timeout.connect(self.restart)
+        if args.restart_every > 0:
+            self.restart_timer.start(int(args.restart_every * 1000))
+
+    def audio_s(self) -> float:
+        return sum(s.played for s in self.sources) / constants.TARGET_RATE / len(self.sources)
+
+    def restart(self) -> None:
+        if self.overlay.transcriber is not None:
+            self.overlay._restart_transcriber(self.overlay.devices)
+            self.restarts += 1
+
+    def measure(self) -> Dict:
+        vt = self.overlay.transcriber
+        model = self.overlay.asr_model
+        return {
+            'wall_s': round(time.perf_counter() - self.started, 1),
+            'audio_s': round(self.audio_s(), 1),
+            'rss_mb': round(rss_mb(), 1),
+            'traced_mb': round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2),
+            'threads': threading.active_count(),
+            'native_threads': count_dir('/proc/self/task'),
+            'fds': count_dir('/proc/self/fd'),
+            'wavs': stale_files(self.wav_dir, STALE_S),
+            'audio_q': vt.audio_q.qsize() if vt is not None else 0,
+            'inbox': sum(s['depth'] for s in vt.stats().values()) if vt is not None else 0,
+            'history_lines': len(self.overlay.history_lines),
+            'calls': model.calls if model is not None else 0,
+            'failures': model.failures if model is not None else 0,
+            'restarts': self.restarts,
+        }
+
+    def top(self) -> List[str]:
+        heap = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = heap.compare_to(self.heap, 'lineno')[:self.args.top]
+        return [str(s) for s in stats]
+
+    def snapshot(self) -> None:
+        snap = self.measure()
+        warm = snap['wall_s'] >= self.args.warmup and self.overlay.transcriber is not None
+        if self.baseline is None and warm:
+            self.baseline = dict(snap)
+            self.heap = tracemalloc.take_snapshot()
+        if self.baseline is not None:
+            growth = {k: snap[k] - self.baseline[k] for k in self.args.limits}
+            snap['growth'] = {k: round(v, 2) for k, v in growth.items()}
+            over = {k: v for k, v in growth.items() if v > self.args.limits[k]}
+            if over:
+                self.violations.append({'wall_s': snap['wall_s'], 'over': over})
+            snap['top'] = self.top()
+        self.snapshots.append(snap)
+        print(f"{snap['wall_s']:8.0f}{snap['audio_s'] / 3600:8.2f}{snap['rss_mb']:9.1f}"
+              f"{snap['traced_mb']:9.2f}{snap['threads']:6d}{snap['native_threads']:6d}"
+              f"{snap['fds']:5d}{snap['wavs']:5d}{snap['audio_q']:4d}{snap['inbox']:6d}"
+              f"{snap['calls']:8d}{snap['failures']:5d}{snap['restarts']:5d}"
+              f"{'  OVER' if self.violations and self.violations[-1]['wall_s'] == snap['wall_s'] else ''}",
+              flush=True)
+        if snap['audio_s'] >= self.args.hours * 3600:
+            self.snap_timer.stop()
+            self.restart_timer.stop()
+            self.app.quit()
+
+    def report(self) -> Dict:
+        return {'args': {k: v for k, v in vars(self.args).items()},
+                'baseline': self.baseline, 'snapshots': self.snapshots,
+                'violations': self.violations, 'passed': not self.violations}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', type=float, default=1.0, help='of audio per input')
+    parser.add_argument('--speed', type=float, default=20.0, help='times real time')
+    parser.add_argument('--sources', type=int, default=2)
+    parser.add_argument('--interval', type=float, default=10.0, help='seconds between snapshots')
+    parser.add_argument('--warmup', type=float, default=20.0, help='seconds before the baseline')
+    parser.add_argument('--restart-every', type=float, default=30.0, help='seconds, 0 for never')
+    parser.add_argument('--fail-every', type=int, default=50, help='model calls, 0 for never')
+    parser.add_argument('--cost-ms', type=float, default=2.0)
+    parser.add_argument('--per-second-ms', type=float, default=2.0)
+    parser.add_argument('--top', type=int, default=10, help='allocators per snapshot')
+    parser.add_argument('--report', default='soak.json')
+    for key, limit in LIMITS.items():
+        parser.add_argument(f"--max-{key.replace('_', '-')}", type=type(limit), default=limit,
+                            help=f"growth of {key} over the baseline")
+    parser.add_argument('--verbose', action='store_true', help='log injected ASR errors too')
+    args = parser.parse_args()
+    args.limits = {k: getattr(args, f"max_{k}") for k in LIMITS}
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format='%(asctime)s %(levelname)s: %(message)s', force=True)
+
+    # allocators are grouped by line, which needs one frame only
+    tracemalloc.start(1)
+    app = QApplication([])
+    with tempfile.TemporaryDirectory() as tmp:
+        soak = Soak(app, args, tmp)
+        print(f"{args.sources} inputs at {args.speed:g}x for {args.hours:g} h of audio, "
+              f"restart every {args.restart_every:g} s, a failed call every {args.fail_every}")
+        print(f"{'wall s':>8s}{'audio h':>8s}{'RSS MB':>9s}{'heap MB':>9s}{'py th':>6s}"
+              f"{'os th':>6s}{'fds':>5s}{'wavs':>5s}{'q':>4s}{'inbox':>6s}{'calls':>8s}"
+              f"{'fail':>5s}{'rst':>5s}")
+        app.exec()
+        soak.overlay.shutdown()
+        tempfile.tempdir = None
+        report = soak.report()
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    for v in report['violations']:
+        grown = ', '.join(f"{k} +{n:g}" for k, n in v['over'].items())
+        print(f"over the limit at {v['wall_s']:.0f} s: {grown}")
+    print(f"{'passed' if report['passed'] else 'FAILED'}, report in {args.report}")
+    sys.exit(0 if report['passed'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Startup time: window first, model in the background, warm before capture.
+
+    python -m benchmarks.startup [--load-ms 3000] [--first-call-ms 800]
+
+Times ``import overlay`` and the construction of the overlay window in a
+fresh interpreter. Then loads a stub model through ``ModelLoader``,
+with a load delay and a one-off first-inference penalty like a real
+model's lazy initialisation, and compares the latency of the first
+utterance with and without the warm-up. The lazy imports and the warm-up
+are checked in ``tests/test_startup.py``.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import constants
+from asr import ModelRunner
+from model_loader import ModelLoader
+from sources import synthesize
+from benchmarks.fakes import FakeModel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import time
+start = time.perf_counter()
+import sys, json
+sys.path.insert(0, {root!r})
+import overlay
+imported = time.perf_counter() - start
+from PySide6.QtWidgets import QApplication
+app = QApplication([])
+w = overlay.Overlay()
+w.show()
+app.processEvents()
+shown = time.perf_counter() - start
+print(json.dumps({{'import_s': imported, 'shown_s': shown}}))
+w.shutdown()
+"""
+
+
+class ColdModel(FakeModel):
+    """Fake model whose first call pays for lazy initialisation."""
+
+    def __init__(self, first_call_ms: float, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.first_call_ms = first_call_ms
+
+    def transcribe(self, audio, *args, **kwargs):
+        if self.first_call_ms:
+            time.sleep(self.first_call_ms / 1000.0)
+            self.first_call_ms = 0.0
+        return super().transcribe(audio, *args, **kwargs)
+
+
+def window_startup() -> dict:
+    # a scratch directory keeps the run away from the real history database
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+        out = subprocess.run([sys.executable, '-c', _CHILD.format(root=ROOT)], cwd=tmp, env=env,
+                             capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def first_utterance(load_ms: float, first_call_ms: float, cost_ms: float, warmup_s: float):
+    """Model-ready time and first-utterance latency, in seconds."""
+    result = {}
+
+    def factory():
+        time.sleep(load_ms / 1000.0)
+        return ColdModel(first_call_ms, cost_ms=cost_ms)
+
+    def done(model, times, error):
+        result.update(model=model, times=times, error=error)
+
+    loader = ModelLoader(done, warmup_s=warmup_s, factory=factory)
+    loader.start()
+    loader.join()
+    if result['error'] is not None:
+        raise result['error']
+    audio = synthesize(constants.TARGET_RATE, [(2.0, 'tone')])
+    start = time.perf_counter()
+    ModelRunner(result['model']).transcribe([audio])
+    return result['times'], time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--load-ms', type=float, default=3000.0, help='stub model load time')
+    parser.add_argument('--first-call-ms', type=float, default=800.0,
+                        help='extra time of the stub model\'s first inference')
+    parser.add_argument('--cost-ms', type=float, default=40.0, help='stub inference time')
+    args = parser.parse_args()
+
+    win = window_startup()
+    print(f"import overlay {win['import_s']:.2f} s, window shown after {win['shown_s']:.2f} s")
+
+    for warmup_s in (0.0, constants.WARMUP_SECONDS):
+        times, first = first_utterance(args.load_ms, args.first_call_ms, args.cost_ms, warmup_s)
+        label = f"warm-up {warmup_s:.1f} s" if warmup_s else "no warm-up "
+        print(f"{label}: model ready after {times.ready_s:.2f} s "
+              f"(load {times.load_s:.2f} s, warm-up {times.warmup_s:.2f} s), "
+              f"first utterance {1000 * first:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
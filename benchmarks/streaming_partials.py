@@ -0,0 +1,50 @@
+"""Audio decoded per partial as an utterance grows, full vs sliding window.
+
+    python -m benchmarks.streaming_partials [--seconds 60]
+
+Feeds one long run of speech frames through ``DevicePipeline.feed``
+with a fake model and reports how many seconds of audio each partial
+update had to decode.
+"""
+import argparse
+import queue
+import time
+
+import numpy as np
+
+import constants
+from benchmarks.fakes import FakeModel, synth_speech
+from transcriber import VADTranscriber
+
+
+def _run(seconds: float, chunk_ms: int) -> FakeModel:
+    model = FakeModel()
+    n_frames = int(seconds * 1000 / constants.FRAME_MS)
+    vt = VADTranscriber(queue.Queue(), [], model, max_frames=n_frames + 1,
+                        stream_chunk_ms=chunk_ms, asr_max_batch=1, asr_max_wait_ms=0)
+    pipeline = vt.add_pipeline(0, constants.TARGET_RATE)
+    flen = pipeline.frame_len
+    speech = synth_speech(constants.TARGET_RATE, [(0.3, False), (seconds, True)])
+    for pos in range(0, len(speech) - flen + 1, flen):
+        pipeline.feed(speech[pos:pos + flen])
+        # let every update run instead of being superseded by the next one
+        while vt.scheduler.pending():
+            time.sleep(0.0005)
+    vt.scheduler.shutdown()
+    return model
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=60.0, help='utterance length')
+    args = parser.parse_args()
+    for name, chunk_ms in (('full', 0), ('windowed', constants.STREAM_CHUNK_MS)):
+        model = _run(args.seconds, chunk_ms)
+        secs = np.array(model.lengths) / constants.TARGET_RATE
+        print(f"{name:9s} calls {model.calls:4d}  audio decoded {secs.sum():8.1f} s  "
+              f"first {secs[0]:5.2f} s  last {secs[-1]:5.2f} s  max {secs.max():5.2f} s")
+        print(f"          per call: {' '.join(f'{s:.1f}' for s in secs[:12])} ...")
+
+
+if __name__ == '__main__':
+    main()
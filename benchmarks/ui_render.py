@@ -0,0 +1,135 @@
+"""UI-thread cost of caption updates with a long history shown.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.ui_render [--history 500]
+
+Replays a stream of partials and finals into two caption views showing
+``--history`` lines: one redrawn from scratch on every update as the
+overlay used to do, one updated in place by ``TranscriptView.apply``. It
+reports the UI-thread time per update, including the repaint, and checks
+that both views always show the same text. It then measures how long
+results take to reach the UI thread through ``ResultQueue`` from a worker
+thread, against the up to 100 ms of the old polling timer.
+"""
+import os
+import time
+import argparse
+import threading
+import statistics
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide6.QtCore import QObject, QTimer, Qt, Slot
+from PySide6.QtWidgets import QApplication
+
+from transcript_view import FrameCoalescer, ResultQueue, TranscriptView
+
+
+def legacy_render(view: TranscriptView, lines, partial: str) -> None:
+    view.clear()
+    for line in lines:
+        view.appendPlainText(line)
+    view.appendPlainText(partial)
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Receiver(QObject):
+    """Stands in for the overlay on the UI thread."""
+
+    def __init__(self, results: ResultQueue, app: QApplication, expected: int = 600) -> None:
+        super().__init__()
+        self.results = results
+        self.app = app
+        self.expected = expected
+        self.latencies = []
+        self.renders = []
+        self.coalescer = FrameCoalescer(self, lambda: self.renders.append(time.perf_counter()))
+
+    @Slot()
+    def on_ready(self) -> None:
+        now = time.perf_counter()
+        for item in self.results.drain():
+            self.latencies.append(1000.0 * (now - item['emitted']))
+        self.coalescer.request()
+        if len(self.latencies) == self.expected:
+            QTimer.singleShot(100, self.app.quit)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', type=int, default=500)
+    parser.add_argument('--updates', type=int, default=600)
+    args = parser.parse_args()
+
+    app = QApplication([])
+    views = {}
+    for name in ('full redraw', 'incremental'):
+        view = TranscriptView()
+        view.document().setMaximumBlockCount(args.history + 1)
+        view.resize(480, 400)
+        view.show()
+        views[name] = view
+
+    history = [f"earlier line {i} with a handful of words in it" for i in range(args.history)]
+    for view in views.values():
+        view.show_lines(history, '')
+    times = {name: [] for name in views}
+    mismatches = 0
+    partial = ''
+    for step in range(args.updates):
+        finals = []
+        words = ' '.join(f"word{w}" for w in range(step % 12 + 1))
+        if step % 12 == 11:
+            finals = [words]
+            history.append(words)
+            del history[:-args.history]
+            partial = ''
+        else:
+            partial = words
+        for name, view in views.items():
+            start = time.perf_counter()
+            if name == 'full redraw':
+                legacy_render(view, history, partial)
+            else:
+                view.apply(finals, partial, lambda: history)
+            view.repaint()
+            times[name].append(1000.0 * (time.perf_counter() - start))
+        # the old view always ends with a (possibly empty) partial line
+        old = views['full redraw'].toPlainText()
+        new = views['incremental'].toPlainText()
+        mismatches += old != (new if partial else new + '\n')
+    for name, t in times.items():
+        print(f"{name:12s} {args.history} lines: mean {statistics.mean(t):7.3f} ms  "
+              f"p50 {percentile(t, 0.5):7.3f}  p99 {percentile(t, 0.99):7.3f}  "
+              f"max {max(t):7.3f} ms per update")
+    print(f"views differed after {mismatches} of {args.updates} updates")
+
+    results = ResultQueue()
+    receiver = Receiver(results, app)
+    results.ready.connect(receiver.on_ready, Qt.QueuedConnection)
+
+    def produce() -> None:
+        for i in range(200):
+            # bursts of three results, as when a batch of partials completes
+            for _ in range(3):
+                results.put({'emitted': time.perf_counter()})
+            time.sleep(0.005)
+
+    # let the views finish painting before timing delivery
+    app.processEvents()
+    worker = threading.Thread(target=produce)
+    QTimer.singleShot(0, worker.start)
+    app.exec()
+    worker.join()
+    lat = receiver.latencies
+    print(f"worker to UI thread: p50 {percentile(lat, 0.5):.3f} ms, "
+          f"p99 {percentile(lat, 0.99):.3f} ms over {len(lat)} results "
+          f"(polling every 100 ms averaged 50 ms)")
+    print(f"{len(lat)} results drawn in {len(receiver.renders)} renders")
+
+
+if __name__ == '__main__':
+    main()
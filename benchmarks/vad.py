@@ -0,0 +1,187 @@
+"""VAD throughput with and without the energy pre-gate, and segmentation agreement.
+
+    python -m benchmarks.vad [--seconds 120] [--audio FILE ...]
+
+Throughput is measured in CPU time on one thread, as frames per second
+per core, for ``VoiceDetector.classify`` alone and for the whole
+``DevicePipeline`` path (resampling, VAD and segmentation, with ASR
+submission stubbed out), one frame per call as when keeping up and
+``VAD_BLOCK_FRAMES`` per call as when the inbox is backed up (the gate
+only acts on blocks), on conversation-like audio and on audio that is
+mostly pauses, like a microphone left open.
+
+Agreement compares the segments found with the gate off and on, fed a
+block at a time so the gate is in use. The
+default material is synthetic speech-like audio: syllables of a voiced
+harmonic tone with fricative noise bursts and fading ends, separated by
+pauses, at several speaking levels over several noise floors. Recorded
+audio, WAV/FLAC or raw captures from ``CaptureSource``, is given with
+``--audio``. A segment agrees when both boundaries are within
+``--tolerance-ms``.
+"""
+import time
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+
+import constants
+from sources import FileSource
+from transcriber import DevicePipeline, PipelineConfig
+from vad import VoiceDetector, make_engine
+
+# (name, speaking RMS, noise floor RMS)
+CONDITIONS = [('loud', 3000.0, 30.0), ('normal', 1000.0, 30.0), ('quiet', 300.0, 20.0),
+              ('noisy room', 1000.0, 150.0)]
+
+
+def speechlike(rate: int, seconds: float, level: float, floor: float, seed: int = 0,
+               pauses: Tuple[float, float] = (0.3, 1.5)) -> np.ndarray:
+    """Utterances of 2-8 syllables with pauses of ``pauses`` seconds over a noise floor."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    out = rng.standard_normal(n) * floor
+    pos = int(rng.uniform(0.3, 1.0) * rate)
+    while pos < n:
+        for _ in range(rng.integers(2, 9)):
+            length = int(rng.uniform(0.12, 0.3) * rate)
+            if pos + length >= n:
+                break
+            t = np.arange(length) / rate
+            f0 = rng.uniform(90.0, 250.0) * (1.0 + 0.1 * np.sin(2 * np.pi * rng.uniform(1, 4) * t))
+            phase = 2 * np.pi * np.cumsum(f0) / rate
+            voiced = sum(np.sin(k * phase) / k for k in range(1, 7))
+            # raised-cosine syllable envelope, so every word fades in and out
+            env = np.sin(np.pi * np.arange(length) / length) ** 2
+            out[pos:pos + length] += level * env * voiced
+            if rng.random() < 0.3:
+                # a fricative before the vowel
+                fric = int(rng.uniform(0.04, 0.1) * rate)
+                start = max(0, pos - fric)
+                out[start:pos] += rng.standard_normal(pos - start) * level * 0.3
+            pos += length + int(rng.uniform(0.0, 0.08) * rate)
+        pos += int(rng.uniform(*pauses) * rate)
+    return np.clip(out, -32768, 32767).astype(np.int16)
+
+
+class _RecordingScheduler:
+    """Notes the span of each final instead of transcribing it."""
+
+    def __init__(self) -> None:
+        self.pipeline = None
+        self.segments: List[Tuple[int, int]] = []
+
+    def submit(self, key, audio, kind, callback) -> None:
+        self.segments.append((self.pipeline.seg_start, self.pipeline.seg_end))
+
+
+def make_config(gate_level: int) -> PipelineConfig:
+    # finals only, so every submission is one segment
+    return PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS, constants.MAX_SILENCE_MS,
+                                  0, constants.MIN_FRAMES, constants.MAX_FRAMES, 0, 0,
+                                  vad_gate_level=gate_level)
+
+
+def segment(pcm: np.ndarray, rate: int, gate_level: int):
+    sched = _RecordingScheduler()
+    pipeline = DevicePipeline(0, rate, make_config(gate_level), sched, None)
+    sched.pipeline = pipeline
+    flags = []
+    process = pipeline.process_frame
+
+    def recording(pos, is_speech):
+        flags.append(is_speech)
+        process(pos, is_speech)
+    pipeline.process_frame = recording
+    block = pipeline.inbox.frame_len * constants.VAD_BLOCK_FRAMES
+    for pos in range(0, len(pcm), block):
+        pipeline.feed(pcm[pos:pos + block])
+    pipeline.flush()
+    return sched.segments, np.array(flags), pipeline.vad
+
+
+def agreement(ref, got, tolerance: int) -> Tuple[int, float]:
+    """Reference segments matched within ``tolerance`` samples, and mean boundary shift."""
+    matched, shifts = 0, []
+    for start, end in ref:
+        best = min(got, key=lambda s: abs(s[0] - start) + abs(s[1] - end), default=None)
+        if best is None:
+            continue
+        shifts.append((abs(best[0] - start) + abs(best[1] - end)) / 2)
+        if abs(best[0] - start) <= tolerance and abs(best[1] - end) <= tolerance:
+            matched += 1
+    return matched, float(np.mean(shifts)) if shifts else 0.0
+
+
+def classify_rate(frames: np.ndarray, gate_level: int, block: int) -> float:
+    """Frames per CPU second through ``VoiceDetector.classify``."""
+    detector = VoiceDetector(make_engine(constants.VAD_ENGINE, constants.VAD_MODE), gate_level)
+    start = time.process_time()
+    for pos in range(0, len(frames), block):
+        detector.classify(frames[pos:pos + block])
+    return len(frames) / (time.process_time() - start)
+
+
+def pipeline_rate(pcm: np.ndarray, rate: int, gate_level: int, block: int) -> float:
+    """Frames per CPU second through ``DevicePipeline`` fed ``block`` frames at a time."""
+    sched = _RecordingScheduler()
+    pipeline = DevicePipeline(0, rate, make_config(gate_level), sched, None)
+    sched.pipeline = pipeline
+    step = pipeline.inbox.frame_len * block
+    start = time.process_time()
+    for pos in range(0, len(pcm), step):
+        pipeline.feed(pcm[pos:pos + step])
+    elapsed = time.process_time() - start
+    return pipeline.vad.frames / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=120.0, help='synthetic audio per condition')
+    parser.add_argument('--rate', type=int, default=48000, help='device rate of the synthetic audio')
+    parser.add_argument('--gate-level', type=int, default=constants.VAD_GATE_LEVEL)
+    parser.add_argument('--tolerance-ms', type=float, default=2 * constants.FRAME_MS)
+    parser.add_argument('--audio', nargs='*', default=[], help='recordings to check agreement on')
+    args = parser.parse_args()
+
+    inputs = [(name, speechlike(args.rate, args.seconds, level, floor, seed=i), args.rate)
+              for i, (name, level, floor) in enumerate(CONDITIONS)]
+    for path in args.audio:
+        source = FileSource(path)
+        inputs.append((path, source.pcm, source.rate))
+
+    flen = constants.TARGET_RATE * constants.FRAME_MS // 1000
+    print("throughput, frames/s per core:")
+    print(f"{'':42s}{'no gate':>10s}{'gate':>10s}{'speed-up':>10s}")
+    for kind, pauses in (('conversation', (0.3, 1.5)), ('mostly pauses', (3.0, 10.0))):
+        pcm16 = speechlike(constants.TARGET_RATE, args.seconds, 1000.0, 30.0, seed=99, pauses=pauses)
+        frames = pcm16[:len(pcm16) // flen * flen].reshape(-1, flen)
+        for block in (1, constants.VAD_BLOCK_FRAMES):
+            label = f"{kind}, {block} per call"
+            off = classify_rate(frames, 0, block)
+            on = classify_rate(frames, args.gate_level, block)
+            print(f"  classify, {label:30s}{off:10.0f}{on:10.0f}{on / off:9.2f}x")
+            off = pipeline_rate(pcm16, constants.TARGET_RATE, 0, block)
+            on = pipeline_rate(pcm16, constants.TARGET_RATE, args.gate_level, block)
+            print(f"  pipeline, {label:30s}{off:10.0f}{on:10.0f}{on / off:9.2f}x")
+
+    tolerance = int(args.tolerance_ms * constants.TARGET_RATE / 1000)
+    print(f"\nsegmentation agreement, gate level {args.gate_level} vs no gate "
+          f"(boundaries within {args.tolerance_ms:.0f} ms):")
+    print(f"{'input':24s}{'gated':>7s}{'frames':>9s}{'segments':>10s}{'matched':>9s}{'shift':>9s}")
+    total = matched_all = 0
+    for name, pcm, rate in inputs:
+        ref, ref_flags, _ = segment(pcm, rate, 0)
+        got, flags, detector = segment(pcm, rate, args.gate_level)
+        same = float(np.mean(ref_flags == flags)) if len(flags) else 1.0
+        matched, shift = agreement(ref, got, tolerance)
+        total += len(ref)
+        matched_all += matched
+        print(f"{name[-24:]:24s}{detector.gated / max(1, detector.frames):7.0%}{same:9.1%}"
+              f"{len(ref):5d}/{len(got):<4d}{matched / max(1, len(ref)):9.0%}"
+              f"{1000 * shift / constants.TARGET_RATE:7.0f}ms")
+    print(f"{matched_all}/{total} segments agree")
+
+
+if __name__ == '__main__':
+    main()
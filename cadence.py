@@ -0,0 +1,88 @@
+"""Partial update cadence that follows the ASR load.
+
+A fixed partial interval either outruns a loaded CPU, queueing partials
+faster than the model gets through them, or leaves a fast one idle.
+``PartialCadence`` looks at the scheduler once a period: the share of
+the workers' time spent transcribing plus the jobs still queued per
+worker is the load, and the interval is scaled by
+``(load / target) ** GAIN`` to bring it to ``target``, within
+``[min_ms, max_ms]``; saturated workers double it each period. Finals
+and chunks count towards the load without being under its control, so
+when they keep the workers busy partials slow down and leave the time
+to them.
+"""
+import time
+import logging
+from typing import Dict, Optional
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# seconds between adjustments
+PERIOD_S = 0.5
+# share of the log error corrected per period; below 1 damps the response
+GAIN = 0.5
+# largest factor the interval changes by in one period
+MAX_STEP = 2.0
+# utilization at which the workers are taken to be saturated: how far
+# demand exceeds them is unknown then, so the interval backs off by MAX_STEP
+SATURATED = 0.95
+
+
+class PartialCadence:
+    """Partial interval steered by the measured load of an ``ASRScheduler``.
+
+    ``update`` is called regularly from a single thread, the VAD loop's.
+    """
+
+    def __init__(self, scheduler, interval_ms: float, min_ms: float, max_ms: float,
+                 target: float, period_s: float = PERIOD_S) -> None:
+        self.scheduler = scheduler
+        self.period = period_s
+        self.interval_ms = float(interval_ms)
+        self.utilization = 0.0
+        self.load = 0.0
+        self.pending = 0
+        self.configure(min_ms, max_ms, target)
+        self._last = time.perf_counter()
+        self._busy = scheduler.busy_time()
+
+    def configure(self, min_ms: float, max_ms: float, target: float) -> None:
+        self.min_ms = max(1.0, float(min(min_ms, max_ms)))
+        self.max_ms = max(self.min_ms, float(max_ms))
+        self.target = min(max(target, 0.05), 1.0)
+        self.interval_ms = min(max(self.interval_ms, self.min_ms), self.max_ms)
+
+    def frames(self, frame_ms: int) -> int:
+        """The interval in VAD frames."""
+        return max(1, round(self.interval_ms / frame_ms))
+
+    def update(self, now: Optional[float] = None) -> bool:
+        """Measure the load if a period has passed; True if the interval was adjusted."""
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self._last
+        if elapsed < self.period:
+            return False
+        busy = self.scheduler.busy_time()
+        workers = max(1, self.scheduler.workers)
+        self.utilization = min(1.0, (busy - self._busy) / (elapsed * workers))
+        self.pending = self.scheduler.pending()
+        self._last, self._busy = now, busy
+        self.load = self.utilization + self.pending / workers
+        if self.load > 0:
+            # with nothing transcribed there is nothing to go by; keep the interval
+            step = min(MAX_STEP, max(1.0 / MAX_STEP, (self.load / self.target) ** GAIN))
+            if self.utilization >= SATURATED:
+                step = MAX_STEP
+            self.interval_ms = min(max(self.interval_ms * step, self.min_ms), self.max_ms)
+            logger.debug("Partial interval %.0f ms at utilization %.2f, %d pending",
+                         self.interval_ms, self.utilization, self.pending)
+        METRICS.gauge('partial_interval_ms', self.interval_ms)
+        METRICS.gauge('asr_utilization', self.utilization)
+        METRICS.gauge('asr_load', self.load)
+        return self.load > 0
+
+    def stats(self) -> Dict[str, float]:
+        return {'interval_ms': round(self.interval_ms), 'utilization': round(self.utilization, 3),
+                'load': round(self.load, 3), 'pending': self.pending, 'target': self.target}
@@ -1,8 +1,21 @@
 TARGET_RATE = 16000
 FRAME_MS = 30
 VAD_MODE = 2
+VAD_ENGINE = "webrtc"
+# frames quieter than this RMS skip the VAD engine; 0 sends every frame to it
+VAD_GATE_LEVEL = 100
+# zero crossings per sample below which a loud frame is taken for hum
+VAD_GATE_MIN_ZCR = 0.01
+# frames classified per call when the inbox is backed up
+VAD_BLOCK_FRAMES = 16
 MAX_SILENCE_MS = 150
 PARTIAL_INTERVAL_MS = 2000
+# steer the partial interval, from PARTIAL_INTERVAL_MS, to keep the ASR
+# workers this busy, within the bounds below
+PARTIAL_ADAPTIVE = True
+PARTIAL_TARGET_UTIL = 0.7
+PARTIAL_MIN_MS = 300
+PARTIAL_MAX_MS = 4000
 CLEAR_TIMEOUT_MS = 6000
 MODEL_NAME = "nvidia/parakeet-tdt-0.6b-v2"
 MAX_LINES = 3
@@ -10,3 +23,38 @@ HISTORY_LINES = 50
 HISTORY_FILE = "history.txt"
 MIN_FRAMES = 15
 MAX_FRAMES = 150
+STREAM_CHUNK_MS = 3000
+STREAM_CONTEXT_MS = 600
+ASR_WORKERS = 2
+ASR_MAX_BATCH = 8
+ASR_MAX_WAIT_MS = 20
+PREROLL_MS = 150
+AUDIO_QUEUE_FRAMES = 200
+# audio a capture can buffer while its file is written
+CAPTURE_BUFFER_MS = 5000
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_MAX_INFLIGHT = 4
+SERVER_MAX_RESULTS = 64
+SERVER_MIN_RATE = 8000
+SERVER_MAX_RATE = 192000
+SERVER_FEED_WORKERS = 4
+METRICS_ENABLED = True
+METRICS_PORT = 0
+OVERLOAD_POLICY = "drop-silence"
+SILENCE_LEVEL = 500
+HISTORY_DB = "history.db"
+HISTORY_MAX_MB = 256
+# backoff between attempts to write history lines that failed
+HISTORY_RETRY_S = 0.5
+HISTORY_RETRY_MAX_S = 30.0
+UI_FRAME_MS = 16
+MODEL_CACHE_DIR = "models"
+WARMUP_SECONDS = 1.0
+ASR_BACKEND = "nemo"
+# intra-op threads per inference call; 0 divides the cores among the ASR workers
+ASR_THREADS = 0
+# run the model in ASR_WORKERS worker processes instead of in-process threads
+ASR_PROCESSES = False
+# pin each ASR worker process to its own share of the cores
+ASR_PIN_CORES = True
@@ -0,0 +1,302 @@
+"""Append-only transcript history backed by SQLite.
+
+Finals are queued by ``append`` and written in batches by a background
+thread, so the caller never touches the disk; lines that hit a transient
+SQLite error, such as a locked database or a full disk, stay queued and
+are retried with backoff. Rows carry a timestamp and
+the input device, reads of the last k lines use the primary key index,
+and text search goes through an FTS5 index when SQLite has it. Once the
+database grows past ``max_bytes`` the oldest rows are pruned.
+"""
+import os
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+import constants
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    device TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lines_ts ON lines(ts);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(text, content='lines', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS lines_ai AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_ad AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts(lines_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+@dataclass
+class HistoryRecord:
+    id: int
+    ts: float
+    device: Optional[str]
+    text: str
+
+
+class HistoryStore:
+    """Transcript lines in a SQLite database, written from a background thread."""
+
+    def __init__(self, path: str = constants.HISTORY_DB,
+                 max_bytes: int = constants.HISTORY_MAX_MB * 1024 * 1024,
+                 batch_ms: int = 50, max_batch: int = 5000) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch = batch_ms / 1000.0
+        self.max_batch = max_batch
+        self._db = self._connect()
+        with self._db:
+            self._db.executescript(_SCHEMA)
+            try:
+                self._db.executescript(_FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                logger.warning("SQLite has no FTS5, history search will scan: %s", e)
+                self.fts = False
+        # ids are handed out here so queued lines can be merged into reads
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM lines").fetchone()[0] or 0) + 1
+        self._lock = threading.Lock()
+        self._unwritten: Deque[HistoryRecord] = deque()
+        # lines waiting for a retry after a failed write
+        self.failed = 0
+        self._q: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name='history-writer')
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(self, text: str, device=None, ts: Optional[float] = None) -> None:
+        """Queue a line for writing; never blocks on the disk."""
+        with self._lock:
+            rec = HistoryRecord(self._next_id, time.time() if ts is None else ts,
+                                None if device is None else str(device), text)
+            self._next_id += 1
+            self._unwritten.append(rec)
+        self._q.put(rec)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every line appended so far has been written or tried.
+
+        Returns False on a timeout or while failed lines wait for a retry.
+        """
+        done = threading.Event()
+        self._q.put(done)
+        return done.wait(timeout) and not self.failed
+
+    def clear(self) -> None:
+        """Drop all history, including lines not yet written."""
+        with self._lock:
+            self._unwritten.clear()
+        self._q.put('clear')
+
+    def close(self) -> None:
+        self._q.put(None)
+        self._writer.join()
+        self._db.close()
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        # lines whose write failed, retried once ``retry_at`` has passed;
+        # newer lines wait behind them so ids stay in order
+        failed: List[HistoryRecord] = []
+        retry_s = constants.HISTORY_RETRY_S
+        retry_at = 0.0
+        try:
+            while True:
+                try:
+                    item = self._q.get(timeout=max(0.0, retry_at - time.monotonic())
+                                       if failed else None)
+                except queue.Empty:
+                    item = 'retry'
+                stop = False
+                records, events = [], []
+                deadline = time.monotonic() + self.batch
+                while True:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        events.append(item)
+                    elif item == 'clear':
+                        records, failed = [], []
+                        self._clear(db)
+                    elif item != 'retry':
+                        records.append(item)
+                    if stop or events or item == 'retry' or len(records) >= self.max_batch:
+                        break
+                    try:
+                        item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                if failed:
+                    failed.extend(records)
+                    records = []
+                    if stop or time.monotonic() >= retry_at:
+                        records, failed = failed, []
+                if records:
+                    if self._write(db, records):
+                        retry_s = constants.HISTORY_RETRY_S
+                    else:
+                        failed = records
+                        retry_at = time.monotonic() + retry_s
+                        logger.warning("Retrying %d history lines in %.1f s", len(failed), retry_s)
+                        retry_s = min(2 * retry_s, constants.HISTORY_RETRY_MAX_S)
+                self.failed = len(failed)
+                for event in events:
+                    event.set()
+                if stop:
+                    if failed:
+                        logger.error("%d history lines could not be written", len(failed))
+                    return
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, records: List[HistoryRecord]) -> bool:
+        """Insert ``records``; False if they should be retried."""
+        try:
+            db.execute("BEGIN")
+            db.executemany("INSERT INTO lines (id, ts, device, text) VALUES (?, ?, ?, ?)",
+                           [(r.id, r.ts, r.device, r.text) for r in records])
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            if isinstance(e, sqlite3.OperationalError):
+                # locked, full or failing disk: worth another try
+                logger.error("Could not write history: %s", e)
+                return False
+            # the rows themselves are at fault, and will be on every try
+            logger.error("Dropped %d history lines: %s", len(records), e)
+        with self._lock:
+            written = set(id(r) for r in records)
+            while self._unwritten and id(self._unwritten[0]) in written:
+                self._unwritten.popleft()
+        self._maybe_rotate(db)
+        return True
+
+    def _clear(self, db: sqlite3.Connection) -> None:
+        try:
+            with db:
+                db.execute("DELETE FROM lines")
+                if self.fts:
+                    db.execute("INSERT INTO lines_fts(lines_fts) VALUES ('delete-all')")
+        except sqlite3.Error as e:
+            logger.error("Could not clear history: %s", e)
+
+    def size(self, db: Optional[sqlite3.Connection] = None) -> int:
+        """Bytes of the database in use, not counting free pages."""
+        db = db or self._db
+        page_size = db.execute("PRAGMA page_size").fetchone()[0]
+        pages = db.execute("PRAGMA page_count").fetchone()[0]
+        free = db.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def _maybe_rotate(self, db: sqlite3.Connection) -> None:
+        if not self.max_bytes:
+            return
+        used = self.size(db)
+        if used <= self.max_bytes:
+            return
+        # prune the oldest rows down to 80% of the limit; freed pages are reused
+        rows = db.execute("SELECT COUNT(*) FROM lines").fetchone()[0]
+        if not rows:
+            return
+        # a row larger than the whole budget takes every row with it
+        drop = min(rows, int(rows * (1.0 - 0.8 * self.max_bytes / used)) + 1)
+        try:
+            with db:
+                db.execute("DELETE FROM lines WHERE id <= (SELECT id FROM lines ORDER BY id "
+                           "LIMIT 1 OFFSET ?)", (drop - 1,))
+            if self.fts:
+                # deletes are only recorded in the index until its segments are merged
+                db.execute("INSERT INTO lines_fts(lines_fts) VALUES ('optimize')")
+        except sqlite3.Error as e:
+            logger.error("Could not rotate history: %s", e)
+            return
+        logger.info("History over %d bytes, pruned %d oldest lines", self.max_bytes, drop)
+
+    def _rows(self, sql: str, args=()) -> List[HistoryRecord]:
+        with self._lock:
+            return [HistoryRecord(*row) for row in self._db.execute(sql, args)]
+
+    def tail(self, k: int) -> List[HistoryRecord]:
+        """The last ``k`` lines, oldest first, including ones still queued."""
+        if k <= 0:
+            return []
+        with self._lock:
+            pending = list(itertools.islice(reversed(self._unwritten), k))[::-1]
+            rows = [HistoryRecord(*row) for row in self._db.execute(
+                "SELECT id, ts, device, text FROM lines ORDER BY id DESC LIMIT ?", (k,))]
+        seen = set(r.id for r in pending)
+        merged = [r for r in reversed(rows) if r.id not in seen] + pending
+        return merged[-k:]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM lines").fetchone()[0] + len(self._unwritten)
+
+    def search(self, text: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None, device=None, limit: int = 100) -> List[HistoryRecord]:
+        """Written lines matching all given filters, newest first.
+
+        ``text`` matches as a phrase through the FTS index, ``since`` and
+        ``until`` are Unix timestamps.
+        """
+        where, args = [], []
+        table = "lines l"
+        if text:
+            if self.fts:
+                table = "lines_fts f JOIN lines l ON l.id = f.rowid"
+                where.append("lines_fts MATCH ?")
+                args.append('"' + text.replace('"', '""') + '"')
+            else:
+                where.append("l.text LIKE ?")
+                args.append('%' + text + '%')
+        if since is not None:
+            where.append("l.ts >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("l.ts < ?")
+            args.append(until)
+        if device is not None:
+            where.append("l.device = ?")
+            args.append(str(device))
+        sql = f"SELECT l.id, l.ts, l.device, l.text FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY l.id DESC LIMIT ?"
+        args.append(limit)
+        return self._rows(sql, args)
+
+    def import_text(self, path: str) -> int:
+        """Append the lines of a plain-text history file, e.g. the old history.txt."""
+        ts = os.path.getmtime(path)
+        n = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    self.append(line, ts=ts)
+                    n += 1
+        return n
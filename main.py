@@ -1,14 +1,25 @@
+import time
+STARTED = time.perf_counter()
+
 import sys
 import logging
-from PySide6.QtWidgets import QApplication
-from overlay import Overlay
+
+logger = logging.getLogger(__name__)
 
 def main():
     """Entry point for the application."""
+    # imported here, as ASR worker processes re-import this module
+    from PySide6.QtCore import QTimer
+    from PySide6.QtWidgets import QApplication
+    from overlay import Overlay
     logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
     app = QApplication(sys.argv)
     overlay = Overlay()
+    # join the capture and ASR threads and write out queued history lines
+    app.aboutToQuit.connect(overlay.shutdown)
     overlay.show()
+    # runs once the event loop has painted the window
+    QTimer.singleShot(0, lambda: logger.info("Window shown after %.2f s", time.perf_counter() - STARTED))
     sys.exit(app.exec())
 
 if __name__ == '__main__':
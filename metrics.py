@@ -0,0 +1,236 @@
+"""In-process latency histograms for the transcription hot path.
+
+Stages time themselves with ``time.perf_counter`` and report to the shared
+``METRICS`` registry, which keeps a fixed-bucket histogram per stage and
+the per-stage time of recently traced segments, plus gauges for values
+that are set rather than timed, like the current partial cadence. A
+segment's trace id is its scheduler key, ``device/segment``. Snapshots can
+be served as Prometheus text or JSON by ``MetricsServer`` or written with
+``dump``.
+
+Setting ``METRICS.enabled = False`` turns every observation into a no-op.
+"""
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Hashable, List, Optional
+
+import constants
+
+logger = logging.getLogger(__name__)
+
+STAGES = (
+    'callback_enqueue',  # device callback: copy into the inbox and signal the loop
+    'audio_q_wait',      # callback signal until the VAD loop picks it up
+    'resample',          # StreamResampler.process per device block
+    'vad',               # speech classification per block of frames
+    'asr_queue_wait',    # job submitted until a worker takes it
+    'wav_write',         # temp WAV files for path-only models
+    'transcribe',        # model.transcribe per batch
+    'text_q_wait',       # result emitted until the UI thread picks it up
+    'ui_render',         # one coalesced caption update on the UI thread
+)
+
+# bucket upper bounds in seconds, four per decade from 10 us to 10 s
+BOUNDS = tuple(1e-5 * 10 ** (i / 4) for i in range(25))
+
+
+def trace_id(key: Hashable) -> str:
+    """Trace id of a scheduler key, ``(device, segment)`` -> ``device/segment``."""
+    return '/'.join(str(k) for k in key) if isinstance(key, tuple) else str(key)
+
+
+class Histogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    def __init__(self) -> None:
+        # the last bucket catches everything above BOUNDS[-1]
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        i = bisect.bisect_left(BOUNDS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += seconds
+            self.count += 1
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside its bucket."""
+        with self._lock:
+            counts, count, top = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                lo = BOUNDS[i - 1] if i else 0.0
+                hi = min(BOUNDS[i], top) if i < len(BOUNDS) else top
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return top
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            count, total, top = self.count, self.total, self.max
+        return {
+            'count': count,
+            'mean_ms': 1000.0 * total / count if count else 0.0,
+            'p50_ms': 1000.0 * self.quantile(0.5),
+            'p90_ms': 1000.0 * self.quantile(0.9),
+            'p99_ms': 1000.0 * self.quantile(0.99),
+            'max_ms': 1000.0 * top,
+        }
+
+
+class Metrics:
+    """Registry of stage histograms and recent segment traces."""
+
+    def __init__(self, enabled: bool = constants.METRICS_ENABLED, max_traces: int = 256) -> None:
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self.histograms: Dict[str, Histogram] = {stage: Histogram() for stage in STAGES}
+        self.traces: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, trace: Optional[Hashable] = None) -> None:
+        if not self.enabled:
+            return
+        hist = self.histograms.get(stage)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(stage, Histogram())
+        hist.observe(seconds)
+        if trace is not None:
+            self.trace(trace, stage, seconds)
+
+    def since(self, stage: str, start: float, trace: Optional[Hashable] = None) -> None:
+        """Record the time elapsed since ``start`` (a perf_counter reading)."""
+        if self.enabled:
+            self.observe(stage, time.perf_counter() - start, trace)
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set the current value of ``name``."""
+        if self.enabled:
+            self.gauges[name] = value
+
+    def trace(self, trace: Hashable, stage: str, seconds: float) -> None:
+        """Add time spent in ``stage`` to a segment's trace only."""
+        if not self.enabled:
+            return
+        tid = trace if isinstance(trace, str) else trace_id(trace)
+        with self._lock:
+            rec = self.traces.get(tid)
+            if rec is None:
+                rec = self.traces[tid] = {}
+                if len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+            rec[stage] = rec.get(stage, 0.0) + seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms = {stage: Histogram() for stage in STAGES}
+            self.traces.clear()
+            self.gauges.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            hists = dict(self.histograms)
+            traces = [{'trace': tid, **{k: round(1000.0 * v, 3) for k, v in rec.items()}}
+                      for tid, rec in self.traces.items()]
+            gauges = dict(self.gauges)
+        return {
+            'time': time.time(),
+            'enabled': self.enabled,
+            'stages': {stage: h.snapshot() for stage, h in hists.items()},
+            'gauges': gauges,
+            'traces_ms': traces,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the stage histograms and gauges."""
+        name = 'transcriber_stage_seconds'
+        lines: List[str] = [f'# HELP {name} Time spent in each pipeline stage.',
+                            f'# TYPE {name} histogram']
+        with self._lock:
+            hists = dict(self.histograms)
+        for stage, h in hists.items():
+            with h._lock:
+                counts, total, count = list(h.counts), h.total, h.count
+            cumulative = 0
+            for bound, n in zip(BOUNDS, counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9g}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+        with self._lock:
+            gauges = dict(self.gauges)
+        for gauge, value in gauges.items():
+            lines.append(f'# TYPE transcriber_{gauge} gauge')
+            lines.append(f'transcriber_{gauge} {value:.9g}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str) -> None:
+        """Write a JSON snapshot atomically."""
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+
+# process-wide registry used by the pipeline
+METRICS = Metrics()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: Metrics = METRICS
+
+    def do_GET(self) -> None:
+        if self.path in ('/', '/metrics'):
+            body = self.registry.prometheus().encode('utf-8')
+            ctype = 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body = json.dumps(self.registry.snapshot()).encode('utf-8')
+            ctype = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        logger.debug("metrics %s", format % args)
+
+
+class MetricsServer:
+    """Serves ``/metrics`` (Prometheus text) and ``/metrics.json`` locally."""
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: Metrics = METRICS) -> None:
+        handler = type('Handler', (_Handler,), {'registry': registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True,
+                                        name='metrics-http')
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._thread.join()
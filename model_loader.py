@@ -0,0 +1,189 @@
+"""Loading the ASR model off the UI thread.
+
+NeMo is only imported when a model is loaded. A copy of the model is kept
+as a ``.nemo`` file in the cache directory and restored from there on
+later starts, which skips the hub lookup; the ONNX backends keep their
+export there too (see ``backends``). A short inference on synthetic
+audio warms the model up before live audio reaches it.
+"""
+import os
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import constants
+import backends
+from asr import ModelRunner
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadTimes:
+    """Seconds spent in each startup step."""
+    source: str = ''
+    import_s: float = 0.0
+    load_s: float = 0.0
+    warmup_s: float = 0.0
+    # loader start until the model is ready for live audio
+    ready_s: float = 0.0
+
+
+def cache_path(name: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, name.replace('/', '__') + '.nemo')
+
+
+def load_model(name: str = constants.MODEL_NAME,
+               cache_dir: Optional[str] = constants.MODEL_CACHE_DIR,
+               backend: str = constants.ASR_BACKEND, threads: int = 0) -> Tuple[object, LoadTimes]:
+    """Load ``name`` for the given inference backend.
+
+    ``threads`` is the number of intra-op threads per inference call,
+    see ``backends.resolve_threads``. The ONNX backends fall back to the
+    matching NeMo one for a model they cannot export.
+    """
+    if backend not in backends.BACKENDS:
+        raise ValueError(f"unknown ASR backend {backend!r}")
+    if backend in (backends.NEMO, backends.NEMO_INT8):
+        model, times = _load_nemo(name, cache_dir)
+        return _torch_model(model, times, backend, threads), times
+    if not cache_dir:
+        raise ValueError(f"the {backend} backend needs a model cache directory")
+    times = LoadTimes()
+    exported = {}
+
+    def load_nemo():
+        model, exported['times'] = _load_nemo(name, cache_dir)
+        exported['model'] = model
+        return model
+
+    start = time.perf_counter()
+    try:
+        path, converted = backends.ensure_onnx(name, cache_dir, backend, load_nemo)
+    except ValueError:
+        model = exported.get('model')
+        if model is None or backends.exportable(model):
+            raise
+        fallback = backends.NEMO_FALLBACK[backend]
+        logger.warning("%s has no CTC head for the %s backend, running it with %s instead",
+                       name, backend, fallback)
+        times = exported['times']
+        return _torch_model(model, times, fallback, threads), times
+    if converted:
+        times.source = 'export'
+        times.import_s = exported['times'].import_s if 'times' in exported else 0.0
+    else:
+        times.source = 'cache'
+    model = backends.OnnxBackend(path, threads)
+    times.load_s = time.perf_counter() - start - times.import_s
+    return model, times
+
+
+def _torch_model(model, times: LoadTimes, backend: str, threads: int):
+    """Prepare a loaded NeMo model for ``backend``, adding any quantization to ``times``."""
+    if backend == backends.NEMO_INT8:
+        start = time.perf_counter()
+        model = backends.quantize_nemo(model)
+        times.load_s += time.perf_counter() - start
+    backends.set_torch_threads(backends.resolve_threads(threads))
+    return model
+
+
+def _load_nemo(name: str, cache_dir: Optional[str]) -> Tuple[object, LoadTimes]:
+    """Restore ``name`` from the local cache, or fetch it and fill the cache."""
+    times = LoadTimes()
+    start = time.perf_counter()
+    import nemo.collections.asr as nemo_asr
+    times.import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = None
+    path = cache_path(name, cache_dir) if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            model = nemo_asr.models.ASRModel.restore_from(path)
+            times.source = 'cache'
+        except Exception as e:
+            logger.warning("Could not restore cached model %s, fetching it again: %s", path, e)
+    if model is None:
+        model = nemo_asr.models.ASRModel.from_pretrained(model_name=name)
+        times.source = 'pretrained'
+        if path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                # save under a temporary name so a half-written file is never restored
+                model.save_to(path + '.tmp')
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                logger.warning("Could not cache model to %s: %s", path, e)
+    times.load_s = time.perf_counter() - start
+    return model, times
+
+
+def warm_up(model, seconds: float = constants.WARMUP_SECONDS) -> float:
+    """Run one inference on synthetic audio; returns the seconds it took."""
+    from sources import synthesize
+    audio = synthesize(constants.TARGET_RATE, [(0.2, 'silence'), (seconds, 'tone'), (0.2, 'silence')])
+    start = time.perf_counter()
+    ModelRunner(model).transcribe([audio])
+    return time.perf_counter() - start
+
+
+class ModelLoader(threading.Thread):
+    """Loads and warms up a model in the background.
+
+    Calls ``done(model, times, None)`` when the model is ready, or
+    ``done(None, None, error)`` if loading failed. ``factory``, if given,
+    replaces ``load_model``, e.g. to supply a stub model. With
+    ``processes`` the model is an ``ASRProcessPool`` of that many worker
+    processes, each loading and warming up its own replica, pinned to its
+    share of the cores with ``pin_cores``; ``factory`` must then be
+    picklable.
+    """
+
+    def __init__(self, done: Callable, name: str = constants.MODEL_NAME,
+                 cache_dir: Optional[str] = constants.MODEL_CACHE_DIR,
+                 warmup_s: float = constants.WARMUP_SECONDS,
+                 factory: Optional[Callable[[], object]] = None,
+                 backend: str = constants.ASR_BACKEND, threads: int = 0,
+                 processes: int = 0, pin_cores: bool = constants.ASR_PIN_CORES) -> None:
+        super().__init__(daemon=True, name='model-loader')
+        self.done = done
+        self.model_name = name
+        self.cache_dir = cache_dir
+        self.backend = backend
+        self.threads = threads
+        self.warmup_s = warmup_s
+        self.factory = factory
+        self.processes = processes
+        self.pin_cores = pin_cores
+
+    def run(self) -> None:
+        start = time.perf_counter()
+        try:
+            if self.processes:
+                from asr_pool import ASRProcessPool, model_factory
+                factory = self.factory or model_factory(self.model_name, self.cache_dir,
+                                                        self.backend, self.threads)
+                model = ASRProcessPool(factory, self.processes, self.warmup_s,
+                                       pin_cores=self.pin_cores)
+                times = model.times
+            elif self.factory is not None:
+                model = self.factory()
+                times = LoadTimes('factory', load_s=time.perf_counter() - start)
+            else:
+                model, times = load_model(self.model_name, self.cache_dir, self.backend,
+                                          self.threads)
+            if self.warmup_s > 0 and not self.processes:
+                times.warmup_s = warm_up(model, self.warmup_s)
+            times.ready_s = time.perf_counter() - start
+        except Exception as e:
+            logger.exception("Could not load model %s", self.model_name)
+            self.done(None, None, e)
+            return
+        logger.info("Model %s (%s) ready in %.2f s (%s: import %.2f s, load %.2f s, "
+                    "warm-up %.2f s)", self.model_name, self.backend, times.ready_s, times.source,
+                    times.import_s, times.load_s, times.warmup_s)
+        self.done(model, times, None)
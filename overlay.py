@@ -1,15 +1,21 @@
 import os
-import queue
-import sounddevice as sd
-import nemo.collections.asr as nemo_asr
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QPlainTextEdit, QDialog, QListWidget, QAbstractItemView, QDialogButtonBox, QMenu, QSpinBox, QFormLayout, QDoubleSpinBox, QFontComboBox, QLineEdit
-from PySide6.QtCore import Qt, QTimer
+from collections import deque
+from itertools import islice
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QDialog, QListWidget, QAbstractItemView, QDialogButtonBox, QMenu, QSpinBox, QFormLayout, QDoubleSpinBox, QFontComboBox, QLineEdit, QCheckBox, QComboBox
+from PySide6.QtCore import Qt, QTimer, Signal
 from PySide6.QtGui import QAction, QFont
 
 import logging
 import settings
 import constants
-from transcriber import VADTranscriber
+from transcriber import PipelineConfig, VADTranscriber
+from ringbuffer import OVERLOAD_POLICIES
+from vad import ENGINES
+from metrics import METRICS, MetricsServer
+from history import HistoryStore
+from transcript_view import FrameCoalescer, ResultQueue, TranscriptView
+from model_loader import ModelLoader
+from backends import BACKENDS, resolve_threads
 
 logging.basicConfig(level=logging.WARNING)
 logger = logging.getLogger(__name__)
@@ -23,6 +29,7 @@ class InputDeviceDialog(QDialog):
 
         self.list_widget = QListWidget()
         self.list_widget.setSelectionMode(QAbstractItemView.SingleSelection)
+        import sounddevice as sd
         for idx, dev in enumerate(sd.query_devices()):
             if dev['max_input_channels'] > 0:
                 self.list_widget.addItem(f"{dev['name']} (#{idx})")
@@ -50,6 +57,10 @@ class ConfigDialog(QDialog):
         self.histSpin.setRange(1, 500)
         self.histSpin.setValue(settings.history_lines)
         layout.addRow("History Lines:", self.histSpin)
+        self.histSizeSpin = QSpinBox()
+        self.histSizeSpin.setRange(1, 100000)
+        self.histSizeSpin.setValue(settings.history_max_mb)
+        layout.addRow("History Max MB:", self.histSizeSpin)
         self.clearSpin = QSpinBox()
         self.clearSpin.setRange(100, 10000)
         self.clearSpin.setValue(settings.clear_timeout)
@@ -58,6 +69,14 @@ class ConfigDialog(QDialog):
         self.vadSpin.setRange(0, 3)
         self.vadSpin.setValue(settings.vad_mode)
         layout.addRow("VAD Mode:", self.vadSpin)
+        self.vadEngineCombo = QComboBox()
+        self.vadEngineCombo.addItems(list(ENGINES))
+        self.vadEngineCombo.setCurrentText(settings.vad_engine)
+        layout.addRow("VAD Engine:", self.vadEngineCombo)
+        self.gateSpin = QSpinBox()
+        self.gateSpin.setRange(0, 32767)
+        self.gateSpin.setValue(settings.vad_gate_level)
+        layout.addRow("VAD Gate Level (0 = off):", self.gateSpin)
         self.frameSpin = QSpinBox()
         self.frameSpin.setRange(1, 1000)
         self.frameSpin.setValue(settings.frame_ms)
@@ -70,6 +89,22 @@ class ConfigDialog(QDialog):
         self.partSpin.setRange(1, 10000)
         self.partSpin.setValue(settings.partial_interval_ms)
         layout.addRow("Partial Interval Ms:", self.partSpin)
+        self.partAdaptCheck = QCheckBox()
+        self.partAdaptCheck.setChecked(settings.partial_adaptive)
+        layout.addRow("Adapt Partials to ASR Load:", self.partAdaptCheck)
+        self.partMinSpin = QSpinBox()
+        self.partMinSpin.setRange(1, 10000)
+        self.partMinSpin.setValue(settings.partial_min_ms)
+        layout.addRow("Partial Min Ms:", self.partMinSpin)
+        self.partMaxSpin = QSpinBox()
+        self.partMaxSpin.setRange(1, 60000)
+        self.partMaxSpin.setValue(settings.partial_max_ms)
+        layout.addRow("Partial Max Ms:", self.partMaxSpin)
+        self.partTargetSpin = QDoubleSpinBox()
+        self.partTargetSpin.setRange(0.05, 1.0)
+        self.partTargetSpin.setSingleStep(0.05)
+        self.partTargetSpin.setValue(settings.partial_target_util)
+        layout.addRow("ASR Target Utilization:", self.partTargetSpin)
         self.minFrameSpin = QSpinBox()
         self.minFrameSpin.setRange(1, 10000)
         self.minFrameSpin.setValue(settings.min_frames)
@@ -78,6 +113,59 @@ class ConfigDialog(QDialog):
         self.maxFrameSpin.setRange(1, 100000)
         self.maxFrameSpin.setValue(settings.max_frames)
         layout.addRow("Max Frames:", self.maxFrameSpin)
+        self.chunkSpin = QSpinBox()
+        self.chunkSpin.setRange(0, 60000)
+        self.chunkSpin.setValue(settings.stream_chunk_ms)
+        layout.addRow("Stream Chunk Ms (0 = off):", self.chunkSpin)
+        self.contextSpin = QSpinBox()
+        self.contextSpin.setRange(0, 10000)
+        self.contextSpin.setValue(settings.stream_context_ms)
+        layout.addRow("Stream Context Ms:", self.contextSpin)
+        self.workerSpin = QSpinBox()
+        self.workerSpin.setRange(1, 64)
+        self.workerSpin.setValue(settings.asr_workers)
+        layout.addRow("ASR Workers:", self.workerSpin)
+        self.batchSpin = QSpinBox()
+        self.batchSpin.setRange(1, 256)
+        self.batchSpin.setValue(settings.asr_max_batch)
+        layout.addRow("ASR Max Batch:", self.batchSpin)
+        self.waitSpin = QSpinBox()
+        self.waitSpin.setRange(0, 1000)
+        self.waitSpin.setValue(settings.asr_max_wait_ms)
+        layout.addRow("ASR Max Wait Ms:", self.waitSpin)
+        self.prerollSpin = QSpinBox()
+        self.prerollSpin.setRange(0, 2000)
+        self.prerollSpin.setValue(settings.preroll_ms)
+        layout.addRow("Pre-roll Ms:", self.prerollSpin)
+        self.queueSpin = QSpinBox()
+        self.queueSpin.setRange(2, 10000)
+        self.queueSpin.setValue(settings.audio_queue_frames)
+        layout.addRow("Audio Queue Frames:", self.queueSpin)
+        self.policyCombo = QComboBox()
+        self.policyCombo.addItems(OVERLOAD_POLICIES)
+        self.policyCombo.setCurrentText(settings.overload_policy)
+        layout.addRow("Overload Policy:", self.policyCombo)
+        self.backendCombo = QComboBox()
+        self.backendCombo.addItems(BACKENDS)
+        self.backendCombo.setCurrentText(settings.asr_backend)
+        layout.addRow("ASR Backend:", self.backendCombo)
+        self.threadSpin = QSpinBox()
+        self.threadSpin.setRange(0, 256)
+        self.threadSpin.setValue(settings.asr_threads)
+        layout.addRow("ASR Threads (0 = auto):", self.threadSpin)
+        self.processCheck = QCheckBox()
+        self.processCheck.setChecked(settings.asr_processes)
+        layout.addRow("ASR Worker Processes:", self.processCheck)
+        self.pinCheck = QCheckBox()
+        self.pinCheck.setChecked(settings.asr_pin_cores)
+        layout.addRow("Pin ASR Processes to Cores:", self.pinCheck)
+        self.metricsCheck = QCheckBox()
+        self.metricsCheck.setChecked(settings.metrics_enabled)
+        layout.addRow("Stage Metrics:", self.metricsCheck)
+        self.metricsPortSpin = QSpinBox()
+        self.metricsPortSpin.setRange(0, 65535)
+        self.metricsPortSpin.setValue(settings.metrics_port)
+        layout.addRow("Metrics Port (0 = off):", self.metricsPortSpin)
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
         buttons.rejected.connect(self.reject)
@@ -87,13 +175,34 @@ class ConfigDialog(QDialog):
         return {
             'max_lines': self.maxSpin.value(),
             'history_lines': self.histSpin.value(),
+            'history_max_mb': self.histSizeSpin.value(),
             'clear_timeout': self.clearSpin.value(),
             'vad_mode': self.vadSpin.value(),
+            'vad_engine': self.vadEngineCombo.currentText(),
+            'vad_gate_level': self.gateSpin.value(),
             'frame_ms': self.frameSpin.value(),
             'max_silence_ms': self.maxSilSpin.value(),
             'partial_interval_ms': self.partSpin.value(),
+            'partial_adaptive': self.partAdaptCheck.isChecked(),
+            'partial_min_ms': self.partMinSpin.value(),
+            'partial_max_ms': self.partMaxSpin.value(),
+            'partial_target_util': self.partTargetSpin.value(),
             'min_frames': self.minFrameSpin.value(),
-            'max_frames': self.maxFrameSpin.value()
+            'max_frames': self.maxFrameSpin.value(),
+            'stream_chunk_ms': self.chunkSpin.value(),
+            'stream_context_ms': self.contextSpin.value(),
+            'asr_workers': self.workerSpin.value(),
+            'asr_max_batch': self.batchSpin.value(),
+            'asr_max_wait_ms': self.waitSpin.value(),
+            'preroll_ms': self.prerollSpin.value(),
+            'audio_queue_frames': self.queueSpin.value(),
+            'overload_policy': self.policyCombo.currentText(),
+            'asr_backend': self.backendCombo.currentText(),
+            'asr_threads': self.threadSpin.value(),
+            'asr_processes': self.processCheck.isChecked(),
+            'asr_pin_cores': self.pinCheck.isChecked(),
+            'metrics_enabled': self.metricsCheck.isChecked(),
+            'metrics_port': self.metricsPortSpin.value()
         }
 
 class AppearanceDialog(QDialog):
@@ -134,31 +243,93 @@ class AppearanceDialog(QDialog):
         }
 
 class Overlay(QWidget):
-    def __init__(self):
+    # (model, LoadTimes, error) from the loader thread
+    model_ready = Signal(object, object, object)
+
+    def __init__(self, factory=None, sources=None, history_db=constants.HISTORY_DB):
+        """``factory``, ``sources`` and ``history_db`` stand in for the model, the
+        input devices and the history file, e.g. in a soak test."""
         super().__init__()
         self.settings = settings.load_settings()
-        self.text_q = queue.Queue()
+        self.factory = factory
+        self.sources = sources
+        # results arrive from ASR worker threads as queued signals
+        self.text_q = ResultQueue(self)
+        self.text_q.ready.connect(self._on_results, Qt.QueuedConnection)
         self.transcriber = None
         self.current = None
         self.show_history = False
         self.devices = []
-        self.history_lines = []
+        # the newest finals, for redraws and the history view
+        self.history_lines = deque(maxlen=self.settings.history_lines)
+        self.partials = {}
         self.partial_text = ""
+        self.new_finals = []
+        self.metrics_server = None
+        self.history = self._open_history(history_db)
         self._setup_ui()
+        self._apply_metrics()
 
-        self.asr_model = nemo_asr.models.ASRModel.from_pretrained(model_name=constants.MODEL_NAME)
-        # restore input device
-        saved_dev = self.settings.input_device
-        default = sd.default.device
-        fallback = default[0] if isinstance(default, (list, tuple)) else default
-        self._restart_transcriber([saved_dev if saved_dev is not None else fallback])
         # apply appearance settings
         self._apply_appearance()
 
         self.clear_timer = QTimer(self)
         self.clear_timer.setSingleShot(True)
         self.clear_timer.timeout.connect(self._clear)
-        self._start_poll()
+        self.renderer = FrameCoalescer(self, self._render_updates)
+
+        # the window shows right away; capture starts once the model is warm
+        self.asr_model = None
+        self.text.setPlainText("Loading speech model...")
+        self.model_ready.connect(self._on_model_ready, Qt.QueuedConnection)
+        self._load_model()
+
+    def _model_options(self):
+        # a process pool has one model replica per ASR worker
+        processes = self.settings.asr_workers if self.settings.asr_processes else 0
+        pin = bool(processes) and self.settings.asr_pin_cores
+        threads = self.settings.asr_threads
+        if not pin:
+            # a pinned replica takes 0 as one thread per core of its own
+            threads = resolve_threads(threads, self.settings.asr_workers)
+        return (self.settings.asr_backend, threads, processes, pin)
+
+    def _load_model(self):
+        self.model_options = self._model_options()
+        backend, threads, processes, pin = self.model_options
+        self.loader = ModelLoader(self.model_ready.emit, constants.MODEL_NAME,
+                                  self.settings.model_cache_dir or None, factory=self.factory,
+                                  backend=backend, threads=threads, processes=processes,
+                                  pin_cores=pin)
+        self.loader.start()
+
+    def _resize_model(self, options):
+        """Resize the process pool in place if only its size changed."""
+        old = self.model_options
+        if (self.loader.is_alive() or not hasattr(self.asr_model, 'resize')
+                or not old[2] or not options[2]
+                or old[:2] + old[3:] != options[:2] + options[3:]):
+            return False
+        self.asr_model.resize(options[2])
+        self.model_options = options
+        return True
+
+    def _on_model_ready(self, model, times, error):
+        if error is not None:
+            self.text.setPlainText(f"Could not load speech model: {error}")
+            return
+        old, self.asr_model = self.asr_model, model
+        self.text.clear()
+        # restore input device
+        saved_dev = self.settings.input_device
+        if saved_dev is None and self.sources is None:
+            import sounddevice as sd
+            default = sd.default.device
+            saved_dev = default[0] if isinstance(default, (list, tuple)) else default
+        self._restart_transcriber(self.devices or [saved_dev])
+        if old is not None and hasattr(old, 'close'):
+            # worker processes of the replaced pool
+            old.close()
 
     def _setup_ui(self):
         self.setWindowFlags(
@@ -173,7 +344,7 @@ class Overlay(QWidget):
 
         font = self.font()
         font.setPointSize(16)
-        self.text = QPlainTextEdit(readOnly=True)
+        self.text = TranscriptView()
         self.text.setFont(font)
         self.text.setStyleSheet("background:rgba(0,0,0,0.7); color:white; border:none;")
         self.text.document().setMaximumBlockCount(self.settings.max_lines)
@@ -215,17 +386,14 @@ class Overlay(QWidget):
                 self.clear_timer.stop()
                 self.text.document().setMaximumBlockCount(self.settings.history_lines + 1)
                 self._load_history_lines()
-                self._render_history()
+                self._render()
             else:
                 self.text.document().setMaximumBlockCount(self.settings.max_lines)
                 self.clear_timer.start(self.settings.clear_timeout)
-                self._render_live()
+                self._render()
         elif action == clear_hist_act:
-            try:
-                os.remove(constants.HISTORY_FILE)
-            except:
-                pass
-            self.history_lines = []
+            self.history.clear()
+            self.history_lines.clear()
             self.text.clear()
         elif action == config_act:
             dlg = ConfigDialog(self, self.settings)
@@ -243,60 +411,119 @@ class Overlay(QWidget):
         h = self.text.fontMetrics().lineSpacing() * self.settings.max_lines + 24
         self.resize(480, h)
         self.clear_timer.setInterval(self.settings.clear_timeout)
-        self._restart_transcriber(self.devices)
+        if self.history_lines.maxlen != self.settings.history_lines:
+            self.history_lines = deque(self.history_lines, maxlen=self.settings.history_lines)
+        self.history.max_bytes = self.settings.history_max_mb * 1024 * 1024
+        self._apply_metrics()
+        self._reconfigure_transcriber()
+        options = self._model_options()
+        if options != self.model_options and not self._resize_model(options):
+            # the current model keeps transcribing until the new one is ready
+            self._load_model()
         settings.save_settings(self.settings)
         # reload history view if enabled after config changes
         if self.show_history:
             self.clear_timer.stop()
             self.text.document().setMaximumBlockCount(self.settings.history_lines + 1)
             self._load_history_lines()
-            self._render_history()
+            self._render()
         else:
             self.text.document().setMaximumBlockCount(self.settings.max_lines)
             self.clear_timer.start(self.settings.clear_timeout)
-            self._render_live()
+            self._render()
 
-    def _load_history_lines(self):
-        self.history_lines = []
-        if os.path.exists(constants.HISTORY_FILE):
+    def _open_history(self, path):
+        store = HistoryStore(path, self.settings.history_max_mb * 1024 * 1024)
+        # carry over the plain-text history of older versions once
+        if (path == constants.HISTORY_DB and os.path.exists(constants.HISTORY_FILE)
+                and not store.count()):
             try:
-                with open(constants.HISTORY_FILE, 'r', encoding='utf-8') as f:
-                    lines = f.read().splitlines()
-                self.history_lines = lines[-self.settings.history_lines:]
-            except Exception as e:
-                logger.error("Could not load history: %s", e)
+                store.import_text(constants.HISTORY_FILE)
+                os.replace(constants.HISTORY_FILE, constants.HISTORY_FILE + '.imported')
+            except OSError as e:
+                logger.error("Could not import history: %s", e)
+        return store
 
-    def _render_history(self):
-        self.text.clear()
-        for line in self.history_lines:
-            self.text.appendPlainText(line)
-        self.text.appendPlainText(self.partial_text)
+    def _load_history_lines(self):
+        try:
+            lines = [r.text for r in self.history.tail(self.settings.history_lines)]
+        except Exception as e:
+            logger.error("Could not load history: %s", e)
+            lines = []
+        self.history_lines = deque(lines, maxlen=self.settings.history_lines)
 
-    def _render_live(self):
-        self.text.clear()
+    def _shown_lines(self):
+        """Finals a full redraw of the current mode shows above the partial."""
+        if self.show_history:
+            return self.history_lines
         num_hist = self.settings.max_lines - 1 if self.partial_text else self.settings.max_lines
-        hist_to_show = self.history_lines[-num_hist:] if num_hist > 0 else []
-        for line in hist_to_show:
-            self.text.appendPlainText(line)
-        if self.partial_text:
-            self.text.appendPlainText(self.partial_text)
+        start = max(0, len(self.history_lines) - num_hist)
+        return list(islice(self.history_lines, start, None)) if num_hist > 0 else []
+
+    def _render(self):
+        self.new_finals = []
+        self.text.show_lines(self._shown_lines(), self.partial_text)
 
     def _choose_inputs(self):
         dlg = InputDeviceDialog(self)
         if dlg.exec() == QDialog.Accepted:
             new_dev = dlg.selected_device()
             if new_dev is not None:
-                self._restart_transcriber([new_dev])
+                self._set_inputs([new_dev])
+
+    def _transcriber_running(self):
+        return self.transcriber is not None and self.transcriber.is_alive()
+
+    def _pipeline_config(self):
+        s = self.settings
+        return PipelineConfig.from_ms(s.vad_mode, s.frame_ms, s.max_silence_ms, s.partial_interval_ms,
+                                      s.min_frames, s.max_frames, s.stream_chunk_ms,
+                                      s.stream_context_ms, s.preroll_ms, s.audio_queue_frames,
+                                      s.overload_policy, s.vad_engine, s.vad_gate_level,
+                                      s.partial_adaptive, s.partial_min_ms, s.partial_max_ms,
+                                      s.partial_target_util)
+
+    def _reconfigure_transcriber(self):
+        if not self._transcriber_running():
+            self._restart_transcriber(self.devices)
+            return
+        # applied by the running pipelines; captions and queued results are kept
+        self.transcriber.reconfigure(self._pipeline_config(), self.settings.asr_workers,
+                                     self.settings.asr_max_batch, self.settings.asr_max_wait_ms)
+
+    def _set_inputs(self, devices):
+        if not self._transcriber_running():
+            self._restart_transcriber(devices)
+            return
+        self.transcriber.set_devices(devices)
+        self.devices = devices
+        # persist selected input device
+        self.settings.input_device = devices[0]
+        settings.save_settings(self.settings)
+
+    def shutdown(self):
+        """Stop capture and transcription, then write out the history."""
+        if self.transcriber:
+            self.transcriber.stop()
+            self.transcriber = None
+        if self.asr_model is not None and hasattr(self.asr_model, 'close'):
+            self.asr_model.close()
+        self.history.close()
 
     def _restart_transcriber(self, devices):
+        if self.asr_model is None:
+            # still loading; the chosen devices are used once it is ready
+            self.devices = devices
+            return
         if self.transcriber:
             self.transcriber.stop()
-        with self.text_q.mutex:
-            self.text_q.queue.clear()
+        self.text_q.clear()
         self.text.clear()
+        self.new_finals = []
         self.current = None
         self.devices = devices
-        self.history_lines = []
+        self.history_lines.clear()
+        self.partials = {}
         self.partial_text = ""
         self.transcriber = VADTranscriber(
             self.text_q,
@@ -307,12 +534,40 @@ class Overlay(QWidget):
             self.settings.max_silence_ms,
             self.settings.partial_interval_ms,
             self.settings.min_frames,
-            self.settings.max_frames
+            self.settings.max_frames,
+            self.settings.stream_chunk_ms,
+            self.settings.stream_context_ms,
+            self.settings.asr_workers,
+            self.settings.asr_max_batch,
+            self.settings.asr_max_wait_ms,
+            self.settings.preroll_ms,
+            self.settings.audio_queue_frames,
+            self.settings.overload_policy,
+            self.settings.vad_engine,
+            self.settings.vad_gate_level,
+            self.settings.partial_adaptive,
+            self.settings.partial_min_ms,
+            self.settings.partial_max_ms,
+            self.settings.partial_target_util,
+            sources=self.sources
         )
         self.transcriber.start()
-        # persist selected input device
-        self.settings.input_device = devices[0]
-        settings.save_settings(self.settings)
+        if self.sources is None:
+            # persist selected input device
+            self.settings.input_device = devices[0]
+            settings.save_settings(self.settings)
+
+    def _apply_metrics(self):
+        METRICS.enabled = self.settings.metrics_enabled
+        port = self.settings.metrics_port if self.settings.metrics_enabled else 0
+        if self.metrics_server and self.metrics_server.port != port:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if port and not self.metrics_server:
+            try:
+                self.metrics_server = MetricsServer(port)
+            except OSError as e:
+                logger.error("Could not serve metrics on port %d: %s", port, e)
 
     def _apply_appearance(self):
         # update font size and window opacity
@@ -326,41 +581,37 @@ class Overlay(QWidget):
         color = self.settings.appearance.text_color
         self.text.setStyleSheet(f"background:{bg}; color:{color}; border:none;")
 
-    def _start_poll(self):
-        timer = QTimer(self)
-        timer.timeout.connect(self._poll)
-        timer.start(100)
-
-    def _append_history(self, text: str) -> None:
+    def _append_history(self, text: str, device=None) -> None:
         self.history_lines.append(text)
-        if len(self.history_lines) > self.settings.history_lines:
-            self.history_lines.pop(0)
-        try:
-            with open(constants.HISTORY_FILE, 'a', encoding='utf-8') as f:
-                f.write(text + '\n')
-        except Exception as e:
-            logger.error("Could not write history: %s", e)
+        # written by the store's background thread
+        self.history.append(text, device)
 
-    def _poll(self):
+    def _on_results(self):
         updated = False
-        while not self.text_q.empty():
-            item = self.text_q.get()
+        for item in self.text_q.drain():
+            METRICS.since('text_q_wait', item['emitted'], item['trace'])
             txt, final, seg = item['text'], item['final'], item['id']
             txt = ' '.join(txt.split())
+            # each input keeps its own in-progress line
+            dev = item.get('device')
             if final:
-                self._append_history(txt)
-                self.partial_text = ''
+                self._append_history(txt, dev)
+                self.new_finals.append(txt)
+                self.partials.pop(dev, None)
             else:
-                self.partial_text = txt
+                self.partials[dev] = txt
                 self.current = seg
+            self.partial_text = ' '.join(p for p in self.partials.values() if p)
             updated = True
         if updated:
-            if self.show_history:
-                self._render_history()
-            else:
-                self._render_live()
-            self.clear_timer.stop()
-            self.clear_timer.start(self.settings.clear_timeout)
+            # bursts of results are drawn once per display frame
+            self.renderer.request()
+
+    def _render_updates(self):
+        finals, self.new_finals = self.new_finals, []
+        self.text.apply(finals, self.partial_text, self._shown_lines)
+        self.clear_timer.stop()
+        self.clear_timer.start(self.settings.clear_timeout)
 
     def _clear(self):
         if not self.show_history:
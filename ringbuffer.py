@@ -0,0 +1,223 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+import constants
+
+
+DROP_OLDEST = 'drop-oldest'
+DROP_SILENCE = 'drop-silence'
+BLOCK = 'block'
+OVERLOAD_POLICIES = (DROP_OLDEST, DROP_SILENCE, BLOCK)
+
+
+class FrameRing:
+    """Preallocated single-producer/single-consumer queue of int16 frames.
+
+    The audio callback copies each block into free slots with ``push``;
+    the consumer reads the oldest slot in place with ``peek`` and frees it
+    with ``advance`` once done, so no per-frame arrays are allocated.
+
+    When a block arrives and the ring is full, ``policy`` decides what is
+    lost: ``drop-oldest`` evicts the oldest waiting frames,
+    ``drop-silence`` first evicts waiting frames whose level is below
+    ``silence_level``, shortening each pause to ``keep_quiet`` frames so
+    segment boundaries survive, and then the oldest, and ``block`` waits up to
+    ``block_timeout`` seconds for the consumer before dropping the new
+    block. The frame being read is never evicted. ``overruns`` counts
+    pushes that found the ring full and ``dropped`` the frames lost.
+    """
+
+    def __init__(self, slots: int, frame_len: int, policy: str = constants.OVERLOAD_POLICY,
+                 silence_level: float = constants.SILENCE_LEVEL, keep_quiet: int = 0,
+                 block_timeout: float = 0.1) -> None:
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"unknown overload policy {policy!r}")
+        self.frames = np.zeros((slots, frame_len), dtype=np.int16)
+        self.lengths = np.zeros(slots, dtype=np.int64)
+        self.quiet = np.zeros(slots, dtype=bool)
+        self.slots = slots
+        self.frame_len = frame_len
+        self.policy = policy
+        # mean square level below which a frame counts as silence
+        self.quiet_energy = float(silence_level) ** 2
+        self.keep_quiet = keep_quiet
+        self.block_timeout = block_timeout
+        self.head = 0  # next slot to write
+        self.tail = 0  # next slot to read
+        self.reading = False  # the slot before ``tail`` is still being read
+        self.overruns = 0
+        self.dropped = 0
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return self.head - self.tail + self.reading
+
+    def _free(self) -> int:
+        return self.slots - (self.head - self.tail) - self.reading
+
+    def push(self, pcm: np.ndarray, timeout: Optional[float] = None) -> bool:
+        """Store a block, splitting it over as many slots as needed.
+
+        The block is stored whole or not at all. Without a timeout a full
+        ring applies the overload policy. With one the producer just waits
+        up to ``timeout`` seconds for room and returns False if there is
+        none, counting nothing, so a replaying producer can retry.
+        """
+        needed = max(1, -(-len(pcm) // self.frame_len))
+        with self._cond:
+            if self._free() < needed:
+                if timeout is not None:
+                    if not self._cond.wait_for(lambda: self._free() >= needed, timeout):
+                        return False
+                elif not self._make_room(needed):
+                    return False
+            head = self.head
+        for i, pos in enumerate(range(0, max(1, len(pcm)), self.frame_len)):
+            part = pcm[pos:pos + self.frame_len]
+            slot = (head + i) % self.slots
+            self.frames[slot, :len(part)] = part
+            self.lengths[slot] = len(part)
+            if self.policy == DROP_SILENCE:
+                energy = np.einsum('i,i->', part, part, dtype=np.float64) / max(1, len(part))
+                self.quiet[slot] = energy < self.quiet_energy
+        with self._cond:
+            self.head = head + needed
+        return True
+
+    def _make_room(self, needed: int) -> bool:
+        """Apply the overload policy; called with the lock held."""
+        self.overruns += 1
+        if self.policy == BLOCK:
+            self._cond.wait_for(lambda: self._free() >= needed, self.block_timeout)
+        elif needed <= self.slots - self.reading:
+            if self.policy == DROP_SILENCE:
+                # evict a batch of quiet frames so the compaction is not
+                # repeated on every push while overloaded
+                self._drop_quiet(max(needed - self._free(), self.slots // 4))
+            short = needed - self._free()
+            if short > 0:
+                if self.reading:
+                    # the slot before ``tail`` is being read: move the frames
+                    # that stay down over the dropped ones instead of past it
+                    keep = np.arange(self.tail + short, self.head) % self.slots
+                    dest = (self.tail + np.arange(len(keep))) % self.slots
+                    self.frames[dest] = self.frames[keep]
+                    self.lengths[dest] = self.lengths[keep]
+                    self.quiet[dest] = self.quiet[keep]
+                    self.head -= short
+                else:
+                    self.tail += short
+                self.dropped += short
+        if self._free() < needed:
+            self.dropped += needed
+            return False
+        return True
+
+    def _drop_quiet(self, count: int) -> None:
+        """Remove up to ``count`` of the oldest droppable quiet frames, keeping order."""
+        idx = np.arange(self.tail, self.head)
+        quiet = self.quiet[idx % self.slots]
+        # position of each quiet frame within its run of quiet frames
+        run = np.cumsum(quiet)
+        run -= np.maximum.accumulate(np.where(quiet, 0, run))
+        drop = np.flatnonzero(run > self.keep_quiet)[:count]
+        if not len(drop):
+            return
+        keep = np.delete(idx, drop) % self.slots
+        dest = (self.tail + np.arange(len(keep))) % self.slots
+        self.frames[dest] = self.frames[keep]
+        self.lengths[dest] = self.lengths[keep]
+        self.quiet[dest] = self.quiet[keep]
+        self.head = self.tail + len(keep)
+        self.dropped += len(drop)
+
+    def configure(self, policy: str, keep_quiet: int) -> None:
+        """Change the overload policy while the ring is in use."""
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"unknown overload policy {policy!r}")
+        with self._cond:
+            if policy == DROP_SILENCE and self.policy != DROP_SILENCE:
+                # levels of frames already waiting were never measured
+                self.quiet[:] = False
+            self.policy = policy
+            self.keep_quiet = keep_quiet
+            self._cond.notify_all()
+
+    def peek(self) -> Optional[np.ndarray]:
+        """View of the oldest unread frame, valid until ``advance``."""
+        with self._cond:
+            if not self.reading:
+                if self.head == self.tail:
+                    return None
+                # claim the slot so the producer cannot evict it mid-read
+                self.tail += 1
+                self.reading = True
+            slot = (self.tail - 1) % self.slots
+        return self.frames[slot, :self.lengths[slot]]
+
+    def advance(self) -> None:
+        with self._cond:
+            self.reading = False
+            self._cond.notify()
+
+
+class SampleRing:
+    """Preallocated int16 sample buffer addressed by absolute sample position.
+
+    Writes append at ``end``; the last ``capacity`` samples stay readable.
+    ``view`` returns a zero-copy slice when the span does not wrap, and
+    ``read`` returns a single owned copy for handing audio to other threads.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = 0
+        # nothing before this was kept through a resize
+        self.floor = 0
+
+    @property
+    def start(self) -> int:
+        """Oldest position still held."""
+        return max(self.floor, self.end - self.capacity)
+
+    def resize(self, capacity: int) -> None:
+        """Reallocate, keeping the newest samples at their positions."""
+        if capacity == self.capacity:
+            return
+        end = self.end
+        keep = self.read(max(self.start, end - capacity), end)
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.end = self.floor = end - len(keep)
+        self.write(keep)
+
+    def write(self, pcm: np.ndarray) -> None:
+        n = len(pcm)
+        if n >= self.capacity:
+            pcm = pcm[n - self.capacity:]
+            self.end += n - self.capacity
+            n = self.capacity
+        pos = self.end % self.capacity
+        first = min(n, self.capacity - pos)
+        self.data[pos:pos + first] = pcm[:first]
+        if first < n:
+            self.data[:n - first] = pcm[first:]
+        self.end += n
+
+    def _check(self, start: int, stop: int) -> None:
+        if start < self.start or stop > self.end or start > stop:
+            raise IndexError(f"samples {start}:{stop} not held (have {self.start}:{self.end})")
+
+    def view(self, start: int, stop: int) -> np.ndarray:
+        self._check(start, stop)
+        a, b = start % self.capacity, stop % self.capacity
+        if stop - start == 0 or a < b or b == 0:
+            return self.data[a:a + stop - start]
+        return np.concatenate((self.data[a:], self.data[:b]))
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        data = self.view(start, stop)
+        return data.copy() if data.base is self.data else data
@@ -0,0 +1,300 @@
+import time
+import threading
+import logging
+from collections import deque, OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+import constants
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+PARTIAL = 'partial'
+FINAL = 'final'
+CHUNK = 'chunk'
+
+
+@dataclass
+class ASRJob:
+    key: Hashable
+    audio: np.ndarray
+    kind: str
+    # called with the transcript, or None if inference failed
+    callback: Callable[[Optional[str]], None]
+    seq: int = 0
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+def _owner(key: Hashable) -> Hashable:
+    """Stream a job belongs to; keys are (stream, segment) tuples."""
+    return key[0] if isinstance(key, tuple) else key
+
+
+def _round_robin(jobs: List[ASRJob], n: int) -> List[ASRJob]:
+    """Pick up to n jobs, one per stream per pass, oldest first within a stream."""
+    if len(jobs) <= n:
+        return jobs
+    by_owner: 'OrderedDict[Hashable, Deque[ASRJob]]' = OrderedDict()
+    for job in jobs:
+        by_owner.setdefault(_owner(job.key), deque()).append(job)
+    picked: List[ASRJob] = []
+    while len(picked) < n:
+        for owner in list(by_owner):
+            picked.append(by_owner[owner].popleft())
+            if not by_owner[owner]:
+                del by_owner[owner]
+            if len(picked) == n:
+                break
+    return picked
+
+
+class ASRScheduler:
+    """Batches transcription jobs in front of a model runner.
+
+    Pending jobs are coalesced into a single ``runner.transcribe`` call of up
+    to ``max_batch`` buffers, waiting at most ``max_wait_ms`` for the batch
+    to fill. Finals and chunks run before partials, and with two or more
+    workers one is always kept free of batches holding only partials, so
+    a final never waits for a partial to finish. When more jobs are
+    pending than fit in a batch they are taken round-robin across streams
+    (the first element of a job's key) so one busy stream cannot starve
+    the others. A partial is dropped as soon as a newer partial or the final
+    for the same key is submitted, and a partial whose result comes back
+    after it was superseded is never delivered, so each key's results reach
+    the callback in order.
+    """
+
+    def __init__(self, runner, workers: int = constants.ASR_WORKERS,
+                 max_batch: int = constants.ASR_MAX_BATCH,
+                 max_wait_ms: int = constants.ASR_MAX_WAIT_MS) -> None:
+        self.runner = runner
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self._cond = threading.Condition()
+        self._urgent: Deque[ASRJob] = deque()
+        self._partials: 'OrderedDict[Hashable, ASRJob]' = OrderedDict()
+        self._latest_partial: Dict[Hashable, int] = {}
+        # results checked for delivery, per key with a worker running its callbacks
+        self._outbox: Dict[Hashable, Deque[Tuple[ASRJob, Optional[str]]]] = {}
+        self._seq = 0
+        self._stopping = False
+        # counters
+        self.batches = 0
+        self.jobs = 0
+        self.dropped = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # seconds workers spent in finished runner calls, and start of those in flight
+        self.busy = 0.0
+        self._running: Dict[threading.Thread, float] = {}
+        # workers busy with a batch of partials only
+        self._partial_only = 0
+        self._workers: List[threading.Thread] = []
+        # workers told to exit once their current batch is delivered
+        self._retired = set()
+        self._started = 0
+        self._add_workers(max(1, workers))
+
+    def _add_workers(self, n: int) -> None:
+        for _ in range(n):
+            t = threading.Thread(target=self._worker, daemon=True, name=f"asr-{self._started}")
+            self._started += 1
+            self._workers.append(t)
+            t.start()
+
+    @property
+    def workers(self) -> int:
+        with self._cond:
+            return len(self._workers) - len(self._retired)
+
+    def configure(self, workers: Optional[int] = None, max_batch: Optional[int] = None,
+                  max_wait_ms: Optional[int] = None) -> None:
+        """Change the worker count and batching limits while running."""
+        with self._cond:
+            if max_batch is not None:
+                self.max_batch = max(1, max_batch)
+            if max_wait_ms is not None:
+                self.max_wait = max_wait_ms / 1000.0
+            if workers is not None and not self._stopping:
+                # forget workers that have exited
+                self._workers = [t for t in self._workers if t.is_alive() or t not in self._retired]
+                self._retired = set(t for t in self._retired if t.is_alive())
+                live = [t for t in self._workers if t not in self._retired]
+                workers = max(1, workers)
+                if workers < len(live):
+                    self._retired.update(live[workers:])
+                else:
+                    self._add_workers(workers - len(live))
+            self._cond.notify_all()
+
+    def submit(self, key: Hashable, audio: np.ndarray, kind: str,
+               callback: Callable[[Optional[str]], None]) -> None:
+        with self._cond:
+            self._seq += 1
+            job = ASRJob(key, audio, kind, callback, self._seq)
+            if kind == PARTIAL:
+                old = self._partials.get(key)
+                if old is not None:
+                    self.dropped += 1
+                # replacing in place keeps the key's position in the queue
+                self._partials[key] = job
+                self._latest_partial[key] = job.seq
+            else:
+                if kind == FINAL:
+                    if self._partials.pop(key, None) is not None:
+                        self.dropped += 1
+                    self._latest_partial.pop(key, None)
+                self._urgent.append(job)
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._urgent) + len(self._partials)
+
+    def busy_time(self) -> float:
+        """Worker seconds spent transcribing so far, calls in progress included."""
+        now = time.perf_counter()
+        with self._cond:
+            return self.busy + sum(now - start for start in self._running.values())
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                'batches': self.batches,
+                'jobs': self.jobs,
+                'dropped': self.dropped,
+                'pending': len(self._urgent) + len(self._partials),
+                'busy_s': self.busy,
+                'queue_wait_ms_mean': 1000.0 * self.wait_total / self.jobs if self.jobs else 0.0,
+                'queue_wait_ms_max': 1000.0 * self.wait_max,
+            }
+
+    def _oldest(self) -> float:
+        times = []
+        if self._urgent:
+            times.append(self._urgent[0].enqueued)
+        if self._partials:
+            times.append(next(iter(self._partials.values())).enqueued)
+        return min(times)
+
+    def _partials_allowed(self) -> bool:
+        live = len(self._workers) - len(self._retired)
+        return self._stopping or live < 2 or self._partial_only < live - 1
+
+    def _take_batch(self) -> Optional[List[ASRJob]]:
+        me = threading.current_thread()
+        with self._cond:
+            while (not self._stopping and me not in self._retired
+                   and not (self._urgent or (self._partials and self._partials_allowed()))):
+                self._cond.wait()
+            if me in self._retired or not (self._urgent or self._partials):
+                return None
+            deadline = self._oldest() + self.max_wait
+            while not self._stopping and len(self._urgent) + len(self._partials) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = _round_robin(list(self._urgent), self.max_batch)
+            if batch:
+                taken = set(id(job) for job in batch)
+                self._urgent = deque(job for job in self._urgent if id(job) not in taken)
+            if len(batch) < self.max_batch and self._partials and (batch or self._partials_allowed()):
+                if not batch:
+                    self._partial_only += 1
+                for job in _round_robin(list(self._partials.values()), self.max_batch - len(batch)):
+                    del self._partials[job.key]
+                    batch.append(job)
+            if not batch:
+                return []
+            now = time.perf_counter()
+            for job in batch:
+                wait = now - job.enqueued
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+                METRICS.observe('asr_queue_wait', wait, job.key)
+            self.jobs += len(batch)
+            self.batches += 1
+            return batch
+
+    def _worker(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            if batch:
+                self._run_batch(batch)
+            # an idle worker would otherwise keep the last batch's audio and callbacks alive
+            del batch
+
+    def _run_batch(self, batch: List[ASRJob]) -> None:
+        me = threading.current_thread()
+        start = time.perf_counter()
+        with self._cond:
+            self._running[me] = start
+        try:
+            texts: List[Optional[str]] = list(self.runner.transcribe([job.audio for job in batch]))
+        except Exception as e:
+            logger.error("ASR error: %s", e)
+            texts = [None] * len(batch)
+        with self._cond:
+            del self._running[me]
+            self.busy += time.perf_counter() - start
+        if METRICS.enabled:
+            # every segment in the batch waited for the whole call
+            elapsed = time.perf_counter() - start
+            for job in batch:
+                METRICS.trace(job.key, 'batch', elapsed)
+        self._deliver(batch, texts)
+        if batch[0].kind == PARTIAL:
+            # urgent jobs come first in a batch, so this one held partials only
+            with self._cond:
+                self._partial_only -= 1
+                self._cond.notify_all()
+
+    def _deliver(self, batch: List[ASRJob], texts: List[Optional[str]]) -> None:
+        """Hand a batch's results to their callbacks, outside the lock.
+
+        Results wait in a per-key outbox drained by one worker at a time, so
+        a slow callback only holds up later results for its own key.
+        """
+        mine = []
+        with self._cond:
+            for job, text in zip(batch, texts):
+                if job.kind == PARTIAL:
+                    if text is None:
+                        continue
+                    if self._latest_partial.get(job.key) != job.seq:
+                        # a newer partial or the final already superseded this one
+                        self.dropped += 1
+                        continue
+                if job.key not in self._outbox:
+                    # no other worker is delivering for this key
+                    self._outbox[job.key] = deque()
+                    mine.append(job.key)
+                self._outbox[job.key].append((job, text))
+        for key in mine:
+            while True:
+                with self._cond:
+                    if not self._outbox[key]:
+                        del self._outbox[key]
+                        break
+                    job, text = self._outbox[key].popleft()
+                try:
+                    job.callback(text)
+                except Exception as e:
+                    logger.error("ASR result callback failed: %s", e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers once the pending jobs have run."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            workers = list(self._workers)
+        if wait:
+            for t in workers:
+                if t is not threading.current_thread():
+                    t.join()
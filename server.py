@@ -0,0 +1,304 @@
+"""Network transcription server sharing one loaded model across clients.
+
+    python server.py --host 0.0.0.0 --port 8765
+
+A client connects over TCP and sends one JSON header line, e.g.
+``{"rate": 48000}`` with a whole rate from 8 to 192 kHz, followed by raw
+little-endian int16 mono PCM; a bad header closes the connection. The
+server answers on the same connection with one JSON object per line,
+``{"text": ..., "final": ..., "id": ..., "start": ..., "end": ...}``.
+Closing the write side of the socket flushes the last segment.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+
+import constants
+import settings
+from asr import ModelRunner
+from backends import BACKENDS, resolve_threads
+from model_loader import load_model, warm_up
+from asr_pool import ASRProcessPool, model_factory
+from scheduler import ASRScheduler, PARTIAL
+from transcriber import DevicePipeline, PipelineConfig
+from metrics import METRICS, MetricsServer
+
+logger = logging.getLogger(__name__)
+
+
+class _Connection:
+    """Per-client glue between the event loop and the shared scheduler.
+
+    Stands in for both the scheduler and the text queue of the client's
+    ``DevicePipeline``: it counts the finals and chunks the client has in
+    flight so reading can pause while too many are outstanding, and hands
+    results from worker threads back to the event loop. The pipeline is
+    fed on a feed thread, so the count is only touched on the event loop.
+    """
+
+    def __init__(self, conn_id: int, scheduler: ASRScheduler, loop: asyncio.AbstractEventLoop,
+                 max_inflight: int, max_results: int) -> None:
+        self.conn_id = conn_id
+        self.scheduler = scheduler
+        self.loop = loop
+        self.max_inflight = max_inflight
+        self.max_results = max_results
+        self.inflight = 0
+        self.results: asyncio.Queue = asyncio.Queue()
+        self.can_read = asyncio.Event()
+        self.can_read.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.closed = False
+        self.dropped = 0
+
+    def submit(self, key, audio, kind, callback) -> None:
+        """Called from a feed thread by the client's pipeline."""
+        if kind != PARTIAL:
+            # finals and chunks always report back, so they can be counted;
+            # queued before the feed's own completion, so counted before the
+            # next read
+            self._call(self._job_started)
+            inner = callback
+
+            def callback(text, inner=inner):
+                try:
+                    inner(text)
+                finally:
+                    self._call(self._job_done)
+        self.scheduler.submit(key, audio, kind, callback)
+
+    def put(self, item: Dict) -> None:
+        """Called from ASR worker threads with a pipeline result."""
+        self._call(self._queue_result, item)
+
+    def _call(self, fn, *args) -> None:
+        if self.closed:
+            return
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            # event loop already closed
+            pass
+
+    def _job_started(self) -> None:
+        self.inflight += 1
+        self._update()
+
+    def _job_done(self) -> None:
+        self.inflight -= 1
+        self._update()
+
+    def _update(self) -> None:
+        if self.inflight < self.max_inflight:
+            self.can_read.set()
+        else:
+            self.can_read.clear()
+        if self.inflight == 0:
+            self.idle.set()
+        else:
+            self.idle.clear()
+
+    def _queue_result(self, item: Dict) -> None:
+        if not item['final'] and self.results.qsize() >= self.max_results:
+            # the client is not keeping up; partials are expendable
+            self.dropped += 1
+            return
+        self.results.put_nowait(item)
+
+    async def write_results(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            item = await self.results.get()
+            if item is None:
+                return
+            METRICS.since('text_q_wait', item['emitted'], item['trace'])
+            out = {k: item[k] for k in ('text', 'final', 'id', 'start', 'end')}
+            writer.write(json.dumps(out).encode('utf-8') + b'\n')
+            await writer.drain()
+
+
+def parse_header(line: bytes) -> int:
+    """Sample rate from a client's header line; raises on anything unusable."""
+    header = json.loads(line.decode('utf-8') or '{}')
+    rate = header.get('rate', constants.TARGET_RATE)
+    if not isinstance(rate, int) or isinstance(rate, bool):
+        raise TypeError(f"rate {rate!r} is not an integer")
+    if not constants.SERVER_MIN_RATE <= rate <= constants.SERVER_MAX_RATE:
+        raise ValueError(f"rate {rate} outside {constants.SERVER_MIN_RATE}-"
+                         f"{constants.SERVER_MAX_RATE} Hz")
+    return rate
+
+
+async def _close(writer: asyncio.StreamWriter) -> None:
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+class TranscriptionServer:
+    """Serves many PCM streams from one model through a shared scheduler.
+
+    Each connection gets its own ``DevicePipeline`` (resampler, VAD and
+    segmentation state). The scheduler batches jobs from all clients and
+    takes them round-robin per client, and each client may have at most
+    ``max_inflight`` finals/chunks outstanding before its socket stops
+    being read. Resampling, VAD and segmentation run on ``feed_workers``
+    threads, so a busy client does not hold up the event loop.
+    """
+
+    def __init__(self, model, config: PipelineConfig,
+                 workers: int = constants.ASR_WORKERS,
+                 max_batch: int = constants.ASR_MAX_BATCH,
+                 max_wait_ms: int = constants.ASR_MAX_WAIT_MS,
+                 max_inflight: int = constants.SERVER_MAX_INFLIGHT,
+                 max_results: int = constants.SERVER_MAX_RESULTS,
+                 feed_workers: int = constants.SERVER_FEED_WORKERS) -> None:
+        self.config = config
+        self.scheduler = ASRScheduler(ModelRunner(model), workers, max_batch, max_wait_ms)
+        self.feeder = ThreadPoolExecutor(max(1, feed_workers), thread_name_prefix='feed')
+        # feed thread CPU seconds and audio seconds fed, over all clients
+        self.feed_s = 0.0
+        self.audio_s = 0.0
+        self._feed_lock = threading.Lock()
+        self.max_inflight = max_inflight
+        self.max_results = max_results
+        self.connections: Dict[int, _Connection] = {}
+        self._next_id = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = constants.SERVER_HOST,
+                    port: int = constants.SERVER_PORT) -> asyncio.AbstractServer:
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.feeder.shutdown(wait=False)
+        self.scheduler.shutdown(wait=False)
+
+    def _feed(self, pipeline: DevicePipeline, pcm: np.ndarray, rate: int) -> None:
+        start = time.thread_time()
+        pipeline.feed(pcm)
+        elapsed = time.thread_time() - start
+        with self._feed_lock:
+            self.feed_s += elapsed
+            self.audio_s += len(pcm) / rate
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._next_id += 1
+        conn_id = self._next_id
+        peer = writer.get_extra_info('peername')
+        try:
+            rate = parse_header(await reader.readline())
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.warning("Bad header from %s: %s", peer, e)
+            await _close(writer)
+            return
+        loop = asyncio.get_running_loop()
+        conn = _Connection(conn_id, self.scheduler, loop, self.max_inflight, self.max_results)
+        self.connections[conn_id] = conn
+        pipeline = DevicePipeline(conn_id, rate, self.config, conn, conn)
+        sender = asyncio.create_task(conn.write_results(writer))
+        logger.info("Client %d connected from %s at %d Hz", conn_id, peer, rate)
+        block = 2 * rate * self.config.frame_ms // 1000
+        pending = b''
+        try:
+            while True:
+                await conn.can_read.wait()
+                data = await reader.read(16 * block)
+                if not data:
+                    break
+                pending += data
+                usable = len(pending) - len(pending) % 2
+                pcm = np.frombuffer(pending[:usable], dtype='<i2')
+                pending = pending[usable:]
+                await loop.run_in_executor(self.feeder, self._feed, pipeline, pcm, rate)
+            await loop.run_in_executor(self.feeder, pipeline.flush)
+            await conn.idle.wait()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            logger.info("Client %d disconnected: %s", conn_id, e)
+        finally:
+            conn.results.put_nowait(None)
+            try:
+                await sender
+            except ConnectionError:
+                pass
+            conn.closed = True
+            del self.connections[conn_id]
+            await _close(writer)
+            logger.info("Client %d closed (%d partials dropped)", conn_id, conn.dropped)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve transcription to remote PCM streams.")
+    parser.add_argument('--host', default=constants.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=constants.SERVER_PORT)
+    parser.add_argument('--model', default=constants.MODEL_NAME)
+    parser.add_argument('--backend', choices=BACKENDS, help='inference backend (default: settings)')
+    parser.add_argument('--threads', type=int, help='intra-op threads per inference call, 0 = auto')
+    parser.add_argument('--processes', action='store_true', default=None,
+                        help='run the model in worker processes (default: settings)')
+    parser.add_argument('--metrics-port', type=int, help='serve stage metrics on this port')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+    cfg = settings.load_settings()
+    METRICS.enabled = cfg.metrics_enabled
+    metrics_port = args.metrics_port if args.metrics_port is not None else cfg.metrics_port
+    if METRICS.enabled and metrics_port:
+        MetricsServer(metrics_port)
+    threads = args.threads if args.threads is not None else cfg.asr_threads
+    backend = args.backend or cfg.asr_backend
+    processes = args.processes or cfg.asr_processes
+    if not (processes and cfg.asr_pin_cores):
+        # a pinned replica takes 0 as one thread per core of its own
+        threads = resolve_threads(threads, cfg.asr_workers)
+    if processes:
+        # each process warms up its own replica
+        model = ASRProcessPool(model_factory(args.model, cfg.model_cache_dir or None, backend,
+                                             threads), cfg.asr_workers,
+                               pin_cores=cfg.asr_pin_cores)
+        times = model.times
+    else:
+        model, times = load_model(args.model, cfg.model_cache_dir or None, backend, threads)
+        # the first connection should not pay for lazy initialisation
+        times.warmup_s = warm_up(model)
+    logger.info("Model %s loaded from %s in %.2f s, warm-up %.2f s",
+                args.model, times.source, times.import_s + times.load_s, times.warmup_s)
+    config = PipelineConfig.from_ms(cfg.vad_mode, cfg.frame_ms, cfg.max_silence_ms,
+                                    cfg.partial_interval_ms, cfg.min_frames, cfg.max_frames,
+                                    cfg.stream_chunk_ms, cfg.stream_context_ms, cfg.preroll_ms,
+                                    vad_engine=cfg.vad_engine, vad_gate_level=cfg.vad_gate_level)
+    server = TranscriptionServer(model, config, cfg.asr_workers, cfg.asr_max_batch,
+                                 cfg.asr_max_wait_ms)
+
+    async def serve() -> None:
+        srv = await server.start(args.host, args.port)
+        logger.info("Listening on %s", ', '.join(str(s.getsockname()) for s in srv.sockets))
+        try:
+            await srv.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(model, ASRProcessPool):
+            model.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -21,13 +21,36 @@ class Appearance:
 class Settings:
     max_lines: int = constants.MAX_LINES
     history_lines: int = constants.HISTORY_LINES
+    history_max_mb: int = constants.HISTORY_MAX_MB
     clear_timeout: int = constants.CLEAR_TIMEOUT_MS
     vad_mode: int = constants.VAD_MODE
+    vad_engine: str = constants.VAD_ENGINE
+    vad_gate_level: int = constants.VAD_GATE_LEVEL
     frame_ms: int = constants.FRAME_MS
     max_silence_ms: int = constants.MAX_SILENCE_MS
     partial_interval_ms: int = constants.PARTIAL_INTERVAL_MS
+    partial_adaptive: bool = constants.PARTIAL_ADAPTIVE
+    partial_min_ms: int = constants.PARTIAL_MIN_MS
+    partial_max_ms: int = constants.PARTIAL_MAX_MS
+    partial_target_util: float = constants.PARTIAL_TARGET_UTIL
     min_frames: int = constants.MIN_FRAMES
     max_frames: int = constants.MAX_FRAMES
+    stream_chunk_ms: int = constants.STREAM_CHUNK_MS
+    stream_context_ms: int = constants.STREAM_CONTEXT_MS
+    asr_workers: int = constants.ASR_WORKERS
+    asr_max_batch: int = constants.ASR_MAX_BATCH
+    asr_max_wait_ms: int = constants.ASR_MAX_WAIT_MS
+    preroll_ms: int = constants.PREROLL_MS
+    audio_queue_frames: int = constants.AUDIO_QUEUE_FRAMES
+    overload_policy: str = constants.OVERLOAD_POLICY
+    asr_backend: str = constants.ASR_BACKEND
+    asr_threads: int = constants.ASR_THREADS
+    asr_processes: bool = constants.ASR_PROCESSES
+    asr_pin_cores: bool = constants.ASR_PIN_CORES
+    # restored .nemo copies and ONNX exports of the model; empty disables the cache
+    model_cache_dir: str = constants.MODEL_CACHE_DIR
+    metrics_enabled: bool = constants.METRICS_ENABLED
+    metrics_port: int = constants.METRICS_PORT
     appearance: Appearance = field(default_factory=Appearance)
     input_device: Optional[int] = None
 
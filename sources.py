@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+import constants
+from ringbuffer import DROP_OLDEST, FrameRing
+from utils import load_audio
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[np.ndarray], None]
+
+RAW_EXTENSION = '.pcm'
+
+
+class AudioSource:
+    """A stream of mono int16 blocks feeding one pipeline.
+
+    ``start`` begins delivering blocks to ``sink`` and calls ``done`` once a
+    finite source has delivered everything. Live sources deliver from an
+    audio callback and must never be blocked; replayed sources may be, so
+    the consumer can apply backpressure instead of dropping audio.
+    """
+    live = False
+
+    def __init__(self, name, rate: int) -> None:
+        self.name = name
+        self.rate = rate
+
+    def start(self, sink: Sink, done: Callable[[], None]) -> None:
+        raise NotImplementedError
+
+    def stop(self) -> None:
+        pass
+
+
+class DeviceSource(AudioSource):
+    """Live capture from a sounddevice input."""
+    live = True
+
+    def __init__(self, device: int, frame_ms: int = constants.FRAME_MS) -> None:
+        import sounddevice as sd
+        info = sd.query_devices(device)
+        super().__init__(device, int(info['default_samplerate']))
+        self.blocksize = int(self.rate * frame_ms / 1000)
+        self.stream = None
+
+    def start(self, sink: Sink, done: Callable[[], None]) -> None:
+        import sounddevice as sd
+
+        def callback(indata: np.ndarray, frames: int, time_info, status) -> None:
+            if status:
+                logger.warning("Audio stream status: %s", status)
+            sink(indata[:, 0])
+
+        self.stream = sd.InputStream(
+            samplerate=self.rate,
+            channels=1,
+            dtype="int16",
+            blocksize=self.blocksize,
+            device=self.name,
+            callback=callback
+        )
+        self.stream.start()
+
+    def stop(self) -> None:
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class ReplaySource(AudioSource):
+    """Delivers prerecorded blocks from a thread.
+
+    ``speed`` is the playback rate relative to real time; ``None`` replays
+    as fast as the consumer accepts blocks.
+    """
+
+    def __init__(self, name, rate: int, frame_ms: int = constants.FRAME_MS,
+                 speed: Optional[float] = 1.0) -> None:
+        super().__init__(name, rate)
+        self.blocksize = int(rate * frame_ms / 1000)
+        self.speed = speed
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        raise NotImplementedError
+
+    def start(self, sink: Sink, done: Callable[[], None]) -> None:
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(sink, done), daemon=True,
+                                        name=f"source-{self.name}")
+        self._thread.start()
+
+    def _run(self, sink: Sink, done: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        played = 0
+        for block in self.blocks():
+            if self._stopping.is_set():
+                return
+            played += len(block)
+            if self.speed:
+                # like a device, a block is delivered once it has been "recorded"
+                delay = start + played / self.rate / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sink(block)
+        done()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class FileSource(ReplaySource):
+    """Replays a WAV/FLAC file or a raw capture written by ``CaptureSource``."""
+
+    def __init__(self, path: str, frame_ms: int = constants.FRAME_MS,
+                 speed: Optional[float] = 1.0, name=None) -> None:
+        if path.endswith(RAW_EXTENSION):
+            self.pcm, rate = open_capture(path)
+        else:
+            self.pcm, rate = load_audio(path)
+        super().__init__(name if name is not None else path, rate, frame_ms, speed)
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        for pos in range(0, len(self.pcm), self.blocksize):
+            yield np.asarray(self.pcm[pos:pos + self.blocksize])
+
+
+def synthesize(rate: int, pattern: Sequence[Tuple[float, str]], freq: float = 300.0,
+               level: float = 6000.0, seed: int = 0) -> np.ndarray:
+    """Build int16 audio from (seconds, kind) spans.
+
+    ``tone`` is a two-harmonic tone that webrtcvad flags as speech,
+    ``noise`` is white noise at ``level`` and ``silence`` a quiet noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for seconds, kind in pattern:
+        n = int(seconds * rate)
+        if kind == 'tone':
+            t = np.arange(n) / rate
+            x = level * np.sin(2 * np.pi * freq * t) + level / 4 * np.sin(2 * np.pi * 2 * freq * t)
+        elif kind == 'noise':
+            x = rng.standard_normal(n) * level / 2
+        elif kind == 'silence':
+            x = rng.standard_normal(n) * 30
+        else:
+            raise ValueError(f"unknown synthetic span kind {kind!r}")
+        parts.append(x)
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+class SyntheticSource(ReplaySource):
+    """Generated tone/noise/silence spans, see ``synthesize``."""
+
+    def __init__(self, name, pattern: Sequence[Tuple[float, str]],
+                 rate: int = constants.TARGET_RATE, freq: float = 300.0, seed: int = 0,
+                 frame_ms: int = constants.FRAME_MS, speed: Optional[float] = 1.0) -> None:
+        super().__init__(name, rate, frame_ms, speed)
+        self.pcm = synthesize(rate, pattern, freq, seed=seed)
+
+    def blocks(self) -> Iterator[np.ndarray]:
+        for pos in range(0, len(self.pcm), self.blocksize):
+            yield self.pcm[pos:pos + self.blocksize]
+
+
+def open_capture(path: str) -> Tuple[np.ndarray, int]:
+    """Memory-map a raw capture; returns (samples, rate)."""
+    with open(path + '.json', 'r', encoding='utf-8') as f:
+        header = json.load(f)
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.int16), int(header['rate'])
+    return np.memmap(path, dtype=header.get('dtype', '<i2'), mode='r'), int(header['rate'])
+
+
+class CaptureSource(AudioSource):
+    """Records everything another source delivers to a raw file.
+
+    Samples are appended as little-endian int16 to ``path`` with the
+    stream parameters in ``path + '.json'``, so a session can be replayed
+    later through ``FileSource`` without decoding.
+
+    Blocks are copied into a ``FrameRing`` and written by a thread of
+    their own, so the device callback never waits on the disk. If the
+    disk falls behind by more than ``buffer_ms`` a live capture loses its
+    oldest unwritten frames, counted in ``dropped``; a replayed one waits.
+    """
+
+    def __init__(self, inner: AudioSource, path: str,
+                 buffer_ms: int = constants.CAPTURE_BUFFER_MS) -> None:
+        super().__init__(inner.name, inner.rate)
+        self.inner = inner
+        self.live = inner.live
+        self.path = path if path.endswith(RAW_EXTENSION) else path + RAW_EXTENSION
+        frame_len = -(-inner.rate * constants.FRAME_MS // 1000)
+        self.ring = FrameRing(max(2, buffer_ms // constants.FRAME_MS), frame_len, DROP_OLDEST)
+        self.samples = 0
+        self.started = ''
+        self._file = None
+        self._wake = threading.Event()
+        self._stopping = False
+        self._writer: Optional[threading.Thread] = None
+
+    @property
+    def dropped(self) -> int:
+        """Frames lost because the file could not be written fast enough."""
+        return self.ring.dropped
+
+    def start(self, sink: Sink, done: Callable[[], None]) -> None:
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._file = open(self.path, 'wb')
+        self._write_header()
+        self._stopping = False
+        self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                        name=f"capture-{self.name}")
+        self._writer.start()
+
+        def record(pcm: np.ndarray) -> None:
+            if self.live:
+                self.ring.push(pcm)
+            else:
+                while not self.ring.push(pcm, timeout=0.1):
+                    if self._stopping:
+                        return
+            self._wake.set()
+            sink(pcm)
+
+        self.inner.start(record, done)
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wake.wait(0.1)
+            self._wake.clear()
+            stopping = self._stopping
+            while True:
+                frame = self.ring.peek()
+                if frame is None:
+                    break
+                try:
+                    self._file.write(np.ascontiguousarray(frame, dtype='<i2'))
+                    self.samples += len(frame)
+                except (OSError, ValueError) as e:
+                    logger.error("Could not write capture %s: %s", self.path, e)
+                finally:
+                    self.ring.advance()
+            if stopping:
+                return
+
+    def _write_header(self) -> None:
+        header = {'rate': self.rate, 'dtype': '<i2', 'channels': 1,
+                  'source': str(self.name), 'samples': self.samples,
+                  'started': self.started}
+        with open(self.path + '.json', 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2)
+
+    def stop(self) -> None:
+        self.inner.stop()
+        self._stopping = True
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._write_header()
+            if self.dropped:
+                logger.warning("Capture %s lost %d frames to a slow disk", self.path, self.dropped)
+
@@ -0,0 +1,155 @@
+"""Sliding-window decoding of long speech segments.
+
+A segment is committed in fixed chunks that overlap the previous one by
+the context, decoded once each, concurrently with the rest of the
+segment's audio. Transcripts of overlapping audio are joined on word
+timings when the model gives them: each word is kept by the piece that
+holds its midpoint in its half of the overlap, so a word cut at a chunk
+edge is taken from the chunk that heard it whole. Without timings the
+overlap is found by matching words, see ``stitch``.
+"""
+import re
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import constants
+
+_WORD_RE = re.compile(r"[^\w']+")
+
+
+def _norm(word: str) -> str:
+    return _WORD_RE.sub('', word.lower())
+
+
+def _cut(whole: str, part: str, test, anchored: bool) -> bool:
+    # a one-letter fragment matches too much to count unless a whole word matches too
+    return part == whole or (len(part) > (0 if anchored else 1) and test(part))
+
+
+def stitch(left: str, right: str, max_overlap: int = 8) -> str:
+    """Join two transcripts whose audio overlaps, dropping repeated words.
+
+    The longest run of words (up to ``max_overlap``) that ends ``left`` and
+    starts ``right`` is treated as the overlap and kept only once. In runs
+    of two or more words the ends may be cut: ``left``'s last word may be
+    the start of the word it matches, heard up to the chunk edge, and
+    ``right``'s first word the end of its match, heard from the start of
+    the context. The whole versions are kept.
+    """
+    lw, rw = left.split(), right.split()
+    if not lw:
+        return right.strip()
+    if not rw:
+        return left.strip()
+    ln = [_norm(w) for w in lw[-max_overlap:]]
+    rn = [_norm(w) for w in rw[:max_overlap]]
+    for k in range(min(len(ln), len(rn)), 0, -1):
+        if ln[-k:] == rn[:k]:
+            return ' '.join(lw + rw[k:])
+    for k in range(min(len(ln), len(rn)), 1, -1):
+        a, b = ln[-k:], rn[:k]
+        if a[1:-1] != b[1:-1]:
+            continue
+        if (_cut(a[0], b[0], a[0].endswith, k > 2 or a[-1] == b[-1])
+                and _cut(b[-1], a[-1], b[-1].startswith, k > 2 or a[0] == b[0])):
+            return ' '.join(lw[:len(lw) - k + 1] + rw[1:])
+    return ' '.join(lw + rw)
+
+
+def join_pieces(pieces: Sequence[Tuple[float, float, str]]) -> str:
+    """Join transcripts of audio pieces that overlap their neighbours.
+
+    ``pieces`` are (start, end, text) in order, times in seconds. Where
+    every text carries word timings, as a ``Transcript`` does, each word
+    goes to the piece holding its midpoint past the middle of the overlap
+    with the previous piece and before the middle of the overlap with the
+    next; otherwise the texts are stitched on matching words.
+    """
+    if not all(getattr(text, 'words', None) is not None for _, _, text in pieces):
+        joined = ''
+        for _, _, text in pieces:
+            joined = stitch(joined, text)
+        return joined
+    # a seam lies halfway through the overlap, or where the later piece starts
+    seams = [(start + max(start, prev_end)) / 2
+             for (_, prev_end, _), (start, _, _) in zip(pieces, pieces[1:])]
+    bounds = [float('-inf')] + seams + [float('inf')]
+    words = []
+    for i, (start, _, text) in enumerate(pieces):
+        lo, hi = bounds[i], bounds[i + 1]
+        words.extend(w for w, a, b in text.words if lo <= start + (a + b) / 2 < hi)
+    return ' '.join(words)
+
+
+class SegmentStream:
+    """Sliding-window decode state for one speech segment.
+
+    Audio is committed in fixed chunks of ``chunk_frames``, each decoded once
+    with ``context_frames`` of left context. Partials and the final only
+    decode the uncommitted tail, so per-update cost stays bounded however
+    long the segment grows. Chunk and tail results may arrive in any order;
+    the final text is released once every chunk has been decoded.
+    """
+
+    def __init__(self, seg_id: int, chunk_frames: int, context_frames: int,
+                 frame_ms: int = constants.FRAME_MS) -> None:
+        self.seg_id = seg_id
+        self.chunk_frames = chunk_frames
+        self.context_frames = context_frames
+        self.frame_s = frame_ms / 1000
+        self.commit = 0
+        self.chunks: List[Optional[str]] = []
+        # (start, end) frames of each chunk
+        self.bounds: List[Tuple[int, int]] = []
+        # first frame and text of the final tail
+        self.final_tail: Optional[Tuple[int, str]] = None
+        # (start, end) in seconds, set when the final is submitted
+        self.span: Tuple[float, float] = (0.0, 0.0)
+        self.lock = threading.Lock()
+
+    def next_chunk(self, n_frames: int) -> Optional[Tuple[int, int, int]]:
+        """Return (index, start, end) of a chunk ready to commit, if any."""
+        if n_frames - self.commit < self.chunk_frames:
+            return None
+        start = max(0, self.commit - self.context_frames)
+        end = self.commit + self.chunk_frames
+        with self.lock:
+            idx = len(self.chunks)
+            self.chunks.append(None)
+            self.bounds.append((start, end))
+        self.commit = end
+        return idx, start, end
+
+    def tail_start(self) -> int:
+        """First frame of the audio a partial or final has to decode."""
+        return max(0, self.commit - self.context_frames)
+
+    def _joined(self, start: int, tail: str) -> str:
+        pieces = []
+        for (a, b), chunk in zip(self.bounds, self.chunks):
+            if chunk is None:
+                break
+            pieces.append((a * self.frame_s, b * self.frame_s, chunk))
+        pieces.append((start * self.frame_s, float('inf'), tail))
+        return join_pieces(pieces)
+
+    def chunk_done(self, idx: int, text: str) -> Optional[str]:
+        """Record a chunk result; returns the final text if it completes it."""
+        with self.lock:
+            self.chunks[idx] = text
+            if self.final_tail is not None and all(c is not None for c in self.chunks):
+                return self._joined(*self.final_tail)
+        return None
+
+    def partial_done(self, start: int, text: str) -> str:
+        """Text so far, given the tail decoded from frame ``start``."""
+        with self.lock:
+            return self._joined(start, text)
+
+    def final_done(self, start: int, text: str) -> Optional[str]:
+        """Record the final tail; returns the final text once chunks are in."""
+        with self.lock:
+            self.final_tail = (start, text)
+            if all(c is not None for c in self.chunks):
+                return self._joined(start, text)
+        return None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from asr import ModelRunner, Transcript
+from benchmarks.fakes import FakeModel, PathOnlyModel
+
+TONE = (np.sin(np.arange(16000) * 0.1) * 8000).astype(np.int16)
+
+
+class PickyModel(FakeModel):
+    """Takes arrays, but fails on empty audio whichever way it comes."""
+
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs):
+        if any(len(self._load(a)) == 0 for a in audio):
+            raise ValueError("empty audio")
+        return super().transcribe(audio, batch_size, verbose, **kwargs)
+
+
+class NoTimestamps(FakeModel):
+    def transcribe(self, audio, batch_size: int = 1, verbose: bool = False, **kwargs):
+        if 'timestamps' in kwargs:
+            raise TypeError("transcribe() got an unexpected keyword argument 'timestamps'")
+        return super().transcribe(audio, batch_size, verbose)
+
+
+def test_path_only_model_is_served_through_files():
+    model = PathOnlyModel(text='hi')
+    runner = ModelRunner(model)
+    assert runner.transcribe([TONE]) == ['hi']
+    assert not runner.in_memory
+    assert runner.transcribe([TONE, TONE]) == ['hi', 'hi']
+
+
+def test_bad_batch_is_raised_and_arrays_kept():
+    runner = ModelRunner(PickyModel(text='hi'))
+    assert runner.transcribe([TONE]) == ['hi']
+    with pytest.raises(ValueError):
+        runner.transcribe([np.zeros(0, dtype=np.int16)])
+    assert runner.in_memory
+
+
+def test_bad_first_batch_does_not_switch_to_files():
+    runner = ModelRunner(PickyModel(text='hi'))
+    with pytest.raises(ValueError):
+        runner.transcribe([np.zeros(0, dtype=np.int16)])
+    assert runner.in_memory and not runner.arrays_accepted
+    assert runner.transcribe([TONE]) == ['hi']
+    assert runner.arrays_accepted
+
+
+def test_model_without_timestamps_is_called_without_them():
+    runner = ModelRunner(NoTimestamps(text='hi'))
+    assert runner.transcribe([TONE]) == ['hi']
+    assert not runner.timestamps and runner.in_memory
+
+
+def test_transcript_keeps_words_through_pickling():
+    import pickle
+    t = pickle.loads(pickle.dumps(Transcript('a b', [('a', 0.0, 0.1), ('b', 0.2, 0.3)])))
+    assert t == 'a b' and t.words == [('a', 0.0, 0.1), ('b', 0.2, 0.3)]
@@ -0,0 +1,122 @@
+import os
+import signal
+import threading
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+
+import asr_pool
+from asr_pool import ASRProcessPool, available_cores, core_sets
+from benchmarks.fakes import FakeModel, GILModel
+from benchmarks.model_pool import Load
+
+AUDIO = [np.zeros(16000, dtype=np.float32)]
+
+
+class SlowStart(asr_pool._Replica):
+    """Replica whose process takes a while to start."""
+    delay = 0.5
+
+    def __init__(self, *args, **kwargs) -> None:
+        time.sleep(self.delay)
+        super().__init__(*args, **kwargs)
+
+
+def wait_for(check, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def call_times(pool: ASRProcessPool, busy: threading.Event, times: list,
+               transcribe: bool = True) -> None:
+    """Times pool calls while ``busy`` is set."""
+    while busy.is_set():
+        start = time.perf_counter()
+        pool.health()
+        if transcribe:
+            pool.transcribe(AUDIO)
+        times.append(time.perf_counter() - start)
+        time.sleep(0.005)
+
+
+def keep_transcribing(pool: ASRProcessPool, busy: threading.Event) -> None:
+    while busy.is_set():
+        try:
+            pool.transcribe(AUDIO)
+        except RuntimeError:
+            # the batch of a killed replica fails
+            pass
+
+
+def test_core_sets():
+    assert core_sets(2, [0, 1, 2, 3, 4]) == [[0, 1, 2], [3, 4]]
+    assert core_sets(3, [0, 1]) == [[0], [1], [0]]
+
+
+def test_resize_starts_replicas_outside_the_lock(monkeypatch):
+    pool = ASRProcessPool(partial(FakeModel, cost_ms=1, text='x'), 1, warmup_s=0,
+                          pin_cores=False)
+    try:
+        monkeypatch.setattr(asr_pool, '_Replica', SlowStart)
+        busy = threading.Event()
+        busy.set()
+        times = []
+        caller = threading.Thread(target=call_times, args=(pool, busy, times))
+        caller.start()
+        start = time.perf_counter()
+        pool.resize(3)
+        resized = time.perf_counter() - start
+        busy.clear()
+        caller.join()
+        assert resized >= 2 * SlowStart.delay
+        # the running replica kept serving while two more started
+        assert len(times) > 5 and max(times) < SlowStart.delay / 2
+        assert wait_for(lambda: len(pool.pids()) == 3)
+        assert pool.transcribe(AUDIO) == ['x']
+    finally:
+        pool.close()
+
+
+def test_killed_replica_is_restarted_outside_the_lock(monkeypatch):
+    pool = ASRProcessPool(partial(FakeModel, cost_ms=1, text='x'), 2, warmup_s=0,
+                          pin_cores=False, health_s=0.2)
+    try:
+        monkeypatch.setattr(asr_pool, '_Replica', SlowStart)
+        busy = threading.Event()
+        busy.set()
+        times = []
+        threads = [threading.Thread(target=keep_transcribing, args=(pool, busy)),
+                   threading.Thread(target=call_times, args=(pool, busy, times, False))]
+        for t in threads:
+            t.start()
+        os.kill(pool.pids()[0], signal.SIGKILL)
+        assert wait_for(lambda: pool.restarts == 1)
+        assert wait_for(lambda: len(pool.pids()) == 2)
+        busy.clear()
+        for t in threads:
+            t.join()
+        # the pool's lock stayed free while the process started again
+        assert max(times) < SlowStart.delay / 2
+        assert pool.transcribe(AUDIO) == ['x']
+    finally:
+        pool.close()
+
+
+@pytest.mark.skipif(len(available_cores()) < 2, reason='scaling needs more than one core')
+def test_throughput_scales_with_replicas():
+    factory = partial(GILModel, cost_ms=20)
+    rates = []
+    for n in (1, 2):
+        pool = ASRProcessPool(factory, n, warmup_s=0)
+        load = Load(pool, [AUDIO], 2 * n)
+        load.measure(0.5)
+        rates.append(load.measure(2.0))
+        load.stop()
+        pool.close()
+    assert rates[1] > 1.5 * rates[0]
@@ -0,0 +1,102 @@
+import logging
+
+import numpy as np
+import pytest
+
+import backends
+import model_loader
+from benchmarks.backends import TEST_MODEL, build_test_model, tone_utterance
+from model_loader import LoadTimes, load_model
+
+
+class Transducer:
+    """Stands in for a pure TDT model: no CTC head, nothing to export."""
+
+    def __init__(self) -> None:
+        self.decoder = object()
+        self.quantized = False
+
+
+@pytest.fixture
+def nemo(monkeypatch):
+    loaded = []
+
+    def load(name, cache_dir):
+        loaded.append(Transducer())
+        return loaded[-1], LoadTimes('cache', load_s=0.1)
+
+    def quantize(model):
+        model.quantized = True
+        return model
+
+    monkeypatch.setattr(model_loader, '_load_nemo', load)
+    monkeypatch.setattr(backends, 'quantize_nemo', quantize)
+    monkeypatch.setattr(backends, 'set_torch_threads', lambda threads: None)
+    return loaded
+
+
+def test_int8_backends_offered():
+    assert backends.NEMO_INT8 in backends.BACKENDS
+    assert set(backends.NEMO_FALLBACK) == {backends.ONNX, backends.ONNX_INT8}
+
+
+def test_nemo_int8_quantizes(nemo, tmp_path):
+    model, times = load_model('tdt', str(tmp_path), backends.NEMO_INT8)
+    assert model.quantized and times.source == 'cache'
+    model, _ = load_model('tdt', str(tmp_path), backends.NEMO)
+    assert not model.quantized
+
+
+@pytest.mark.parametrize('backend, quantized', [(backends.ONNX, False), (backends.ONNX_INT8, True)])
+def test_onnx_falls_back_for_a_transducer(nemo, tmp_path, caplog, backend, quantized):
+    with caplog.at_level(logging.WARNING, logger='model_loader'):
+        model, times = load_model('tdt', str(tmp_path), backend)
+    assert isinstance(model, Transducer) and model.quantized == quantized
+    assert times.source == 'cache'
+    assert 'no CTC head' in caplog.text
+    # nothing half-exported is left to be picked up next time
+    assert not list(tmp_path.glob('*.onnx*'))
+
+
+def test_onnx_int8_runs_an_exportable_model(tmp_path):
+    build_test_model(str(tmp_path), 256, 2)
+    model, times = load_model(TEST_MODEL, str(tmp_path), backends.ONNX_INT8)
+    assert isinstance(model, backends.OnnxBackend) and times.source == 'export'
+    fp32, _ = load_model(TEST_MODEL, str(tmp_path), backends.ONNX)
+    rng = np.random.default_rng(3)
+    audio = [tone_utterance(rng, 4)[0] for _ in range(10)]
+    same = sum(a == b for a, b in zip(model.transcribe(audio), fp32.transcribe(audio)))
+    assert same >= 8
+    _, times = load_model(TEST_MODEL, str(tmp_path), backends.ONNX_INT8)
+    assert times.source == 'cache'
+
+
+def test_quantize_nemo_quantizes_torch_modules():
+    torch = pytest.importorskip('torch')
+
+    class Hybrid(torch.nn.Module):
+        """Has the parts of a NeMo model that ``quantize_nemo`` looks for."""
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.encoder = torch.nn.Sequential(torch.nn.Linear(16, 32), torch.nn.ReLU())
+            self.decoder = torch.nn.LSTM(32, 32, batch_first=True)
+            self.ctc_decoder = torch.nn.Linear(32, 8)
+            self.joint = None
+
+        def forward(self, x):
+            return self.ctc_decoder(self.decoder(self.encoder(x))[0])
+
+    torch.manual_seed(0)
+    model = Hybrid()
+    x = torch.randn(2, 5, 16)
+    with torch.no_grad():
+        expected = model(x)
+        quantized = backends.quantize_nemo(model)
+        got = quantized(x)
+    assert quantized is model and not model.training
+    dynamic = torch.ao.nn.quantized.dynamic
+    assert isinstance(model.encoder[0], dynamic.Linear)
+    assert isinstance(model.decoder, dynamic.LSTM)
+    assert isinstance(model.ctc_decoder, dynamic.Linear)
+    assert torch.allclose(got, expected, atol=0.05)
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+from scipy.io import wavfile
+
+import constants
+from batch import plan_outputs, transcribe_files
+from benchmarks.fakes import ToneModel
+from sources import synthesize
+
+PATTERN = [(0.3, 'silence'), (1.0, 'tone'), (0.8, 'silence'), (1.2, 'tone'), (0.8, 'silence')]
+
+
+def write_wav(path, freq=300.0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wavfile.write(path, constants.TARGET_RATE, synthesize(constants.TARGET_RATE, PATTERN, freq))
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_transcribes_a_tree_keeping_relative_paths(tmp_path):
+    write_wav(str(tmp_path / 'in' / 'a' / 'x.wav'), 300.0)
+    write_wav(str(tmp_path / 'in' / 'b' / 'x.wav'), 500.0)
+    out = tmp_path / 'out'
+
+    stats = transcribe_files([str(tmp_path / 'in')], ToneModel(), str(out))
+
+    assert (stats.files, stats.skipped, stats.failed, stats.segments) == (2, 0, 0, 4)
+    a = read_jsonl(out / 'a' / 'x.jsonl')
+    b = read_jsonl(out / 'b' / 'x.jsonl')
+    assert [s['text'] for s in a] == ['300', '300']
+    assert [s['text'] for s in b] == ['500', '500']
+    assert a[0]['start'] < a[0]['end'] <= a[1]['start']
+
+
+def test_done_inputs_are_skipped(tmp_path):
+    write_wav(str(tmp_path / 'in' / 'x.wav'))
+    transcribe_files([str(tmp_path / 'in')], ToneModel(), str(tmp_path / 'out'))
+    stats = transcribe_files([str(tmp_path / 'in')], ToneModel(), str(tmp_path / 'out'))
+    assert (stats.files, stats.skipped) == (0, 1)
+
+
+def test_srt(tmp_path):
+    write_wav(str(tmp_path / 'x.wav'))
+    transcribe_files([str(tmp_path / 'x.wav')], ToneModel(), fmt='srt')
+    with open(tmp_path / 'x.srt', encoding='utf-8') as f:
+        blocks = f.read().strip().split('\n\n')
+    assert len(blocks) == 2
+    assert blocks[0].splitlines()[0] == '1'
+    assert ' --> ' in blocks[0].splitlines()[1]
+
+
+def test_same_name_files_passed_directly_collide(tmp_path):
+    write_wav(str(tmp_path / 'a' / 'x.wav'))
+    write_wav(str(tmp_path / 'b' / 'x.wav'))
+    with pytest.raises(ValueError, match='both'):
+        transcribe_files([str(tmp_path / 'a' / 'x.wav'), str(tmp_path / 'b' / 'x.wav')],
+                         ToneModel(), str(tmp_path / 'out'))
+    assert not (tmp_path / 'out').exists()
+
+
+def test_same_stem_side_by_side_collides(tmp_path):
+    write_wav(str(tmp_path / 'x.wav'))
+    write_wav(str(tmp_path / 'x.flac'))
+    with pytest.raises(ValueError):
+        plan_outputs([str(tmp_path)], None, 'jsonl')
+
+
+def test_file_reached_twice_is_planned_once(tmp_path):
+    write_wav(str(tmp_path / 'in' / 'x.wav'))
+    planned = plan_outputs([str(tmp_path / 'in'), str(tmp_path / 'in' / 'x.wav')],
+                           str(tmp_path / 'out'), 'jsonl')
+    assert planned == [(str(tmp_path / 'in' / 'x.wav'), str(tmp_path / 'out' / 'x.jsonl'))]
@@ -0,0 +1,101 @@
+import pytest
+
+import constants
+from benchmarks.cadence import run
+from cadence import MAX_STEP, PartialCadence
+
+
+class LoadedScheduler:
+    """Scheduler whose workers are busy ``utilization`` of the time."""
+
+    def __init__(self, workers: int = 2) -> None:
+        self.workers = workers
+        self.busy = 0.0
+        self.queued = 0
+
+    def busy_time(self) -> float:
+        return self.busy
+
+    def pending(self) -> int:
+        return self.queued
+
+
+def drive(cadence: PartialCadence, scheduler: LoadedScheduler, utilization: float,
+          periods: int, start: float, queued: int = 0) -> float:
+    now = start
+    for _ in range(periods):
+        now += cadence.period
+        scheduler.busy += utilization * cadence.period * scheduler.workers
+        scheduler.queued = queued
+        cadence.update(now)
+    return now
+
+
+def make(interval_ms: float = 1000):
+    scheduler = LoadedScheduler()
+    cadence = PartialCadence(scheduler, interval_ms, 200, 4000, 0.5)
+    cadence._last = 0.0
+    return scheduler, cadence
+
+
+def test_interval_settles_where_utilization_meets_the_target():
+    scheduler, cadence = make()
+    # partials cost time in proportion to their rate
+    now = 0.0
+    for _ in range(40):
+        utilization = min(1.0, 400.0 / cadence.interval_ms)
+        now = drive(cadence, scheduler, utilization, 1, now)
+    assert cadence.interval_ms == pytest.approx(800, rel=0.05)
+    assert cadence.utilization == pytest.approx(0.5, rel=0.05)
+
+
+def test_interval_follows_a_latency_change():
+    scheduler, cadence = make()
+    now = drive(cadence, scheduler, 0.05, 10, 0.0)
+    assert cadence.interval_ms == 200
+    # the model becomes slow: saturated workers back off by MAX_STEP a period
+    drive(cadence, scheduler, 1.0, 1, now)
+    assert cadence.interval_ms == 200 * MAX_STEP
+    now = drive(cadence, scheduler, 1.0, 10, now)
+    assert cadence.interval_ms == 4000
+    drive(cadence, scheduler, 0.05, 10, now)
+    assert cadence.interval_ms == 200
+
+
+def test_queued_jobs_slow_partials_down():
+    scheduler, cadence = make()
+    # finals and chunks keep the queue full at moderate utilization
+    drive(cadence, scheduler, 0.4, 5, 0.0, queued=4)
+    assert cadence.interval_ms == 4000
+    assert cadence.stats()['pending'] == 4
+
+
+def test_idle_workers_keep_the_interval():
+    scheduler, cadence = make(1500)
+    assert not cadence.update(10.0)
+    assert cadence.interval_ms == 1500
+
+
+def test_bounds():
+    _, cadence = make(100000)
+    assert cadence.interval_ms == 4000
+    cadence.configure(500, 300, 2.0)
+    assert (cadence.min_ms, cadence.max_ms, cadence.target) == (300, 300, 1.0)
+    assert cadence.frames(30) == 10
+
+
+def test_cadence_adapts_while_the_model_slows_down():
+    phase_s = 5.0
+    result = run(True, constants.PARTIAL_INTERVAL_MS, 3, phase_s)
+    timeline = [(t, stats['interval_ms']) for t, stats, _ in result['timeline']]
+    fast = [ms for t, ms in timeline if t <= phase_s]
+    slow = [ms for t, ms in timeline if phase_s < t <= 2 * phase_s]
+    again = [ms for t, ms in timeline if t > 2 * phase_s]
+    assert min(fast) <= 2 * constants.PARTIAL_MIN_MS
+    assert max(slow) >= 4 * min(fast)
+    assert min(again) <= 2 * constants.PARTIAL_MIN_MS
+    fast, slow, _ = result['phases']
+    # partials give way to finals while the model is slow, and every segment still gets its final
+    assert slow['partials'] < fast['partials']
+    assert fast['finals'] > 0 and slow['finals'] > 0
+    assert slow['final_max'] < 1000 * phase_s
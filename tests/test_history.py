@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import constants
+from history import HistoryStore
+
+
+class FlakyConnection:
+    """Connection whose inserts raise ``error`` while ``failures`` lasts."""
+
+    def __init__(self, db: sqlite3.Connection, store) -> None:
+        self.db = db
+        self.store = store
+
+    def executemany(self, sql, rows):
+        if self.store.failures and sql.startswith('INSERT INTO lines'):
+            self.store.failures -= 1
+            self.store.attempts += 1
+            raise self.store.error("database is locked")
+        return self.db.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+    def __enter__(self):
+        return self.db.__enter__()
+
+    def __exit__(self, *exc):
+        return self.db.__exit__(*exc)
+
+
+class FlakyStore(HistoryStore):
+    failures = 0
+    attempts = 0
+    error = sqlite3.OperationalError
+
+    def _connect(self):
+        db = super()._connect()
+        # only the writer's connection fails
+        if threading.current_thread().name == 'history-writer':
+            return FlakyConnection(db, self)
+        return db
+
+
+@pytest.fixture(autouse=True)
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(constants, 'HISTORY_RETRY_S', 0.02)
+    monkeypatch.setattr(constants, 'HISTORY_RETRY_MAX_S', 0.05)
+
+
+def texts(records):
+    return [r.text for r in records]
+
+
+def test_append_tail_search(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'))
+    for i in range(100):
+        store.append(f"line {i}", device='mic' if i % 2 else 'desk', ts=1000.0 + i)
+    # queued lines are visible before they are written
+    assert texts(store.tail(3)) == ['line 97', 'line 98', 'line 99']
+    assert store.flush(5)
+    assert store.count() == 100
+    assert texts(store.tail(2)) == ['line 98', 'line 99']
+    assert texts(store.search('line 42')) == ['line 42']
+    assert texts(store.search(since=1095.0, device='mic')) == ['line 99', 'line 97', 'line 95']
+    store.close()
+    reopened = HistoryStore(str(tmp_path / 'h.db'))
+    assert texts(reopened.tail(1)) == ['line 99']
+    reopened.close()
+
+
+def test_rotation_prunes_the_oldest(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'), max_bytes=64 * 1024)
+    for i in range(5000):
+        store.append(f"a fairly long transcript line number {i} " * 2)
+    store.flush(10)
+    assert store.count() < 5000
+    assert texts(store.tail(1)) == [f"a fairly long transcript line number 4999 " * 2]
+    store.close()
+
+
+def test_rotation_drops_a_row_larger_than_the_limit(tmp_path):
+    store = HistoryStore(str(tmp_path / 'h.db'), max_bytes=64 * 1024)
+    store.append('x' * 300 * 1024)
+    assert store.flush(5)
+    assert store.count() == 0
+    assert store.size() <= 64 * 1024
+    store.append('small')
+    assert store.flush(5)
+    assert texts(store.tail(5)) == ['small']
+    store.close()
+
+
+def test_failed_write_is_retried(tmp_path):
+    store = FlakyStore(str(tmp_path / 'h.db'))
+    store.failures = 3
+    for i in range(10):
+        store.append(f"line {i}")
+    # the lines stay visible while their write is retried
+    assert not store.flush(5)
+    assert texts(store.tail(10)) == [f"line {i}" for i in range(10)]
+    store.append('line 10')
+    deadline = time.monotonic() + 5
+    while not store.flush(5) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.attempts == 3 and store.failed == 0
+    store.close()
+    db = sqlite3.connect(str(tmp_path / 'h.db'))
+    rows = [row[0] for row in db.execute("SELECT text FROM lines ORDER BY id")]
+    db.close()
+    assert rows == [f"line {i}" for i in range(11)]
+
+
+def test_bad_rows_are_dropped_not_retried(tmp_path):
+    store = FlakyStore(str(tmp_path / 'h.db'))
+    store.failures = 1
+    store.error = sqlite3.IntegrityError
+    store.append('bad')
+    assert store.flush(5)
+    store.append('good')
+    assert store.flush(5)
+    assert store.attempts == 1
+    assert texts(store.tail(5)) == ['good']
+    store.close()
+
+
+def test_clear_drops_lines_waiting_for_a_retry(tmp_path):
+    store = FlakyStore(str(tmp_path / 'h.db'))
+    store.failures = 1
+    store.append('lost')
+    assert not store.flush(5)
+    store.clear()
+    store.append('kept')
+    assert store.flush(5)
+    assert texts(store.tail(5)) == ['kept']
+    store.close()
+
+
+def test_close_gives_up_on_a_broken_disk(tmp_path):
+    store = FlakyStore(str(tmp_path / 'h.db'))
+    store.failures = 10 ** 6
+    store.append('never written')
+    start = time.monotonic()
+    store.close()
+    assert time.monotonic() - start < 5
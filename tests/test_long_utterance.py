@@ -0,0 +1,46 @@
+import pytest
+
+import constants
+from asr import Transcript
+from benchmarks.long_utterance import errors, run, utterance
+from streaming import join_pieces, stitch
+
+SPEED = 20.0
+COST_MS = 5.0
+PER_SECOND_MS = 20.0
+
+
+def test_stitch_keeps_overlapping_words_once():
+    assert stitch('the quick brown fox', 'brown fox jumps over') == 'the quick brown fox jumps over'
+    # words cut at the chunk edges are kept whole
+    assert stitch('the quick brown fox jum', 'own fox jumps over') == \
+        'the quick brown fox jumps over'
+    assert stitch('a b c', 'd e') == 'a b c d e'
+    assert stitch('', 'd e') == 'd e'
+
+
+def test_join_pieces_splits_the_overlap_on_timings():
+    # the pieces overlap from 2.0 s to 3.0 s, so the seam is at 2.5 s
+    left = Transcript('one two thr', [('one', 0.2, 0.8), ('two', 1.4, 2.2), ('thr', 2.6, 3.0)])
+    right = Transcript('wo three four', [('wo', 0.0, 0.2), ('three', 0.6, 1.2), ('four', 1.5, 2.0)])
+    assert join_pieces([(0.0, 3.0, left), (2.0, 5.0, right)]) == 'one two three four'
+
+
+@pytest.mark.parametrize('mode', ['stitch', 'timestamps'])
+@pytest.mark.parametrize('seconds, seed', [(20.0, 0), (45.0, 1)])
+def test_long_speech_has_no_seam_errors(mode, seconds, seed):
+    pcm, ref = utterance(constants.TARGET_RATE, seconds, seed)
+    result = run(mode, pcm, SPEED, COST_MS, PER_SECOND_MS)
+    hyp = ' '.join(f['text'] for f in result['finals']).split()
+    assert errors(ref, hyp) == (0, 0, 0)
+    assert len(result['finals']) == 1
+
+
+def test_final_latency_does_not_grow_with_length():
+    latency = []
+    for seconds, seed in ((10.0, 2), (60.0, 3)):
+        pcm, _ = utterance(constants.TARGET_RATE, seconds, seed)
+        latency.append(max(run('timestamps', pcm, SPEED, COST_MS, PER_SECOND_MS)['latency']))
+    # decoding all 60 s at once would take over 1.2 s
+    assert latency[1] < 400
+    assert latency[1] < latency[0] + 200
@@ -0,0 +1,114 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from metrics import BOUNDS, STAGES, Histogram, Metrics, MetricsServer, trace_id
+
+
+def test_quantile_interpolates_inside_the_bucket():
+    h = Histogram()
+    for _ in range(10):
+        h.observe(0.002)
+    for _ in range(10):
+        h.observe(0.05)
+    # 0.002 lands in (BOUNDS[9], BOUNDS[10]], 0.05 in (BOUNDS[14], BOUNDS[15]]
+    assert BOUNDS[9] < 0.002 <= BOUNDS[10] and BOUNDS[14] < 0.05 <= BOUNDS[15]
+    assert h.counts[10] == 10 and h.counts[15] == 10
+    assert h.quantile(0.25) == pytest.approx(BOUNDS[9] + (BOUNDS[10] - BOUNDS[9]) * 5 / 10)
+    # the top bucket is capped at the largest value seen
+    assert h.quantile(0.75) == pytest.approx(BOUNDS[14] + (0.05 - BOUNDS[14]) * 5 / 10)
+    assert h.quantile(1.0) == pytest.approx(0.05)
+    assert h.quantile(0.0) == pytest.approx(BOUNDS[9])
+
+
+def test_quantile_of_the_overflow_bucket_and_of_nothing():
+    h = Histogram()
+    assert h.quantile(0.5) == 0.0
+    h.observe(20.0)
+    h.observe(30.0)
+    assert h.counts[-1] == 2
+    assert h.quantile(0.5) == pytest.approx(BOUNDS[-1] + (30.0 - BOUNDS[-1]) / 2)
+    snap = h.snapshot()
+    assert snap['count'] == 2 and snap['mean_ms'] == pytest.approx(25000.0)
+    assert snap['max_ms'] == pytest.approx(30000.0)
+
+
+def parse(text: str):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            key, value = line.rsplit(' ', 1)
+            samples[key] = float(value)
+    return samples
+
+
+def test_prometheus_text_format():
+    m = Metrics(enabled=True)
+    m.observe('vad', 0.002)
+    m.observe('vad', 0.05)
+    m.observe('vad', 20.0)
+    m.gauge('partial_interval_s', 0.75)
+    text = m.prometheus()
+    assert text.endswith('\n')
+    name = 'transcriber_stage_seconds'
+    assert text.count(f'# TYPE {name} histogram') == 1
+    assert '# TYPE transcriber_partial_interval_s gauge' in text
+    samples = parse(text)
+    buckets = [samples[f'{name}_bucket{{stage="vad",le="{b:.6g}"}}'] for b in BOUNDS]
+    # buckets are cumulative and +Inf holds the overflow too
+    assert buckets == sorted(buckets)
+    assert buckets[10] == 1 and buckets[15] == 2 and buckets[-1] == 2
+    assert samples[f'{name}_bucket{{stage="vad",le="+Inf"}}'] == 3
+    assert samples[f'{name}_count{{stage="vad"}}'] == 3
+    assert samples[f'{name}_sum{{stage="vad"}}'] == pytest.approx(20.052)
+    assert samples['transcriber_partial_interval_s'] == 0.75
+    # every stage is exported, observed or not
+    for stage in STAGES:
+        assert samples[f'{name}_count{{stage="{stage}"}}'] == (3 if stage == 'vad' else 0)
+
+
+def test_disabled_metrics_record_nothing():
+    m = Metrics(enabled=False)
+    m.observe('vad', 0.01, trace=('mic', 1))
+    m.since('transcribe', 0.0, trace=('mic', 1))
+    m.trace(('mic', 2), 'transcribe', 0.5)
+    m.gauge('partial_interval_s', 1.0)
+    m.observe('custom', 0.01)
+    assert all(h.count == 0 for h in m.histograms.values())
+    assert set(m.histograms) == set(STAGES)
+    assert not m.traces and not m.gauges
+    snap = m.snapshot()
+    assert not snap['enabled'] and not snap['traces_ms']
+
+
+def test_traces_are_summed_per_segment_and_bounded():
+    m = Metrics(enabled=True, max_traces=2)
+    m.observe('vad', 0.001, trace=('mic', 1))
+    m.observe('vad', 0.002, trace=('mic', 1))
+    m.trace(('mic', 2), 'transcribe', 0.1)
+    m.trace('mic/3', 'transcribe', 0.1)
+    assert trace_id(('mic', 1)) == 'mic/1'
+    assert list(m.traces) == ['mic/2', 'mic/3']
+    m.observe('vad', 0.001, trace=('mic', 1))
+    assert m.traces['mic/1'] == {'vad': pytest.approx(0.001)}
+
+
+def test_metrics_server_serves_both_formats():
+    m = Metrics(enabled=True)
+    m.observe('transcribe', 0.2)
+    server = MetricsServer(0, registry=m)
+    try:
+        base = f'http://127.0.0.1:{server.port}'
+        with urllib.request.urlopen(base + '/metrics', timeout=5) as r:
+            assert r.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+            assert r.read().decode() == m.prometheus()
+        with urllib.request.urlopen(base + '/metrics.json', timeout=5) as r:
+            snap = json.loads(r.read())
+        assert snap['stages']['transcribe']['count'] == 1
+        with pytest.raises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(base + '/nope', timeout=5)
+        assert err.value.code == 404
+    finally:
+        server.stop()
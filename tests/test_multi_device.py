@@ -0,0 +1,58 @@
+import queue
+from collections import defaultdict
+
+from benchmarks.fakes import ToneModel
+from sources import SyntheticSource
+from transcriber import VADTranscriber
+
+RATES = (48000, 44100, 16000, 32000)
+
+
+def run(sources):
+    text_q = queue.Queue()
+    vt = VADTranscriber(text_q, [], ToneModel(cost_ms=2), sources=sources)
+    vt.start()
+    vt.join(30)
+    assert not vt.is_alive()
+    vt.scheduler.shutdown()
+    items = []
+    while not text_q.empty():
+        items.append(text_q.get())
+    return vt, items
+
+
+def test_inputs_are_segmented_independently():
+    bursts = 3
+    sources = []
+    for dev in range(8):
+        # staggered so the inputs talk over each other
+        burst = [(1.5, 'tone'), (0.6 + 0.05 * dev, 'silence')]
+        pattern = [(0.5 + 0.1 * dev, 'silence')] + burst * bursts
+        sources.append(SyntheticSource(dev, pattern, RATES[dev % len(RATES)], 300 + 100 * dev,
+                                       seed=dev, speed=8.0))
+    vt, items = run(sources)
+
+    finals = defaultdict(list)
+    for item in items:
+        if item['final']:
+            finals[item['device']].append(item['text'])
+    assert sorted(finals) == list(range(8))
+    for dev, texts in finals.items():
+        assert len(texts) == bursts
+        # audio from another input would shift the dominant frequency
+        assert texts == [f"{300 + 100 * dev}"] * bursts
+    assert all(s['dropped'] == 0 for s in vt.stats().values())
+
+
+def test_segment_ids_are_per_input():
+    pattern = [(0.3, 'silence'), (1.0, 'tone'), (0.8, 'silence')] * 2
+    sources = [SyntheticSource(name, pattern, 16000, 400, speed=8.0) for name in ('left', 'right')]
+    _, items = run(sources)
+    segs = defaultdict(set)
+    for item in items:
+        if item['final']:
+            segs[item['device']].add(item['id'])
+    assert set(segs) == {'left', 'right'}
+    # each input numbers its own segments
+    assert len(segs['left']) == 2
+    assert segs['left'] == segs['right']
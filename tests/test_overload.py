@@ -0,0 +1,178 @@
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import constants
+from benchmarks.fakes import FakeModel
+from benchmarks.overload import StallingTranscriber
+from ringbuffer import BLOCK, DROP_OLDEST, DROP_SILENCE, FrameRing
+from sources import SyntheticSource, synthesize
+from transcriber import DevicePipeline, PipelineConfig
+
+LOUD = 4000
+QUIET = 0
+
+
+def frame(value: int, n: int = 4) -> np.ndarray:
+    return np.full(n, value, dtype=np.int16)
+
+
+def read_all(ring: FrameRing):
+    out = []
+    while True:
+        f = ring.peek()
+        if f is None:
+            return out
+        out.append(int(f[0]))
+        ring.advance()
+
+
+def test_drop_oldest_keeps_the_newest():
+    ring = FrameRing(4, 4, DROP_OLDEST)
+    for i in range(6):
+        assert ring.push(frame(i + 1))
+    assert (ring.overruns, ring.dropped) == (2, 2)
+    assert read_all(ring) == [3, 4, 5, 6]
+
+
+def test_drop_silence_evicts_quiet_frames_first():
+    ring = FrameRing(8, 4, DROP_SILENCE, silence_level=100, keep_quiet=1)
+    values = [LOUD, QUIET, QUIET + 1, QUIET + 2, QUIET + 3, LOUD + 1, LOUD + 2, LOUD + 3]
+    for v in values:
+        ring.push(frame(v))
+    ring.push(frame(LOUD + 4))
+    got = read_all(ring)
+    # every speech frame survives, in order, and the pause keeps one frame
+    assert [v for v in got if v >= LOUD] == [LOUD, LOUD + 1, LOUD + 2, LOUD + 3, LOUD + 4]
+    assert [v for v in got if v < LOUD][0] == QUIET
+    pushed = values + [LOUD + 4]
+    assert [pushed.index(v) for v in got] == sorted(pushed.index(v) for v in got)
+    assert ring.overruns == 1 and ring.dropped == len(values) + 1 - len(got)
+
+
+def test_drop_silence_falls_back_to_oldest():
+    ring = FrameRing(3, 4, DROP_SILENCE, silence_level=100)
+    for i in range(4):
+        ring.push(frame(LOUD + i))
+    assert read_all(ring) == [LOUD + 1, LOUD + 2, LOUD + 3]
+    assert ring.dropped == 1
+
+
+def test_block_waits_for_the_consumer():
+    ring = FrameRing(2, 4, BLOCK, block_timeout=2.0)
+    ring.push(frame(1))
+    ring.push(frame(2))
+
+    def consume():
+        time.sleep(0.05)
+        ring.peek()
+        ring.advance()
+    t = threading.Thread(target=consume)
+    t.start()
+    assert ring.push(frame(3))
+    t.join()
+    assert (ring.overruns, ring.dropped) == (1, 0)
+    assert read_all(ring) == [2, 3]
+
+
+def test_block_drops_the_new_block_after_its_timeout():
+    ring = FrameRing(2, 4, BLOCK, block_timeout=0.01)
+    ring.push(frame(1))
+    ring.push(frame(2))
+    assert not ring.push(frame(3, 8))
+    assert (ring.overruns, ring.dropped) == (1, 2)
+    assert read_all(ring) == [1, 2]
+
+
+def test_push_with_timeout_counts_nothing():
+    ring = FrameRing(1, 4, DROP_OLDEST)
+    ring.push(frame(1))
+    assert not ring.push(frame(2), timeout=0.01)
+    assert (ring.overruns, ring.dropped) == (0, 0)
+    assert read_all(ring) == [1]
+
+
+def test_frame_being_read_is_never_evicted():
+    ring = FrameRing(2, 4, DROP_OLDEST)
+    ring.push(frame(1))
+    ring.push(frame(2))
+    view = ring.peek()
+    ring.push(frame(3))
+    ring.push(frame(4))
+    assert int(view[0]) == 1
+    ring.advance()
+    assert read_all(ring) == [4]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        FrameRing(2, 4, 'drop-everything')
+
+
+class InlineScheduler:
+    """Answers every job at once with its audio length."""
+
+    def __init__(self) -> None:
+        self.jobs = []
+
+    def submit(self, key, audio, kind, callback) -> None:
+        self.jobs.append((key, len(audio), kind))
+        callback(str(len(audio)))
+
+
+def finals(pattern, preroll_ms):
+    config = PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS, 300, 0,
+                                    constants.MIN_FRAMES, constants.MAX_FRAMES, 0, 0, preroll_ms)
+    text_q = queue.Queue()
+    pipeline = DevicePipeline('mic', constants.TARGET_RATE, config, InlineScheduler(), text_q)
+    pipeline.feed(synthesize(constants.TARGET_RATE, pattern, 440))
+    pipeline.flush()
+    return [item for item in text_q.queue if item['final']]
+
+
+def test_preroll_keeps_the_onset():
+    pattern = [(0.6, 'silence'), (1.0, 'tone'), (0.6, 'silence')]
+    without, = finals(pattern, 0)
+    with_preroll, = finals(pattern, 150)
+    assert without['start'] >= 0.6 - constants.FRAME_MS / 1000
+    assert with_preroll['start'] <= 0.6 - 0.12
+    assert with_preroll['start'] == pytest.approx(without['start'] - 0.15, abs=0.001)
+
+
+def test_next_utterance_is_not_cut_after_a_final():
+    # the second utterance starts right after the first one's final
+    pattern = [(0.3, 'silence'), (1.0, 'tone'), (0.6, 'silence'), (1.0, 'tone'), (0.6, 'silence')]
+    first, second = finals(pattern, 150)
+    assert first['end'] <= second['start']
+    assert second['start'] <= 1.9 - 0.12
+
+
+def overloaded(policy: str):
+    utterances = 4
+    pattern = [(0.5, 'silence')] + [(1.5, 'tone'), (1.5, 'silence')] * utterances
+    source = SyntheticSource('mic', pattern, 48000, 440, speed=5.0)
+    source.live = True
+    text_q = queue.Queue()
+    vt = StallingTranscriber(text_q, [], FakeModel(cost_ms=1), audio_queue_frames=50,
+                             overload_policy=policy, sources=[source])
+    vt.stall = 3.0 / 5.0
+    vt.every = 7.0 / 5.0
+    vt.start()
+    vt.join(30)
+    vt.scheduler.shutdown()
+    speech_blocks = int(1.5 * 1000 / constants.FRAME_MS) * utterances
+    return vt.stats()['mic'], max(0, speech_blocks - vt.speech_fed), vt.max_depth
+
+
+def test_overload_is_bounded_and_counted():
+    oldest, oldest_lost, depth = overloaded(DROP_OLDEST)
+    assert depth <= 50
+    assert oldest['overruns'] > 0 and oldest['dropped'] >= oldest['overruns']
+    silence, silence_lost, depth = overloaded(DROP_SILENCE)
+    assert depth <= 50
+    assert silence['dropped'] > 0
+    # pauses go first, so far less speech is lost
+    assert silence_lost < oldest_lost / 2
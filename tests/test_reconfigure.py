@@ -0,0 +1,52 @@
+import threading
+import tracemalloc
+
+from benchmarks.fakes import FakeModel
+from benchmarks.reconfigure import (Discard, apply, applied, make_sources, round_settings,
+                                    settle, traced)
+from transcriber import VADTranscriber
+
+ROUNDS = 1000
+SWAP_EVERY = 10
+MAX_GROWTH_KB = 512
+
+
+def test_thousand_reconfigurations_keep_threads_and_memory_flat():
+    before = set(threading.enumerate())
+    tracemalloc.start()
+    try:
+        config, workers, batch, wait = round_settings(0)
+        vt = VADTranscriber(Discard(), [], FakeModel(cost_ms=5.0), asr_workers=workers,
+                            asr_max_batch=batch, asr_max_wait_ms=wait, sources=make_sources(0))
+        vt.config = config
+        vt.start()
+        for i in range(1, 51):
+            apply(vt, i)
+        apply(vt, 0)
+        generation = 1
+        vt.set_sources(make_sources(generation))
+        applied(vt)
+        base_threads = settle(vt, workers)
+        base_mem = traced()
+
+        for i in range(1, ROUNDS + 1):
+            apply(vt, i)
+            assert vt.is_alive()
+            if i % SWAP_EVERY == 0:
+                generation += 1
+                vt.set_sources(make_sources(generation))
+                applied(vt)
+        apply(vt, 0)
+        vt.set_sources(make_sources(generation + 1))
+        applied(vt)
+        threads = settle(vt, workers)
+        mem = traced()
+        vt.stop()
+    finally:
+        tracemalloc.stop()
+
+    assert threads == base_threads
+    assert (mem - base_mem) / 1024 <= MAX_GROWTH_KB
+    # stopping joins the loop, the inputs and the ASR workers
+    assert not vt.is_alive()
+    assert [t for t in threading.enumerate() if t not in before and t.is_alive()] == []
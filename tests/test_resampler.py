@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from utils import StreamResampler
+
+TARGET = 16000
+
+
+def tone(rate: int, seconds: float, freq: float = 440.0) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (8000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def feed(resampler: StreamResampler, pcm: np.ndarray, sizes) -> np.ndarray:
+    out, pos, i = [], 0, 0
+    while pos < len(pcm):
+        n = sizes[i % len(sizes)]
+        out.append(resampler.process(pcm[pos:pos + n]))
+        pos += n
+        i += 1
+    return np.concatenate(out)
+
+
+def peak_hz(pcm: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(pcm * np.hanning(len(pcm))))
+    return np.argmax(spectrum) * rate / len(pcm)
+
+
+@pytest.mark.parametrize('rate', [44100, 48000, 32000])
+def test_blocks_or_whole_give_the_same_output(rate):
+    pcm = tone(rate, 2.0) + np.random.default_rng(0).integers(-500, 500, int(rate * 2.0),
+                                                                dtype=np.int16)
+    whole = StreamResampler(rate, TARGET).process(pcm)
+    blocks = feed(StreamResampler(rate, TARGET), pcm, [rate // 100, 1, 7, 4096, 333])
+    assert np.array_equal(whole, blocks)
+
+
+@pytest.mark.parametrize('rate', [44100, 48000, 32000])
+def test_tone_keeps_its_pitch_and_level(rate):
+    out = feed(StreamResampler(rate, TARGET), tone(rate, 2.0, 1000.0), [rate * 30 // 1000])
+    steady = out[TARGET // 10:].astype(np.float64)
+    assert peak_hz(steady, TARGET) == pytest.approx(1000.0, abs=2.0)
+    assert np.sqrt(np.mean(steady ** 2)) == pytest.approx(8000 / np.sqrt(2), rel=0.02)
+
+
+@pytest.mark.parametrize('rate', [44100, 48000, 32000])
+def test_no_drift_over_long_input(rate):
+    seconds = 120.0
+    pcm = tone(rate, seconds, 250.0)
+    block = rate * 30 // 1000
+    resampler = StreamResampler(rate, TARGET)
+    out = feed(resampler, pcm, [block])
+    # never more than one filter period behind the exact count
+    assert len(pcm) * TARGET / rate - resampler.up <= len(out) <= len(pcm) * TARGET / rate
+    # a tone is in the same phase at the end as at the start
+    expected = 8000 * np.sin(2 * np.pi * 250.0 * np.arange(len(out)) / TARGET)
+    head, tail = slice(TARGET, 2 * TARGET), slice(len(out) - TARGET, len(out))
+    lag = [np.argmax(np.correlate(out[s].astype(np.float64), expected[s], 'full'))
+           for s in (head, tail)]
+    assert lag[0] == lag[1]
+
+
+def test_same_rate_passes_through():
+    pcm = tone(TARGET, 0.1)
+    assert np.array_equal(StreamResampler(TARGET, TARGET).process(pcm), pcm)
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from ringbuffer import DROP_OLDEST, DROP_SILENCE, FrameRing, SampleRing
+
+
+def samples(start: int, stop: int) -> np.ndarray:
+    return np.arange(start, stop, dtype=np.int16)
+
+
+def test_sample_ring_wraps_and_keeps_the_newest():
+    ring = SampleRing(10)
+    ring.write(samples(0, 7))
+    ring.write(samples(7, 14))
+    assert (ring.start, ring.end) == (4, 14)
+    assert np.array_equal(ring.read(4, 14), samples(4, 14))
+    with pytest.raises(IndexError):
+        ring.view(3, 10)
+    with pytest.raises(IndexError):
+        ring.view(10, 15)
+
+
+def test_sample_ring_view_is_zero_copy_unless_it_wraps():
+    ring = SampleRing(10)
+    ring.write(samples(0, 14))
+    # positions 10:14 sit in slots 0:4
+    flat = ring.view(10, 14)
+    assert flat.base is ring.data
+    assert np.array_equal(flat, samples(10, 14))
+    wrapped = ring.view(6, 12)
+    assert wrapped.base is not ring.data
+    assert np.array_equal(wrapped, samples(6, 12))
+    # a span ending on the wrap point needs no copy
+    assert ring.view(4, 10).base is ring.data
+    assert np.array_equal(ring.view(4, 14), samples(4, 14))
+    assert len(ring.view(8, 8)) == 0
+
+
+def test_sample_ring_read_is_owned():
+    ring = SampleRing(10)
+    ring.write(samples(0, 5))
+    copy = ring.read(0, 5)
+    ring.write(samples(100, 110))
+    assert np.array_equal(copy, samples(0, 5))
+
+
+def test_sample_ring_oversized_write_keeps_its_tail():
+    ring = SampleRing(10)
+    ring.write(samples(0, 3))
+    ring.write(samples(3, 28))
+    assert (ring.start, ring.end) == (18, 28)
+    assert np.array_equal(ring.read(18, 28), samples(18, 28))
+
+
+@pytest.mark.parametrize('capacity', [4, 10, 25])
+def test_sample_ring_resize_keeps_positions(capacity):
+    ring = SampleRing(10)
+    ring.write(samples(0, 17))
+    ring.resize(capacity)
+    assert ring.end == 17
+    assert ring.start == max(0, 17 - min(capacity, 10))
+    assert np.array_equal(ring.read(ring.start, 17), samples(ring.start, 17))
+    ring.write(samples(17, 40))
+    assert np.array_equal(ring.read(ring.start, 40), samples(40 - capacity, 40))
+
+
+def read_frames(ring: FrameRing):
+    out = []
+    while True:
+        frame = ring.peek()
+        if frame is None:
+            return out
+        out.append(frame.copy())
+        ring.advance()
+
+
+def test_frame_ring_splits_blocks_over_slots():
+    ring = FrameRing(8, 4, DROP_OLDEST)
+    assert ring.push(samples(0, 10))
+    assert len(ring) == 3
+    frames = read_frames(ring)
+    assert [f.tolist() for f in frames] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert len(ring) == 0 and ring.peek() is None
+
+
+def test_frame_ring_wraps_in_order():
+    ring = FrameRing(3, 2, DROP_OLDEST)
+    got = []
+    for i in range(0, 40, 2):
+        assert ring.push(samples(i, i + 2))
+        if i % 4:
+            got.extend(f.tolist() for f in read_frames(ring))
+    got.extend(f.tolist() for f in read_frames(ring))
+    assert sum(got, []) == list(range(40))
+    assert (ring.overruns, ring.dropped) == (0, 0)
+
+
+def test_frame_ring_peek_is_a_view_held_until_advance():
+    ring = FrameRing(2, 4, DROP_OLDEST)
+    ring.push(samples(0, 4))
+    frame = ring.peek()
+    assert frame.base is ring.frames
+    # peeking again returns the same frame until it is released
+    assert ring.peek() is not None and int(ring.peek()[0]) == 0
+    assert len(ring) == 1
+    ring.advance()
+    assert len(ring) == 0
+
+
+def test_frame_ring_drops_a_block_larger_than_the_ring():
+    ring = FrameRing(2, 4, DROP_OLDEST)
+    ring.push(samples(0, 4))
+    assert not ring.push(samples(4, 16))
+    assert ring.dropped == 3
+    assert [f.tolist() for f in read_frames(ring)] == [[0, 1, 2, 3]]
+
+
+def test_frame_ring_switching_to_drop_silence_measures_new_frames_only():
+    ring = FrameRing(3, 4, DROP_OLDEST, silence_level=100)
+    ring.push(np.zeros(4, dtype=np.int16))
+    ring.configure(DROP_SILENCE, 0)
+    ring.push(np.full(4, 5000, dtype=np.int16))
+    ring.push(np.zeros(4, dtype=np.int16))
+    ring.push(np.full(4, 6000, dtype=np.int16))
+    # the frame that was waiting when the policy changed counts as speech
+    assert [int(f[0]) for f in read_frames(ring)] == [0, 5000, 6000]
+    with pytest.raises(ValueError):
+        ring.configure('drop-everything', 0)
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from asr import ModelRunner
+from benchmarks.fakes import FakeModel
+from scheduler import ASRScheduler, CHUNK, FINAL, PARTIAL
+
+AUDIO = np.zeros(1600, dtype=np.int16)
+
+
+def test_results_in_order_and_ending_with_final():
+    model = FakeModel(cost_ms=20)
+    sched = ASRScheduler(ModelRunner(model), workers=2, max_batch=8, max_wait_ms=10)
+    results = defaultdict(list)
+    for seg in range(20):
+        for i in range(5):
+            sched.submit(seg, AUDIO, PARTIAL, lambda text, s=seg, i=i: results[s].append(i))
+        sched.submit(seg, AUDIO, FINAL, lambda text, s=seg: results[s].append('final'))
+        time.sleep(0.005)
+    sched.shutdown()
+
+    assert sorted(results) == list(range(20))
+    for got in results.values():
+        assert got[-1] == 'final'
+        assert got.count('final') == 1
+        assert got[:-1] == sorted(got[:-1])
+    # pending jobs were coalesced and superseded partials dropped
+    assert model.calls < 20 * 6
+    assert sched.stats()['dropped'] > 0
+
+
+def test_final_drops_pending_partial():
+    gate = threading.Event()
+    delivered = []
+    sched = ASRScheduler(ModelRunner(FakeModel()), workers=1, max_batch=1, max_wait_ms=0)
+    # keeps the only worker busy while the rest is queued
+    sched.submit('busy', AUDIO, FINAL, lambda text: gate.wait(5))
+    time.sleep(0.05)
+    sched.submit('seg', AUDIO, PARTIAL, lambda text: delivered.append('partial'))
+    sched.submit('seg', AUDIO, FINAL, lambda text: delivered.append('final'))
+    gate.set()
+    sched.shutdown()
+    assert delivered == ['final']
+    assert sched.stats()['dropped'] == 1
+
+
+def test_finals_and_chunks_run_before_partials():
+    gate = threading.Event()
+    order = []
+    sched = ASRScheduler(ModelRunner(FakeModel()), workers=1, max_batch=1, max_wait_ms=0)
+    sched.submit('busy', AUDIO, FINAL, lambda text: gate.wait(5))
+    time.sleep(0.05)
+    sched.submit('a', AUDIO, PARTIAL, lambda text: order.append('partial a'))
+    sched.submit('b', AUDIO, CHUNK, lambda text: order.append('chunk b'))
+    sched.submit('c', AUDIO, FINAL, lambda text: order.append('final c'))
+    gate.set()
+    sched.shutdown()
+    assert order == ['chunk b', 'final c', 'partial a']
+
+
+def test_slow_callback_does_not_stall_other_workers():
+    other = threading.Event()
+    sched = ASRScheduler(ModelRunner(FakeModel()), workers=2, max_batch=1, max_wait_ms=0)
+    waited = []
+    # the first callback waits for the second, which another worker delivers
+    sched.submit('a', AUDIO, FINAL, lambda text: waited.append(other.wait(5)))
+    sched.submit('b', AUDIO, FINAL, lambda text: other.set())
+    sched.shutdown()
+    assert waited == [True]
+
+
+def test_callback_can_submit():
+    done = threading.Event()
+    sched = ASRScheduler(ModelRunner(FakeModel()), workers=1, max_batch=1, max_wait_ms=0)
+    sched.submit('a', AUDIO, FINAL, lambda text: sched.submit('b', AUDIO, FINAL,
+                                                               lambda text: done.set()))
+    assert done.wait(5)
+    sched.shutdown()
+
+
+def test_failed_call_delivers_none_to_finals_only():
+    class Failing(FakeModel):
+        def transcribe(self, audio, batch_size=1, verbose=False, **kwargs):
+            raise RuntimeError("boom")
+
+    delivered = []
+    sched = ASRScheduler(ModelRunner(Failing()), workers=1, max_batch=4, max_wait_ms=0)
+    sched.submit('a', AUDIO, PARTIAL, lambda text: delivered.append(('partial', text)))
+    sched.submit('b', AUDIO, FINAL, lambda text: delivered.append(('final', text)))
+    sched.shutdown()
+    assert delivered == [('final', None)]
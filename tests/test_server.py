@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import constants
+import server
+from benchmarks.fakes import ToneModel, synth_speech
+from server import TranscriptionServer, parse_header
+from transcriber import PipelineConfig
+
+RATES = (16000, 48000, 44100, 32000)
+
+
+def make_server(**kwargs) -> TranscriptionServer:
+    config = PipelineConfig.from_ms(constants.VAD_MODE, constants.FRAME_MS,
+                                    constants.MAX_SILENCE_MS, 500, constants.MIN_FRAMES,
+                                    constants.MAX_FRAMES, constants.STREAM_CHUNK_MS,
+                                    constants.STREAM_CONTEXT_MS)
+    return TranscriptionServer(ToneModel(cost_ms=kwargs.pop('cost_ms', 5)), config, **kwargs)
+
+
+async def stream(port: int, header: bytes, audio: bytes = b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(header)
+    step = 4096
+    try:
+        for pos in range(0, len(audio), step):
+            writer.write(audio[pos:pos + step])
+            await writer.drain()
+        writer.write_eof()
+    except ConnectionError:
+        pass
+    results = []
+    while True:
+        line = await asyncio.wait_for(reader.readline(), 30)
+        if not line:
+            break
+        results.append(json.loads(line))
+    writer.close()
+    return results
+
+
+def speech(rate: int, freq: int, bursts: int) -> bytes:
+    pattern = [(0.5, False)] + [(1.5, True), (0.6, False)] * bursts
+    return synth_speech(rate, pattern, freq).tobytes()
+
+
+async def serve(srv: TranscriptionServer, *clients):
+    listener = await srv.start('127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        return await asyncio.gather(*(client(port) for client in clients))
+    finally:
+        await srv.close()
+
+
+def test_loopback_clients_get_their_own_finals():
+    srv = make_server(workers=2)
+    freqs = [300 + 100 * i for i in range(6)]
+    clients = [lambda port, i=i: stream(port, json.dumps({'rate': RATES[i % 4]}).encode() + b'\n',
+                                        speech(RATES[i % 4], freqs[i], 3))
+               for i in range(6)]
+    results = asyncio.run(serve(srv, *clients))
+    for freq, res in zip(freqs, results):
+        # two ASR workers may deliver a later segment first; ids give the order
+        finals = sorted((r for r in res if r['final']), key=lambda r: r['id'])
+        assert [r['text'] for r in finals] == [str(freq)] * 3
+        # each final has its own segment id and covers audio after the one before
+        assert len({r['id'] for r in finals}) == 3
+        assert all(a['end'] <= b['start'] for a, b in zip(finals, finals[1:]))
+    assert srv.connections == {}
+
+
+def test_backpressure_still_delivers_every_final():
+    srv = make_server(workers=1, max_inflight=1, cost_ms=40)
+    clients = [lambda port, i=i: stream(port, b'{"rate": 16000}\n', speech(16000, 300 + 200 * i, 3))
+               for i in range(3)]
+    results = asyncio.run(serve(srv, *clients))
+    for i, res in enumerate(results):
+        assert [r['text'] for r in res if r['final']] == [str(300 + 200 * i)] * 3
+
+
+@pytest.mark.parametrize('header', [
+    b'{"rate": null}\n', b'{"rate": 0}\n', b'{"rate": -16000}\n', b'{"rate": 10000000}\n',
+    b'{"rate": "16000"}\n', b'{"rate": true}\n', b'{"rate": Infinity}\n', b'[16000]\n',
+    b'not json\n', b'\xff\xfe\n',
+])
+def test_bad_header_closes_connection(header):
+    srv = make_server()
+    good = lambda port: stream(port, b'{"rate": 16000}\n', speech(16000, 400, 1))
+    bad, after = asyncio.run(serve(srv, lambda port: stream(port, header, b'\0' * 3200), good))
+    assert bad == []
+    # the server keeps serving others
+    assert [r['text'] for r in after if r['final']] == ['400']
+
+
+def test_parse_header():
+    assert parse_header(b'') == constants.TARGET_RATE
+    assert parse_header(b'{}\n') == constants.TARGET_RATE
+    assert parse_header(b'{"rate": 44100}\n') == 44100
+    with pytest.raises(TypeError):
+        parse_header(b'{"rate": 16000.0}\n')
+    with pytest.raises(ValueError):
+        parse_header(b'{"rate": 7999}\n')
+
+
+def test_pipelines_are_fed_off_the_event_loop(monkeypatch):
+    threads = set()
+    feed = server.DevicePipeline.feed
+
+    def spy(self, pcm):
+        threads.add(threading.current_thread().name)
+        return feed(self, pcm)
+
+    monkeypatch.setattr(server.DevicePipeline, 'feed', spy)
+    srv = make_server()
+    results = asyncio.run(serve(srv, lambda port: stream(port, b'{"rate": 16000}\n',
+                                                         speech(16000, 500, 1))))
+    assert [r['text'] for r in results[0] if r['final']] == ['500']
+    assert threads and all(name.startswith('feed') for name in threads)
+    assert srv.audio_s == pytest.approx(0.5 + 2.1, abs=0.05)
+    assert srv.feed_s > 0
+
+
+def test_no_qt_or_sounddevice():
+    code = ("import sys, server; "
+            "print('PySide6' in sys.modules, 'sounddevice' in sys.modules)")
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.split() == ['False', 'False']
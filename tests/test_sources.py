@@ -0,0 +1,103 @@
+import threading
+import time
+
+import numpy as np
+
+import sources
+from sources import AudioSource, CaptureSource, FileSource, SyntheticSource, open_capture
+
+PATTERN = [(0.3, 'silence'), (1.0, 'tone'), (0.5, 'noise'), (0.6, 'silence')]
+
+
+class LiveBlocks(AudioSource):
+    """Live source calling its sink from a thread, timing every call."""
+    live = True
+
+    def __init__(self, pcm: np.ndarray, rate: int, block: int) -> None:
+        super().__init__('live', rate)
+        self.pcm = pcm
+        self.block = block
+        self.calls = []
+        self._thread = None
+
+    def start(self, sink, done) -> None:
+        def run():
+            for pos in range(0, len(self.pcm), self.block):
+                start = time.perf_counter()
+                sink(self.pcm[pos:pos + self.block])
+                self.calls.append(time.perf_counter() - start)
+            done()
+        self._thread = threading.Thread(target=run)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._thread.join()
+
+
+class SlowFile:
+    def __init__(self, f, delay: float) -> None:
+        self.f = f
+        self.delay = delay
+
+    def write(self, data) -> int:
+        time.sleep(self.delay)
+        return self.f.write(data)
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def collect(source: AudioSource) -> np.ndarray:
+    blocks = []
+    finished = threading.Event()
+    source.start(lambda pcm: blocks.append(np.array(pcm)), finished.set)
+    assert finished.wait(10)
+    source.stop()
+    return np.concatenate(blocks)
+
+
+def test_replayed_capture_is_lossless(tmp_path):
+    inner = SyntheticSource('mic', PATTERN, 48000, 440, speed=None)
+    capture = CaptureSource(inner, str(tmp_path / 'session'), buffer_ms=60)
+    delivered = collect(capture)
+
+    samples, rate = open_capture(str(tmp_path / 'session.pcm'))
+    assert rate == 48000
+    assert np.array_equal(samples, inner.pcm)
+    assert np.array_equal(delivered, inner.pcm)
+    assert capture.samples == len(inner.pcm) and capture.dropped == 0
+    assert np.array_equal(FileSource(str(tmp_path / 'session.pcm')).pcm, inner.pcm)
+
+
+def test_live_callback_does_not_wait_for_the_disk(tmp_path, monkeypatch):
+    real_open = open
+    monkeypatch.setattr(sources, 'open',
+                        lambda path, mode='r', **kw: SlowFile(real_open(path, mode, **kw), 0.02)
+                        if mode == 'wb' else real_open(path, mode, **kw), raising=False)
+    pcm = np.arange(16000 * 2, dtype=np.int16)
+    inner = LiveBlocks(pcm, 16000, 480)
+    capture = CaptureSource(inner, str(tmp_path / 'live'))
+    collect(capture)
+
+    # 67 writes of 20 ms each happen after the callbacks, not inside them
+    assert sum(inner.calls) < 0.3
+    samples, _ = open_capture(str(tmp_path / 'live.pcm'))
+    assert np.array_equal(samples, pcm)
+
+
+def test_live_capture_drops_oldest_when_the_disk_falls_behind(tmp_path, monkeypatch):
+    real_open = open
+    monkeypatch.setattr(sources, 'open',
+                        lambda path, mode='r', **kw: SlowFile(real_open(path, mode, **kw), 0.05)
+                        if mode == 'wb' else real_open(path, mode, **kw), raising=False)
+    pcm = np.arange(16000, dtype=np.int16)
+    inner = LiveBlocks(pcm, 16000, 480)
+    capture = CaptureSource(inner, str(tmp_path / 'live'), buffer_ms=90)
+    delivered = collect(capture)
+
+    assert np.array_equal(delivered, pcm)
+    assert capture.dropped > 0
+    samples, _ = open_capture(str(tmp_path / 'live.pcm'))
+    assert len(samples) == capture.samples == len(pcm) - 480 * capture.dropped
+    # what was written is in order
+    assert np.all(np.diff(samples.astype(np.int64)) > 0)
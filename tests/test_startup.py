@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import model_loader
+from asr import ModelRunner
+from benchmarks.startup import ColdModel
+from model_loader import ModelLoader, load_model
+from sources import synthesize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+import settings
+settings._SETTINGS_FILE = 'settings.json'
+import overlay
+from PySide6.QtWidgets import QApplication
+from benchmarks.fakes import FakeModel
+from sources import SyntheticSource
+
+models = []
+
+def factory():
+    time.sleep(1.0)
+    models.append(FakeModel(cost_ms=5))
+    return models[-1]
+
+app = QApplication([])
+source = SyntheticSource('mic', [(5.0, 'silence')], speed=1.0)
+w = overlay.Overlay(factory=factory, sources=[source], history_db='history.db')
+w.show()
+app.processEvents()
+heavy = [m for m in ('nemo', 'nemo.collections.asr', 'torch', 'sounddevice') if m in sys.modules]
+loading = w.text.toPlainText()
+deadline = time.monotonic() + 20
+while w.transcriber is None and time.monotonic() < deadline:
+    app.processEvents()
+    time.sleep(0.01)
+print(json.dumps({{'heavy': heavy, 'loading': loading, 'live': w.transcriber is not None,
+                  'warm_calls': models[0].calls if models else 0}}))
+w.shutdown()
+"""
+
+
+def load(warmup_s: float, factory):
+    result = {}
+    finished = threading.Event()
+
+    def done(model, times, error):
+        result.update(model=model, times=times, error=error,
+                      calls=getattr(model, 'calls', None))
+        finished.set()
+
+    loader = ModelLoader(done, warmup_s=warmup_s, factory=factory)
+    loader.start()
+    assert finished.wait(10)
+    loader.join()
+    return result
+
+
+def test_model_is_warm_when_reported_ready():
+    res = load(0.5, lambda: ColdModel(300, cost_ms=5))
+    assert res['error'] is None
+    # the warm-up call happened before ``done``
+    assert res['calls'] == 1
+    times = res['times']
+    assert times.source == 'factory'
+    assert times.warmup_s >= 0.3
+    assert times.ready_s >= times.load_s + times.warmup_s
+    start = time.perf_counter()
+    ModelRunner(res['model']).transcribe([synthesize(16000, [(1.0, 'tone')])])
+    assert time.perf_counter() - start < 0.2
+
+
+def test_without_warm_up_the_first_call_is_cold():
+    res = load(0.0, lambda: ColdModel(300, cost_ms=5))
+    assert res['calls'] == 0 and res['times'].warmup_s == 0.0
+    start = time.perf_counter()
+    ModelRunner(res['model']).transcribe([synthesize(16000, [(1.0, 'tone')])])
+    assert time.perf_counter() - start >= 0.3
+
+
+def test_load_error_is_reported():
+    def factory():
+        raise OSError('no such model')
+    res = load(0.5, factory)
+    assert res['model'] is None and res['times'] is None
+    assert isinstance(res['error'], OSError)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        load_model(backend='tensorrt')
+
+
+def test_cache_path(tmp_path):
+    assert model_loader.cache_path('nvidia/parakeet', str(tmp_path)) == \
+        str(tmp_path / 'nvidia__parakeet.nemo')
+
+
+def test_window_shows_before_the_model_loads(tmp_path):
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    out = subprocess.run([sys.executable, '-c', _CHILD.format(root=ROOT)], cwd=str(tmp_path),
+                         env=env, capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    assert res['heavy'] == []
+    assert res['loading'] == 'Loading speech model...'
+    # capture went live only after the warm-up call
+    assert res['live'] and res['warm_calls'] >= 1
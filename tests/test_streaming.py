@@ -0,0 +1,99 @@
+import pytest
+
+from asr import Transcript
+from streaming import SegmentStream, join_pieces, stitch
+
+FRAME_S = 0.03
+CHUNK = 100
+CONTEXT = 33
+
+
+def spoken(start: float, end: float) -> Transcript:
+    """What a model with word timings hears of ``start``..``end`` seconds.
+
+    Word ``i`` is said from ``0.5 i`` to ``0.5 i + 0.3``; words cut by
+    either edge are heard only in part.
+    """
+    words = []
+    i = max(0, int(start / 0.5) - 1)
+    while 0.5 * i < end:
+        a, b = 0.5 * i, 0.5 * i + 0.3
+        if b > start:
+            heard = f'w{i}' if a >= start and b <= end else f'w{i}'[:2]
+            words.append((heard, max(a, start) - start, min(b, end) - start))
+        i += 1
+    return Transcript(' '.join(w for w, _, _ in words), words)
+
+
+def test_boundary_word_heard_by_both_pieces_is_kept_once():
+    # overlap 2.0 - 3.0 s, seam at 2.5 s; 'two' is whole in both pieces
+    left = Transcript('one two', [('one', 0.5, 1.0), ('two', 2.2, 2.7)])
+    right = Transcript('two three', [('two', 0.2, 0.7), ('three', 1.5, 2.0)])
+    assert join_pieces([(0.0, 3.0, left), (2.0, 5.0, right)]) == 'one two three'
+    # a word centred on the seam goes to the later piece only
+    left = Transcript('one two', [('one', 0.5, 1.0), ('two', 2.3, 2.7)])
+    right = Transcript('two three', [('two', 0.3, 0.7), ('three', 1.5, 2.0)])
+    assert join_pieces([(0.0, 3.0, left), (2.0, 5.0, right)]) == 'one two three'
+
+
+def test_empty_piece_in_the_middle():
+    left = Transcript('one', [('one', 0.5, 1.0)])
+    empty = Transcript('', [])
+    right = Transcript('four', [('four', 1.0, 1.5)])
+    pieces = [(0.0, 3.0, left), (2.0, 5.0, empty), (4.0, 7.0, right)]
+    assert join_pieces(pieces) == 'one four'
+    # without timings the empty text is skipped over by stitching
+    assert join_pieces([(a, b, str(t)) for a, b, t in pieces]) == 'one four'
+    assert join_pieces([(0.0, 3.0, empty)]) == ''
+
+
+def test_pieces_without_timings_are_stitched():
+    left = Transcript('one two three', [('one', 0.2, 0.5), ('two', 1.0, 1.4), ('three', 2.1, 2.6)])
+    # one piece without timings makes the whole join fall back to matching words
+    pieces = [(0.0, 3.0, left), (2.0, 5.0, 'three four')]
+    assert join_pieces(pieces) == stitch('one two three', 'three four') == 'one two three four'
+
+
+def test_stitch_keeps_a_repeated_word_outside_the_overlap():
+    assert stitch('go go', 'go now') == 'go go now'
+    assert stitch('Hello, world.', 'world hello') == 'Hello, world. hello'
+    assert stitch('a b', '') == 'a b'
+
+
+def decode(start: int, end: int) -> Transcript:
+    return spoken(start * FRAME_S, end * FRAME_S)
+
+
+def test_chunks_out_of_order_hold_the_final_back():
+    stream = SegmentStream(1, CHUNK, CONTEXT, frame_ms=30)
+    n = 350
+    chunks = []
+    while (chunk := stream.next_chunk(n)) is not None:
+        chunks.append(chunk)
+    assert [(s, e) for _, s, e in chunks] == [(0, 100), (67, 200), (167, 300)]
+    start = stream.tail_start()
+    assert start == 267
+    assert stream.chunk_done(2, decode(*chunks[2][1:])) is None
+    assert stream.final_done(start, decode(start, n)) is None
+    assert stream.chunk_done(0, decode(*chunks[0][1:])) is None
+    final = stream.chunk_done(1, decode(*chunks[1][1:]))
+    assert final == str(spoken(0.0, n * FRAME_S))
+
+
+def test_partial_cost_stays_flat_as_the_segment_grows():
+    stream = SegmentStream(1, CHUNK, CONTEXT, frame_ms=30)
+    decoded = []
+    # twenty minutes of speech, a partial every ten frames
+    for n in range(10, 40000, 10):
+        while (chunk := stream.next_chunk(n)) is not None:
+            idx, start, end = chunk
+            stream.chunk_done(idx, decode(start, end))
+        start = stream.tail_start()
+        text = stream.partial_done(start, decode(start, n))
+        decoded.append(n - start)
+    # no partial decodes more than one chunk and its context
+    assert max(decoded) <= CHUNK + CONTEXT
+    early, late = decoded[50:200], decoded[-150:]
+    assert max(late) == max(early)
+    assert sum(late) / len(late) == pytest.approx(sum(early) / len(early), rel=0.1)
+    assert text == str(spoken(0.0, 39990 * FRAME_S))
@@ -0,0 +1,134 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PySide6.QtWidgets')
+
+from PySide6.QtCore import QEvent, QObject, Qt  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from transcript_view import FrameCoalescer, ResultQueue, TranscriptView  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def view(app):
+    view = TranscriptView()
+    view.document().setMaximumBlockCount(4)
+    view.resize(300, 200)
+    view.show()
+    app.processEvents()
+    yield view
+    view.close()
+
+
+class Paints(QObject):
+    """Counts paint events of the widget it is installed on."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, obj, event) -> bool:
+        if event.type() == QEvent.Paint:
+            self.count += 1
+        return False
+
+
+def pump(app, seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        time.sleep(0.002)
+
+
+def redraws_forbidden(view, monkeypatch) -> None:
+    def redraw(lines, partial):
+        raise AssertionError('view was redrawn')
+    monkeypatch.setattr(view, 'show_lines', redraw)
+
+
+def test_partial_is_replaced_in_place(view, monkeypatch):
+    finals = ['one', 'two']
+    view.show_lines(finals, 'thr')
+    first = view.document().firstBlock()
+    redraws_forbidden(view, monkeypatch)
+    for partial in ('three', 'three fo', 'three four'):
+        view.apply([], partial, lambda: finals)
+        assert view.toPlainText() == '\n'.join(finals + [partial])
+        assert view.document().blockCount() == 3
+    # the lines above the partial were left alone
+    assert view.document().firstBlock() == first and first.text() == 'one'
+
+
+def test_final_is_appended_and_takes_the_partials_place(view, monkeypatch):
+    finals = ['one', 'two']
+    view.show_lines(finals, 'three fo')
+    redraws_forbidden(view, monkeypatch)
+    finals.append('three four')
+    view.apply(['three four'], 'five', lambda: finals)
+    assert view.toPlainText() == 'one\ntwo\nthree four\nfive'
+    finals.append('five six')
+    view.apply(['five six'], '', lambda: finals[-4:])
+    assert view.toPlainText() == 'one\ntwo\nthree four\nfive six'
+    assert not view.partial_shown
+    # with the block limit reached, the oldest line goes when a final is added
+    finals.append('seven')
+    view.apply(['seven'], '', lambda: finals[-4:])
+    assert view.toPlainText() == 'two\nthree four\nfive six\nseven'
+
+
+def test_vanished_partial_redraws(view):
+    view.show_lines(['one'], 'two')
+    view.apply([], '', lambda: ['one'])
+    assert view.toPlainText() == 'one' and not view.partial_shown
+
+
+def test_burst_is_coalesced_into_one_repaint(app, view):
+    paints = Paints()
+    view.viewport().installEventFilter(paints)
+    renders = []
+    partial = ['']
+
+    def render() -> None:
+        renders.append(time.perf_counter())
+        view.apply([], partial[0], lambda: [])
+
+    coalescer = FrameCoalescer(view, render, frame_ms=50)
+    # the first request after idle renders at once
+    coalescer.request()
+    assert len(renders) == 1
+    pump(app, 0.1)
+    paints.count = 0
+    # a burst within one frame is drawn once, at the end of the frame
+    coalescer.request()
+    for i in range(20):
+        partial[0] = f'word {i}'
+        coalescer.request()
+    assert len(renders) == 2
+    pump(app, 0.2)
+    assert len(renders) == 3
+    assert renders[2] - renders[1] >= 0.045
+    assert view.toPlainText() == 'word 19'
+    assert 1 <= paints.count <= 2
+    view.viewport().removeEventFilter(paints)
+
+
+def test_result_queue_signals_once_per_batch(app):
+    results = ResultQueue()
+    batches = []
+    results.ready.connect(lambda: batches.append(results.drain()), Qt.QueuedConnection)
+    for i in range(5):
+        results.put({'id': i})
+    assert not batches
+    app.processEvents()
+    assert [len(b) for b in batches] == [5]
+    results.put({'id': 5})
+    app.processEvents()
+    assert [len(b) for b in batches] == [5, 1]
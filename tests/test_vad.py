@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+import constants
+from sources import synthesize
+from vad import GATE_HANGOVER, GATE_SAMPLE_EVERY, EnergyEngine, VoiceDetector, make_engine
+
+RATE = constants.TARGET_RATE
+FLEN = RATE * constants.FRAME_MS // 1000
+
+
+class SpyEngine:
+    """Says speech to every frame it is shown and remembers which ones it saw."""
+
+    def __init__(self) -> None:
+        self.seen = []
+
+    def set_mode(self, mode: int) -> None:
+        pass
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        self.seen.extend(f.tobytes() for f in frames)
+        return np.ones(len(frames), dtype=bool)
+
+
+def frames_of(pcm: np.ndarray) -> np.ndarray:
+    return pcm[:len(pcm) // FLEN * FLEN].reshape(-1, FLEN)
+
+
+def run(detector: VoiceDetector, frames: np.ndarray, block: int = 5) -> np.ndarray:
+    return np.concatenate([detector.classify(frames[i:i + block])
+                           for i in range(0, len(frames), block)])
+
+
+def hum(seconds: float, level: float = 6000.0) -> np.ndarray:
+    # loud, but crossing zero far too rarely for a voice
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (level * np.sin(2 * np.pi * 20.0 * t)).astype(np.int16)
+
+
+@pytest.mark.parametrize('pcm', [
+    synthesize(RATE, [(3.0, 'silence')]),
+    synthesize(RATE, [(3.0, 'noise')], level=80.0),
+    hum(3.0),
+], ids=['silence', 'quiet noise', 'hum'])
+def test_pauses_stay_behind_the_gate(pcm):
+    frames = frames_of(pcm)
+    spy = SpyEngine()
+    detector = VoiceDetector(spy, gate_level=constants.VAD_GATE_LEVEL)
+    flags = run(detector, frames)
+    assert not flags.any()
+    # the engine only sees its noise samples, and their verdict is ignored
+    assert len(spy.seen) == -(-len(frames) // GATE_SAMPLE_EVERY)
+    assert detector.gated == len(frames) - len(spy.seen)
+
+
+def test_speech_onset_and_offset_pass_the_gate():
+    pcm = synthesize(RATE, [(0.6, 'silence'), (0.9, 'tone'), (0.9, 'silence')])
+    frames = frames_of(pcm)
+    spy = SpyEngine()
+    flags = run(VoiceDetector(spy, gate_level=constants.VAD_GATE_LEVEL), frames, block=4)
+    onset, offset = int(0.6 * RATE) // FLEN, int(1.5 * RATE) // FLEN
+    # the first frame holding the tone already passes
+    assert not flags[:onset].any()
+    assert flags[onset + 1:offset].all()
+    assert flags[onset] or flags[onset + 1]
+    # the engine decides the hangover after the tone ends, then the gate shuts
+    assert flags[offset:offset + GATE_HANGOVER].all()
+    assert not flags[offset + GATE_HANGOVER + 1:].any()
+    seen = set(spy.seen)
+    assert all(f.tobytes() in seen for f in frames[onset + 1:offset + GATE_HANGOVER])
+
+
+def test_gate_hysteresis():
+    level = constants.VAD_GATE_LEVEL
+    t = np.arange(20 * FLEN) / RATE
+    tone = np.sin(2 * np.pi * 300.0 * t)
+    # between the release and the onset level: rms 0.75 of the gate level
+    between = (0.75 * level * np.sqrt(2) * tone).astype(np.int16)
+    loud = (4 * level * tone).astype(np.int16)
+    # not loud enough to open the gate
+    assert not run(VoiceDetector(SpyEngine(), level), frames_of(between)).any()
+    # but enough to keep it open once speech opened it
+    flags = run(VoiceDetector(SpyEngine(), level), frames_of(np.concatenate([loud, between])))
+    assert flags.all()
+
+
+def test_gate_level_zero_sends_everything():
+    frames = frames_of(synthesize(RATE, [(1.0, 'silence')]))
+    spy = SpyEngine()
+    assert run(VoiceDetector(spy, gate_level=0), frames).all()
+    assert len(spy.seen) == len(frames)
+
+
+def test_energy_engine_and_registry():
+    engine = make_engine('energy', 0)
+    assert isinstance(engine, EnergyEngine)
+    frames = frames_of(synthesize(RATE, [(0.3, 'silence'), (0.3, 'tone')]))
+    flags = engine.classify(frames)
+    assert not flags[:9].any() and flags[11:].all()
+    with pytest.raises(ValueError):
+        make_engine('nope', 0)
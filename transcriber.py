@@ -1,139 +1,604 @@
-import os
+import time
 import queue
 import threading
 import logging
-from concurrent.futures import ThreadPoolExecutor
-import tempfile
-import contextlib
+import dataclasses
+from dataclasses import dataclass
+from functools import partial
 
-from utils import resample_pcm
+from utils import StreamResampler
+from ringbuffer import FrameRing, SampleRing
+from sources import AudioSource, DeviceSource
+from asr import ModelRunner
+from cadence import PartialCadence
+from streaming import SegmentStream
+from scheduler import ASRScheduler, PARTIAL, FINAL, CHUNK
+from metrics import METRICS, trace_id
+from vad import VoiceDetector, make_engine
 import constants
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
 import numpy as np
-import webrtcvad
-from scipy.io.wavfile import write as wav_write
-import sounddevice as sd
 
 logger = logging.getLogger(__name__)
 
-class VADTranscriber(threading.Thread):
-    def __init__(self, text_queue: queue.Queue, devices: List[int], model,
-                 vad_mode: int = constants.VAD_MODE,
-                 frame_ms: int = constants.FRAME_MS,
-                 max_silence_ms: int = constants.MAX_SILENCE_MS,
-                 partial_interval_ms: int = constants.PARTIAL_INTERVAL_MS,
-                 min_frames: int = constants.MIN_FRAMES,
-                 max_frames: int = constants.MAX_FRAMES) -> None:
-        super().__init__(daemon=True)
+@dataclass
+class PipelineConfig:
+    """Segmentation parameters shared by every device pipeline, in frames."""
+    frame_ms: int
+    vad_mode: int
+    max_silence: int
+    partial_frames: int
+    min_frames: int
+    max_frames: int
+    stream_chunk: int
+    stream_context: int
+    preroll: int
+    # device blocks held while the VAD loop is behind, and what to drop
+    queue_frames: int = constants.AUDIO_QUEUE_FRAMES
+    overload_policy: str = constants.OVERLOAD_POLICY
+    vad_engine: str = constants.VAD_ENGINE
+    vad_gate_level: int = constants.VAD_GATE_LEVEL
+    # partial interval steered by the ASR load, from partial_frames, within these bounds
+    partial_adaptive: bool = constants.PARTIAL_ADAPTIVE
+    partial_min: int = constants.PARTIAL_MIN_MS // constants.FRAME_MS
+    partial_max: int = constants.PARTIAL_MAX_MS // constants.FRAME_MS
+    partial_target: float = constants.PARTIAL_TARGET_UTIL
+
+    @classmethod
+    def from_ms(cls, vad_mode: int, frame_ms: int, max_silence_ms: int, partial_interval_ms: int,
+                min_frames: int, max_frames: int, stream_chunk_ms: int,
+                stream_context_ms: int, preroll_ms: int = constants.PREROLL_MS,
+                queue_frames: int = constants.AUDIO_QUEUE_FRAMES,
+                overload_policy: str = constants.OVERLOAD_POLICY,
+                vad_engine: str = constants.VAD_ENGINE,
+                vad_gate_level: int = constants.VAD_GATE_LEVEL,
+                partial_adaptive: bool = constants.PARTIAL_ADAPTIVE,
+                partial_min_ms: int = constants.PARTIAL_MIN_MS,
+                partial_max_ms: int = constants.PARTIAL_MAX_MS,
+                partial_target: float = constants.PARTIAL_TARGET_UTIL) -> 'PipelineConfig':
+        return cls(frame_ms, vad_mode,
+                   int(max_silence_ms / frame_ms),
+                   int(partial_interval_ms / frame_ms),
+                   min_frames, max_frames,
+                   # sliding-window partials; a chunk size of 0 re-decodes the whole segment
+                   int(stream_chunk_ms / frame_ms),
+                   int(stream_context_ms / frame_ms),
+                   int(preroll_ms / frame_ms),
+                   queue_frames, overload_policy, vad_engine, vad_gate_level,
+                   partial_adaptive,
+                   max(1, int(partial_min_ms / frame_ms)),
+                   max(1, int(partial_max_ms / frame_ms)),
+                   partial_target)
+
+class DevicePipeline:
+    """Resampling, VAD and segmentation state for a single audio input.
+
+    Each pipeline numbers its own segments and tags its results with
+    ``device``, so several inputs can share one scheduler and text queue
+    without their audio being mixed into the same segment.
+
+    Device blocks land in a preallocated ``inbox`` and resampled audio in a
+    preallocated ``ring`` large enough for a full segment plus pre-roll.
+    With a segment stream, a segment runs on through long speech and only
+    ends at a pause: its audio is committed in overlapping chunks as it
+    comes, so the ring only needs to hold the part not yet committed.
+    The VAD reads frames from the ring in place and segments are copied
+    out once when handed to the scheduler. When the inbox is backed up,
+    up to ``VAD_BLOCK_FRAMES`` frames are classified per VAD call.
+    """
+
+    def __init__(self, device, rate: int, config: PipelineConfig,
+                 scheduler: ASRScheduler, text_queue) -> None:
+        self.device = device
+        self.config = config
+        self.scheduler = scheduler
         self.text_q = text_queue
-        self.vad = webrtcvad.Vad(vad_mode)
-        self.frame_ms = frame_ms
-        self.max_silence = int(max_silence_ms / frame_ms)
-        self.partial_frames = int(partial_interval_ms / frame_ms)
-        self.min_frames = min_frames
-        self.max_frames = max_frames
-        self.model = model
-        self.audio_q = queue.Queue()
-        self.running = False
+        self.frame_len = constants.TARGET_RATE * config.frame_ms // 1000
+        self.inbox = FrameRing(config.queue_frames, -(-rate * config.frame_ms // 1000),
+                               config.overload_policy, keep_quiet=config.max_silence + 2)
+        self.reported_drops = 0
+        # set by the owner while the partial cadence adapts
+        self.partial_frames = config.partial_frames
+        self.resampler = StreamResampler(rate, constants.TARGET_RATE)
+        self.vad = VoiceDetector(make_engine(config.vad_engine, config.vad_mode),
+                                 config.vad_gate_level)
+        # device samples written to the ring per VAD block
+        self.block_len = self.inbox.frame_len * constants.VAD_BLOCK_FRAMES
+        self.limit_frames = self._limit_frames(config)
+        self.ring = SampleRing(self._ring_capacity())
+        self.vad_pos = 0
         self.segment = 0
-        self.devices = devices
-        # executor for transcribe tasks
-        self.executor = ThreadPoolExecutor(max_workers=2)
-
-    def _audio_callback_factory(self, rate: int):
-        def callback(indata: np.ndarray, frames: int, time_info: Dict, status) -> None:
-            if status:
-                logger.warning("Audio stream status: %s", status)
-            pcm = indata.copy().flatten()
-            self.audio_q.put((pcm, rate))
-        return callback
-
-    def _setup_streams(self):
-        stack = contextlib.ExitStack()
-        for dev in self.devices:
-            info = sd.query_devices(dev)
-            dev_rate = int(info['default_samplerate'])
-            blocksize = int(dev_rate * self.frame_ms / 1000)
-            stack.enter_context(sd.InputStream(
-                samplerate=dev_rate,
-                channels=1,
-                dtype="int16",
-                blocksize=blocksize,
-                device=dev,
-                callback=self._audio_callback_factory(dev_rate)
-            ))
-        return stack
-
-    def _init_loop_state(self):
-        self.buffer = []
+        self.stream: Optional[SegmentStream] = None
+        self.seg_start = self.seg_end = self.last_end = 0
         self.silence = 0
         self.triggered = False
         self.frames = 0
         self.speech_frames = 0
 
-    def _process_frame(self, pcm_rs, is_speech):
+    def reconfigure(self, config: PipelineConfig) -> None:
+        """Switch to new segmentation settings between two frames.
+
+        Must run on the thread that feeds the pipeline. The frame size and
+        inbox size are fixed for a pipeline's lifetime; a segment in
+        progress keeps its stream settings and ends under the new limits.
+        """
+        if (config.frame_ms, config.queue_frames) != (self.config.frame_ms, self.config.queue_frames):
+            raise ValueError("frame size and inbox size need a new pipeline")
+        if config.vad_engine != self.config.vad_engine:
+            self.vad = VoiceDetector(make_engine(config.vad_engine, config.vad_mode),
+                                     config.vad_gate_level)
+        elif config.vad_mode != self.config.vad_mode:
+            self.vad.set_mode(config.vad_mode)
+        self.vad.set_gate(config.vad_gate_level)
+        self.inbox.configure(config.overload_policy, config.max_silence + 2)
+        self.partial_frames = config.partial_frames
+        self.limit_frames = self._limit_frames(config)
+        capacity = self._ring_capacity()
+        if self.triggered:
+            # never cut into the segment in progress
+            capacity = max(capacity, self.ring.end - self._held_start() + 4 * self.frame_len)
+        self.ring.resize(capacity)
+        self.config = config
+
+    @staticmethod
+    def _limit_frames(config: PipelineConfig) -> int:
+        # longest uncommitted audio kept before the segment is force-finalized, in frames
+        return max(2 * config.max_frames + config.preroll,
+                   config.stream_chunk + config.stream_context)
+
+    def _held_start(self) -> int:
+        """Ring position of the oldest audio the segment in progress still needs."""
+        if self.stream is not None:
+            return self.seg_start + self.stream.tail_start() * self.frame_len
+        return self.seg_start
+
+    def _ring_capacity(self) -> int:
+        # a full segment plus the frames written ahead of the VAD
+        return (self.limit_frames + 4 + constants.VAD_BLOCK_FRAMES) * self.frame_len
+
+    def drain(self) -> None:
+        """Process every block waiting in the inbox."""
+        frame = self.inbox.peek()
+        while frame is not None:
+            self.write(frame)
+            self.inbox.advance()
+            if self.ring.end - self.vad_pos >= constants.VAD_BLOCK_FRAMES * self.frame_len:
+                self.detect()
+            frame = self.inbox.peek()
+        self.detect()
+
+    def feed(self, pcm: np.ndarray) -> None:
+        """Resample device audio of any length and run whole frames through the VAD."""
+        for pos in range(0, len(pcm), self.block_len):
+            self.write(pcm[pos:pos + self.block_len])
+            self.detect()
+
+    def write(self, pcm: np.ndarray) -> None:
+        """Resample a block of device audio into the ring."""
+        start = time.perf_counter()
+        self.ring.write(self.resampler.process(pcm))
+        METRICS.since('resample', start)
+
+    def detect(self) -> None:
+        """Classify the whole frames written since the last call, a block at a time."""
+        flen = self.frame_len
+        while self.ring.end - self.vad_pos >= flen:
+            pos = self.vad_pos
+            n = min((self.ring.end - pos) // flen, constants.VAD_BLOCK_FRAMES)
+            self.vad_pos += n * flen
+            start = time.perf_counter()
+            flags = self.vad.classify(self.ring.view(pos, pos + n * flen).reshape(n, flen))
+            METRICS.since('vad', start)
+            for i in range(n):
+                self.process_frame(pos + i * flen, bool(flags[i]))
+
+    def process_frame(self, pos: int, is_speech: bool) -> None:
+        """Advance the segment state machine by the frame starting at ``pos``."""
+        cfg = self.config
+        flen = self.frame_len
         if not self.triggered and is_speech:
             self.triggered = True
-            self.buffer = [pcm_rs]
+            # include a little audio from before the onset
+            held = -(-self.ring.start // flen) * flen
+            self.seg_start = max(pos - cfg.preroll * flen, self.last_end, held)
+            self.seg_end = pos + flen
             self.silence = self.frames = 0
             self.segment += 1
+            if cfg.stream_chunk > 0:
+                self.stream = SegmentStream(self.segment, cfg.stream_chunk, cfg.stream_context,
+                                            cfg.frame_ms)
         elif self.triggered:
-            self.buffer.append(pcm_rs)
+            self.seg_end = pos + flen
             self.frames += 1
             if not is_speech:
                 self.silence += 1
-                if self.speech_frames >= self.max_frames or self.silence > self.max_silence:
-                    if self.speech_frames >= self.min_frames:
-                        self._enqueue_transcription(self.buffer, final=True)
-                    self._reset_loop_state()
+                # past max_frames a segment ends at any gap, unless a stream
+                # keeps its decoding bounded and it can run on to a real pause
+                long = self.stream is None and self.speech_frames >= cfg.max_frames
+                if long or self.silence > cfg.max_silence:
+                    if self.speech_frames >= cfg.min_frames:
+                        self._enqueue_transcription(final=True)
+                    self._reset_state()
             else:
                 self.silence = 0
                 self.speech_frames += 1
-            if self.frames >= self.partial_frames and self.speech_frames >= self.min_frames:
-                self._enqueue_transcription(self.buffer, final=False)
+            if self.stream is not None:
+                self._enqueue_chunks()
+            if self.triggered and (self.seg_end - self._held_start()) // flen >= self.limit_frames:
+                # the ring only holds this much; finalize before it wraps
+                self._enqueue_transcription(final=True)
+                self._reset_state()
+            # a partial interval of 0 disables partials
+            if (self.partial_frames and self.frames >= self.partial_frames
+                    and self.speech_frames >= cfg.min_frames):
+                self._enqueue_transcription(final=False)
                 self.frames = 0
 
-    def _reset_loop_state(self):
+    def _reset_state(self):
         self.triggered = False
+        self.stream = None
+        self.last_end = self.seg_end
         self.silence = 0
         self.frames = 0
         self.speech_frames = 0
-        with self.audio_q.mutex:
-            self.audio_q.queue.clear()
+
+    def _enqueue_chunks(self) -> None:
+        """Commit full chunks of the current segment for one-time decoding."""
+        while True:
+            chunk = self.stream.next_chunk((self.seg_end - self.seg_start) // self.frame_len)
+            if chunk is None:
+                return
+            idx, start, end = chunk
+            data = self.ring.read(self.seg_start + start * self.frame_len,
+                                  self.seg_start + end * self.frame_len)
+            self.scheduler.submit((self.device, self.segment), data, CHUNK,
+                                  partial(self._on_chunk, self.stream, idx))
+
+    def _enqueue_transcription(self, final: bool) -> None:
+        """Queue the current segment's audio for transcription."""
+        stream = self.stream
+        # with a segment stream only the uncommitted tail is decoded
+        start = stream.tail_start() if stream is not None else 0
+        data = self.ring.read(self.seg_start + start * self.frame_len, self.seg_end)
+        seg_id = self.segment
+        # segment time span in seconds since the pipeline started
+        span = (self.seg_start / constants.TARGET_RATE, self.seg_end / constants.TARGET_RATE)
+        if stream is not None and final:
+            stream.span = span
+        self.scheduler.submit((self.device, seg_id), data, FINAL if final else PARTIAL,
+                              partial(self._on_result, final, seg_id, stream, span, start))
+
+    def flush(self) -> None:
+        """Finalize the segment in progress, e.g. at the end of a file."""
+        if self.triggered:
+            if self.speech_frames >= self.config.min_frames:
+                self._enqueue_transcription(final=True)
+            self._reset_state()
+
+    def _on_chunk(self, stream: SegmentStream, idx: int, text: Optional[str]) -> None:
+        final_text = stream.chunk_done(idx, text if text is not None else '')
+        if final_text is not None:
+            self._emit(final_text, True, stream.seg_id, stream.span)
+
+    def _on_result(self, final: bool, seg_id: int, stream: Optional[SegmentStream],
+                   span: Tuple[float, float], start: int, text: Optional[str]) -> None:
+        if text is None:
+            if not final or stream is None:
+                return
+            text = ''
+        if stream is not None:
+            text = stream.final_done(start, text) if final else stream.partial_done(start, text)
+            if text is None:
+                # the last outstanding chunk emits the final
+                return
+        # always enqueue transcription
+        self._emit(text, final, seg_id, span)
+
+    def _emit(self, text: str, final: bool, seg_id: int, span: Tuple[float, float]) -> None:
+        self.text_q.put({'text': str(text), 'final': final, 'id': seg_id, 'device': self.device,
+                         'start': round(span[0], 3), 'end': round(span[1], 3),
+                         'trace': trace_id((self.device, seg_id)),
+                         'emitted': time.perf_counter()})
+
+# wakes the VAD loop to apply a pending reconfiguration or to stop
+_CONTROL = object()
+
+
+class VADTranscriber(threading.Thread):
+    """Captures from one or more inputs and feeds a shared ASR scheduler.
+
+    Settings are changed while running with ``reconfigure`` and inputs
+    with ``set_devices`` or ``set_sources``; both hand the change to the
+    VAD loop, which applies it between two blocks of audio, so the ASR
+    workers and the loop thread stay up. ``stop`` shuts everything down
+    and waits for the threads to exit.
+
+    With ``partial_adaptive`` the loop steers the partial interval of
+    every input by the measured ASR load, see ``PartialCadence``;
+    ``cadence_stats`` reports it.
+    """
+
+    def __init__(self, text_queue: queue.Queue, devices: List[int], model,
+                 vad_mode: int = constants.VAD_MODE,
+                 frame_ms: int = constants.FRAME_MS,
+                 max_silence_ms: int = constants.MAX_SILENCE_MS,
+                 partial_interval_ms: int = constants.PARTIAL_INTERVAL_MS,
+                 min_frames: int = constants.MIN_FRAMES,
+                 max_frames: int = constants.MAX_FRAMES,
+                 stream_chunk_ms: int = constants.STREAM_CHUNK_MS,
+                 stream_context_ms: int = constants.STREAM_CONTEXT_MS,
+                 asr_workers: int = constants.ASR_WORKERS,
+                 asr_max_batch: int = constants.ASR_MAX_BATCH,
+                 asr_max_wait_ms: int = constants.ASR_MAX_WAIT_MS,
+                 preroll_ms: int = constants.PREROLL_MS,
+                 audio_queue_frames: int = constants.AUDIO_QUEUE_FRAMES,
+                 overload_policy: str = constants.OVERLOAD_POLICY,
+                 vad_engine: str = constants.VAD_ENGINE,
+                 vad_gate_level: int = constants.VAD_GATE_LEVEL,
+                 partial_adaptive: bool = constants.PARTIAL_ADAPTIVE,
+                 partial_min_ms: int = constants.PARTIAL_MIN_MS,
+                 partial_max_ms: int = constants.PARTIAL_MAX_MS,
+                 partial_target: float = constants.PARTIAL_TARGET_UTIL,
+                 sources: Optional[List[AudioSource]] = None) -> None:
+        super().__init__(daemon=True, name='vad-loop')
+        self.text_q = text_queue
+        self.frame_ms = frame_ms
+        self.config = PipelineConfig.from_ms(vad_mode, frame_ms, max_silence_ms, partial_interval_ms,
+                                             min_frames, max_frames, stream_chunk_ms,
+                                             stream_context_ms, preroll_ms, audio_queue_frames,
+                                             overload_policy, vad_engine, vad_gate_level,
+                                             partial_adaptive, partial_min_ms, partial_max_ms,
+                                             partial_target)
+        self.model = model
+        self.runner = ModelRunner(model)
+        # wake-ups for the VAD loop, at most one pending per source; the
+        # audio itself waits in each pipeline's bounded inbox
+        self.audio_q = queue.Queue()
+        self._signalled = set()
+        self.running = False
+        self.devices = devices
+        # defaults to live capture from ``devices``
+        self.sources = sources
+        self._own_sources = sources is None
+        self._ended = set()
+        self._flushed = set()
+        self.pipelines: Dict[int, DevicePipeline] = {}
+        # changes waiting for the VAD loop
+        self._control_lock = threading.Lock()
+        self._pending_config: Optional[PipelineConfig] = None
+        self._pending_devices: Optional[List[int]] = None
+        self._pending_sources: Optional[List[AudioSource]] = None
+        # batches transcribe jobs and drops superseded partials
+        self.scheduler = ASRScheduler(self.runner, asr_workers, asr_max_batch, asr_max_wait_ms)
+        self.cadence: Optional[PartialCadence] = None
+        self._configure_cadence()
+
+    def add_pipeline(self, device, rate: int) -> DevicePipeline:
+        pipeline = DevicePipeline(device, rate, self.config, self.scheduler, self.text_q)
+        if self.cadence is not None:
+            pipeline.partial_frames = self.cadence.frames(self.config.frame_ms)
+        self.pipelines[device] = pipeline
+        return pipeline
+
+    def _configure_cadence(self) -> None:
+        cfg = self.config
+        if not (cfg.partial_adaptive and cfg.partial_frames):
+            # the pipelines' own config applies
+            self.cadence = None
+            return
+        bounds = (cfg.partial_min * cfg.frame_ms, cfg.partial_max * cfg.frame_ms, cfg.partial_target)
+        if self.cadence is None:
+            self.cadence = PartialCadence(self.scheduler, cfg.partial_frames * cfg.frame_ms, *bounds)
+        else:
+            self.cadence.configure(*bounds)
+        self._update_cadence(force=True)
+
+    def _update_cadence(self, force: bool = False) -> None:
+        cadence = self.cadence
+        if cadence is not None and (cadence.update() or force):
+            frames = cadence.frames(self.config.frame_ms)
+            for pipeline in self.pipelines.values():
+                pipeline.partial_frames = frames
+
+    def cadence_stats(self) -> Dict[str, float]:
+        """Current partial interval and ASR utilization; empty with a fixed interval."""
+        cadence = self.cadence
+        if cadence is None:
+            return {}
+        return cadence.stats()
+
+    def _sink_factory(self, source: AudioSource):
+        inbox = self.pipelines[source.name].inbox
+        name = source.name
+        if source.live:
+            def sink(pcm: np.ndarray) -> None:
+                start = time.perf_counter()
+                inbox.push(pcm)
+                self._signal(name)
+                METRICS.since('callback_enqueue', start)
+        else:
+            # replayed audio waits for room instead of being dropped
+            def sink(pcm: np.ndarray) -> None:
+                start = time.perf_counter()
+                while not inbox.push(pcm, timeout=0.1):
+                    if not self.running:
+                        return
+                self._signal(name)
+                METRICS.since('callback_enqueue', start)
+        return sink
+
+    def _signal(self, name) -> None:
+        if name not in self._signalled:
+            self._signalled.add(name)
+            self.audio_q.put((name, time.perf_counter()))
+
+    def _source_done(self, name) -> None:
+        self._ended.add(name)
+        self.audio_q.put((name, time.perf_counter()))
+
+    def _open_devices(self, devices: List[int]) -> List[AudioSource]:
+        sources = []
+        for dev in devices:
+            try:
+                sources.append(DeviceSource(dev, self.frame_ms))
+            except Exception as e:
+                logger.error("Could not open input %s: %s", dev, e)
+        return sources
+
+    def _start_sources(self, sources: List[AudioSource]) -> None:
+        self.sources = []
+        for source in sources:
+            self.add_pipeline(source.name, source.rate)
+        for source in sources:
+            try:
+                source.start(self._sink_factory(source), partial(self._source_done, source.name))
+            except Exception as e:
+                logger.error("Could not start input %s: %s", source.name, e)
+                del self.pipelines[source.name]
+                continue
+            self.sources.append(source)
+
+    def _stop_sources(self) -> None:
+        for source in self.sources or []:
+            try:
+                source.stop()
+            except Exception as e:
+                logger.error("Could not stop input %s: %s", source.name, e)
+
+    def _replace_sources(self, sources: List[AudioSource]) -> None:
+        """Swap inputs; the ASR scheduler and this thread keep running."""
+        self._stop_sources()
+        old = self.pipelines
+        for pipeline in old.values():
+            # finish what the old inputs captured
+            pipeline.drain()
+            pipeline.flush()
+        self.pipelines = {}
+        self._ended.clear()
+        self._flushed.clear()
+        self._signalled.clear()
+        self._start_sources(sources)
+        for name, pipeline in self.pipelines.items():
+            if name in old:
+                # keep segment ids unique, results of the old pipeline may still arrive
+                pipeline.segment = old[name].segment
+
+    def _apply_control(self) -> None:
+        with self._control_lock:
+            config, self._pending_config = self._pending_config, None
+            devices, self._pending_devices = self._pending_devices, None
+            sources, self._pending_sources = self._pending_sources, None
+        if config is not None:
+            reopen = (config.frame_ms, config.queue_frames) != (self.config.frame_ms,
+                                                                self.config.queue_frames)
+            if reopen and not self._own_sources and sources is None:
+                logger.warning("Frame and queue size changes apply when the inputs are replaced")
+                config = dataclasses.replace(config, frame_ms=self.config.frame_ms,
+                                             queue_frames=self.config.queue_frames)
+                reopen = False
+            self.config = config
+            self.frame_ms = config.frame_ms
+            if reopen and devices is None and sources is None:
+                devices = self.devices
+            if not reopen:
+                for pipeline in self.pipelines.values():
+                    pipeline.reconfigure(config)
+            self._configure_cadence()
+        if devices is not None:
+            self._own_sources = True
+            sources = self._open_devices(devices)
+        if sources is not None:
+            self._replace_sources(sources)
+            logger.info("Inputs now %s", ', '.join(str(s.name) for s in self.sources) or 'none')
+
+    def reconfigure(self, config: PipelineConfig, asr_workers: Optional[int] = None,
+                    asr_max_batch: Optional[int] = None,
+                    asr_max_wait_ms: Optional[int] = None) -> None:
+        """Apply new settings without restarting; safe from any thread.
+
+        VAD mode, thresholds, segment limits and the overload policy take
+        effect on the next frame. A new frame or inbox size reopens the
+        inputs. The scheduler is resized in place.
+        """
+        self.scheduler.configure(asr_workers, asr_max_batch, asr_max_wait_ms)
+        with self._control_lock:
+            self._pending_config = config
+        self._wake()
+
+    def set_devices(self, devices: List[int]) -> None:
+        """Capture from ``devices`` instead; safe from any thread."""
+        with self._control_lock:
+            self.devices = devices
+            self._pending_devices = devices
+            self._pending_sources = None
+        self._wake()
+
+    def set_sources(self, sources: List[AudioSource]) -> None:
+        """Read from ``sources`` instead; safe from any thread."""
+        with self._control_lock:
+            self._pending_sources = sources
+            self._pending_devices = None
+        self._wake()
+
+    def _wake(self) -> None:
+        self.audio_q.put((_CONTROL, time.perf_counter()))
+
+    def _drain(self, name) -> None:
+        pipeline = self.pipelines.get(name)
+        if pipeline is None:
+            # signalled by an input that was replaced since
+            return
+        pipeline.drain()
+        dropped = pipeline.inbox.dropped
+        if dropped != pipeline.reported_drops:
+            logger.warning("Input %s fell behind, %d frames dropped (%s)",
+                           name, dropped - pipeline.reported_drops, pipeline.inbox.policy)
+            pipeline.reported_drops = dropped
+        if name in self._ended and name not in self._flushed and not len(pipeline.inbox):
+            pipeline.flush()
+            self._flushed.add(name)
 
     def run(self) -> None:
         self.running = True
-        with self._setup_streams() as stack:
-            self._init_loop_state()
+        try:
+            self._start_sources(self._open_devices(self.devices) if self.sources is None
+                                else self.sources)
             while self.running:
                 try:
-                    pcm, rate = self.audio_q.get(timeout=0.5)
+                    name, queued = self.audio_q.get(timeout=0.5)
                 except queue.Empty:
+                    self._update_cadence()
+                    continue
+                if name is _CONTROL:
+                    if self.running:
+                        self._apply_control()
                     continue
-                pcm_rs = resample_pcm(pcm.astype(np.int16), rate, constants.TARGET_RATE)
-                is_speech = self.vad.is_speech(pcm_rs.tobytes(), sample_rate=constants.TARGET_RATE)
-                self._process_frame(pcm_rs, is_speech)
+                METRICS.since('audio_q_wait', queued)
+                # frames pushed after this are picked up by this drain or signal again
+                self._signalled.discard(name)
+                self._drain(name)
+                self._update_cadence()
+                if self.sources and len(self._flushed) == len(self.sources):
+                    # every source was finite and has been played out
+                    break
+        finally:
+            self.running = False
+            self._stop_sources()
 
-    def _enqueue_transcription(self, buffer: List[np.ndarray], final: bool) -> None:
-        """Spawn a thread to process and transcribe buffered audio."""
-        data = np.concatenate(buffer)
-        seg_id = self.segment
-        # submit transcription to executor
-        self.executor.submit(self._transcribe, data, final, seg_id)
+    def stats(self) -> Dict:
+        """Inbox depth, overruns and dropped frames per input."""
+        return {name: {'depth': len(p.inbox), 'overruns': p.inbox.overruns,
+                       'dropped': p.inbox.dropped}
+                for name, p in list(self.pipelines.items())}
 
-    def _transcribe(self, data: np.ndarray, final: bool, seg_id: int) -> None:
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
-            wav_write(f.name, constants.TARGET_RATE, data)
-            path = f.name
-        try:
-            text = self.model.transcribe([path], verbose=False)[0].text.strip()
-            # always enqueue transcription
-            self.text_q.put({'text': text, 'final': final, 'id': seg_id})
-        except Exception as e:
-            logger.error("ASR error: %s", e)
-        finally:
-            os.remove(path)
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop capturing and wait for the loop and the ASR workers to exit.
 
-    def stop(self) -> None:
+        Jobs already submitted still run, so their results are delivered.
+        """
         self.running = False
+        self._wake()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join(timeout)
+        self.scheduler.shutdown(wait=self is not threading.current_thread())
@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
+
+import constants
+from metrics import METRICS
+
+
+class ResultQueue(QObject):
+    """Transcriber results handed to the UI thread through a queued signal.
+
+    ``put`` may be called from any thread. ``ready`` is emitted once per
+    batch: further results arriving before the UI thread calls ``drain``
+    join the same batch instead of queueing more signals.
+    """
+    ready = Signal()
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._signalled = False
+
+    def put(self, item: Dict) -> None:
+        with self._lock:
+            self._items.append(item)
+            if self._signalled:
+                return
+            self._signalled = True
+        self.ready.emit()
+
+    def drain(self) -> List[Dict]:
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            self._signalled = False
+        return items
+
+    def clear(self) -> None:
+        self.drain()
+
+
+class TranscriptView(QPlainTextEdit):
+    """Caption text that is updated in place rather than redrawn.
+
+    Finals are appended as new blocks and the in-progress partial, when
+    there is one, is kept as the last block and replaced on each update.
+    The document's maximum block count trims old lines. A full redraw is
+    only needed when the shown lines change otherwise, e.g. on a mode
+    switch or after the view was cleared.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(readOnly=True)
+        self.partial_shown = False
+
+    def show_lines(self, lines: List[str], partial: str) -> None:
+        """Redraw from scratch."""
+        self.clear()
+        for line in lines:
+            self.appendPlainText(line)
+        if partial:
+            self.appendPlainText(partial)
+        self.partial_shown = bool(partial)
+
+    def apply(self, finals: List[str], partial: str, lines: Callable[[], List[str]]) -> None:
+        """Append new finals and show ``partial`` as the last line.
+
+        ``lines`` returns the finals a full redraw would show, used when
+        the change cannot be made in place.
+        """
+        # an emptied view is redrawn, so ``partial_shown`` needs no reset on clear();
+        # a partial that vanished leaves room for an older line above it
+        if self.document().isEmpty() or (self.partial_shown and not partial and not finals):
+            self.show_lines(lines(), partial)
+            return
+        if self.partial_shown and finals:
+            self._remove_last_block()
+            self.partial_shown = False
+        for line in finals:
+            self.appendPlainText(line)
+        if partial:
+            if self.partial_shown:
+                self._replace_last_block(partial)
+            else:
+                self.appendPlainText(partial)
+        elif finals:
+            # without a partial line the block limit leaves one line too many
+            excess = self.document().blockCount() - len(lines())
+            if excess > 0:
+                self._remove_first_blocks(excess)
+        self.partial_shown = bool(partial)
+
+    def _last_block(self) -> QTextCursor:
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        return cursor
+
+    def _remove_last_block(self) -> None:
+        cursor = self._last_block()
+        cursor.removeSelectedText()
+        # join with the block above, if any
+        cursor.deletePreviousChar()
+
+    def _remove_first_blocks(self, n: int) -> None:
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.NextBlock, QTextCursor.KeepAnchor, n)
+        cursor.removeSelectedText()
+
+    def _replace_last_block(self, text: str) -> None:
+        self._last_block().insertText(text)
+
+
+class FrameCoalescer:
+    """Runs ``render`` at most once per display frame.
+
+    The first request after an idle period renders immediately; requests
+    arriving within ``frame_ms`` of the last render are folded into one
+    render at the end of that frame.
+    """
+
+    def __init__(self, parent: QObject, render: Callable[[], None],
+                 frame_ms: int = constants.UI_FRAME_MS) -> None:
+        self.render = render
+        self.frame = frame_ms / 1000.0
+        self.last = 0.0
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._run)
+
+    def request(self) -> None:
+        if self.timer.isActive():
+            return
+        wait = self.last + self.frame - time.perf_counter()
+        if wait <= 0:
+            self._run()
+        else:
+            self.timer.start(int(wait * 1000) + 1)
+
+    def _run(self) -> None:
+        self.last = time.perf_counter()
+        self.render()
+        METRICS.since('ui_render', self.last)
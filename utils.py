@@ -1,5 +1,10 @@
+import math
+import functools
+from typing import Tuple
+
 import numpy as np
 import scipy.signal
+from scipy.io import wavfile
 
 def resample_pcm(pcm: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
     if orig_sr == target_sr:
@@ -9,4 +14,85 @@ def resample_pcm(pcm: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
     resampled = scipy.signal.resample(pcm, new_len)
     # clip and convert to int16
     resampled = np.clip(resampled, np.iinfo(np.int16).min, np.iinfo(np.int16).max)
-    return resampled.astype(np.int16)
\ No newline at end of file
+    return resampled.astype(np.int16)
+
+@functools.lru_cache(maxsize=None)
+def _polyphase_taps(orig_sr: int, target_sr: int, half_width: int = 10) -> Tuple[int, int, np.ndarray]:
+    """Return (up, down, taps) of the anti-aliasing filter for orig_sr -> target_sr."""
+    g = math.gcd(orig_sr, target_sr)
+    up, down = target_sr // g, orig_sr // g
+    max_rate = max(up, down)
+    taps = scipy.signal.firwin(2 * half_width * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    return up, down, (taps * up).astype(np.float32)
+
+
+class StreamResampler:
+    """Rational polyphase resampler that keeps filter state across blocks.
+
+    Input is consumed in whole filter periods of ``down`` samples, each
+    producing ``up`` output samples. Leftover input and enough history to
+    cover the filter carry over to the next call, so block boundaries are
+    seamless and the output never drifts from ``total_in * up / down`` by
+    more than one period. Filtering stays in float32.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int) -> None:
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        if orig_sr == target_sr:
+            self.up = self.down = 1
+            return
+        self.up, self.down, self.taps = _polyphase_taps(orig_sr, target_sr)
+        # history needed by the first output of a period, rounded to whole periods
+        need = -(-(len(self.taps) - 1) // self.up)
+        self.history = -(-need // self.down) * self.down
+        self.skip = self.history // self.down * self.up
+        # work buffer; the first ``pending`` samples are unconsumed input,
+        # primed with silence
+        self.buf = np.zeros(self.history + self.down, dtype=np.float32)
+        self.pending = self.history
+
+    def process(self, pcm: np.ndarray) -> np.ndarray:
+        if self.up == self.down:
+            return pcm.astype(np.int16, copy=False)
+        n = self.pending + len(pcm)
+        if n > len(self.buf):
+            self.buf = np.concatenate((self.buf[:self.pending], np.zeros(n, dtype=np.float32)))
+        self.buf[self.pending:n] = pcm
+        periods = (n - self.history) // self.down
+        if periods <= 0:
+            self.pending = n
+            return np.zeros(0, dtype=np.int16)
+        out = scipy.signal.upfirdn(self.taps, self.buf[:n], self.up, self.down)
+        out = out[self.skip:self.skip + periods * self.up]
+        # carry the unconsumed tail over to the front of the work buffer
+        consumed = periods * self.down
+        self.pending = n - consumed
+        self.buf[:self.pending] = self.buf[consumed:n].copy()
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16)
+
+
+def load_audio(path: str) -> Tuple[np.ndarray, int]:
+    """Read a WAV or FLAC file as mono int16."""
+    if path.lower().endswith('.flac'):
+        try:
+            import soundfile
+        except ImportError as e:
+            raise RuntimeError("reading FLAC files requires the soundfile package") from e
+        data, rate = soundfile.read(path, dtype='int16', always_2d=True)
+    else:
+        rate, data = wavfile.read(path)
+        if data.ndim == 1:
+            data = data[:, None]
+    if data.dtype == np.int16:
+        pcm = data.mean(axis=1).astype(np.int16) if data.shape[1] > 1 else data[:, 0]
+    elif data.dtype.kind == 'f':
+        pcm = np.clip(data.mean(axis=1) * 32768.0, -32768, 32767).astype(np.int16)
+    else:
+        # int32/uint8 WAVs: rescale to 16 bits
+        info = np.iinfo(data.dtype)
+        scale = 32768.0 / (1 << (info.bits - 1))
+        centered = data.mean(axis=1) - (info.min + info.max + 1) / 2 * (info.min == 0)
+        pcm = np.clip(centered * scale, -32768, 32767).astype(np.int16)
+    return np.ascontiguousarray(pcm), int(rate)
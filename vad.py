@@ -0,0 +1,174 @@
+"""Speech/non-speech decisions for blocks of VAD frames.
+
+A ``VoiceDetector`` classifies several frames per call. An energy and
+zero-crossing pre-gate, computed for the whole block with numpy, passes
+only frames that might hold speech on to the engine, so long silences
+never reach it. The gate has hysteresis: it opens on a frame above
+``gate_level`` and only closes again once a frame falls below half of
+it, then lets the engine decide ``GATE_HANGOVER`` more frames, so the
+quiet ends of words are still classified by the engine.
+Every ``GATE_SAMPLE_EVERY``-th gated frame is classified anyway, its
+result discarded: webrtcvad adapts its noise model to the frames it is
+shown and, shown only loud ones, takes the first voice for background.
+
+Engines take an int16 array of frames, shape (frames, samples), and
+return a boolean per frame. ``webrtc`` is the default; others are added
+with ``register_engine``.
+"""
+import logging
+from typing import Callable, Dict
+
+import numpy as np
+
+import constants
+
+logger = logging.getLogger(__name__)
+
+# amplitude at which an open gate closes again, relative to the onset level
+GATE_RELEASE = 0.5
+GATE_SAMPLE_EVERY = 16
+# frames the engine keeps deciding after the gate closes
+GATE_HANGOVER = 8
+
+
+class WebRTCEngine:
+    """webrtcvad's classifier, one C call per frame."""
+
+    def __init__(self, mode: int, rate: int = constants.TARGET_RATE) -> None:
+        import webrtcvad
+        self.vad = webrtcvad.Vad(mode)
+        self.rate = rate
+
+    def set_mode(self, mode: int) -> None:
+        self.vad.set_mode(mode)
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        n, flen = frames.shape
+        data = memoryview(np.ascontiguousarray(frames)).cast('B')
+        step = 2 * flen
+        is_speech, rate = self.vad.is_speech, self.rate
+        return np.fromiter((is_speech(data[i * step:(i + 1) * step], rate, flen) for i in range(n)),
+                           dtype=bool, count=n)
+
+
+class EnergyEngine:
+    """Frame RMS against a fixed level per mode; no dependencies, no state.
+
+    Much cruder than webrtcvad, it flags any loud sound as speech. Useful
+    where webrtcvad is unavailable or with a clean close-talking mic.
+    """
+    LEVELS = (300.0, 500.0, 800.0, 1200.0)
+
+    def __init__(self, mode: int, rate: int = constants.TARGET_RATE) -> None:
+        self.set_mode(mode)
+
+    def set_mode(self, mode: int) -> None:
+        self.energy = self.LEVELS[mode] ** 2
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        x = frames.astype(np.float32)
+        return np.einsum('ij,ij->i', x, x) >= self.energy * frames.shape[1]
+
+
+ENGINES: Dict[str, Callable] = {'webrtc': WebRTCEngine, 'energy': EnergyEngine}
+
+
+def register_engine(name: str, factory: Callable) -> None:
+    """Make ``factory(mode, rate)`` available as VAD engine ``name``."""
+    ENGINES[name] = factory
+
+
+def make_engine(name: str, mode: int, rate: int = constants.TARGET_RATE):
+    factory = ENGINES.get(name)
+    if factory is None:
+        raise ValueError(f"unknown VAD engine {name!r}, expected one of {', '.join(ENGINES)}")
+    return factory(mode, rate)
+
+
+class VoiceDetector:
+    """Pre-gate plus engine; ``gate_level`` 0 sends every frame to the engine."""
+
+    def __init__(self, engine, gate_level: float = constants.VAD_GATE_LEVEL,
+                 min_zcr: float = constants.VAD_GATE_MIN_ZCR) -> None:
+        self.engine = engine
+        self.open = False
+        self.hang = 0
+        self.frames = 0
+        self.gated = 0
+        self._closed = 0
+        self.set_gate(gate_level, min_zcr)
+
+    def set_gate(self, gate_level: float, min_zcr: float = constants.VAD_GATE_MIN_ZCR) -> None:
+        self.gate_level = gate_level
+        self.min_zcr = min_zcr
+        self.onset_energy = float(gate_level) ** 2
+        self.release_energy = self.onset_energy * GATE_RELEASE ** 2
+
+    def set_mode(self, mode: int) -> None:
+        self.engine.set_mode(mode)
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """Speech flag per row of ``frames``."""
+        n, flen = frames.shape
+        self.frames += n
+        if self.gate_level <= 0:
+            return self.engine.classify(frames)
+        x = frames.astype(np.float32)
+        energy = np.einsum('ij,ij->i', x, x)
+        out = np.zeros(n, dtype=bool)
+        if not self.hang and energy.max() < self.release_energy * flen:
+            # the common case in a pause: nothing but the noise samples
+            self.open = False
+            send = list(range(-self._closed % GATE_SAMPLE_EVERY, n, GATE_SAMPLE_EVERY))
+            self._closed += n
+            self.gated += n - len(send)
+            if send:
+                self.engine.classify(frames[send])
+            return out
+        if self.open and energy.min() >= self.release_energy * flen:
+            # still talking
+            self.hang = GATE_HANGOVER
+            return self.engine.classify(frames)
+        passed, send = self._gate(frames, energy.tolist())
+        self.gated += n - len(send)
+        if len(send) == n:
+            out = self.engine.classify(frames)
+        elif send:
+            out[send] = self.engine.classify(frames[send])
+        out &= passed
+        return out
+
+    def _voiced(self, frame: np.ndarray) -> bool:
+        # loud but hardly crossing zero: hum, rumble or a DC step, not a voice
+        signs = np.signbit(frame)
+        return np.count_nonzero(signs[1:] != signs[:-1]) >= self.min_zcr * len(frame)
+
+    def _gate(self, frames: np.ndarray, energy):
+        """Frames that may hold speech, and the frames to show the engine.
+
+        Sequential, as each frame depends on the state the previous one
+        left. Zero crossings are only counted where the gate would open.
+        """
+        flen = frames.shape[1]
+        onset, release = self.onset_energy * flen, self.release_energy * flen
+        state, hang, closed = self.open, self.hang, self._closed
+        passed, send = [], []
+        for i, e in enumerate(energy):
+            if (state and e >= release) or (e >= onset and self._voiced(frames[i])):
+                state, hang = True, GATE_HANGOVER
+            else:
+                # after the gate closes the engine decides for a few more frames,
+                # as webrtcvad's own hangover extends speech past its end
+                state = False
+                if hang:
+                    hang -= 1
+                else:
+                    passed.append(False)
+                    if closed % GATE_SAMPLE_EVERY == 0:
+                        send.append(i)
+                    closed += 1
+                    continue
+            passed.append(True)
+            send.append(i)
+        self.open, self.hang, self._closed = state, hang, closed
+        return np.array(passed), send